@@ -0,0 +1,41 @@
+"""Add audit_logs table
+
+Revision ID: 3f1c2a7d9e04
+Revises: 894c05a6a4d9
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9e04'
+down_revision: Union[str, Sequence[str], None] = '894c05a6a4d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('user_ip', sa.String(length=45), nullable=True),
+        sa.Column('document_type', sa.String(length=100), nullable=True),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_audit_logs_timestamp_event_type', 'audit_logs', ['timestamp', 'event_type'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_logs_timestamp_event_type', table_name='audit_logs')
+    op.drop_table('audit_logs')
@@ -0,0 +1,44 @@
+"""Add generation_cache table and summary_usage.cache_hit
+
+Revision ID: 7b2e4d1c8a35
+Revises: 3f1c2a7d9e04
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e4d1c8a35'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a7d9e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'generation_cache',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+    op.create_index(op.f('ix_generation_cache_created_at'), 'generation_cache', ['created_at'], unique=False)
+    op.create_index(op.f('ix_generation_cache_expires_at'), 'generation_cache', ['expires_at'], unique=False)
+    op.add_column(
+        'summary_usage',
+        sa.Column('cache_hit', sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('summary_usage', 'cache_hit')
+    op.drop_index(op.f('ix_generation_cache_expires_at'), table_name='generation_cache')
+    op.drop_index(op.f('ix_generation_cache_created_at'), table_name='generation_cache')
+    op.drop_table('generation_cache')
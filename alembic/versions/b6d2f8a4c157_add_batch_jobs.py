@@ -0,0 +1,66 @@
+"""Add batch_jobs and batch_job_items tables
+
+Revision ID: b6d2f8a4c157
+Revises: e8a1b6d3f920
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f8a4c157'
+down_revision: Union[str, Sequence[str], None] = 'e8a1b6d3f920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'batch_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('total_items', sa.Integer(), nullable=False),
+        sa.Column('user_ip', sa.String(length=45), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_batch_jobs_status'), 'batch_jobs', ['status'], unique=False)
+    op.create_table(
+        'batch_job_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=36), nullable=False),
+        sa.Column('line_no', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('request', sa.Text(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('available_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['batch_jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_batch_job_items_job_line', 'batch_job_items', ['job_id', 'line_no'], unique=True
+    )
+    op.create_index(
+        'ix_batch_job_items_claim', 'batch_job_items', ['status', 'available_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_batch_job_items_claim', table_name='batch_job_items')
+    op.drop_index('ix_batch_job_items_job_line', table_name='batch_job_items')
+    op.drop_table('batch_job_items')
+    op.drop_index(op.f('ix_batch_jobs_status'), table_name='batch_jobs')
+    op.drop_table('batch_jobs')
@@ -0,0 +1,36 @@
+"""Add prompt cache token counts to summary_usage
+
+Revision ID: c4d9e2f7a610
+Revises: 7b2e4d1c8a35
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e2f7a610'
+down_revision: Union[str, Sequence[str], None] = '7b2e4d1c8a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'summary_usage',
+        sa.Column('cache_read_tokens', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'summary_usage',
+        sa.Column('cache_write_tokens', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('summary_usage', 'cache_write_tokens')
+    op.drop_column('summary_usage', 'cache_read_tokens')
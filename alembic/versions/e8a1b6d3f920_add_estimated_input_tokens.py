@@ -0,0 +1,31 @@
+"""Add estimated input tokens to summary_usage
+
+Revision ID: e8a1b6d3f920
+Revises: c4d9e2f7a610
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a1b6d3f920'
+down_revision: Union[str, Sequence[str], None] = 'c4d9e2f7a610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'summary_usage',
+        sa.Column('estimated_input_tokens', sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('summary_usage', 'estimated_input_tokens')
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import MESSAGES
+from app.core.database import get_db
+from app.schemas.batch import BatchJobResponse
+from app.services import batch_service
+from app.utils.exceptions import BatchInputError
+
+# 保護されたAPIルーター(認証必須)
+protected_router = APIRouter(prefix="/batch", tags=["batch"])
+
+settings = get_settings()
+
+
+@protected_router.post("/jobs", response_model=BatchJobResponse, status_code=202)
+def create_batch_job(http_request: Request, file: UploadFile, db: Session = Depends(get_db)):
+    """JSONL・CSV（1行1件のSummaryRequest）をアップロードしてバッチ生成ジョブを登録"""
+    user_ip = http_request.client.host if http_request.client else None
+    try:
+        requests = batch_service.parse_batch_file(
+            file.file.read(), file.filename, settings.batch_max_items
+        )
+    except BatchInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = batch_service.create_job(db, requests, file.filename, user_ip)
+    db.commit()
+    return batch_service.get_job_status(db, job.id)
+
+
+@protected_router.get("/jobs/{job_id}", response_model=BatchJobResponse)
+def get_batch_job(job_id: str, db: Session = Depends(get_db)):
+    """ジョブの状態と進捗"""
+    status = batch_service.get_job_status(db, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=MESSAGES["ERROR"]["BATCH_JOB_NOT_FOUND"])
+    return status
+
+
+@protected_router.get("/jobs/{job_id}/results")
+def get_batch_job_results(job_id: str, after: int = 0, db: Session = Depends(get_db)):
+    """完了した項目の結果をJSON Linesで順に返す（afterで前回の続きから取得）"""
+    if batch_service.get_job_status(db, job_id) is None:
+        raise HTTPException(status_code=404, detail=MESSAGES["ERROR"]["BATCH_JOB_NOT_FOUND"])
+    return StreamingResponse(
+        batch_service.iter_job_results(job_id, after),
+        media_type="application/x-ndjson",
+    )
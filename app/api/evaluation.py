@@ -14,6 +14,7 @@ from app.schemas.evaluation import (
 )
 from app.services import evaluation_prompt_service, evaluation_service
 from app.services.evaluation_service import execute_evaluation_stream
+from app.services.sse_helpers import start_event_stream
 from app.utils.audit_logger import log_audit_event
 
 # 公開ルーター(読み取り専用、CSRF保護なし)
@@ -27,10 +28,10 @@ protected_router = APIRouter(prefix="/evaluation", tags=["evaluation"])
 
 
 @protected_router.post("/evaluate", response_model=EvaluationResponse)
-def evaluate_output(http_request: Request, request: EvaluationRequest):
+async def evaluate_output(http_request: Request, request: EvaluationRequest):
     """出力評価API"""
     user_ip = http_request.client.host if http_request.client else None
-    return evaluation_service.execute_evaluation(
+    return await evaluation_service.execute_evaluation_async(
         document_type=request.document_type,
         input_text=request.input_text,
         current_prescription=request.current_prescription,
@@ -44,14 +45,14 @@ def evaluate_output(http_request: Request, request: EvaluationRequest):
 async def evaluate_output_stream(http_request: Request, request: EvaluationRequest):
     """SSEストリーミング出力評価API"""
     user_ip = http_request.client.host if http_request.client else None
-    event_generator = execute_evaluation_stream(
+    event_generator = await start_event_stream(execute_evaluation_stream(
         document_type=request.document_type,
         input_text=request.input_text,
         current_prescription=request.current_prescription,
         additional_info=request.additional_info,
         output_summary=request.output_summary,
         user_ip=user_ip,
-    )
+    ))
     return StreamingResponse(
         event_generator,
         media_type="text/event-stream",
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends
+
+from app.core.security import require_csrf_token
+from app.external import gateway_http
+from app.external.api_factory import get_client_pool_stats
+from app.external.circuit_breaker import get_circuit_breakers
+from app.external.rate_limiter import get_rate_limiters
+from app.services.admission import get_admission_controller
+from app.services.batch_worker import get_batch_worker
+from app.services.model_router import get_model_router
+from app.services.usage_writer import get_usage_writer
+
+# 運用状況の確認用ルーター(診療科・医師名を含むため認証必須、/health自体は公開)
+protected_router = APIRouter(
+    prefix="/health", tags=["health"], dependencies=[Depends(require_csrf_token)]
+)
+
+
+@protected_router.get("/connections")
+async def connection_stats():
+    """APIクライアントプールとCloudflare AI Gateway接続の再利用状況"""
+    return {
+        "client_pool": get_client_pool_stats(),
+        "gateway": gateway_http.get_connection_stats(),
+    }
+
+
+@protected_router.get("/admission")
+async def admission_stats():
+    """プロバイダーごと・利用者ごとの実行中・順番待ちの件数と待ち時間"""
+    controller = get_admission_controller()
+    if controller is None:
+        return {"enabled": False, "providers": {}, "tenants": {}}
+    return {"enabled": True, **controller.snapshot()}
+
+
+@protected_router.get("/batch-worker")
+async def batch_worker_stats():
+    """バッチワーカーの処理件数"""
+    return get_batch_worker().stats()
+
+
+@protected_router.get("/circuit-breakers")
+async def circuit_breaker_stats():
+    """プロバイダー・接続経路ごとのサーキットブレーカーの状態"""
+    return get_circuit_breakers().snapshot()
+
+
+@protected_router.get("/rate-limits")
+async def rate_limit_stats():
+    """プロバイダーごとのレート制限の残量と待ち件数"""
+    return get_rate_limiters().snapshot()
+
+
+@protected_router.get("/routing")
+async def routing_stats():
+    """モデルごとの応答時間p95・エラー率と直近のモデル選択の判定"""
+    return get_model_router().snapshot()
+
+
+@protected_router.get("/usage-writer")
+async def usage_writer_stats():
+    """使用統計書き込みキューの状況"""
+    return get_usage_writer().stats()
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
-from app.core.constants import get_message
+from app.core.constants import DEPARTMENT_DOCTORS_MAPPING, DOCUMENT_TYPES, get_message
 from app.core.database import get_db
-from app.schemas.prompt import PromptCreate, PromptListItem, PromptResponse
+from app.schemas.prompt import EffectivePromptItem, PromptCreate, PromptListItem, PromptResponse
 from app.services import prompt_service
 from app.utils.audit_logger import log_audit_event
 
@@ -21,6 +21,27 @@ def list_prompts(db: Session = Depends(get_db)):
     return prompts
 
 
+@public_router.get("/effective", response_model=list[EffectivePromptItem])
+def list_effective_prompts(department: str, db: Session = Depends(get_db)):
+    """診療科の医師・文書タイプごとに適用されるプロンプトを一括取得"""
+    doctors = DEPARTMENT_DOCTORS_MAPPING.get(department, ["default"])
+    keys = [(department, doc_type, doctor) for doctor in doctors for doc_type in DOCUMENT_TYPES]
+    resolved = prompt_service.get_prompts_bulk(db, keys)
+
+    return [
+        EffectivePromptItem(
+            department=dept,
+            document_type=doc_type,
+            doctor=doctor,
+            prompt_id=prompt.id if prompt else None,
+            source_department=prompt.department if prompt else None,
+            source_doctor=prompt.doctor if prompt else None,
+            selected_model=prompt.selected_model if prompt else None,
+        )
+        for (dept, doc_type, doctor), prompt in resolved.items()
+    ]
+
+
 @public_router.get("/{prompt_id}", response_model=PromptResponse)
 def get_prompt(prompt_id: int, db: Session = Depends(get_db)):
     """単一プロンプトを取得"""
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 
-from app.api import evaluation, prompts, settings, statistics, summary
+from app.api import batch, evaluation, prompts, settings, statistics, summary
 from app.core.security import require_csrf_token
 
 # 公開ルーター(読み取り専用、CSRF保護なし)
@@ -20,6 +20,7 @@ admin_router.include_router(evaluation.router)  # POST/DELETE: save_evaluation_p
 protected_api_router = APIRouter(dependencies=[Depends(require_csrf_token)])
 protected_api_router.include_router(summary.protected_router)  # /generate エンドポイント
 protected_api_router.include_router(evaluation.protected_router)  # /evaluate エンドポイント
+protected_api_router.include_router(batch.protected_router)  # /batch/jobs エンドポイント
 
 # 統合ルーター
 api_router = APIRouter()
@@ -4,7 +4,8 @@ from fastapi.responses import StreamingResponse
 from app.core.config import get_settings
 from app.core.constants import ModelType
 from app.schemas.summary import SummaryRequest, SummaryResponse
-from app.services.summary_service import execute_summary_generation, execute_summary_generation_stream
+from app.services.sse_helpers import start_event_stream
+from app.services.summary_service import execute_summary_generation_async, execute_summary_generation_stream
 
 # 公開ルーター(読み取り専用、CSRF保護なし)
 public_router = APIRouter(prefix="/summary", tags=["summary"])
@@ -16,10 +17,10 @@ settings = get_settings()
 
 
 @protected_router.post("/generate", response_model=SummaryResponse)
-def generate_summary(http_request: Request, request: SummaryRequest):
+async def generate_summary(http_request: Request, request: SummaryRequest):
     """文書生成API"""
     user_ip = http_request.client.host if http_request.client else None
-    return execute_summary_generation(
+    return await execute_summary_generation_async(
         medical_text=request.medical_text,
         additional_info=request.additional_info,
         referral_purpose=request.referral_purpose,
@@ -30,6 +31,7 @@ def generate_summary(http_request: Request, request: SummaryRequest):
         model=request.model,
         model_explicitly_selected=request.model_explicitly_selected,
         user_ip=user_ip,
+        bypass_cache=request.bypass_cache,
     )
 
 
@@ -37,7 +39,7 @@ def generate_summary(http_request: Request, request: SummaryRequest):
 async def generate_summary_stream(http_request: Request, request: SummaryRequest):
     """SSEストリーミング文書生成API"""
     user_ip = http_request.client.host if http_request.client else None
-    event_generator = execute_summary_generation_stream(
+    event_generator = await start_event_stream(execute_summary_generation_stream(
         medical_text=request.medical_text,
         additional_info=request.additional_info,
         referral_purpose=request.referral_purpose,
@@ -48,7 +50,8 @@ async def generate_summary_stream(http_request: Request, request: SummaryRequest
         model=request.model,
         model_explicitly_selected=request.model_explicitly_selected,
         user_ip=user_ip,
-    )
+        bypass_cache=request.bypass_cache,
+    ))
     return StreamingResponse(
         event_generator,
         media_type="text/event-stream",
@@ -44,14 +44,98 @@ class Settings(BaseSettings):
     cloudflare_account_id: str | None = None
     cloudflare_gateway_id: str | None = None
     cloudflare_aig_token: str | None = None
+    cloudflare_http2: bool = True
+    cloudflare_max_connections: int = 20
+    cloudflare_max_keepalive_connections: int = 10
+    cloudflare_keepalive_expiry: float = 60.0
+    cloudflare_connect_timeout: float = 10.0
+    cloudflare_read_timeout: float = 120.0
+    cloudflare_write_timeout: float = 30.0
+    cloudflare_pool_timeout: float = 10.0
 
     # Application
     max_input_tokens: int = 200000
     min_input_tokens: int = 100
-    max_token_threshold: int = 100000
+    max_token_threshold: int = 100000  # Claudeに送るプロンプトの推定トークン数の上限（レイテンシ予算）
+    claude_context_window: int = 200000
+    gemini_context_window: int = 1048576
+    token_calibration_ttl: int = 600  # 秒（0で補正しない）
+    token_calibration_days: int = 30
+    adaptive_routing: bool = True
+    routing_latency_slo: float = 60.0  # 秒（p95）
+    routing_max_error_rate: float = 0.2
+    routing_window: int = 200  # モデルごとに保持する件数
+    routing_window_seconds: int = 900
+    routing_min_samples: int = 10
+    hedging_enabled: bool = False  # ストリーミングのみ（予備にも送ると重複して課金される）
+    hedge_percentile: float = 95.0  # 最初のチャンクまでの時間のこのパーセンタイルを超えたら予備にも送る
+    hedge_min_delay: float = 2.0  # 秒
+    hedge_default_delay: float = 20.0  # 秒（最初のチャンクまでの時間の記録が少ない間）
+    failover_enabled: bool = True  # 429・5xxで予備の送信先に切り替える
+    hedge_targets: list[str] = ["route", "model"]  # route: 別経路の同じモデル / model: 別のモデル
+    circuit_breaker_enabled: bool = True
+    circuit_failure_rate: float = 0.5  # 429・5xx・接続障害の割合
+    circuit_slow_call_duration: float = 60.0  # 秒（ストリーミングは最初のチャンクまで）
+    circuit_slow_call_rate: float = 0.8
+    circuit_window: int = 20  # 判定に使う直近の呼び出し件数
+    circuit_min_calls: int = 10
+    circuit_open_seconds: float = 30.0
+    circuit_half_open_probes: int = 2
+    # プロバイダーのアカウントごとのクォータ（0で制限しない、TPMは推定トークン数で予約し実績で精算）
+    claude_rpm_limit: int = 0
+    claude_tpm_limit: int = 0
+    gemini_rpm_limit: int = 0
+    gemini_tpm_limit: int = 0
+    rate_limit_max_wait: float = 30.0  # 秒（超える場合は待たずに予備の送信先へ）
+    throttle_max_retries: int = 2  # 429・529を返された呼び出しの再試行回数
+    throttle_backoff_base: float = 1.0  # 秒
+    throttle_backoff_max: float = 20.0  # 秒（Retry-Afterがこれより長ければ再試行しない）
+    admission_enabled: bool = True
+    admission_concurrency: dict[str, int] = {}  # プロバイダーごとの同時生成数（例: {"claude": 8}）
+    admission_default_concurrency: int = 8
+    admission_max_queue: int = 32  # プロバイダーごとの待ち件数の上限（超えると503）
+    admission_default_service_time: float = 30.0  # 秒（推定待ち時間の初期値）
+    admission_tenant_key: str = "department"  # department: 診療科ごと / doctor: 診療科・医師ごと
+    admission_tenant_concurrency: int = 4  # 利用者ごとの同時生成数（0で制限しない）
+    admission_tenant_weights: dict[str, float] = {}  # 利用者ごとの重み（例: {"救急科": 2}）
     prompt_management: bool = True
     app_type: str = "default"
     selected_ai_model: str = ModelType.CLAUDE.value
+    prompt_cache_ttl: int = 300  # 秒（0でキャッシュ無効）
+    prompt_cache_maxsize: int = 1024
+    cache_invalidation_backend: str = "auto"  # auto / postgres / memory
+    input_scan_cache_size: int = 256
+    generation_cache_backend: str = "none"  # none / memory / database / file
+    generation_cache_ttl: int = 3600  # 秒
+    generation_cache_maxsize: int = 256
+    generation_cache_dir: str = "data/generation_cache"
+    generation_coalescing: bool = True
+    prompt_caching_enabled: bool = True
+    gemini_context_cache_ttl: int = 3600  # 秒
+
+    # バッチ生成
+    batch_worker_enabled: bool = False  # Webプロセス内でも処理する場合True（通常は専用プロセスで実行）
+    batch_worker_concurrency: int = 2  # ワーカープロセスごとの同時生成数
+    batch_max_items: int = 1000  # 1ジョブの最大件数
+    batch_max_attempts: int = 3
+    batch_retry_delay: float = 30.0  # 秒（失敗するたびに倍にする）
+    batch_lease_seconds: float = 600.0  # 処理中の項目を他のワーカーが再取得できるまでの秒数
+    batch_poll_interval: float = 2.0  # 秒
+
+    # 使用統計の書き込み
+    usage_batch_size: int = 100
+    usage_flush_interval: float = 2.0  # 秒
+    usage_queue_maxsize: int = 10000
+    usage_queue_overflow: str = "spill"  # spill / drop
+    usage_spill_path: str = "data/usage_spill.jsonl"
+
+    # 監査ログ
+    audit_log_sinks: list[str] = ["stdout"]  # stdout / file / database
+    audit_log_file: str = "logs/audit.jsonl"
+    audit_log_max_bytes: int = 10_000_000
+    audit_log_backup_count: int = 5
+    audit_db_batch_size: int = 50
+    audit_flush_interval: float = 1.0  # 秒
 
     # CSRF認証
     csrf_secret_key: str = "default-csrf-secret-key"
@@ -49,9 +49,17 @@ DOCUMENT_TYPE_TO_PURPOSE_MAPPING = {
 
 MESSAGES: dict[str, dict[str, str]] = {
     "ERROR": {
+        "ADMISSION_QUEUE_FULL": "混み合っているため受け付けできませんでした。しばらくしてから再度お試しください",
         "API_ERROR": "API エラーが発生しました",
+        "BATCH_EMPTY": "処理する行がありません",
+        "BATCH_INVALID_ENCODING": "ファイルをUTF-8で読み込めませんでした",
+        "BATCH_INVALID_ROW": "{line}行目: {error}",
+        "BATCH_ITEM_INTERRUPTED": "処理中に停止したワーカーの再試行回数が上限に達しました",
+        "BATCH_JOB_NOT_FOUND": "バッチジョブが見つかりません",
+        "BATCH_TOO_MANY_ITEMS": "一度に処理できるのは{max_items}件までです",
         "BEDROCK_API_ERROR": "Amazon Bedrock Claude API呼び出しエラー: {error}",
         "BEDROCK_INIT_ERROR": "Amazon Bedrock Claude API初期化エラー: {error}",
+        "CIRCUIT_OPEN": "{name}の障害が続いているため呼び出しを一時停止しています",
         "CLAUDE_CLIENT_NOT_INITIALIZED": "Claude API クライアントが初期化されていません",
         "CLOUDFLARE_GATEWAY_API_ERROR": "Cloudflare AI Gateway経由のAPI呼び出しエラー: {error}",
         "CLOUDFLARE_GATEWAY_NOT_INITIALIZED": "Cloudflare Gateway が初期化されていません",
@@ -72,6 +80,7 @@ MESSAGES: dict[str, dict[str, str]] = {
         "PROMPT_LOAD_FAILED": "プロンプトの読み込みに失敗しました",
         "PROMPT_NOT_FOUND": "プロンプトが見つかりません",
         "PROMPT_UPDATE_FAILED": "プロンプトの更新に失敗しました",
+        "RATE_LIMITED": "{name}のレート制限の上限に達しているため、しばらくしてから再度お試しください",
         "RESPONSE_BODY_EMPTY": "レスポンスボディが空です",
         "STATISTICS_AGGREGATED_LOAD_FAILED": "集計データの読み込みに失敗しました",
         "STATISTICS_RECORDS_LOAD_FAILED": "使用履歴の読み込みに失敗しました",
@@ -105,6 +114,7 @@ MESSAGES: dict[str, dict[str, str]] = {
         "EVALUATION_PROMPT_CONTENT_REQUIRED": "評価プロンプトの内容を入力してください",
         "EVALUATION_PROMPT_NOT_SET": "{document_type}の評価プロンプトが設定されていません",
         "FIELD_REQUIRED": "すべての項目を入力してください",
+        "INPUT_EXCEEDS_CONTEXT": "入力テキストが長すぎるため、どのモデルでも生成できません",
         "INPUT_TOO_LONG": "入力テキストが長すぎます",
         "INPUT_TOO_SHORT": "入力文字数が少なすぎます",
         "NO_INPUT": "カルテ情報を入力してください",
@@ -127,6 +137,7 @@ MESSAGES: dict[str, dict[str, str]] = {
         "EVALUATING": "評価中...",
         "EVALUATING_ELAPSED": "評価中... ({elapsed}秒経過)",
         "EVALUATION_START": "評価を開始します...",
+        "QUEUED": "順番待ちです（{position}番目、約{wait}秒）",
     },
     "INFO": {
         "AI_DISCLAIMER": "生成AIは不正確な場合があります。回答をカルテでご確認ください。",
@@ -142,10 +153,38 @@ MESSAGES: dict[str, dict[str, str]] = {
         "RE_EVALUATE": "前回の評価をクリアして再評価しますか？",
     },
     "LOG": {
+        "AUDIT_DB_WRITE_FAILED": "監査ログのデータベース書き込みに失敗（{count}件）: {error}",
+        "AUDIT_UNKNOWN_SINK": "不明な監査ログ出力先を無視しました: {sink}",
+        "BATCH_ITEM_FAILED": "バッチジョブ{job_id}の{line}行目の生成に失敗（{attempts}回目）: {error}",
+        "BATCH_JOB_COMPLETED": "バッチジョブ{job_id}が完了しました（成功: {succeeded}件、失敗: {failed}件）",
+        "BATCH_WORKER_ERROR": "バッチワーカーの処理中にエラーが発生しました: {error}",
+        "CACHE_INVALIDATION_BAD_PAYLOAD": "不正なキャッシュ無効化通知を無視しました: {payload}",
+        "CACHE_INVALIDATION_LISTENER_FAILED": "キャッシュ無効化通知の受信に失敗（再接続します）: {error}",
+        "CIRCUIT_CLOSED": "{name}の試行呼び出しが成功したため呼び出しを再開しました",
+        "CIRCUIT_OPENED": "{name}の呼び出しを{seconds}秒間停止します（理由: {reason}）",
         "CLIENT_CLOUDFLARE_CLAUDE": "APIクライアント選択: CloudflareClaudeAPIClient",
         "CLIENT_CLOUDFLARE_GEMINI": "APIクライアント選択: CloudflareGeminiAPIClient",
         "CLIENT_DIRECT_CLAUDE": "APIクライアント選択: ClaudeAPIClient (Direct Amazon Bedrock)",
         "CLIENT_DIRECT_GEMINI": "APIクライアント選択: GeminiAPIClient (Direct Vertex AI)",
+        "CLIENT_POOL_CLOSE_FAILED": "APIクライアントのクローズに失敗: {error}",
+        "CLIENT_POOL_EVICTED": "設定変更によりAPIクライアントを破棄: {client}",
+        "GATEWAY_HTTP2_UNAVAILABLE": "h2がインストールされていないためHTTP/1.1でCloudflare AI Gatewayに接続します",
+        "GEMINI_CONTEXT_CACHE_CREATE_FAILED": "Geminiのコンテキストキャッシュを作成できないためキャッシュなしで生成します: {error}",
+        "GENERATION_CACHE_READ_FAILED": "生成結果キャッシュの読み込みに失敗（通常どおり生成します）: {error}",
+        "GENERATION_CACHE_UNKNOWN_BACKEND": "不明な生成結果キャッシュの保存先のためキャッシュを無効化しました: {backend}",
+        "GENERATION_CACHE_WRITE_FAILED": "生成結果キャッシュの書き込みに失敗: {error}",
+        "GENERATION_COALESCED": "進行中の同じ文書生成に参加しました（参加数: {waiters}）",
+        "GENERATION_FAILOVER": "{lane}の呼び出しが失敗したため{next_lane}に切り替えます: {error}",
+        "GENERATION_HEDGED": "{lane}の応答が{delay}秒以内にないため{next_lane}にも送信しました",
+        "MODEL_ROUTED_AWAY": "{preferred}が応答時間・エラー率のSLOを満たさないため{model}に切り替えました（理由: {reason}）",
+        "MODEL_ROUTER_SEED_FAILED": "使用統計からモデル選択の統計を初期化できませんでした: {error}",
+        "PROVIDER_THROTTLED_RETRY": "{name}がレート制限・過負荷を返したため{delay}秒後に再試行します（{attempt}回目）: {error}",
+        "TOKEN_CALIBRATION_FAILED": "推定トークン数の補正係数を更新できないため前回の値を使用します: {error}",
+        "USAGE_QUEUE_FULL_DROPPED": "使用統計キューが満杯のため1件破棄しました",
+        "USAGE_SPILL_FAILED": "使用統計の退避ファイル書き込みに失敗: {error}",
+        "USAGE_SPILL_INVALID_LINE": "使用統計の退避ファイルに不正な行があったため読み飛ばしました",
+        "USAGE_SPILL_REPLAYED": "退避していた使用統計{count}件をデータベースに書き込みました",
+        "USAGE_SPILL_REPLAY_FAILED": "退避していた使用統計の書き込みに失敗（次回再試行）: {error}",
     },
     "AUDIT": {
         "DOCUMENT_GENERATION_FAILURE": "文書生成失敗",
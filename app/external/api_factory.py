@@ -1,14 +1,18 @@
+import hashlib
 import logging
+import os
 from enum import Enum
-from typing import Union
+from typing import Any, AsyncGenerator, Callable, Union
 
 from app.core.config import get_settings
 from app.core.constants import DEFAULT_DOCUMENT_TYPE, MESSAGES, get_message
+from app.external.async_base_api import AsyncBaseAPIClient
 from app.external.base_api import BaseAPIClient
-from app.external.claude_api import ClaudeAPIClient
-from app.external.cloudflare_claude_api import CloudflareClaudeAPIClient
-from app.external.cloudflare_gemini_api import CloudflareGeminiAPIClient
-from app.external.gemini_api import GeminiAPIClient
+from app.external.claude_api import AsyncClaudeAPIClient, ClaudeAPIClient
+from app.external.client_pool import ClientKey, ClientPool
+from app.external.cloudflare_claude_api import AsyncCloudflareClaudeAPIClient, CloudflareClaudeAPIClient
+from app.external.cloudflare_gemini_api import AsyncCloudflareGeminiAPIClient, CloudflareGeminiAPIClient
+from app.external.gemini_api import AsyncGeminiAPIClient, GeminiAPIClient
 from app.utils.exceptions import APIError
 
 logger = logging.getLogger(__name__)
@@ -19,33 +23,100 @@ class APIProvider(Enum):
     GEMINI = "gemini"
 
 
-def create_client(provider: Union[APIProvider, str]) -> BaseAPIClient:
-    """APIプロバイダーに応じたクライアントを生成"""
+def _resolve_provider(provider: Union[APIProvider, str]) -> APIProvider:
     if isinstance(provider, str):
         try:
-            provider = APIProvider(provider.lower())
+            return APIProvider(provider.lower())
         except ValueError:
             raise APIError(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
+    if not isinstance(provider, APIProvider):
+        logger.error(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
+        raise APIError(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
+    return provider
 
+
+def _use_cloudflare_gateway() -> bool:
     settings = get_settings()
+    return all([
+        settings.cloudflare_account_id,
+        settings.cloudflare_gateway_id,
+        settings.cloudflare_aig_token,
+    ])
 
-    if provider == APIProvider.GEMINI:
-        if all([
+
+def available_routes() -> list[str]:
+    """利用できる接続経路（AI Gatewayが設定されていれば優先、直結はその予備）"""
+    return ["cloudflare", "direct"] if _use_cloudflare_gateway() else ["direct"]
+
+
+_client_pool = ClientPool()
+
+
+def _credential_fingerprint(provider: APIProvider, use_cloudflare: bool) -> str:
+    """クライアント構築に使うモデル名と認証情報のハッシュ（値そのものはキーに残さない）"""
+    settings = get_settings()
+    if use_cloudflare:
+        values = [
             settings.cloudflare_account_id,
             settings.cloudflare_gateway_id,
             settings.cloudflare_aig_token,
-        ]):
+        ]
+        if provider == APIProvider.CLAUDE:
+            values += [
+                settings.aws_access_key_id,
+                settings.aws_secret_access_key,
+                settings.aws_region,
+                settings.anthropic_model,
+            ]
+        else:
+            values += [
+                settings.google_project_id,
+                settings.google_location,
+                settings.gemini_model,
+                settings.gemini_thinking_level,
+            ]
+    elif provider == APIProvider.CLAUDE:
+        # ClaudeAPIClientは環境変数から直接読み込む
+        values = [
+            os.getenv("AWS_ACCESS_KEY_ID"),
+            os.getenv("AWS_SECRET_ACCESS_KEY"),
+            os.getenv("AWS_REGION"),
+            os.getenv("ANTHROPIC_MODEL"),
+        ]
+    else:
+        values = [
+            settings.google_credentials_json,
+            settings.google_project_id,
+            settings.google_location,
+            settings.gemini_model,
+            settings.gemini_thinking_level,
+        ]
+    return hashlib.sha256("\0".join(str(v) for v in values).encode("utf-8")).hexdigest()
+
+
+def _client_key(
+    mode: str, provider: APIProvider, route: str | None = None
+) -> tuple[ClientKey, bool]:
+    use_cloudflare = route == "cloudflare" if route is not None else _use_cloudflare_gateway()
+    key = ClientKey(
+        mode=mode,
+        provider=provider.value,
+        route="cloudflare" if use_cloudflare else "direct",
+        fingerprint=_credential_fingerprint(provider, use_cloudflare),
+    )
+    return key, use_cloudflare
+
+
+def _build_client(provider: APIProvider, use_cloudflare: bool) -> BaseAPIClient:
+    if provider == APIProvider.GEMINI:
+        if use_cloudflare:
             logger.info(get_message("LOG", "CLIENT_CLOUDFLARE_GEMINI"))
             return CloudflareGeminiAPIClient()
         logger.info(get_message("LOG", "CLIENT_DIRECT_GEMINI"))
         return GeminiAPIClient()
 
     if provider == APIProvider.CLAUDE:
-        if all([
-            settings.cloudflare_account_id,
-            settings.cloudflare_gateway_id,
-            settings.cloudflare_aig_token,
-        ]):
+        if use_cloudflare:
             logger.info(get_message("LOG", "CLIENT_CLOUDFLARE_CLAUDE"))
             return CloudflareClaudeAPIClient()
         logger.info(get_message("LOG", "CLIENT_DIRECT_CLAUDE"))
@@ -55,6 +126,77 @@ def create_client(provider: Union[APIProvider, str]) -> BaseAPIClient:
     raise APIError(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
 
 
+def _build_async_client(provider: APIProvider, use_cloudflare: bool) -> AsyncBaseAPIClient:
+    if provider == APIProvider.GEMINI:
+        if use_cloudflare:
+            logger.info(get_message("LOG", "CLIENT_CLOUDFLARE_GEMINI"))
+            return AsyncCloudflareGeminiAPIClient()
+        logger.info(get_message("LOG", "CLIENT_DIRECT_GEMINI"))
+        return AsyncGeminiAPIClient()
+
+    if provider == APIProvider.CLAUDE:
+        if use_cloudflare:
+            logger.info(get_message("LOG", "CLIENT_CLOUDFLARE_CLAUDE"))
+            return AsyncCloudflareClaudeAPIClient()
+        logger.info(get_message("LOG", "CLIENT_DIRECT_CLAUDE"))
+        return AsyncClaudeAPIClient()
+
+    logger.error(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
+    raise APIError(MESSAGES["ERROR"]["UNSUPPORTED_API_PROVIDER"].format(provider=provider))
+
+
+def evaluation_client_key(mode: str, model_name: str) -> ClientKey:
+    """評価用（Vertex AI直結・固定モデル）クライアントのプールキー"""
+    fingerprint = _credential_fingerprint(APIProvider.GEMINI, use_cloudflare=False)
+    return ClientKey(
+        mode=mode,
+        provider=APIProvider.GEMINI.value,
+        route="evaluation",
+        fingerprint=hashlib.sha256(f"{fingerprint}\0{model_name}".encode("utf-8")).hexdigest(),
+    )
+
+
+def get_pooled_client(key: ClientKey, factory: Callable[[], Any]) -> Any:
+    """キーに対応するプール済みクライアントを取得（未登録ならfactoryで生成）"""
+    return _client_pool.get_or_create(key, factory)
+
+
+def create_client(provider: Union[APIProvider, str], route: str | None = None) -> BaseAPIClient:
+    """
+    APIプロバイダーに応じたクライアントを取得（初期化済みクライアントをプロセス内で再利用）
+
+    route: "cloudflare" / "direct" で接続経路を指定（Noneで設定どおり）
+    """
+    provider = _resolve_provider(provider)
+    key, use_cloudflare = _client_key("sync", provider, route)
+    return _client_pool.get_or_create(key, lambda: _build_client(provider, use_cloudflare))
+
+
+def create_async_client(
+    provider: Union[APIProvider, str], route: str | None = None
+) -> AsyncBaseAPIClient:
+    """APIプロバイダーに応じた非同期クライアントを取得（routeはcreate_clientと同じ）"""
+    provider = _resolve_provider(provider)
+    key, use_cloudflare = _client_key("async", provider, route)
+    return _client_pool.get_or_create(key, lambda: _build_async_client(provider, use_cloudflare))
+
+
+def invalidate_clients(provider: Union[APIProvider, str, None] = None) -> int:
+    """プール済みクライアントを破棄し、次回取得時に現在の設定で再構築させる"""
+    provider_value = _resolve_provider(provider).value if provider is not None else None
+    return _client_pool.invalidate(provider_value)
+
+
+def get_client_pool_stats() -> dict[str, Any]:
+    """クライアントプールの利用状況"""
+    return _client_pool.stats()
+
+
+async def shutdown_clients() -> None:
+    """アプリ終了時にプール済みクライアントの接続を閉じる"""
+    await _client_pool.aclose_all()
+
+
 def generate_summary_with_provider(
     provider: Union[APIProvider, str],
     medical_text: str,
@@ -65,9 +207,11 @@ def generate_summary_with_provider(
     document_type: str = DEFAULT_DOCUMENT_TYPE,
     doctor: str = "default",
     model_name: str | None = None,
+    prompt_template: str | None = None,
+    route: str | None = None,
 ):
     """指定されたプロバイダーで文書を生成"""
-    client = create_client(provider)
+    client = create_client(provider, route)
     return client.generate_summary(
         medical_text,
         additional_info,
@@ -77,6 +221,7 @@ def generate_summary_with_provider(
         document_type,
         doctor,
         model_name,
+        prompt_template,
     )
 
 
@@ -90,9 +235,67 @@ def generate_summary_stream_with_provider(
     document_type: str = DEFAULT_DOCUMENT_TYPE,
     doctor: str = "default",
     model_name: str | None = None,
+    prompt_template: str | None = None,
+    route: str | None = None,
 ):
     """指定されたプロバイダーでストリーム形式の文書を生成"""
-    client = create_client(provider)
+    client = create_client(provider, route)
+    return client.generate_summary_stream(
+        medical_text,
+        additional_info,
+        referral_purpose,
+        current_prescription,
+        department,
+        document_type,
+        doctor,
+        model_name,
+        prompt_template,
+    )
+
+
+async def generate_summary_with_provider_async(
+    provider: Union[APIProvider, str],
+    medical_text: str,
+    additional_info: str = "",
+    referral_purpose: str = "",
+    current_prescription: str = "",
+    department: str = "default",
+    document_type: str = DEFAULT_DOCUMENT_TYPE,
+    doctor: str = "default",
+    model_name: str | None = None,
+    prompt_template: str | None = None,
+    route: str | None = None,
+) -> tuple[str, int, int]:
+    """指定されたプロバイダーで非同期に文書を生成"""
+    client = create_async_client(provider, route)
+    return await client.generate_summary(
+        medical_text,
+        additional_info,
+        referral_purpose,
+        current_prescription,
+        department,
+        document_type,
+        doctor,
+        model_name,
+        prompt_template,
+    )
+
+
+def generate_summary_stream_with_provider_async(
+    provider: Union[APIProvider, str],
+    medical_text: str,
+    additional_info: str = "",
+    referral_purpose: str = "",
+    current_prescription: str = "",
+    department: str = "default",
+    document_type: str = DEFAULT_DOCUMENT_TYPE,
+    doctor: str = "default",
+    model_name: str | None = None,
+    prompt_template: str | None = None,
+    route: str | None = None,
+) -> AsyncGenerator[Union[str, dict], None]:
+    """指定されたプロバイダーで非同期ストリーム形式の文書を生成"""
+    client = create_async_client(provider, route)
     return client.generate_summary_stream(
         medical_text,
         additional_info,
@@ -102,4 +305,5 @@ def generate_summary_stream_with_provider(
         document_type,
         doctor,
         model_name,
+        prompt_template,
     )
@@ -0,0 +1,185 @@
+import asyncio
+import inspect
+from abc import ABC, abstractmethod
+from typing import AsyncGenerator, Optional, Tuple, Union
+
+from app.core.constants import DEFAULT_DOCUMENT_TYPE, MESSAGES
+from app.external.base_api import SummaryPromptMixin, cache_token_counts, usage_dict
+from app.external.provider_call import call_provider_async, stream_provider_async
+from app.utils.exceptions import APIError
+
+
+class AsyncBaseAPIClient(SummaryPromptMixin, ABC):
+    """イベントループ上で動作する非同期APIクライアントの基底クラス"""
+
+    # レート制限（プロバイダー単位）・サーキットブレーカーの単位（プロバイダー, 接続経路）。Noneでは使わない
+    provider_route: tuple[str, str] | None = None
+
+    def __init__(self, api_key: str | None, default_model: str | None):
+        self.api_key: str | None = api_key
+        self.default_model: str | None = default_model
+        self._initialized = False
+        self._init_lock = asyncio.Lock()
+
+    async def ensure_initialized(self) -> None:
+        """未初期化の場合のみinitializeを実行（プールで共有されるクライアントを再初期化しない）"""
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await self.initialize()
+                self._initialized = True
+
+    async def close(self) -> None:
+        """保持しているSDKクライアントの接続を閉じる"""
+        client = getattr(self, "client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+    @abstractmethod
+    async def initialize(self) -> bool:
+        """APIクライアントを初期化"""
+        pass
+
+    @abstractmethod
+    async def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        """
+        プロンプトから要約を生成
+        Args:
+            prompt: 生成用プロンプト
+            model_name: 使用モデル名
+        Returns:
+            Tuple[str, int, int]: (生成された要約, 入力トークン数, 出力トークン数)
+        Raises:
+            APIError: API呼び出しに失敗した場合
+        """
+        pass
+
+    async def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """ストリーミングのデフォルト実装"""
+        result = await self._generate_content(prompt, model_name)
+        yield result[0]
+        yield usage_dict(*result[1:], *cache_token_counts(result))
+
+    async def _prepare_prompt(
+        self,
+        medical_text: str,
+        additional_info: str,
+        referral_purpose: str,
+        current_prescription: str,
+        department: str,
+        document_type: str,
+        doctor: str,
+        model_name: Optional[str],
+        prompt_template: Optional[str] = None,
+    ) -> tuple[str, str]:
+        """モデル名とプロンプトを解決（DB参照はスレッドで実行）"""
+        if not model_name:
+            model_name = await asyncio.to_thread(
+                self.get_model_name, department, document_type, doctor
+            )
+
+        if not model_name:
+            raise APIError(MESSAGES["ERROR"]["MODEL_NAME_NOT_SPECIFIED"])
+
+        prompt_args = (
+            medical_text,
+            additional_info,
+            referral_purpose,
+            current_prescription,
+            department,
+            document_type,
+            doctor,
+            prompt_template,
+        )
+        if prompt_template is not None:
+            # 解決済みテンプレートがあればDB参照は不要
+            return self.create_summary_prompt(*prompt_args), model_name
+
+        prompt = await asyncio.to_thread(self.create_summary_prompt, *prompt_args)
+        return prompt, model_name
+
+    async def generate_summary(
+        self,
+        medical_text: str,
+        additional_info: str = "",
+        referral_purpose: str = "",
+        current_prescription: str = "",
+        department: str = "default",
+        document_type: str = DEFAULT_DOCUMENT_TYPE,
+        doctor: str = "default",
+        model_name: Optional[str] = None,
+        prompt_template: Optional[str] = None,
+    ) -> Tuple[str, int, int]:
+        try:
+            await self.ensure_initialized()
+
+            prompt, model_name = await self._prepare_prompt(
+                medical_text,
+                additional_info,
+                referral_purpose,
+                current_prescription,
+                department,
+                document_type,
+                doctor,
+                model_name,
+                prompt_template,
+            )
+
+            return await call_provider_async(
+                self.provider_route, prompt, lambda: self._generate_content(prompt, model_name)
+            )
+
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(
+                f"{self.__class__.__name__}でエラーが発生しました: {str(e)}"
+            )
+
+    async def generate_summary_stream(
+        self,
+        medical_text: str,
+        additional_info: str = "",
+        referral_purpose: str = "",
+        current_prescription: str = "",
+        department: str = "default",
+        document_type: str = DEFAULT_DOCUMENT_TYPE,
+        doctor: str = "default",
+        model_name: Optional[str] = None,
+        prompt_template: Optional[str] = None,
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """ストリーミングで要約を生成"""
+        try:
+            await self.ensure_initialized()
+
+            prompt, model_name = await self._prepare_prompt(
+                medical_text,
+                additional_info,
+                referral_purpose,
+                current_prescription,
+                department,
+                document_type,
+                doctor,
+                model_name,
+                prompt_template,
+            )
+
+            async for item in stream_provider_async(
+                self.provider_route,
+                prompt,
+                lambda: self._generate_content_stream(prompt, model_name),
+            ):
+                yield item
+
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(
+                f"{self.__class__.__name__}でエラーが発生しました: {str(e)}"
+            )
@@ -1,35 +1,125 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Generator, Optional, Tuple, Union
+from typing import Any, Generator, Optional, Tuple, Union
 
 from app.core.constants import DEFAULT_DOCUMENT_TYPE, DEFAULT_SUMMARY_PROMPT, MESSAGES
 from app.core.database import get_db_session
-from app.services.prompt_service import get_prompt, get_selected_model
+from app.external.provider_call import call_provider, stream_provider
+from app.services.prompt_service import get_selected_model, resolve_prompt
 from app.utils.exceptions import APIError
 
 
-class BaseAPIClient(ABC):
-    def __init__(self, api_key: str | None, default_model: str | None):
-        self.api_key: str | None = api_key
-        self.default_model: str | None = default_model
+class SummaryPrompt(str):
+    """
+    プロンプト全文（従来どおり文字列として扱える）とテンプレート・入力部分の区切り
 
-    @abstractmethod
-    def initialize(self) -> bool:
-        """APIクライアントを初期化"""
-        pass
+    prefixはテンプレートのみからなり、同じ部署・文書種別のリクエストで共通のため
+    プロバイダー側のプロンプトキャッシュの対象にする
+    """
+
+    prefix: str
+    body: str
+
+    def __new__(cls, prefix: str, body: str) -> "SummaryPrompt":
+        prompt = super().__new__(cls, f"{prefix}\n{body}")
+        prompt.prefix = prefix
+        prompt.body = body
+        return prompt
+
+
+class GenerationResult(tuple):
+    """
+    (生成テキスト, 入力トークン数, 出力トークン数) として展開できる生成結果
+
+    プロンプトキャッシュの読み込み・書き込みトークン数を属性で持つ
+    （入力トークン数はキャッシュ分を含まない）
+    served_modelは予備のモデルに切り替えて生成した場合のモデル（ModelTypeの値）
+    """
+
+    cache_read_tokens: int
+    cache_write_tokens: int
+    served_model: str | None
+
+    def __new__(
+        cls,
+        text: str,
+        input_tokens: int,
+        output_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        served_model: str | None = None,
+    ) -> "GenerationResult":
+        result = super().__new__(cls, (text, input_tokens, output_tokens))
+        result.cache_read_tokens = cache_read_tokens
+        result.cache_write_tokens = cache_write_tokens
+        result.served_model = served_model
+        return result
+
+    @classmethod
+    def from_usage(cls, text: str, usage: dict[str, Any]) -> "GenerationResult":
+        """ストリーム最後のトークン数dictから生成結果を作る"""
+        return cls(
+            text,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            usage.get("cache_read_tokens", 0),
+            usage.get("cache_write_tokens", 0),
+            usage.get("served_model"),
+        )
+
+    def usage(self) -> dict[str, Any]:
+        """ストリーム最後に返すトークン数dict（切り替えた場合は生成したモデルも含める）"""
+        usage: dict[str, Any] = usage_dict(
+            self[1], self[2], self.cache_read_tokens, self.cache_write_tokens
+        )
+        if self.served_model is not None:
+            usage["served_model"] = self.served_model
+        return usage
+
+
+def usage_dict(
+    input_tokens: int,
+    output_tokens: int,
+    cache_read_tokens: int = 0,
+    cache_write_tokens: int = 0,
+) -> dict[str, int]:
+    """ストリーム最後に返すトークン数dict（キャッシュ分は発生した場合のみ含める）"""
+    usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+    if cache_read_tokens:
+        usage["cache_read_tokens"] = cache_read_tokens
+    if cache_write_tokens:
+        usage["cache_write_tokens"] = cache_write_tokens
+    return usage
+
+
+def cache_token_counts(result: Tuple[str, int, int]) -> tuple[int, int]:
+    """生成結果のプロンプトキャッシュ読み込み・書き込みトークン数（記録がなければ0）"""
+    return getattr(result, "cache_read_tokens", 0), getattr(result, "cache_write_tokens", 0)
+
+
+def build_prompt_body(
+    medical_text: str,
+    additional_info: str = "",
+    referral_purpose: str = "",
+    current_prescription: str = "",
+) -> str:
+    """カルテ情報以降のプロンプト可変部分"""
+    body = f"【カルテ情報】\n{medical_text}"
+
+    if referral_purpose.strip():
+        body += f"\n【紹介目的】\n{referral_purpose}"
+
+    if current_prescription.strip():
+        body += f"\n【現在の処方】\n{current_prescription}"
+
+    body += f"\n【追加情報】{additional_info}"
+    return body
 
-    @abstractmethod
-    def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
-        """
-        プロンプトから要約を生成
-        Args:
-            prompt: 生成用プロンプト
-            model_name: 使用モデル名
-        Returns:
-            Tuple[str, int, int]: (生成された要約, 入力トークン数, 出力トークン数)
-        Raises:
-            APIError: API呼び出しに失敗した場合
-        """
-        pass
+
+class SummaryPromptMixin:
+    """同期・非同期クライアント共通のプロンプト構築とモデル名解決"""
+
+    default_model: str | None
 
     def create_summary_prompt(
         self,
@@ -40,28 +130,21 @@ class BaseAPIClient(ABC):
         department: str = "default",
         document_type: str = DEFAULT_DOCUMENT_TYPE,
         doctor: str = "default",
-    ) -> str:
-        try:
-            with get_db_session() as db:
-                prompt_data = get_prompt(db, department, document_type, doctor)
-                if prompt_data:
-                    prompt_template = prompt_data.content
-                else:
-                    prompt_template = DEFAULT_SUMMARY_PROMPT
-        except Exception:
-            prompt_template = DEFAULT_SUMMARY_PROMPT
+        prompt_template: str | None = None,
+    ) -> SummaryPrompt:
+        """テンプレートを先頭の固定部分、カルテ以降を可変部分としてプロンプトを構築"""
+        if prompt_template is None:
+            try:
+                with get_db_session() as db:
+                    resolved = resolve_prompt(db, department, document_type, doctor)
+                    prompt_template = resolved.content or DEFAULT_SUMMARY_PROMPT
+            except Exception:
+                prompt_template = DEFAULT_SUMMARY_PROMPT
 
-        prompt = f"{prompt_template}\n【カルテ情報】\n{medical_text}"
-
-        if referral_purpose.strip():
-            prompt += f"\n【紹介目的】\n{referral_purpose}"
-
-        if current_prescription.strip():
-            prompt += f"\n【現在の処方】\n{current_prescription}"
-
-        prompt += f"\n【追加情報】{additional_info}"
-
-        return prompt
+        body = build_prompt_body(
+            medical_text, additional_info, referral_purpose, current_prescription
+        )
+        return SummaryPrompt(prompt_template, body)
 
     def get_model_name(
         self,
@@ -79,6 +162,52 @@ class BaseAPIClient(ABC):
             pass
         return self.default_model
 
+
+class BaseAPIClient(SummaryPromptMixin, ABC):
+    # レート制限（プロバイダー単位）・サーキットブレーカーの単位（プロバイダー, 接続経路）。Noneでは使わない
+    provider_route: tuple[str, str] | None = None
+
+    def __init__(self, api_key: str | None, default_model: str | None):
+        self.api_key: str | None = api_key
+        self.default_model: str | None = default_model
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def ensure_initialized(self) -> None:
+        """未初期化の場合のみinitializeを実行（プールで共有されるクライアントを再初期化しない）"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self.initialize()
+                self._initialized = True
+
+    def close(self) -> None:
+        """保持しているSDKクライアントの接続を閉じる"""
+        client = getattr(self, "client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+
+    @abstractmethod
+    def initialize(self) -> bool:
+        """APIクライアントを初期化"""
+        pass
+
+    @abstractmethod
+    def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        """
+        プロンプトから要約を生成
+        Args:
+            prompt: 生成用プロンプト
+            model_name: 使用モデル名
+        Returns:
+            Tuple[str, int, int]: (生成された要約, 入力トークン数, 出力トークン数)
+        Raises:
+            APIError: API呼び出しに失敗した場合
+        """
+        pass
+
     def generate_summary(
         self,
         medical_text: str,
@@ -89,9 +218,10 @@ class BaseAPIClient(ABC):
         document_type: str = DEFAULT_DOCUMENT_TYPE,
         doctor: str = "default",
         model_name: Optional[str] = None,
+        prompt_template: Optional[str] = None,
     ) -> Tuple[str, int, int]:
         try:
-            self.initialize()
+            self.ensure_initialized()
 
             if not model_name:
                 model_name = self.get_model_name(department, document_type, doctor)
@@ -107,9 +237,12 @@ class BaseAPIClient(ABC):
                 department,
                 document_type,
                 doctor,
+                prompt_template,
             )
 
-            return self._generate_content(prompt, model_name)
+            return call_provider(
+                self.provider_route, prompt, lambda: self._generate_content(prompt, model_name)
+            )
 
         except APIError as e:
             raise e
@@ -122,9 +255,9 @@ class BaseAPIClient(ABC):
         self, prompt: str, model_name: str
     ) -> Generator[Union[str, dict], None, None]:
         """ストリーミングのデフォルト実装"""
-        text, input_tokens, output_tokens = self._generate_content(prompt, model_name)
-        yield text
-        yield {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        result = self._generate_content(prompt, model_name)
+        yield result[0]
+        yield usage_dict(*result[1:], *cache_token_counts(result))
 
     def generate_summary_stream(
         self,
@@ -136,10 +269,11 @@ class BaseAPIClient(ABC):
         document_type: str = DEFAULT_DOCUMENT_TYPE,
         doctor: str = "default",
         model_name: Optional[str] = None,
+        prompt_template: Optional[str] = None,
     ) -> Generator[Union[str, dict], None, None]:
         """ストリーミングで要約を生成"""
         try:
-            self.initialize()
+            self.ensure_initialized()
 
             if not model_name:
                 model_name = self.get_model_name(department, document_type, doctor)
@@ -155,9 +289,14 @@ class BaseAPIClient(ABC):
                 department,
                 document_type,
                 doctor,
+                prompt_template,
             )
 
-            yield from self._generate_content_stream(prompt, model_name)
+            yield from stream_provider(
+                self.provider_route,
+                prompt,
+                lambda: self._generate_content_stream(prompt, model_name),
+            )
 
         except APIError:
             raise
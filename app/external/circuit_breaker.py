@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from app.core.config import get_settings
+from app.core.constants import MESSAGES, get_message
+from app.external.provider_errors import is_retryable_error
+from app.utils.exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class _Outcome:
+    failed: bool
+    slow: bool
+
+
+class CircuitBreaker:
+    """
+    プロバイダー・接続経路ごとのサーキットブレーカー
+
+    直近window件の呼び出しの失敗率または遅延率が閾値を超えると開き、open_seconds秒の間は
+    呼び出さずに失敗させる。その後は半開状態でhalf_open_probes件だけ試行し、
+    全て成功すれば閉じ、1件でも失敗・遅延すれば再び開く。
+    失敗として数えるのはレート制限・サーバーエラー・接続障害のみ（入力の誤りなどは数えない）。
+    遅延はストリーミングでは最初のチャンクまでの時間で判定する。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: float = 60.0,
+        slow_call_rate_threshold: float = 0.8,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 2,
+    ):
+        self.name = name
+        self._failure_rate_threshold = failure_rate_threshold
+        self._slow_call_duration = slow_call_duration
+        self._slow_call_rate_threshold = slow_call_rate_threshold
+        self._min_calls = max(min_calls, 1)
+        self._open_seconds = open_seconds
+        self._half_open_probes = max(half_open_probes, 1)
+        self._outcomes: deque[_Outcome] = deque(maxlen=max(window, 1))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._opened_at_wall: str | None = None
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def acquire(self) -> "CircuitCall":
+        """呼び出しを開始（開いている・半開の試行枠がない場合はCircuitOpenError）"""
+        with self._lock:
+            self._advance()
+            if self._state == OPEN or (
+                self._state == HALF_OPEN and self._probes_started >= self._half_open_probes
+            ):
+                self._rejected += 1
+                retry_after = max(self._opened_at + self._open_seconds - time.monotonic(), 0.0)
+                raise CircuitOpenError(
+                    MESSAGES["ERROR"]["CIRCUIT_OPEN"].format(name=self.name),
+                    retry_after=retry_after,
+                )
+            probe = self._state == HALF_OPEN
+            if probe:
+                self._probes_started += 1
+        return CircuitCall(self, probe)
+
+    def _finish(self, probe: bool, latency: float, error: BaseException | None) -> None:
+        if error is not None and not (isinstance(error, Exception) and is_retryable_error(error)):
+            # プロバイダーの状態と関係のない失敗・中断は結果に数えず、試行枠だけ戻す
+            with self._lock:
+                if probe and self._state == HALF_OPEN:
+                    self._probes_started -= 1
+            return
+
+        outcome = _Outcome(failed=error is not None, slow=latency > self._slow_call_duration)
+        with self._lock:
+            if probe:
+                if self._state != HALF_OPEN:
+                    return
+                if outcome.failed or outcome.slow:
+                    self._open(reason="probe_failed")
+                    return
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self._half_open_probes:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.warning(get_message("LOG", "CIRCUIT_CLOSED", name=self.name))
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append(outcome)
+            reason = self._trip_reason()
+            if reason is not None:
+                self._open(reason)
+
+    def _trip_reason(self) -> str | None:
+        calls = len(self._outcomes)
+        if calls < self._min_calls:
+            return None
+        if sum(o.failed for o in self._outcomes) / calls >= self._failure_rate_threshold:
+            return "failure_rate"
+        if sum(o.slow for o in self._outcomes) / calls >= self._slow_call_rate_threshold:
+            return "slow_call_rate"
+        return None
+
+    def _open(self, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._opened_at_wall = datetime.now(UTC).isoformat()
+        logger.warning(get_message(
+            "LOG", "CIRCUIT_OPENED", name=self.name, reason=reason,
+            seconds=str(round(self._open_seconds)),
+        ))
+
+    def _advance(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_seconds:
+            self._state = HALF_OPEN
+            self._probes_started = 0
+            self._probes_succeeded = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        """現在の状態と直近の失敗率・遅延率"""
+        with self._lock:
+            self._advance()
+            calls = len(self._outcomes)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failure_rate": sum(o.failed for o in self._outcomes) / calls if calls else None,
+                "slow_call_rate": sum(o.slow for o in self._outcomes) / calls if calls else None,
+                "opened_at": self._opened_at_wall if self._state != CLOSED else None,
+                "retry_after": (
+                    max(self._opened_at + self._open_seconds - time.monotonic(), 0.0)
+                    if self._state == OPEN else None
+                ),
+                "rejected": self._rejected,
+            }
+
+
+class CircuitCall:
+    """
+    acquireで開始した呼び出し1回（最初のチャンクを受け取った時点で応答時間を確定）
+
+    breakerがNoneの場合は何も記録しない
+    """
+
+    def __init__(self, breaker: CircuitBreaker | None, probe: bool = False):
+        self._breaker = breaker
+        self._probe = probe
+        self._started = time.monotonic()
+        self._latency: float | None = None
+        self._finished = False
+
+    def first_chunk(self) -> None:
+        if self._latency is None:
+            self._latency = time.monotonic() - self._started
+
+    def finish(self, error: BaseException | None = None) -> None:
+        if self._finished or self._breaker is None:
+            return
+        self._finished = True
+        latency = self._latency if self._latency is not None else time.monotonic() - self._started
+        self._breaker._finish(self._probe, latency, error)
+
+
+class CircuitBreakerRegistry:
+    """プロバイダー・接続経路ごとのサーキットブレーカーを保持"""
+
+    def __init__(self, enabled: bool = True, **options: Any):
+        self._enabled = enabled
+        self._options = options
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str, route: str) -> CircuitBreaker | None:
+        """provider/routeのサーキットブレーカー（無効化されていればNone）"""
+        if not self._enabled:
+            return None
+        name = f"{provider}/{route}"
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self._options)
+            return breaker
+
+    def snapshot(self) -> dict[str, Any]:
+        """サーキットブレーカーごとの状態"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            "enabled": self._enabled,
+            "breakers": {name: breaker.snapshot() for name, breaker in sorted(breakers.items())},
+        }
+
+
+_registry: CircuitBreakerRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """設定に従ったプロセス共有のサーキットブレーカー"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            settings = get_settings()
+            _registry = CircuitBreakerRegistry(
+                enabled=settings.circuit_breaker_enabled,
+                failure_rate_threshold=settings.circuit_failure_rate,
+                slow_call_duration=settings.circuit_slow_call_duration,
+                slow_call_rate_threshold=settings.circuit_slow_call_rate,
+                window=settings.circuit_window,
+                min_calls=settings.circuit_min_calls,
+                open_seconds=settings.circuit_open_seconds,
+                half_open_probes=settings.circuit_half_open_probes,
+            )
+        return _registry
+
+
+def set_circuit_breakers(registry: CircuitBreakerRegistry | None) -> None:
+    """サーキットブレーカーを差し替える（Noneで設定から再生成）"""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+
+def acquire_circuit(provider_route: tuple[str, str] | None) -> CircuitCall:
+    """クライアントのprovider/routeの呼び出しを開始（対象外・無効なら記録しない）"""
+    breaker = get_circuit_breakers().breaker(*provider_route) if provider_route is not None else None
+    return breaker.acquire() if breaker is not None else CircuitCall(None)
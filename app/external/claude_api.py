@@ -1,34 +1,87 @@
 import os
-from typing import Tuple
+from typing import Any, AsyncGenerator, Generator, Tuple, Union
 
-from anthropic import AnthropicBedrock
-from anthropic.types import TextBlock
+from anthropic import AnthropicBedrock, AsyncAnthropicBedrock
+from anthropic.types import MessageParam, TextBlock, TextBlockParam
 from dotenv import load_dotenv
 
+from app.core.config import get_settings
 from app.core.constants import MESSAGES
-from app.external.base_api import BaseAPIClient
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient, GenerationResult, SummaryPrompt, usage_dict
 from app.utils.exceptions import APIError
 
 load_dotenv()
 
 
-class ClaudeAPIClient(BaseAPIClient):
-    def __init__(self):
+def _extract_text(response: Any) -> str:
+    """Messages APIのレスポンスから最初のテキストブロックを取り出す"""
+    if response.content:
+        for content_block in response.content:
+            if isinstance(content_block, TextBlock):
+                return content_block.text
+    return MESSAGES["ERROR"]["EMPTY_RESPONSE"]
+
+
+def _messages(prompt: str) -> list[MessageParam]:
+    """
+    Messages APIに渡すユーザーメッセージ
+
+    テンプレート部分の直後にcache_controlの区切りを置き、同じテンプレートの
+    リクエスト間でプロンプトキャッシュを共有する（最小トークン数未満の場合はキャッシュされない）
+    """
+    if not isinstance(prompt, SummaryPrompt) or not get_settings().prompt_caching_enabled:
+        return [{"role": "user", "content": prompt}]
+    content: list[TextBlockParam] = [
+        {"type": "text", "text": prompt.prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": prompt.body},
+    ]
+    return [{"role": "user", "content": content}]
+
+
+def _token_count(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def _usage_counts(usage: Any) -> tuple[int, int, int, int]:
+    """(入力, 出力, キャッシュ読み込み, キャッシュ書き込み) のトークン数"""
+    return (
+        usage.input_tokens,
+        usage.output_tokens,
+        _token_count(getattr(usage, "cache_read_input_tokens", 0)),
+        _token_count(getattr(usage, "cache_creation_input_tokens", 0)),
+    )
+
+
+class _BedrockCredentialsMixin:
+    """環境変数からBedrock接続情報を読み込み検証する"""
+
+    provider_route = ("claude", "direct")
+
+    def _load_credentials(self) -> None:
         self.aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
         self.aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         self.aws_region = os.getenv("AWS_REGION")
         self.anthropic_model = os.getenv("ANTHROPIC_MODEL")
 
+    def _validate_credentials(self) -> None:
+        if not all([self.aws_access_key_id, self.aws_secret_access_key, self.aws_region]):
+            raise APIError(MESSAGES["CONFIG"]["AWS_CREDENTIALS_MISSING"])
+
+        if not self.anthropic_model:
+            raise APIError(MESSAGES["CONFIG"]["ANTHROPIC_MODEL_MISSING"])
+
+
+class ClaudeAPIClient(_BedrockCredentialsMixin, BaseAPIClient):
+    def __init__(self):
+        self._load_credentials()
+
         super().__init__(None, self.anthropic_model)
         self.client = None
 
     def initialize(self) -> bool:
         try:
-            if not all([self.aws_access_key_id, self.aws_secret_access_key, self.aws_region]):
-                raise APIError(MESSAGES["CONFIG"]["AWS_CREDENTIALS_MISSING"])
-
-            if not self.anthropic_model:
-                raise APIError(MESSAGES["CONFIG"]["ANTHROPIC_MODEL_MISSING"])
+            self._validate_credentials()
 
             self.client = AnthropicBedrock(
                 aws_access_key=self.aws_access_key_id,
@@ -58,22 +111,100 @@ class ClaudeAPIClient(BaseAPIClient):
             response = self.client.messages.create(
                 model=model_name,
                 max_tokens=6000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                messages=_messages(prompt),
             )
 
-            summary_text = MESSAGES["ERROR"]["EMPTY_RESPONSE"]
-            if response.content:
-                for content_block in response.content:
-                    if isinstance(content_block, TextBlock):
-                        summary_text = content_block.text
-                        break
+            summary_text = _extract_text(response)
+
+            return GenerationResult(summary_text, *_usage_counts(response.usage))
+
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["BEDROCK_API_ERROR"].format(error=str(e)))
+
+    def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> Generator[Union[str, dict], None, None]:
+        """messages.streamでコンテンツを生成"""
+        try:
+            if self.client is None:
+                raise APIError(MESSAGES["ERROR"]["CLAUDE_CLIENT_NOT_INITIALIZED"])
+
+            with self.client.messages.stream(
+                model=model_name,
+                max_tokens=6000,
+                messages=_messages(prompt),
+            ) as stream:
+                for text in stream.text_stream:
+                    if text:
+                        yield text
+
+                final_message = stream.get_final_message()
+
+            yield usage_dict(*_usage_counts(final_message.usage))
+
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["BEDROCK_API_ERROR"].format(error=str(e)))
+
+
+class AsyncClaudeAPIClient(_BedrockCredentialsMixin, AsyncBaseAPIClient):
+    """AsyncAnthropicBedrockを使用する非同期クライアント"""
+
+    def __init__(self):
+        self._load_credentials()
+
+        super().__init__(None, self.anthropic_model)
+        self.client = None
+
+    async def initialize(self) -> bool:
+        try:
+            self._validate_credentials()
+
+            self.client = AsyncAnthropicBedrock(
+                aws_access_key=self.aws_access_key_id,
+                aws_secret_key=self.aws_secret_access_key,
+                aws_region=self.aws_region,
+            )
+            return True
+
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["BEDROCK_INIT_ERROR"].format(error=str(e)))
+
+    async def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        try:
+            if self.client is None:
+                raise APIError(MESSAGES["ERROR"]["CLAUDE_CLIENT_NOT_INITIALIZED"])
+
+            response = await self.client.messages.create(
+                model=model_name,
+                max_tokens=6000,
+                messages=_messages(prompt),
+            )
+
+            return GenerationResult(_extract_text(response), *_usage_counts(response.usage))
+
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["BEDROCK_API_ERROR"].format(error=str(e)))
+
+    async def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """messages.streamでコンテンツを生成"""
+        try:
+            if self.client is None:
+                raise APIError(MESSAGES["ERROR"]["CLAUDE_CLIENT_NOT_INITIALIZED"])
+
+            async with self.client.messages.stream(
+                model=model_name,
+                max_tokens=6000,
+                messages=_messages(prompt),
+            ) as stream:
+                async for text in stream.text_stream:
+                    if text:
+                        yield text
 
-            input_tokens = response.usage.input_tokens
-            output_tokens = response.usage.output_tokens
+                final_message = await stream.get_final_message()
 
-            return summary_text, input_tokens, output_tokens
+            yield usage_dict(*_usage_counts(final_message.usage))
 
         except Exception as e:
             raise APIError(MESSAGES["ERROR"]["BEDROCK_API_ERROR"].format(error=str(e)))
@@ -0,0 +1,119 @@
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, NamedTuple
+
+from app.core.constants import get_message
+
+logger = logging.getLogger(__name__)
+
+
+class ClientKey(NamedTuple):
+    """プール内のクライアントを識別するキー"""
+
+    mode: str  # "sync" または "async"
+    provider: str
+    route: str  # "direct" または "cloudflare"
+    fingerprint: str  # モデル名と認証情報のハッシュ
+
+    @property
+    def slot(self) -> tuple[str, str, str]:
+        """フィンガープリントを除いた識別子（設定変更時の置き換え単位）"""
+        return self.mode, self.provider, self.route
+
+    @property
+    def label(self) -> str:
+        return f"{self.mode}/{self.provider}/{self.route}"
+
+
+class ClientPool:
+    """
+    初期化済みAPIクライアントをプロセス内で共有するレジストリ
+
+    同じスロットに異なるフィンガープリントのクライアントが要求された場合は
+    設定変更とみなし、古いクライアントを破棄して置き換える
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[ClientKey, Any] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_create(self, key: ClientKey, factory: Callable[[], Any]) -> Any:
+        """キーに対応するクライアントを返し、未登録ならfactoryで生成して登録"""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._hits += 1
+                return client
+
+            self._misses += 1
+            stale = [
+                (k, self._clients.pop(k))
+                for k in list(self._clients)
+                if k.slot == key.slot and k.fingerprint != key.fingerprint
+            ]
+            client = factory()
+            self._clients[key] = client
+
+        for stale_key, stale_client in stale:
+            logger.info(get_message("LOG", "CLIENT_POOL_EVICTED", client=stale_key.label))
+            _close_quietly(stale_client)
+        return client
+
+    def invalidate(self, provider: str | None = None) -> int:
+        """登録済みクライアントを破棄（providerを指定した場合はそのプロバイダーのみ）"""
+        with self._lock:
+            removed = [
+                (k, self._clients.pop(k))
+                for k in list(self._clients)
+                if provider is None or k.provider == provider
+            ]
+
+        for _, client in removed:
+            _close_quietly(client)
+        return len(removed)
+
+    async def aclose_all(self) -> None:
+        """全クライアントを閉じてプールを空にする（アプリ終了時に使用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            try:
+                result = client.close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(get_message("LOG", "CLIENT_POOL_CLOSE_FAILED", error=str(e)))
+
+    def stats(self) -> dict[str, Any]:
+        """プールの利用状況"""
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "hits": self._hits,
+                "misses": self._misses,
+                "clients": [k.label for k in self._clients],
+            }
+
+
+def _close_quietly(client: Any) -> None:
+    """クライアントを閉じる（非同期クライアントは実行中のイベントループにクローズを登録）"""
+    close = getattr(client, "close", None)
+    if close is None:
+        return
+    try:
+        if inspect.iscoroutinefunction(close):
+            try:
+                asyncio.get_running_loop().create_task(close())
+            except RuntimeError:
+                # イベントループ外では閉じられないためGCに任せる
+                pass
+            return
+        close()
+    except Exception as e:
+        logger.warning(get_message("LOG", "CLIENT_POOL_CLOSE_FAILED", error=str(e)))
@@ -1,48 +1,219 @@
 import json
-from typing import Tuple
+from typing import Any, AsyncGenerator, Generator, Tuple, Union
 
 import httpx
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from botocore.credentials import Credentials
+from botocore.eventstream import EventStreamBuffer, EventStreamMessage
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 from app.core.constants import MESSAGES
-from app.external.base_api import BaseAPIClient
+from app.external import gateway_http
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient, GenerationResult, SummaryPrompt, usage_dict
 from app.utils.exceptions import APIError
 
 
-class CloudflareClaudeAPIClient(BaseAPIClient):
+# ストリーム途中の例外イベントに対応するHTTPステータス（Bedrock Converse APIの定義）
+_STREAM_EXCEPTION_STATUS = {
+    "throttlingException": 429,
+    "internalServerException": 500,
+    "modelStreamErrorException": 424,
+    "serviceUnavailableException": 503,
+    "validationException": 400,
+}
+
+
+def _gateway_error(e: Exception) -> APIError:
+    if isinstance(e, httpx.HTTPStatusError):
+        return APIError(
+            MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(
+                error=f"HTTP {e.response.status_code}: {e.response.text}"
+            ),
+            status_code=e.response.status_code,
+        )
+    return APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(error=str(e)))
+
+
+class _CloudflareClaudeRequestMixin:
+    """AI Gateway経由のBedrockリクエスト構築（SigV4署名）とレスポンス解析"""
+
+    provider_route = ("claude", "cloudflare")
+
+    settings: Settings
+    default_model: str | None
+
+    def _load_settings(self, settings: Settings) -> None:
+        self.settings = settings
+        self.aws_access_key_id = settings.aws_access_key_id
+        self.aws_secret_access_key = settings.aws_secret_access_key
+        self.aws_region = settings.aws_region
+
+    def _validate_settings(self) -> None:
+        if not all([
+            self.settings.cloudflare_account_id,
+            self.settings.cloudflare_gateway_id,
+            self.settings.cloudflare_aig_token,
+        ]):
+            raise APIError(MESSAGES["CONFIG"]["CLOUDFLARE_GATEWAY_SETTINGS_MISSING"])
+
+        if not all([
+            self.aws_access_key_id,
+            self.aws_secret_access_key,
+            self.aws_region,
+        ]):
+            raise APIError(MESSAGES["CONFIG"]["AWS_CREDENTIALS_MISSING"])
+
+        if not self.default_model:
+            raise APIError(MESSAGES["CONFIG"]["ANTHROPIC_MODEL_MISSING"])
+
+    def _check_gateway_settings(self) -> None:
+        if not all([
+            self.settings.cloudflare_account_id,
+            self.settings.cloudflare_gateway_id,
+            self.settings.cloudflare_aig_token,
+        ]):
+            raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_NOT_INITIALIZED"])
+
+    def _build_request(self, prompt: str, model_name: str, action: str) -> tuple[str, dict[str, str], str]:
+        """
+        SigV4署名済みのAI Gatewayリクエストを構築
+        Args:
+            prompt: 生成用プロンプト
+            model_name: 使用モデル名
+            action: Bedrockのアクション名（converse / converse-stream）
+        Returns:
+            tuple[str, dict[str, str], str]: (Gateway URL, ヘッダー, リクエストボディ)
+        """
+        request_body = {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._message_content(prompt)
+                }
+            ],
+            "inferenceConfig": {
+                "maxTokens": 6000
+            }
+        }
+
+        body_str = json.dumps(request_body)
+
+        # Bedrock URL（署名用）
+        stock_url = (
+            f"https://bedrock-runtime.{self.aws_region}.amazonaws.com"
+            f"/model/{model_name}/{action}"
+        )
+
+        # AWS SigV4署名
+        credentials = Credentials(
+            access_key=self.aws_access_key_id,
+            secret_key=self.aws_secret_access_key
+        )
+
+        headers = {
+            "Content-Type": "application/json",
+        }
+
+        request = AWSRequest(
+            method="POST",
+            url=stock_url,
+            data=body_str,
+            headers=headers
+        )
+
+        SigV4Auth(credentials, "bedrock", self.aws_region).add_auth(request)
+
+        # Cloudflare AI Gateway URL
+        gateway_url = (
+            f"https://gateway.ai.cloudflare.com/v1/"
+            f"{self.settings.cloudflare_account_id}/"
+            f"{self.settings.cloudflare_gateway_id}/"
+            f"aws-bedrock/bedrock-runtime/{self.aws_region}/"
+            f"model/{model_name}/{action}"
+        )
+
+        # Cloudflare認証ヘッダーを追加
+        final_headers = dict(request.headers)
+        final_headers["cf-aig-authorization"] = f"Bearer {self.settings.cloudflare_aig_token}"
+
+        return gateway_url, final_headers, body_str
+
+    def _message_content(self, prompt: str) -> list[dict[str, Any]]:
+        """テンプレート部分の直後にcachePointを置き、同じテンプレートのリクエスト間でキャッシュを共有する"""
+        if not isinstance(prompt, SummaryPrompt) or not self.settings.prompt_caching_enabled:
+            return [{"text": prompt}]
+        return [
+            {"text": prompt.prefix},
+            {"cachePoint": {"type": "default"}},
+            {"text": prompt.body},
+        ]
+
+    @staticmethod
+    def _usage_counts(usage: dict[str, Any]) -> tuple[int, int, int, int]:
+        """(入力, 出力, キャッシュ読み込み, キャッシュ書き込み) のトークン数"""
+        return (
+            usage.get("inputTokens", 0),
+            usage.get("outputTokens", 0),
+            usage.get("cacheReadInputTokens", 0),
+            usage.get("cacheWriteInputTokens", 0),
+        )
+
+    @classmethod
+    def _parse_response(cls, response_data: dict[str, Any]) -> Tuple[str, int, int]:
+        # レスポンスからテキストを抽出
+        result_text = ""
+        if "output" in response_data and "message" in response_data["output"]:
+            message = response_data["output"]["message"]
+            if "content" in message and message["content"]:
+                for content_block in message["content"]:
+                    if "text" in content_block:
+                        result_text = content_block["text"]
+                        break
+
+        if not result_text:
+            result_text = MESSAGES["ERROR"]["EMPTY_RESPONSE"]
+
+        # トークン数を抽出
+        return GenerationResult(result_text, *cls._usage_counts(response_data.get("usage", {})))
+
+    @staticmethod
+    def _parse_event(message: EventStreamMessage) -> tuple[str | None, dict[str, Any]]:
+        """
+        イベントストリームのメッセージを解析
+        Returns:
+            tuple[str | None, dict[str, Any]]: (イベント種別, ペイロード)
+        Raises:
+            APIError: 例外イベントを受信した場合
+        """
+        headers = message.headers
+        payload: dict[str, Any] = json.loads(message.payload) if message.payload else {}
+
+        if headers.get(":message-type") == "exception":
+            exception_type = headers.get(":exception-type")
+            raise APIError(
+                MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(
+                    error=f"{exception_type}: {payload.get('message', '')}"
+                ),
+                status_code=_STREAM_EXCEPTION_STATUS.get(str(exception_type)),
+            )
+
+        return headers.get(":event-type"), payload
+
+
+class CloudflareClaudeAPIClient(_CloudflareClaudeRequestMixin, BaseAPIClient):
     """Cloudflare AI Gateway経由でAmazon Bedrock Claude APIに接続するクライアント"""
 
     def __init__(self, model_name: str | None = None):
         settings = get_settings()
         model = model_name or settings.anthropic_model
         super().__init__(None, model)
-        self.settings = settings
-        self.aws_access_key_id = settings.aws_access_key_id
-        self.aws_secret_access_key = settings.aws_secret_access_key
-        self.aws_region = settings.aws_region
+        self._load_settings(settings)
 
     def initialize(self) -> bool:
         try:
-            if not all([
-                self.settings.cloudflare_account_id,
-                self.settings.cloudflare_gateway_id,
-                self.settings.cloudflare_aig_token,
-            ]):
-                raise APIError(MESSAGES["CONFIG"]["CLOUDFLARE_GATEWAY_SETTINGS_MISSING"])
-
-            if not all([
-                self.aws_access_key_id,
-                self.aws_secret_access_key,
-                self.aws_region,
-            ]):
-                raise APIError(MESSAGES["CONFIG"]["AWS_CREDENTIALS_MISSING"])
-
-            if not self.default_model:
-                raise APIError(MESSAGES["CONFIG"]["ANTHROPIC_MODEL_MISSING"])
-
+            self._validate_settings()
             return True
         except APIError:
             raise
@@ -51,104 +222,139 @@ class CloudflareClaudeAPIClient(BaseAPIClient):
 
     def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
         try:
-            if not all([
-                self.settings.cloudflare_account_id,
-                self.settings.cloudflare_gateway_id,
-                self.settings.cloudflare_aig_token,
-            ]):
-                raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_NOT_INITIALIZED"])
-
-            request_body = {
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [{"text": prompt}]
-                    }
-                ],
-                "inferenceConfig": {
-                    "maxTokens": 6000
-                }
-            }
+            self._check_gateway_settings()
 
-            body_str = json.dumps(request_body)
+            gateway_url, final_headers, body_str = self._build_request(prompt, model_name, "converse")
 
-            # Bedrock URL（署名用）
-            stock_url = (
-                f"https://bedrock-runtime.{self.aws_region}.amazonaws.com"
-                f"/model/{model_name}/converse"
+            response = gateway_http.post(
+                gateway_url,
+                headers=final_headers,
+                content=body_str
             )
+            response.raise_for_status()
 
-            # AWS SigV4署名
-            credentials = Credentials(
-                access_key=self.aws_access_key_id,
-                secret_key=self.aws_secret_access_key
-            )
+            return self._parse_response(response.json())
 
-            headers = {
-                "Content-Type": "application/json",
-            }
+        except Exception as e:
+            raise _gateway_error(e)
 
-            request = AWSRequest(
-                method="POST",
-                url=stock_url,
-                data=body_str,
-                headers=headers
+    def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> Generator[Union[str, dict], None, None]:
+        """converse-stream（AWSイベントストリーム）でコンテンツを生成"""
+        try:
+            self._check_gateway_settings()
+
+            gateway_url, final_headers, body_str = self._build_request(
+                prompt, model_name, "converse-stream"
             )
 
-            SigV4Auth(credentials, "bedrock", self.aws_region).add_auth(request)
+            usage: dict[str, Any] = {}
 
-            # Cloudflare AI Gateway URL
-            gateway_url = (
-                f"https://gateway.ai.cloudflare.com/v1/"
-                f"{self.settings.cloudflare_account_id}/"
-                f"{self.settings.cloudflare_gateway_id}/"
-                f"aws-bedrock/bedrock-runtime/{self.aws_region}/"
-                f"model/{model_name}/converse"
-            )
+            with gateway_http.stream(
+                "POST",
+                gateway_url,
+                headers=final_headers,
+                content=body_str
+            ) as response:
+                if response.is_error:
+                    response.read()
+                response.raise_for_status()
+
+                event_buffer = EventStreamBuffer()
+                for raw in response.iter_bytes():
+                    event_buffer.add_data(raw)
+                    for message in event_buffer:
+                        event_type, payload = self._parse_event(message)
+                        if event_type == "contentBlockDelta":
+                            text = payload.get("delta", {}).get("text")
+                            if text:
+                                yield text
+                        elif event_type == "metadata":
+                            usage = payload.get("usage", {})
+
+            yield usage_dict(*self._usage_counts(usage))
+
+        except APIError:
+            raise
+        except Exception as e:
+            raise _gateway_error(e)
+
+
+class AsyncCloudflareClaudeAPIClient(_CloudflareClaudeRequestMixin, AsyncBaseAPIClient):
+    """共有httpx.AsyncClientでCloudflare AI Gateway経由のBedrock Claudeに接続する非同期クライアント"""
+
+    def __init__(self, model_name: str | None = None):
+        settings = get_settings()
+        model = model_name or settings.anthropic_model
+        super().__init__(None, model)
+        self._load_settings(settings)
+
+    async def initialize(self) -> bool:
+        try:
+            self._validate_settings()
+            return True
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["BEDROCK_INIT_ERROR"].format(error=str(e)))
+
+    async def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        try:
+            self._check_gateway_settings()
 
-            # Cloudflare認証ヘッダーを追加
-            final_headers = dict(request.headers)
-            final_headers["cf-aig-authorization"] = f"Bearer {self.settings.cloudflare_aig_token}"
+            gateway_url, final_headers, body_str = self._build_request(prompt, model_name, "converse")
 
-            response = httpx.post(
+            response = await gateway_http.apost(
                 gateway_url,
                 headers=final_headers,
                 content=body_str,
-                timeout=120.0
             )
             response.raise_for_status()
 
-            response_data = response.json()
+            return self._parse_response(response.json())
 
-            # レスポンスからテキストを抽出
-            result_text = ""
-            if "output" in response_data and "message" in response_data["output"]:
-                message = response_data["output"]["message"]
-                if "content" in message and message["content"]:
-                    for content_block in message["content"]:
-                        if "text" in content_block:
-                            result_text = content_block["text"]
-                            break
+        except Exception as e:
+            raise _gateway_error(e)
 
-            if not result_text:
-                result_text = MESSAGES["ERROR"]["EMPTY_RESPONSE"]
+    async def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """converse-stream（AWSイベントストリーム）でコンテンツを生成"""
+        try:
+            self._check_gateway_settings()
 
-            # トークン数を抽出
-            input_tokens = 0
-            output_tokens = 0
+            gateway_url, final_headers, body_str = self._build_request(
+                prompt, model_name, "converse-stream"
+            )
 
-            if "usage" in response_data:
-                usage = response_data["usage"]
-                input_tokens = usage.get("inputTokens", 0)
-                output_tokens = usage.get("outputTokens", 0)
+            usage: dict[str, Any] = {}
 
-            return result_text, input_tokens, output_tokens
+            async with gateway_http.astream(
+                "POST",
+                gateway_url,
+                headers=final_headers,
+                content=body_str,
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
 
-        except httpx.HTTPStatusError as e:
-            raise APIError(
-                MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(
-                    error=f"HTTP {e.response.status_code}: {e.response.text}"
-                )
-            )
+                event_buffer = EventStreamBuffer()
+                async for raw in response.aiter_bytes():
+                    event_buffer.add_data(raw)
+                    for message in event_buffer:
+                        event_type, payload = self._parse_event(message)
+                        if event_type == "contentBlockDelta":
+                            text = payload.get("delta", {}).get("text")
+                            if text:
+                                yield text
+                        elif event_type == "metadata":
+                            usage = payload.get("usage", {})
+
+            yield usage_dict(*self._usage_counts(usage))
+
+        except APIError:
+            raise
         except Exception as e:
-            raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(error=str(e)))
+            raise _gateway_error(e)
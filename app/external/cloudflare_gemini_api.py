@@ -1,14 +1,154 @@
-from typing import Tuple
+import json
+from typing import Any, AsyncGenerator, Generator, Tuple, Union
 
 import httpx
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 from app.core.constants import MESSAGES
-from app.external.base_api import BaseAPIClient
+from app.external import gateway_http
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient, GenerationResult, usage_dict
 from app.utils.exceptions import APIError
 
 
-class CloudflareGeminiAPIClient(BaseAPIClient):
+def _gateway_error(e: Exception) -> APIError:
+    if isinstance(e, httpx.HTTPStatusError):
+        return APIError(
+            MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(
+                error=f"HTTP {e.response.status_code}: {e.response.text}"
+            ),
+            status_code=e.response.status_code,
+        )
+    return APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(error=str(e)))
+
+
+class _CloudflareGeminiRequestMixin:
+    """AI Gateway経由のVertex AIリクエスト構築とレスポンス解析"""
+
+    provider_route = ("gemini", "cloudflare")
+
+    settings: Settings
+
+    def _validate_settings(self) -> None:
+        if not all([
+            self.settings.cloudflare_account_id,
+            self.settings.cloudflare_gateway_id,
+            self.settings.cloudflare_aig_token,
+        ]):
+            raise APIError(MESSAGES["CONFIG"]["CLOUDFLARE_GATEWAY_SETTINGS_MISSING"])
+
+        if not self.settings.google_project_id:
+            raise APIError(MESSAGES["CONFIG"]["VERTEX_AI_PROJECT_MISSING"])
+
+    def _check_gateway_settings(self) -> None:
+        if not all([
+            self.settings.cloudflare_account_id,
+            self.settings.cloudflare_gateway_id,
+            self.settings.cloudflare_aig_token,
+        ]):
+            raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_NOT_INITIALIZED"])
+
+    def _gateway_url(self, model_name: str, method: str) -> str:
+        """Cloudflare AI Gateway経由のVertex AIエンドポイントURLを構築"""
+        return (
+            f"https://gateway.ai.cloudflare.com/v1/"
+            f"{self.settings.cloudflare_account_id}/"
+            f"{self.settings.cloudflare_gateway_id}/"
+            f"google-vertex-ai/v1/projects/{self.settings.google_project_id}/"
+            f"locations/{self.settings.google_location}/"
+            f"publishers/google/models/{model_name}:{method}"
+        )
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "cf-aig-authorization": f"Bearer {self.settings.cloudflare_aig_token}",
+            "Content-Type": "application/json",
+        }
+
+    def _request_body(self, prompt: str) -> dict[str, Any]:
+        thinking_level = (
+            "LOW"
+            if self.settings.gemini_thinking_level == "LOW"
+            else "HIGH"
+        )
+
+        return {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": prompt}]
+                }
+            ],
+            "generationConfig": {
+                "thinkingConfig": {
+                    "thinkingLevel": thinking_level
+                }
+            }
+        }
+
+    @staticmethod
+    def _parse_response(response_data: dict[str, Any]) -> Tuple[str, int, int]:
+        result_text = ""
+        if "candidates" in response_data and response_data["candidates"]:
+            candidate = response_data["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                parts = candidate["content"]["parts"]
+                if parts and "text" in parts[0]:
+                    result_text = parts[0]["text"]
+
+        if not result_text:
+            result_text = MESSAGES["ERROR"]["EMPTY_RESPONSE"]
+
+        input_tokens = 0
+        output_tokens = 0
+        cached_tokens = 0
+
+        if "usageMetadata" in response_data:
+            metadata = response_data["usageMetadata"]
+            input_tokens = metadata.get("promptTokenCount", 0)
+            output_tokens = metadata.get("candidatesTokenCount", 0)
+            cached_tokens = metadata.get("cachedContentTokenCount", 0)
+
+        # テンプレートが先頭にあるため暗黙キャッシュが効く（promptTokenCountはキャッシュ分を含む）
+        return GenerationResult(result_text, input_tokens - cached_tokens, output_tokens, cached_tokens)
+
+    @staticmethod
+    def _parse_sse_line(line: str) -> dict[str, Any] | None:
+        """SSEのdata行をJSONとして解析"""
+        if not line.startswith("data:"):
+            return None
+        payload = line[5:].strip()
+        if not payload:
+            return None
+        return json.loads(payload)
+
+    @staticmethod
+    def _chunk_texts(chunk: dict[str, Any]) -> list[str]:
+        texts = []
+        for candidate in chunk.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                # 思考過程のパートは出力に含めない
+                if part.get("text") and not part.get("thought"):
+                    texts.append(part["text"])
+        return texts
+
+    @staticmethod
+    def _chunk_usage(chunk: dict[str, Any], input_tokens: int, output_tokens: int) -> tuple[int, int]:
+        metadata = chunk.get("usageMetadata")
+        if metadata:
+            input_tokens = metadata.get("promptTokenCount", input_tokens)
+            output_tokens = metadata.get("candidatesTokenCount", output_tokens)
+        return input_tokens, output_tokens
+
+    @staticmethod
+    def _chunk_cached_tokens(chunk: dict[str, Any], cached_tokens: int) -> int:
+        metadata = chunk.get("usageMetadata")
+        if metadata:
+            cached_tokens = metadata.get("cachedContentTokenCount", cached_tokens)
+        return cached_tokens
+
+
+class CloudflareGeminiAPIClient(_CloudflareGeminiRequestMixin, BaseAPIClient):
     """Cloudflare AI Gateway経由でVertex AI Gemini APIに接続するクライアント"""
 
     def __init__(self, model_name: str | None = None):
@@ -19,16 +159,7 @@ class CloudflareGeminiAPIClient(BaseAPIClient):
 
     def initialize(self) -> bool:
         try:
-            if not all([
-                self.settings.cloudflare_account_id,
-                self.settings.cloudflare_gateway_id,
-                self.settings.cloudflare_aig_token,
-            ]):
-                raise APIError(MESSAGES["CONFIG"]["CLOUDFLARE_GATEWAY_SETTINGS_MISSING"])
-
-            if not self.settings.google_project_id:
-                raise APIError(MESSAGES["CONFIG"]["VERTEX_AI_PROJECT_MISSING"])
-
+            self._validate_settings()
             return True
         except APIError:
             raise
@@ -37,83 +168,124 @@ class CloudflareGeminiAPIClient(BaseAPIClient):
 
     def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
         try:
-            if not all([
-                self.settings.cloudflare_account_id,
-                self.settings.cloudflare_gateway_id,
-                self.settings.cloudflare_aig_token,
-            ]):
-                raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_NOT_INITIALIZED"])
-
-            base_url = (
-                f"https://gateway.ai.cloudflare.com/v1/"
-                f"{self.settings.cloudflare_account_id}/"
-                f"{self.settings.cloudflare_gateway_id}/"
-                f"google-vertex-ai/v1/projects/{self.settings.google_project_id}/"
-                f"locations/{self.settings.google_location}/"
-                f"publishers/google/models/{model_name}:generateContent"
+            self._check_gateway_settings()
+
+            response = gateway_http.post(
+                self._gateway_url(model_name, "generateContent"),
+                headers=self._headers(),
+                json=self._request_body(prompt)
             )
+            response.raise_for_status()
 
-            headers = {
-                "cf-aig-authorization": f"Bearer {self.settings.cloudflare_aig_token}",
-                "Content-Type": "application/json",
-            }
+            return self._parse_response(response.json())
 
-            thinking_level = (
-                "LOW"
-                if self.settings.gemini_thinking_level == "LOW"
-                else "HIGH"
-            )
+        except Exception as e:
+            raise _gateway_error(e)
 
-            request_body = {
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [{"text": prompt}]
-                    }
-                ],
-                "generationConfig": {
-                    "thinkingConfig": {
-                        "thinkingLevel": thinking_level
-                    }
-                }
-            }
+    def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> Generator[Union[str, dict], None, None]:
+        """streamGenerateContent（SSE）でコンテンツを生成"""
+        try:
+            self._check_gateway_settings()
+
+            input_tokens = 0
+            output_tokens = 0
+            cached_tokens = 0
+
+            with gateway_http.stream(
+                "POST",
+                self._gateway_url(model_name, "streamGenerateContent") + "?alt=sse",
+                headers=self._headers(),
+                json=self._request_body(prompt)
+            ) as response:
+                if response.is_error:
+                    response.read()
+                response.raise_for_status()
+
+                for line in response.iter_lines():
+                    chunk = self._parse_sse_line(line)
+                    if chunk is None:
+                        continue
+                    yield from self._chunk_texts(chunk)
+                    input_tokens, output_tokens = self._chunk_usage(chunk, input_tokens, output_tokens)
+                    cached_tokens = self._chunk_cached_tokens(chunk, cached_tokens)
+
+            yield usage_dict(input_tokens - cached_tokens, output_tokens, cached_tokens)
+
+        except APIError:
+            raise
+        except Exception as e:
+            raise _gateway_error(e)
+
+
+class AsyncCloudflareGeminiAPIClient(_CloudflareGeminiRequestMixin, AsyncBaseAPIClient):
+    """共有httpx.AsyncClientでCloudflare AI Gateway経由のVertex AI Geminiに接続する非同期クライアント"""
+
+    def __init__(self, model_name: str | None = None):
+        settings = get_settings()
+        model = model_name or settings.gemini_model
+        super().__init__(None, model)
+        self.settings = settings
+
+    async def initialize(self) -> bool:
+        try:
+            self._validate_settings()
+            return True
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_INIT_ERROR"].format(error=str(e)))
 
-            response = httpx.post(
-                base_url,
-                headers=headers,
-                json=request_body,
-                timeout=120.0
+    async def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        try:
+            self._check_gateway_settings()
+
+            response = await gateway_http.apost(
+                self._gateway_url(model_name, "generateContent"),
+                headers=self._headers(),
+                json=self._request_body(prompt),
             )
             response.raise_for_status()
 
-            response_data = response.json()
+            return self._parse_response(response.json())
 
-            result_text = ""
-            if "candidates" in response_data and response_data["candidates"]:
-                candidate = response_data["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    parts = candidate["content"]["parts"]
-                    if parts and "text" in parts[0]:
-                        result_text = parts[0]["text"]
+        except Exception as e:
+            raise _gateway_error(e)
 
-            if not result_text:
-                result_text = MESSAGES["ERROR"]["EMPTY_RESPONSE"]
+    async def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """streamGenerateContent（SSE）でコンテンツを生成"""
+        try:
+            self._check_gateway_settings()
 
             input_tokens = 0
             output_tokens = 0
+            cached_tokens = 0
 
-            if "usageMetadata" in response_data:
-                metadata = response_data["usageMetadata"]
-                input_tokens = metadata.get("promptTokenCount", 0)
-                output_tokens = metadata.get("candidatesTokenCount", 0)
+            async with gateway_http.astream(
+                "POST",
+                self._gateway_url(model_name, "streamGenerateContent") + "?alt=sse",
+                headers=self._headers(),
+                json=self._request_body(prompt),
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
 
-            return result_text, input_tokens, output_tokens
+                async for line in response.aiter_lines():
+                    chunk = self._parse_sse_line(line)
+                    if chunk is None:
+                        continue
+                    for text in self._chunk_texts(chunk):
+                        yield text
+                    input_tokens, output_tokens = self._chunk_usage(chunk, input_tokens, output_tokens)
+                    cached_tokens = self._chunk_cached_tokens(chunk, cached_tokens)
 
-        except httpx.HTTPStatusError as e:
-            raise APIError(
-                MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(
-                    error=f"HTTP {e.response.status_code}: {e.response.text}"
-                )
-            )
+            yield usage_dict(input_tokens - cached_tokens, output_tokens, cached_tokens)
+
+        except APIError:
+            raise
         except Exception as e:
-            raise APIError(MESSAGES["ERROR"]["CLOUDFLARE_GATEWAY_API_ERROR"].format(error=str(e)))
+            raise _gateway_error(e)
@@ -0,0 +1,196 @@
+import importlib.util
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator
+
+import httpx
+
+from app.core.config import Settings, get_settings
+from app.core.constants import get_message
+
+logger = logging.getLogger(__name__)
+
+# 新規TCP接続の確立を示すhttpcoreのトレースイベント
+_CONNECT_EVENT = "connection.connect_tcp.complete"
+
+
+class GatewayConnectionStats:
+    """ゲートウェイ接続の再利用状況"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.http2_responses = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_response(self, response: httpx.Response) -> None:
+        if response.http_version == "HTTP/2":
+            with self._lock:
+                self.http2_responses += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "reused_requests": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+                "http2_responses": self.http2_responses,
+            }
+
+
+def _http2_enabled(settings: Settings) -> bool:
+    """HTTP/2は設定が有効かつh2がインストールされている場合のみ使用"""
+    if not settings.cloudflare_http2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning(get_message("LOG", "GATEWAY_HTTP2_UNAVAILABLE"))
+        return False
+    return True
+
+
+def _client_options(settings: Settings) -> dict[str, Any]:
+    return {
+        "http2": _http2_enabled(settings),
+        "limits": httpx.Limits(
+            max_connections=settings.cloudflare_max_connections,
+            max_keepalive_connections=settings.cloudflare_max_keepalive_connections,
+            keepalive_expiry=settings.cloudflare_keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(
+            connect=settings.cloudflare_connect_timeout,
+            read=settings.cloudflare_read_timeout,
+            write=settings.cloudflare_write_timeout,
+            pool=settings.cloudflare_pool_timeout,
+        ),
+    }
+
+
+def _config_key(settings: Settings) -> tuple[Any, ...]:
+    return (
+        settings.cloudflare_http2,
+        settings.cloudflare_max_connections,
+        settings.cloudflare_max_keepalive_connections,
+        settings.cloudflare_keepalive_expiry,
+        settings.cloudflare_connect_timeout,
+        settings.cloudflare_read_timeout,
+        settings.cloudflare_write_timeout,
+        settings.cloudflare_pool_timeout,
+    )
+
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+_client_config: tuple[Any, ...] | None = None
+_async_client_config: tuple[Any, ...] | None = None
+_stats = GatewayConnectionStats()
+
+
+def _on_response(response: httpx.Response) -> None:
+    _stats.record_response(response)
+
+
+async def _on_async_response(response: httpx.Response) -> None:
+    _stats.record_response(response)
+
+
+def _trace(event_name: str, info: dict[str, Any]) -> None:
+    if event_name == _CONNECT_EVENT:
+        _stats.record_connection()
+
+
+async def _async_trace(event_name: str, info: dict[str, Any]) -> None:
+    if event_name == _CONNECT_EVENT:
+        _stats.record_connection()
+
+
+def get_client() -> httpx.Client:
+    """プロセス共有の同期クライアントを取得（設定変更時は再構築）"""
+    global _client, _client_config
+    settings = get_settings()
+    config = _config_key(settings)
+    with _lock:
+        if _client is None or _client_config != config:
+            # 旧クライアントは処理中のリクエストが終わり次第GCされる
+            _client = httpx.Client(
+                event_hooks={"response": [_on_response]},
+                **_client_options(settings),
+            )
+            _client_config = config
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """プロセス共有の非同期クライアントを取得（設定変更時は再構築）"""
+    global _async_client, _async_client_config
+    settings = get_settings()
+    config = _config_key(settings)
+    with _lock:
+        if _async_client is None or _async_client_config != config:
+            # 旧クライアントは処理中のリクエストが終わり次第GCされる
+            _async_client = httpx.AsyncClient(
+                event_hooks={"response": [_on_async_response]},
+                **_client_options(settings),
+            )
+            _async_client_config = config
+        return _async_client
+
+
+def post(url: str, **kwargs: Any) -> httpx.Response:
+    """共有クライアントでPOST"""
+    _stats.record_request()
+    return get_client().post(url, extensions={"trace": _trace}, **kwargs)
+
+
+@contextmanager
+def stream(method: str, url: str, **kwargs: Any) -> Iterator[httpx.Response]:
+    """共有クライアントでストリーミングリクエスト"""
+    _stats.record_request()
+    with get_client().stream(method, url, extensions={"trace": _trace}, **kwargs) as response:
+        yield response
+
+
+async def apost(url: str, **kwargs: Any) -> httpx.Response:
+    """共有非同期クライアントでPOST"""
+    _stats.record_request()
+    return await get_async_client().post(url, extensions={"trace": _async_trace}, **kwargs)
+
+
+@asynccontextmanager
+async def astream(method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+    """共有非同期クライアントでストリーミングリクエスト"""
+    _stats.record_request()
+    async with get_async_client().stream(
+        method, url, extensions={"trace": _async_trace}, **kwargs
+    ) as response:
+        yield response
+
+
+def get_connection_stats() -> dict[str, Any]:
+    """接続再利用カウンター"""
+    return _stats.snapshot()
+
+
+async def close_clients() -> None:
+    """共有クライアントを閉じる（アプリ終了時に使用）"""
+    global _client, _async_client, _client_config, _async_client_config
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+        _client_config = _async_client_config = None
+
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -1,19 +1,240 @@
+import hashlib
 import json
-from typing import Generator, Tuple, Union
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, AsyncGenerator, Generator, Iterator, Tuple, Union
 
+from cachetools import TTLCache
 from google import genai
 from google.genai import types
 from google.oauth2 import service_account
 
-from app.core.config import get_settings
-from app.core.constants import MESSAGES
-from app.external.base_api import BaseAPIClient
+from app.core.config import Settings, get_settings
+from app.core.constants import MESSAGES, get_message
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient, GenerationResult, SummaryPrompt, usage_dict
 from app.utils.exceptions import APIError
 
+logger = logging.getLogger(__name__)
+
+# サーバー側の期限切れ直前のキャッシュを参照しないよう、手元ではこの秒数だけ早く破棄する
+_CONTEXT_CACHE_EXPIRY_MARGIN = 60
+
+
+def build_genai_client(settings: Settings) -> genai.Client:
+    """設定からVertex AI用のgenaiクライアントを構築"""
+    if not settings.google_project_id:
+        raise APIError(MESSAGES["CONFIG"]["VERTEX_AI_PROJECT_MISSING"])
+
+    google_credentials_json = settings.google_credentials_json
+
+    if google_credentials_json:
+        try:
+            credentials_dict = json.loads(google_credentials_json)
+
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_dict,
+                scopes=['https://www.googleapis.com/auth/cloud-platform']
+            )
+
+            return genai.Client(
+                vertexai=True,
+                project=settings.google_project_id,
+                location=settings.google_location,
+                credentials=credentials
+            )
+
+        except json.JSONDecodeError as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_JSON_PARSE_ERROR"].format(error=str(e)))
+        except KeyError as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_FIELD_MISSING"].format(error=str(e)))
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_ERROR"].format(error=str(e)))
+
+    return genai.Client(
+        vertexai=True,
+        project=settings.google_project_id,
+        location=settings.google_location,
+    )
+
+
+def _generation_config(
+    settings: Settings, cached_content: str | None = None
+) -> types.GenerateContentConfig:
+    thinking_level = (
+        types.ThinkingLevel.LOW
+        if settings.gemini_thinking_level == "LOW"
+        else types.ThinkingLevel.HIGH
+    )
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(
+            thinking_level=thinking_level
+        ),
+        cached_content=cached_content,
+    )
+
+
+def _cached_token_count(metadata: Any) -> int:
+    """プロンプトのうちコンテキストキャッシュ（明示・暗黙）から読み込んだトークン数"""
+    cached = getattr(metadata, 'cached_content_token_count', None)
+    return cached if isinstance(cached, int) else 0
+
+
+def _parse_response(response: Any, cache_write_tokens: int = 0) -> GenerationResult:
+    result_text = ""
+    if hasattr(response, 'text') and response.text is not None:
+        result_text = str(response.text)
+    else:
+        result_text = str(response)
+
+    input_tokens = 0
+    output_tokens = 0
+    cache_read_tokens = 0
+
+    if hasattr(response, 'usage_metadata') and response.usage_metadata is not None:
+        metadata = response.usage_metadata
+        if hasattr(metadata, 'prompt_token_count') and metadata.prompt_token_count is not None:
+            input_tokens = int(metadata.prompt_token_count)
+        if hasattr(metadata, 'candidates_token_count') and metadata.candidates_token_count is not None:
+            output_tokens = int(metadata.candidates_token_count)
+        cache_read_tokens = _cached_token_count(metadata)
+
+    # prompt_token_countはキャッシュ分を含むため、Claudeと同じくキャッシュ以外の入力に揃える
+    return GenerationResult(
+        result_text,
+        input_tokens - cache_read_tokens,
+        output_tokens,
+        cache_read_tokens,
+        cache_write_tokens,
+    )
+
+
+def _chunk_usage(chunk: Any, input_tokens: int, output_tokens: int) -> tuple[int, int]:
+    """ストリームチャンクのusage_metadataでトークン数を更新"""
+    if hasattr(chunk, 'usage_metadata') and chunk.usage_metadata:
+        metadata = chunk.usage_metadata
+        if hasattr(metadata, 'prompt_token_count') and metadata.prompt_token_count:
+            input_tokens = int(metadata.prompt_token_count)
+        if hasattr(metadata, 'candidates_token_count') and metadata.candidates_token_count:
+            output_tokens = int(metadata.candidates_token_count)
+    return input_tokens, output_tokens
+
+
+def _chunk_cached_tokens(chunk: Any, cached_tokens: int) -> int:
+    """ストリームチャンクのusage_metadataでキャッシュ読み込みトークン数を更新"""
+    metadata = getattr(chunk, 'usage_metadata', None)
+    if not metadata:
+        return cached_tokens
+    return _cached_token_count(metadata) or cached_tokens
+
+
+def _stream_usage(
+    input_tokens: int, output_tokens: int, cached_tokens: int, cache_write_tokens: int
+) -> dict[str, int]:
+    """ストリーム最後のトークン数dict（入力はキャッシュ分を除く）"""
+    return usage_dict(
+        input_tokens - cached_tokens, output_tokens, cached_tokens, cache_write_tokens
+    )
+
+
+class _ContextCacheRegistry:
+    """
+    テンプレートごとに作成したGeminiコンテキストキャッシュ（cachedContents）の名前
+
+    キーはモデル名とテンプレート内容のハッシュのため、テンプレートを編集すると別のキャッシュになる。
+    作成に失敗したテンプレート（最小トークン数未満など）も空文字で記録し、期限まで再作成しない。
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._maxsize = maxsize
+        self._ttl: int | None = None
+        self._names: TTLCache[str, str] | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, prefix: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{prefix}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _cache(self, ttl: int) -> TTLCache[str, str]:
+        if self._names is None or self._ttl != ttl:
+            self._names = TTLCache(
+                maxsize=self._maxsize, ttl=max(ttl - _CONTEXT_CACHE_EXPIRY_MARGIN, 1)
+            )
+            self._ttl = ttl
+        return self._names
+
+    def get(self, key: str, ttl: int) -> str | None:
+        with self._lock:
+            return self._cache(ttl).get(key)
+
+    def put(self, key: str, name: str, ttl: int) -> None:
+        with self._lock:
+            self._cache(ttl)[key] = name
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            if self._names is not None:
+                self._names.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names = None
+
+
+_context_caches = _ContextCacheRegistry()
+
+
+def clear_context_caches() -> None:
+    """作成済みコンテキストキャッシュの記録を破棄（サーバー側のキャッシュは期限で削除される）"""
+    _context_caches.clear()
+
+
+def _context_cache_key(prompt: SummaryPrompt, model_name: str, settings: Settings) -> str | None:
+    """テンプレート部分をコンテキストキャッシュに載せる場合のキー（対象外はNone）"""
+    if not settings.prompt_caching_enabled or settings.gemini_context_cache_ttl <= 0:
+        return None
+    return _ContextCacheRegistry.key(model_name, prompt.prefix)
+
+
+def _context_cache_config(prompt: SummaryPrompt, settings: Settings) -> types.CreateCachedContentConfig:
+    return types.CreateCachedContentConfig(
+        contents=[types.Content(role="user", parts=[types.Part(text=prompt.prefix)])],
+        ttl=f"{settings.gemini_context_cache_ttl}s",
+    )
+
+
+def _created_cache(cached_content: Any) -> tuple[str, int]:
+    """作成したキャッシュの (名前, キャッシュしたトークン数)"""
+    name = cached_content.name if isinstance(cached_content.name, str) else ""
+    metadata = getattr(cached_content, "usage_metadata", None)
+    tokens = getattr(metadata, "total_token_count", None)
+    return name, tokens if isinstance(tokens, int) else 0
+
+
+@contextmanager
+def _discard_on_error(prompt: str, model_name: str, cache_name: str | None) -> Iterator[None]:
+    """キャッシュを使った呼び出しが失敗した場合、削除・失効に備えて次回は作り直す"""
+    try:
+        yield
+    except Exception:
+        if cache_name and isinstance(prompt, SummaryPrompt):
+            _context_caches.discard(_ContextCacheRegistry.key(model_name, prompt.prefix))
+        raise
+
+
+def _request_contents(prompt: str, cache_name: str | None) -> str:
+    """キャッシュを使う場合はテンプレート以降の可変部分のみを送る"""
+    if cache_name and isinstance(prompt, SummaryPrompt):
+        return prompt.body
+    return prompt
+
 
 class GeminiAPIClient(BaseAPIClient):
     """Gemini API クライアント"""
 
+    provider_route = ("gemini", "direct")
+
     def __init__(self, model_name: str | None = None):
         settings = get_settings()
         model = model_name or settings.gemini_model
@@ -23,83 +244,51 @@ class GeminiAPIClient(BaseAPIClient):
 
     def initialize(self) -> bool:
         try:
-            if not self.settings.google_project_id:
-                raise APIError(MESSAGES["CONFIG"]["VERTEX_AI_PROJECT_MISSING"])
-
-            google_credentials_json = self.settings.google_credentials_json
-
-            if google_credentials_json:
-                try:
-                    credentials_dict = json.loads(google_credentials_json)
-
-                    credentials = service_account.Credentials.from_service_account_info(
-                        credentials_dict,
-                        scopes=['https://www.googleapis.com/auth/cloud-platform']
-                    )
-
-                    self.client = genai.Client(
-                        vertexai=True,
-                        project=self.settings.google_project_id,
-                        location=self.settings.google_location,
-                        credentials=credentials
-                    )
-
-                except json.JSONDecodeError as e:
-                    raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_JSON_PARSE_ERROR"].format(error=str(e)))
-                except KeyError as e:
-                    raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_FIELD_MISSING"].format(error=str(e)))
-                except Exception as e:
-                    raise APIError(MESSAGES["ERROR"]["VERTEX_AI_CREDENTIALS_ERROR"].format(error=str(e)))
-            else:
-                self.client = genai.Client(
-                    vertexai=True,
-                    project=self.settings.google_project_id,
-                    location=self.settings.google_location,
-                )
-
+            self.client = build_genai_client(self.settings)
             return True
         except APIError:
             raise
         except Exception as e:
             raise APIError(MESSAGES["ERROR"]["VERTEX_AI_INIT_ERROR"].format(error=str(e)))
 
+    def _context_cache(
+        self, client: genai.Client, prompt: str, model_name: str
+    ) -> tuple[str | None, int]:
+        """テンプレートのコンテキストキャッシュ名を取得（未作成なら作成）し、(名前, 書き込みトークン数) を返す"""
+        # テンプレートと分かれていない文字列のプロンプトはキャッシュしない
+        if not isinstance(prompt, SummaryPrompt):
+            return None, 0
+        key = _context_cache_key(prompt, model_name, self.settings)
+        if key is None:
+            return None, 0
+        ttl = self.settings.gemini_context_cache_ttl
+        name = _context_caches.get(key, ttl)
+        if name is not None:
+            return name or None, 0
+        try:
+            name, tokens = _created_cache(client.caches.create(
+                model=model_name, config=_context_cache_config(prompt, self.settings)
+            ))
+        except Exception as e:
+            logger.warning(get_message("LOG", "GEMINI_CONTEXT_CACHE_CREATE_FAILED", error=str(e)))
+            name, tokens = "", 0
+        _context_caches.put(key, name, ttl)
+        return name or None, tokens
+
     def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
         try:
             if self.client is None:
                 raise APIError(MESSAGES["ERROR"]["GEMINI_CLIENT_NOT_INITIALIZED"])
 
-            thinking_level = (
-                types.ThinkingLevel.LOW
-                if self.settings.gemini_thinking_level == "LOW"
-                else types.ThinkingLevel.HIGH
-            )
-            response = self.client.models.generate_content(
-                model=model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(
-                        thinking_level=thinking_level
-                    )
+            cache_name, cache_write_tokens = self._context_cache(self.client, prompt, model_name)
+            with _discard_on_error(prompt, model_name, cache_name):
+                response = self.client.models.generate_content(
+                    model=model_name,
+                    contents=_request_contents(prompt, cache_name),
+                    config=_generation_config(self.settings, cache_name)
                 )
-            )
-
-            result_text = ""
-            if hasattr(response, 'text') and response.text is not None:
-                result_text = str(response.text)
-            else:
-                result_text = str(response)
-
-            input_tokens = 0
-            output_tokens = 0
 
-            if hasattr(response, 'usage_metadata') and response.usage_metadata is not None:
-                metadata = response.usage_metadata
-                if hasattr(metadata, 'prompt_token_count') and metadata.prompt_token_count is not None:
-                    input_tokens = int(metadata.prompt_token_count)
-                if hasattr(metadata, 'candidates_token_count') and metadata.candidates_token_count is not None:
-                    output_tokens = int(metadata.candidates_token_count)
-
-            return result_text, input_tokens, output_tokens
+            return _parse_response(response, cache_write_tokens)
         except Exception as e:
             raise APIError(MESSAGES["ERROR"]["VERTEX_AI_API_ERROR"].format(error=str(e)))
 
@@ -111,37 +300,126 @@ class GeminiAPIClient(BaseAPIClient):
             if self.client is None:
                 raise APIError(MESSAGES["ERROR"]["GEMINI_CLIENT_NOT_INITIALIZED"])
 
-            thinking_level = (
-                types.ThinkingLevel.LOW
-                if self.settings.gemini_thinking_level == "LOW"
-                else types.ThinkingLevel.HIGH
-            )
+            cache_name, cache_write_tokens = self._context_cache(self.client, prompt, model_name)
+            input_tokens = 0
+            output_tokens = 0
+            cached_tokens = 0
 
-            response_stream = self.client.models.generate_content_stream(
-                model=model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(
-                        thinking_level=thinking_level
-                    )
+            with _discard_on_error(prompt, model_name, cache_name):
+                response_stream = self.client.models.generate_content_stream(
+                    model=model_name,
+                    contents=_request_contents(prompt, cache_name),
+                    config=_generation_config(self.settings, cache_name)
                 )
-            )
 
+                for chunk in response_stream:
+                    if hasattr(chunk, 'text') and chunk.text:
+                        yield chunk.text
+
+                    input_tokens, output_tokens = _chunk_usage(chunk, input_tokens, output_tokens)
+                    cached_tokens = _chunk_cached_tokens(chunk, cached_tokens)
+
+            yield _stream_usage(input_tokens, output_tokens, cached_tokens, cache_write_tokens)
+
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_API_ERROR"].format(error=str(e)))
+
+
+class AsyncGeminiAPIClient(AsyncBaseAPIClient):
+    """genaiのaioクライアントを使用する非同期Geminiクライアント"""
+
+    provider_route = ("gemini", "direct")
+
+    def __init__(self, model_name: str | None = None):
+        settings = get_settings()
+        model = model_name or settings.gemini_model
+        super().__init__(None, model)
+        self.client = None
+        self.settings = settings
+
+    async def initialize(self) -> bool:
+        try:
+            self.client = build_genai_client(self.settings)
+            return True
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_INIT_ERROR"].format(error=str(e)))
+
+    async def close(self) -> None:
+        """aio側のHTTPクライアントを閉じる"""
+        if self.client is not None:
+            await self.client.aio.aclose()
+
+    async def _context_cache(
+        self, client: genai.Client, prompt: str, model_name: str
+    ) -> tuple[str | None, int]:
+        """テンプレートのコンテキストキャッシュ名を取得（未作成なら作成）し、(名前, 書き込みトークン数) を返す"""
+        # テンプレートと分かれていない文字列のプロンプトはキャッシュしない
+        if not isinstance(prompt, SummaryPrompt):
+            return None, 0
+        key = _context_cache_key(prompt, model_name, self.settings)
+        if key is None:
+            return None, 0
+        ttl = self.settings.gemini_context_cache_ttl
+        name = _context_caches.get(key, ttl)
+        if name is not None:
+            return name or None, 0
+        try:
+            name, tokens = _created_cache(await client.aio.caches.create(
+                model=model_name, config=_context_cache_config(prompt, self.settings)
+            ))
+        except Exception as e:
+            logger.warning(get_message("LOG", "GEMINI_CONTEXT_CACHE_CREATE_FAILED", error=str(e)))
+            name, tokens = "", 0
+        _context_caches.put(key, name, ttl)
+        return name or None, tokens
+
+    async def _generate_content(self, prompt: str, model_name: str) -> Tuple[str, int, int]:
+        try:
+            if self.client is None:
+                raise APIError(MESSAGES["ERROR"]["GEMINI_CLIENT_NOT_INITIALIZED"])
+
+            cache_name, cache_write_tokens = await self._context_cache(self.client, prompt, model_name)
+            with _discard_on_error(prompt, model_name, cache_name):
+                response = await self.client.aio.models.generate_content(
+                    model=model_name,
+                    contents=_request_contents(prompt, cache_name),
+                    config=_generation_config(self.settings, cache_name)
+                )
+
+            return _parse_response(response, cache_write_tokens)
+        except Exception as e:
+            raise APIError(MESSAGES["ERROR"]["VERTEX_AI_API_ERROR"].format(error=str(e)))
+
+    async def _generate_content_stream(
+        self, prompt: str, model_name: str
+    ) -> AsyncGenerator[Union[str, dict], None]:
+        """ストリーミングでコンテンツを生成"""
+        try:
+            if self.client is None:
+                raise APIError(MESSAGES["ERROR"]["GEMINI_CLIENT_NOT_INITIALIZED"])
+
+            cache_name, cache_write_tokens = await self._context_cache(self.client, prompt, model_name)
             input_tokens = 0
             output_tokens = 0
+            cached_tokens = 0
+
+            with _discard_on_error(prompt, model_name, cache_name):
+                response_stream = await self.client.aio.models.generate_content_stream(
+                    model=model_name,
+                    contents=_request_contents(prompt, cache_name),
+                    config=_generation_config(self.settings, cache_name)
+                )
 
-            for chunk in response_stream:
-                if hasattr(chunk, 'text') and chunk.text:
-                    yield chunk.text
+                async for chunk in response_stream:
+                    if hasattr(chunk, 'text') and chunk.text:
+                        yield chunk.text
 
-                if hasattr(chunk, 'usage_metadata') and chunk.usage_metadata:
-                    metadata = chunk.usage_metadata
-                    if hasattr(metadata, 'prompt_token_count') and metadata.prompt_token_count:
-                        input_tokens = int(metadata.prompt_token_count)
-                    if hasattr(metadata, 'candidates_token_count') and metadata.candidates_token_count:
-                        output_tokens = int(metadata.candidates_token_count)
+                    input_tokens, output_tokens = _chunk_usage(chunk, input_tokens, output_tokens)
+                    cached_tokens = _chunk_cached_tokens(chunk, cached_tokens)
 
-            yield {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            yield _stream_usage(input_tokens, output_tokens, cached_tokens, cache_write_tokens)
 
         except Exception as e:
             raise APIError(MESSAGES["ERROR"]["VERTEX_AI_API_ERROR"].format(error=str(e)))
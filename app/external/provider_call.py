@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from app.core.constants import get_message
+from app.external.circuit_breaker import CircuitCall, acquire_circuit
+from app.external.provider_errors import is_throttled_error, retry_after_seconds
+from app.external.rate_limiter import Reservation, get_rate_limiters
+from app.utils.exceptions import CircuitOpenError, RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ProviderRoute = tuple[str, str]
+
+
+def _prompt_tokens(prompt: str) -> int:
+    # token_estimatorはbase_apiを参照するため呼び出し時に読み込む
+    from app.services.token_estimator import estimate_text_tokens
+
+    return estimate_text_tokens(prompt)
+
+
+def _used_tokens(usage: Any) -> int | None:
+    """生成結果・ストリーム最後のトークン数dictから入出力トークン数の合計"""
+    if isinstance(usage, dict):
+        return sum(
+            usage.get(key, 0)
+            for key in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+        )
+    if isinstance(usage, tuple) and len(usage) >= 3:
+        return (
+            usage[1]
+            + usage[2]
+            + getattr(usage, "cache_read_tokens", 0)
+            + getattr(usage, "cache_write_tokens", 0)
+        )
+    return None
+
+
+def _reserve(route: ProviderRoute, tokens: int) -> Reservation:
+    limiter = get_rate_limiters().limiter(route[0])
+    return limiter.reserve(tokens) if limiter is not None else Reservation(None, tokens, 0.0)
+
+
+def _retry_delay(route: ProviderRoute, attempt: int, error: BaseException) -> float | None:
+    """レート制限で失敗した呼び出しを再試行するまでの秒数（再試行しない場合はNone）"""
+    if isinstance(error, (CircuitOpenError, RateLimitedError)) or not isinstance(error, Exception):
+        return None
+    if not is_throttled_error(error):
+        return None
+    delay = get_rate_limiters().backoff.delay(attempt, retry_after_seconds(error))
+    if delay is not None:
+        logger.warning(get_message(
+            "LOG", "PROVIDER_THROTTLED_RETRY",
+            name="/".join(route), delay=f"{delay:.1f}", attempt=str(attempt + 1), error=str(error),
+        ))
+    return delay
+
+
+def _begin(route: ProviderRoute, reservation: Reservation) -> CircuitCall:
+    try:
+        return acquire_circuit(route)
+    except CircuitOpenError:
+        reservation.cancel()
+        raise
+
+
+def call_provider(route: ProviderRoute | None, prompt: str, call: Callable[[], T]) -> T:
+    """
+    レート制限の範囲で待ってからプロバイダーを呼び出し、レート制限された場合は間隔をおいて再試行
+
+    サーキットブレーカーが開いていれば呼び出さずに失敗する（routeがNoneではどちらも使わない）
+    """
+    if route is None:
+        return call()
+    tokens = _prompt_tokens(prompt)
+    attempt = 0
+    while True:
+        reservation = _reserve(route, tokens)
+        if reservation.wait > 0:
+            time.sleep(reservation.wait)
+        circuit = _begin(route, reservation)
+        try:
+            result = call()
+        except BaseException as e:
+            circuit.finish(e)
+            delay = _retry_delay(route, attempt, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        circuit.finish()
+        used = _used_tokens(result)
+        if used is not None:
+            reservation.settle(used)
+        return result
+
+
+async def call_provider_async(
+    route: ProviderRoute | None, prompt: str, call: Callable[[], Awaitable[T]]
+) -> T:
+    """call_providerの非同期版"""
+    if route is None:
+        return await call()
+    tokens = _prompt_tokens(prompt)
+    attempt = 0
+    while True:
+        reservation = _reserve(route, tokens)
+        if reservation.wait > 0:
+            try:
+                await asyncio.sleep(reservation.wait)
+            except asyncio.CancelledError:
+                reservation.cancel()
+                raise
+        circuit = _begin(route, reservation)
+        try:
+            result = await call()
+        except BaseException as e:
+            circuit.finish(e)
+            delay = _retry_delay(route, attempt, e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        circuit.finish()
+        used = _used_tokens(result)
+        if used is not None:
+            reservation.settle(used)
+        return result
+
+
+def stream_provider(
+    route: ProviderRoute | None, prompt: str, open_stream: Callable[[], Iterator[T]]
+) -> Iterator[T]:
+    """call_providerのストリーミング版（最初のチャンクを返す前の失敗のみ再試行）"""
+    if route is None:
+        yield from open_stream()
+        return
+    tokens = _prompt_tokens(prompt)
+    attempt = 0
+    while True:
+        reservation = _reserve(route, tokens)
+        if reservation.wait > 0:
+            time.sleep(reservation.wait)
+        circuit = _begin(route, reservation)
+        started = False
+        last = None
+        try:
+            for item in open_stream():
+                circuit.first_chunk()
+                started = True
+                last = item
+                yield item
+        except BaseException as e:
+            circuit.finish(e)
+            delay = None if started else _retry_delay(route, attempt, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        circuit.finish()
+        used = _used_tokens(last)
+        if used is not None:
+            reservation.settle(used)
+        return
+
+
+async def stream_provider_async(
+    route: ProviderRoute | None, prompt: str, open_stream: Callable[[], AsyncIterator[T]]
+) -> AsyncIterator[T]:
+    """stream_providerの非同期版"""
+    if route is None:
+        async for item in open_stream():
+            yield item
+        return
+    tokens = _prompt_tokens(prompt)
+    attempt = 0
+    while True:
+        reservation = _reserve(route, tokens)
+        if reservation.wait > 0:
+            try:
+                await asyncio.sleep(reservation.wait)
+            except asyncio.CancelledError:
+                reservation.cancel()
+                raise
+        circuit = _begin(route, reservation)
+        started = False
+        last = None
+        try:
+            async for item in open_stream():
+                circuit.first_chunk()
+                started = True
+                last = item
+                yield item
+        except BaseException as e:
+            circuit.finish(e)
+            delay = None if started else _retry_delay(route, attempt, e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        circuit.finish()
+        used = _used_tokens(last)
+        if used is not None:
+            reservation.settle(used)
+        return
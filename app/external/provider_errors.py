@@ -0,0 +1,105 @@
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+# 別のプロバイダー・経路に切り替えれば成功する見込みがあるHTTPステータス
+_RETRYABLE_STATUS = frozenset({408, 409, 424, 429, 500, 502, 503, 504, 529})
+
+# 同じ送信先で時間をおけば成功する見込みがあるHTTPステータス（レート制限・過負荷）
+_THROTTLED_STATUS = frozenset({429, 529})
+
+
+def _exception_chain(exc: BaseException):
+    """例外と、その原因として連鎖している例外（clientsはAPIErrorで包んで送出する）"""
+    seen: set[int] = set()
+    current: BaseException | None = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def _status_of(exc: BaseException) -> int | None:
+    # APIError・anthropic: status_code / google-genai: code / httpx: response.status_code
+    for value in (
+        getattr(exc, "status_code", None),
+        getattr(exc, "code", None),
+        getattr(getattr(exc, "response", None), "status_code", None),
+    ):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    # botocore ClientError
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def provider_status_code(exc: BaseException) -> int | None:
+    """プロバイダー呼び出しの例外から最初に見つかったHTTPステータスを取得"""
+    for error in _exception_chain(exc):
+        status = _status_of(error)
+        if status is not None:
+            return status
+    return None
+
+
+def _is_transport_error(exc: BaseException) -> bool:
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    # SDK固有の接続・タイムアウト例外（anthropic.APIConnectionErrorなど）
+    return type(exc).__name__.endswith(("ConnectionError", "TimeoutError"))
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """レート制限（429）・サーバーエラー（5xx）・接続障害など、別経路で再試行すべき失敗か"""
+    status = provider_status_code(exc)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    return any(_is_transport_error(error) for error in _exception_chain(exc))
+
+
+def is_throttled_error(exc: BaseException) -> bool:
+    """プロバイダーがレート制限・過負荷を返した失敗か"""
+    return provider_status_code(exc) in _THROTTLED_STATUS
+
+
+def _parse_retry_after(value: str) -> float | None:
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=UTC)
+    return max((at - datetime.now(UTC)).total_seconds(), 0.0)
+
+
+def _retry_after_of(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is None or not hasattr(headers, "get"):
+        return None
+    # anthropicはミリ秒単位のretry-after-msも返す
+    milliseconds = headers.get("retry-after-ms")
+    if isinstance(milliseconds, str):
+        parsed = _parse_retry_after(milliseconds)
+        if parsed is not None:
+            return parsed / 1000
+    value = headers.get("retry-after")
+    return _parse_retry_after(value) if isinstance(value, str) else None
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """プロバイダーのレスポンスのRetry-Afterヘッダーが示す秒数（なければNone）"""
+    for error in _exception_chain(exc):
+        seconds = _retry_after_of(error)
+        if seconds is not None:
+            return seconds
+    return None
@@ -0,0 +1,244 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable
+
+from app.core.config import get_settings
+from app.core.constants import MESSAGES
+from app.utils.exceptions import RateLimitedError
+
+
+class TokenBucket:
+    """
+    1分あたりの上限をならして払い出すトークンバケット
+
+    予約時に残量から差し引き（負になってもよい）、不足分が補充されるまでの秒数を待ち時間とする。
+    後から予約した呼び出しは先の予約分も待つため、待ち順は予約順になる。
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amountを予約した場合の待ち時間（予約はしない）"""
+        self._refill()
+        deficit = min(amount, self.capacity) - self._tokens
+        return max(deficit / self._rate, 0.0)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        """予約の取り消し・実績との差分を戻す（負のamountで追加で差し引く）"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class Reservation:
+    """予約済みのリクエスト1回分（待ち時間と、実際のトークン数で精算するための予約量）"""
+
+    def __init__(self, limiter: "ProviderRateLimiter | None", tokens: int, wait: float):
+        self._limiter = limiter
+        self.tokens = tokens
+        self.wait = wait
+
+    def settle(self, actual_tokens: int) -> None:
+        """実際の入出力トークン数との差分を精算"""
+        if self._limiter is not None:
+            self._limiter._adjust(self.tokens - actual_tokens, requests=0)
+            self.tokens = actual_tokens
+
+    def cancel(self) -> None:
+        """呼び出さなかった予約を戻す"""
+        if self._limiter is not None:
+            self._limiter._adjust(self.tokens, requests=1)
+            self._limiter = None
+
+
+class ProviderRateLimiter:
+    """
+    プロバイダーのアカウント単位のRPM・TPM（推定値）の上限に収まるよう呼び出しを待たせる
+
+    待ち時間がmax_wait秒を超える場合は予約せずにRateLimitedErrorを送出する
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_wait: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._requests = TokenBucket(rpm, clock) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm, clock) if tpm > 0 else None
+        self._max_wait = max_wait
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._waited = 0
+        self._wait_seconds = 0.0
+        self._rejected = 0
+
+    def reserve(self, tokens: int) -> Reservation:
+        """1リクエスト・推定tokensトークンを予約し、送信までの待ち時間を返す"""
+        with self._lock:
+            wait = max(
+                self._requests.wait_time(1) if self._requests else 0.0,
+                self._tokens.wait_time(tokens) if self._tokens else 0.0,
+            )
+            if wait > self._max_wait:
+                self._rejected += 1
+                raise RateLimitedError(
+                    MESSAGES["ERROR"]["RATE_LIMITED"].format(name=self.name), retry_after=wait
+                )
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+            self._reserved += 1
+            if wait > 0:
+                self._waited += 1
+                self._wait_seconds += wait
+        return Reservation(self, tokens, wait)
+
+    def acquire(self, tokens: int) -> Reservation:
+        """予約して送信できるまで待つ"""
+        reservation = self.reserve(tokens)
+        if reservation.wait > 0:
+            time.sleep(reservation.wait)
+        return reservation
+
+    async def acquire_async(self, tokens: int) -> Reservation:
+        """予約して送信できるまで待つ（待機中に取り消された場合は予約を戻す）"""
+        reservation = self.reserve(tokens)
+        if reservation.wait > 0:
+            try:
+                await asyncio.sleep(reservation.wait)
+            except asyncio.CancelledError:
+                reservation.cancel()
+                raise
+        return reservation
+
+    def _adjust(self, tokens: int, requests: int) -> None:
+        with self._lock:
+            if self._tokens and tokens:
+                self._tokens.give(tokens)
+            if self._requests and requests:
+                self._requests.give(requests)
+
+    def snapshot(self) -> dict[str, Any]:
+        """残量と待たせた件数"""
+        with self._lock:
+            return {
+                "rpm": self._requests.capacity if self._requests else None,
+                "tpm": self._tokens.capacity if self._tokens else None,
+                "available_requests": self._requests.available if self._requests else None,
+                "available_tokens": self._tokens.available if self._tokens else None,
+                "reserved": self._reserved,
+                "waited": self._waited,
+                "wait_seconds": round(self._wait_seconds, 3),
+                "rejected": self._rejected,
+            }
+
+
+class BackoffPolicy:
+    """レート制限された呼び出しの再試行間隔（full jitterの指数バックオフ、Retry-Afterを優先）"""
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base: float = 1.0,
+        cap: float = 20.0,
+        rng: random.Random | None = None,
+    ):
+        self.max_retries = max_retries
+        self._base = base
+        self._cap = cap
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """attempt回目（0始まり）の失敗後の待ち時間（再試行しない場合はNone）"""
+        if attempt >= self.max_retries:
+            return None
+        if retry_after is not None and retry_after > self._cap:
+            # 上限より長く待つより予備の送信先に切り替える
+            return None
+        backoff = self._rng.uniform(0, min(self._cap, self._base * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+
+class RateLimiterRegistry:
+    """プロバイダーごとのレート制限と再試行間隔"""
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[int, int]] | None = None,
+        max_wait: float = 30.0,
+        backoff: BackoffPolicy | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.backoff = backoff or BackoffPolicy()
+        self._limiters = {
+            provider: ProviderRateLimiter(provider, rpm, tpm, max_wait, clock)
+            for provider, (rpm, tpm) in (limits or {}).items()
+            if rpm > 0 or tpm > 0
+        }
+
+    def limiter(self, provider: str) -> ProviderRateLimiter | None:
+        """プロバイダーのレート制限（上限が設定されていなければNone）"""
+        return self._limiters.get(provider)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "max_retries": self.backoff.max_retries,
+            "providers": {name: limiter.snapshot() for name, limiter in self._limiters.items()},
+        }
+
+
+_registry: RateLimiterRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiters() -> RateLimiterRegistry:
+    """設定に従ったプロセス共有のレート制限"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            settings = get_settings()
+            _registry = RateLimiterRegistry(
+                limits={
+                    "claude": (settings.claude_rpm_limit, settings.claude_tpm_limit),
+                    "gemini": (settings.gemini_rpm_limit, settings.gemini_tpm_limit),
+                },
+                max_wait=settings.rate_limit_max_wait,
+                backoff=BackoffPolicy(
+                    max_retries=settings.throttle_max_retries,
+                    base=settings.throttle_backoff_base,
+                    cap=settings.throttle_backoff_max,
+                ),
+            )
+        return _registry
+
+
+def set_rate_limiters(registry: RateLimiterRegistry | None) -> None:
+    """レート制限を差し替える（Noneで設定から再生成）"""
+    global _registry
+    with _registry_lock:
+        _registry = registry
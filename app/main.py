@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
@@ -7,6 +9,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from app.api import health
 from app.api.router import api_router
 from app.core.config import get_settings
 from app.core.constants import (
@@ -18,7 +21,18 @@ from app.core.constants import (
     ModelType,
 )
 from app.core.security import SecurityHeadersMiddleware, generate_csrf_token
-from app.utils.error_handlers import api_exception_handler, validation_exception_handler
+from app.external import gateway_http
+from app.external.api_factory import shutdown_clients
+from app.services import cache_invalidation
+from app.services.batch_worker import get_batch_worker, shutdown_batch_worker
+from app.services.usage_writer import get_usage_writer, shutdown_usage_writer
+from app.utils.audit_logger import start_audit_logging, stop_audit_logging
+from app.utils.error_handlers import (
+    api_exception_handler,
+    overloaded_exception_handler,
+    validation_exception_handler,
+)
+from app.utils.exceptions import AdmissionRejectedError
 
 settings = get_settings()
 
@@ -27,11 +41,37 @@ logging.basicConfig(
     format="%(levelname)s:\t%(name)s - %(message)s",
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリのライフサイクル管理"""
+    start_audit_logging()
+    # 他ワーカーでのプロンプト変更通知を受信してキャッシュを破棄
+    cache_invalidation.start_listener()
+    # 前回終了時に退避した使用統計があれば書き込みスレッドが再投入する
+    get_usage_writer().start()
+    # 前回終了時に処理中だった項目もリース期限切れ後に取得し直して続きから処理する
+    if settings.batch_worker_enabled:
+        get_batch_worker().start()
+    yield
+    # 処理中のバッチ項目の完了を待ってから使用統計を書き出す
+    await asyncio.to_thread(shutdown_batch_worker)
+    await asyncio.to_thread(cache_invalidation.stop_listener)
+    # キューに残った使用統計を書き込む
+    await asyncio.to_thread(shutdown_usage_writer)
+    # プール済みAPIクライアントと共有HTTP接続を閉じる
+    await shutdown_clients()
+    await gateway_http.close_clients()
+    # 終了処理中の監査イベントも含めて全て書き出す
+    await asyncio.to_thread(stop_audit_logging)
+
+
 app = FastAPI(
     title="MediDocsLM API",
     version="1.0.0",
     docs_url=None, # 開発段階では "/api/docs"
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 # CORSミドルウェアを追加（明示的なCORS設定）
@@ -48,6 +88,7 @@ app.add_middleware(SecurityHeadersMiddleware)
 
 # エラーハンドラーを登録
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
+app.add_exception_handler(AdmissionRejectedError, overloaded_exception_handler)
 app.add_exception_handler(Exception, api_exception_handler)
 
 # 静的ファイル
@@ -58,6 +99,7 @@ templates = Jinja2Templates(directory="app/templates")
 
 # API ルーター
 app.include_router(api_router, prefix="/api")
+app.include_router(health.protected_router)
 
 
 def get_available_models() -> list[str]:
@@ -1,7 +1,20 @@
+from .audit_log import AuditLog
 from .base import Base
+from .batch_job import BatchJob, BatchJobItem
 from .evaluation_prompt import EvaluationPrompt
+from .generation_cache import GenerationCacheEntry
 from .prompt import Prompt
 from .setting import AppSetting as Setting
 from .usage import SummaryUsage
 
-__all__ = ["Base", "EvaluationPrompt", "Prompt", "Setting", "SummaryUsage"]
+__all__ = [
+    "AuditLog",
+    "Base",
+    "BatchJob",
+    "BatchJobItem",
+    "EvaluationPrompt",
+    "GenerationCacheEntry",
+    "Prompt",
+    "Setting",
+    "SummaryUsage",
+]
@@ -0,0 +1,20 @@
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text
+
+from .base import Base
+
+
+class AuditLog(Base):
+    __tablename__ = "audit_logs"
+
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    success = Column(Boolean, nullable=False)
+    user_ip = Column(String(45))
+    document_type = Column(String(100))
+    model = Column(String(100))
+    payload = Column(Text, nullable=False)  # イベント全体のJSON
+
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_event_type", "timestamp", "event_type"),
+    )
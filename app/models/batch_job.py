@@ -0,0 +1,39 @@
+from typing import Any
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+
+from .base import Base
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id: Any = Column(String(36), primary_key=True)  # UUID
+    status: Any = Column(String(20), nullable=False, index=True)  # queued / running / completed
+    filename: Any = Column(String(255))
+    total_items: Any = Column(Integer, nullable=False)
+    user_ip: Any = Column(String(45))
+    created_at: Any = Column(DateTime(timezone=True), nullable=False)
+    completed_at: Any = Column(DateTime(timezone=True))
+
+
+class BatchJobItem(Base):
+    __tablename__ = "batch_job_items"
+
+    id: Any = Column(Integer, primary_key=True)
+    job_id: Any = Column(String(36), ForeignKey("batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    line_no: Any = Column(Integer, nullable=False)  # アップロードしたファイルでの行番号（1始まり）
+    status: Any = Column(String(20), nullable=False)  # pending / running / succeeded / failed
+    request: Any = Column(Text, nullable=False)  # SummaryRequestのJSON
+    result: Any = Column(Text)  # SummaryResponseのJSON
+    error_message: Any = Column(Text)
+    attempts: Any = Column(Integer, nullable=False, default=0, server_default="0")
+    available_at: Any = Column(DateTime(timezone=True), nullable=False)  # 再試行の待ち時間が明ける時刻
+    locked_by: Any = Column(String(64))
+    locked_until: Any = Column(DateTime(timezone=True))  # 処理中のワーカーが停止した場合に再取得できる時刻
+    updated_at: Any = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_batch_job_items_job_line", "job_id", "line_no", unique=True),
+        Index("ix_batch_job_items_claim", "status", "available_at"),
+    )
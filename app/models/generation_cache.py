@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, String, Text
+
+from .base import Base
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # 入力内容・プロンプト・モデルのSHA-256
+    payload = Column(Text, nullable=False)  # 生成結果のJSON
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
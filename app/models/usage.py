@@ -1,5 +1,5 @@
-from sqlalchemy import Column, DateTime, Float, Index, Integer, String
-from sqlalchemy.sql import func
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, Integer, String
+from sqlalchemy.sql import false, func
 
 from .base import Base
 
@@ -17,6 +17,11 @@ class SummaryUsage(Base):
     input_tokens = Column(Integer)
     output_tokens = Column(Integer)
     processing_time = Column(Float)
+    cache_hit = Column(Boolean, nullable=False, default=False, server_default=false())  # 生成結果キャッシュからの応答
+    # プロバイダー側のプロンプトキャッシュ（input_tokensはこれらを含まない）
+    cache_read_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    cache_write_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    estimated_input_tokens = Column(Integer)  # モデル選択時の補正前の推定トークン数
 
     __table_args__ = (
         Index("ix_summary_usage_aggregation", "document_types", "department", "doctor"),
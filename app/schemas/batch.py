@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued / running / completed
+    filename: str | None
+    total_items: int
+    pending: int
+    running: int
+    succeeded: int
+    failed: int
+    progress: float  # 完了（成功・失敗）した割合（0〜1）
+    created_at: datetime
+    completed_at: datetime | None
@@ -40,3 +40,14 @@ class PromptListItem(BaseModel):
     updated_at: datetime | None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class EffectivePromptItem(BaseModel):
+    """医師・文書タイプごとに実際に適用されるプロンプト"""
+    department: str
+    document_type: str
+    doctor: str
+    prompt_id: int | None
+    source_department: str | None
+    source_doctor: str | None
+    selected_model: str | None
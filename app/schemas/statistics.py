@@ -7,6 +7,9 @@ class UsageSummary(BaseModel):
     total_input_tokens: int
     total_output_tokens: int
     average_processing_time: float
+    cache_hit_count: int = 0
+    total_cache_read_tokens: int = 0
+    total_cache_write_tokens: int = 0
 
 
 class UsageRecord(BaseModel):
@@ -20,6 +23,9 @@ class UsageRecord(BaseModel):
     input_tokens: int | None
     output_tokens: int | None
     processing_time: float | None
+    cache_hit: bool | None = None
+    cache_read_tokens: int | None = None
+    cache_write_tokens: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -31,5 +37,6 @@ class AggregatedRecord(BaseModel):
     count: int
     input_tokens: int
     output_tokens: int
+    cache_read_tokens: int = 0
 
     model_config = ConfigDict(from_attributes=True)
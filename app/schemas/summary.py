@@ -13,6 +13,7 @@ class SummaryRequest(BaseModel):
     document_type: str = DEFAULT_DOCUMENT_TYPE
     model: str = ModelType.CLAUDE.value
     model_explicitly_selected: bool = False
+    bypass_cache: bool = False  # Trueの場合は生成結果キャッシュを使わず新しく生成
 
 
 class SummaryResponse(BaseModel):
@@ -24,4 +25,7 @@ class SummaryResponse(BaseModel):
     processing_time: float
     model_used: str
     model_switched: bool
+    cache_hit: bool = False
+    coalesced: bool = False  # 進行中の同じ生成に参加して結果を受け取った場合True
+    retryable: bool = False  # プロバイダー呼び出しの失敗など、再試行すれば成功し得る場合True（入力エラーはFalse）
     error_message: str | None = None
@@ -0,0 +1,416 @@
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from typing import Any, AsyncGenerator, Callable
+
+from app.core.config import get_settings
+from app.core.constants import MESSAGES
+from app.services.sse_helpers import sse_event
+from app.utils.exceptions import AdmissionRejectedError
+
+# 処理時間の移動平均の重み（直近の処理時間を重視する）
+_SERVICE_TIME_WEIGHT = 0.2
+
+# 入力トークン数を推定できない場合の1件あたりの重み
+DEFAULT_COST = 1000.0
+
+
+class AdmissionTicket:
+    """生成1件分の実行枠（待ち行列に並んでいる間はadmittedがFalse）"""
+
+    def __init__(
+        self,
+        controller: "AdmissionController | None",
+        key: str,
+        enqueued_at: float,
+        tenant: str = "",
+        cost: float = DEFAULT_COST,
+    ):
+        self.key = key
+        self.tenant = tenant
+        self.cost = cost
+        self.admitted = controller is None
+        self.enqueued_at = enqueued_at
+        self.admitted_at: float | None = enqueued_at if controller is None else None
+        # 重み付き公平キューの仮想時刻での開始・終了タグ（終了タグの小さい順に実行枠を得る）
+        self.start_tag = 0.0
+        self.finish_tag = 0.0
+        self.sequence = 0
+        self._controller = controller
+        self._released = False
+        # 順番が進んだ・実行枠を得た場合の通知先（待っている側が設定する）
+        self._notify: Callable[[], None] | None = None
+
+    @property
+    def position(self) -> int:
+        """待ち行列での順番（1始まり、実行中は0）"""
+        if self._controller is None or self.admitted:
+            return 0
+        return self._controller._position(self)
+
+    @property
+    def estimated_wait(self) -> float:
+        """実行できるまでの推定秒数"""
+        if self._controller is None or self.admitted:
+            return 0.0
+        return self._controller._estimate(self.key, self.position)
+
+    async def wait_async(self, timeout: float | None = None) -> None:
+        """順番が進む・実行枠を得る・timeout秒経過するまで待つ"""
+        if self._controller is not None:
+            await self._controller.wait_async(self, timeout)
+
+    def release(self) -> None:
+        """実行枠を返す（待ち行列に並んでいる場合は抜ける）"""
+        if self._controller is not None:
+            self._controller._release(self)
+
+    def __enter__(self) -> "AdmissionTicket":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class _Lane:
+    def __init__(self, limit: int, service_time: float):
+        self.limit = max(limit, 1)
+        self.active = 0
+        self.waiting: list[AdmissionTicket] = []
+        self.service_time = service_time
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        # 実行枠を得た最後のチケットの開始タグ（新しく並ぶチケットのタグの下限）
+        self.virtual_time = 0.0
+        self.finish_tags: dict[str, float] = {}
+
+    def observe(self, seconds: float) -> None:
+        self.service_time += (seconds - self.service_time) * _SERVICE_TIME_WEIGHT
+
+
+class _Tenant:
+    def __init__(self) -> None:
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+        self.service_seconds = 0.0
+
+
+class AdmissionController:
+    """
+    プロバイダーごとの同時生成数を制限し、超えた分を上限付きの待ち行列で待たせる
+
+    待ち行列は診療科（設定により医師）ごとの重み付き公平キューで、入力トークン数を重みとした
+    仮想終了時刻の早い順に実行枠を割り当てる。大量・長大な入力を送った利用者の後ろに
+    他の利用者の短い入力が並び続けることはなく、利用者ごとの同時実行数にも上限を設けられる。
+    待ち行列が満杯の場合はAdmissionRejectedError（503、Retry-Afterは推定待ち時間）を送出する。
+    """
+
+    def __init__(
+        self,
+        concurrency: dict[str, int] | None = None,
+        default_concurrency: int = 8,
+        max_queue: int = 32,
+        default_service_time: float = 30.0,
+        tenant_concurrency: int = 0,
+        tenant_weights: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._concurrency = concurrency or {}
+        self._default_concurrency = default_concurrency
+        self._max_queue = max_queue
+        self._default_service_time = default_service_time
+        self._tenant_concurrency = tenant_concurrency
+        self._tenant_weights = tenant_weights or {}
+        self._clock = clock
+        self._lanes: dict[str, _Lane] = {}
+        self._tenants: dict[str, _Tenant] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def enter(self, key: str, tenant: str = "", cost: float = DEFAULT_COST) -> AdmissionTicket:
+        """実行枠を要求（空きがなければ待ち行列に並ぶ）"""
+        with self._lock:
+            lane = self._lane(key)
+            ticket = AdmissionTicket(self, key, self._clock(), tenant, max(cost, 1.0))
+            ticket.start_tag = max(lane.virtual_time, lane.finish_tags.get(tenant, 0.0))
+            ticket.finish_tag = ticket.start_tag + ticket.cost / self._weight(tenant)
+            self._sequence += 1
+            ticket.sequence = self._sequence
+            lane.waiting.append(ticket)
+            # 既に並んでいるチケットは実行枠を得られない状態のため、得られるのはこのチケットのみ
+            self._dispatch()
+            if not ticket.admitted and len(lane.waiting) > self._max_queue:
+                lane.waiting.remove(ticket)
+                lane.rejected += 1
+                self._tenant(tenant).rejected += 1
+                raise AdmissionRejectedError(
+                    MESSAGES["ERROR"]["ADMISSION_QUEUE_FULL"],
+                    retry_after=self._estimate_locked(lane, len(lane.waiting) + 1),
+                )
+            lane.finish_tags[tenant] = ticket.finish_tag
+            return ticket
+
+    def admit(self, key: str, tenant: str = "", cost: float = DEFAULT_COST) -> AdmissionTicket:
+        """実行枠を得るまでスレッドを待たせる"""
+        ticket = self.enter(key, tenant, cost)
+        if ticket.admitted:
+            return ticket
+        changed = threading.Event()
+        with self._lock:
+            ticket._notify = changed.set
+        try:
+            while not ticket.admitted:
+                changed.wait()
+                changed.clear()
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket
+
+    async def wait_async(self, ticket: AdmissionTicket, timeout: float | None = None) -> None:
+        """順番が進む・実行枠を得る・timeout秒経過するまで待つ"""
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(changed.set)
+
+        # 通知先の登録と判定の間に実行枠を得た場合も取りこぼさないよう、ロック内で再確認する
+        with self._lock:
+            ticket._notify = notify
+            if ticket.admitted:
+                return
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            ticket.release()
+            raise
+
+    async def admit_async(
+        self, key: str, tenant: str = "", cost: float = DEFAULT_COST
+    ) -> AdmissionTicket:
+        """実行枠を得るまで待つ（取り消された場合は待ち行列から抜ける）"""
+        ticket = self.enter(key, tenant, cost)
+        while not ticket.admitted:
+            await self.wait_async(ticket)
+        return ticket
+
+    def snapshot(self) -> dict[str, Any]:
+        """プロバイダーごと・利用者ごとの実行中・待ち件数と待ち時間・処理時間"""
+        with self._lock:
+            queued: dict[str, int] = {}
+            for lane in self._lanes.values():
+                for ticket in lane.waiting:
+                    queued[ticket.tenant] = queued.get(ticket.tenant, 0) + 1
+            return {
+                "providers": {
+                    key: {
+                        "limit": lane.limit,
+                        "active": lane.active,
+                        "queued": len(lane.waiting),
+                        "max_queue": self._max_queue,
+                        "service_time": round(lane.service_time, 3),
+                        "admitted": lane.admitted,
+                        "rejected": lane.rejected,
+                        "average_wait": _average(lane.wait_seconds, lane.admitted),
+                    }
+                    for key, lane in sorted(self._lanes.items())
+                },
+                "tenants": {
+                    name: {
+                        "limit": self._tenant_concurrency or None,
+                        "weight": self._weight(name),
+                        "active": tenant.active,
+                        "queued": queued.get(name, 0),
+                        "admitted": tenant.admitted,
+                        "rejected": tenant.rejected,
+                        "average_wait": _average(tenant.wait_seconds, tenant.admitted),
+                        "average_service_time": _average(tenant.service_seconds, tenant.completed),
+                    }
+                    for name, tenant in sorted(self._tenants.items())
+                },
+            }
+
+    def _lane(self, key: str) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane(
+                self._concurrency.get(key, self._default_concurrency), self._default_service_time
+            )
+        return lane
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = _Tenant()
+        return tenant
+
+    def _weight(self, tenant: str) -> float:
+        return max(self._tenant_weights.get(tenant, 1.0), 0.01)
+
+    def _has_room(self, tenant: str) -> bool:
+        return not self._tenant_concurrency or self._tenant(tenant).active < self._tenant_concurrency
+
+    def _dispatch(self) -> list[AdmissionTicket]:
+        """空いた実行枠を、同時実行数の上限に達していない利用者の終了タグの小さい順に割り当てる"""
+        granted = []
+        for lane in self._lanes.values():
+            while lane.active < lane.limit:
+                candidates = [t for t in lane.waiting if self._has_room(t.tenant)]
+                if not candidates:
+                    break
+                ticket = min(candidates, key=_queue_order)
+                lane.waiting.remove(ticket)
+                lane.virtual_time = max(lane.virtual_time, ticket.start_tag)
+                self._grant(lane, ticket)
+                granted.append(ticket)
+        return granted
+
+    def _grant(self, lane: _Lane, ticket: AdmissionTicket) -> None:
+        now = self._clock()
+        ticket.admitted = True
+        ticket.admitted_at = now
+        tenant = self._tenant(ticket.tenant)
+        lane.active += 1
+        lane.admitted += 1
+        lane.wait_seconds += now - ticket.enqueued_at
+        tenant.active += 1
+        tenant.admitted += 1
+        tenant.wait_seconds += now - ticket.enqueued_at
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        with self._lock:
+            if ticket._released:
+                return
+            ticket._released = True
+            lane = self._lanes[ticket.key]
+            if ticket.admitted:
+                assert ticket.admitted_at is not None
+                elapsed = self._clock() - ticket.admitted_at
+                tenant = self._tenant(ticket.tenant)
+                lane.active -= 1
+                lane.observe(elapsed)
+                tenant.active -= 1
+                tenant.completed += 1
+                tenant.service_seconds += elapsed
+            else:
+                lane.waiting.remove(ticket)
+            granted = self._dispatch()
+            # 実行枠を得た・順番が進んだ待ち手に知らせる
+            waiting = [t for other in self._lanes.values() for t in other.waiting]
+            notify = [t._notify for t in (*granted, *waiting) if t._notify is not None]
+        for callback in notify:
+            # 待ち手のイベントループが終了している場合は知らせる必要がない
+            with contextlib.suppress(RuntimeError):
+                callback()
+
+    def _position(self, ticket: AdmissionTicket) -> int:
+        with self._lock:
+            waiting = sorted(self._lanes[ticket.key].waiting, key=_queue_order)
+            try:
+                return waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def _estimate(self, key: str, position: int) -> float:
+        with self._lock:
+            return self._estimate_locked(self._lane(key), position)
+
+    def _estimate_locked(self, lane: _Lane, position: int) -> float:
+        # 前に並んでいるposition-1件と自分の分だけ実行枠が空くのを待つ
+        return math.ceil(position / lane.limit) * lane.service_time
+
+
+def _queue_order(ticket: AdmissionTicket) -> tuple[float, int]:
+    return ticket.finish_tag, ticket.sequence
+
+
+def _average(total: float, count: int) -> float:
+    return round(total / count, 3) if count else 0.0
+
+
+async def queued_events(
+    ticket: AdmissionTicket, heartbeat_interval: float = 5
+) -> AsyncGenerator[str, None]:
+    """実行枠を得るまで、順番と推定待ち時間をprogressイベント（status: queued）で送る"""
+    while not ticket.admitted:
+        position = ticket.position
+        if position:
+            yield sse_event("progress", {
+                "status": "queued",
+                "message": MESSAGES["STATUS"]["QUEUED"].format(
+                    position=position, wait=math.ceil(ticket.estimated_wait)
+                ),
+                "position": position,
+                "estimated_wait": round(ticket.estimated_wait, 1),
+            })
+        await ticket.wait_async(heartbeat_interval)
+
+
+_controller: AdmissionController | None = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController | None:
+    """設定に従ったプロセス共有のアドミッション制御（無効化されていればNone）"""
+    global _controller
+    settings = get_settings()
+    if not settings.admission_enabled:
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                concurrency=settings.admission_concurrency,
+                default_concurrency=settings.admission_default_concurrency,
+                max_queue=settings.admission_max_queue,
+                default_service_time=settings.admission_default_service_time,
+                tenant_concurrency=settings.admission_tenant_concurrency,
+                tenant_weights=settings.admission_tenant_weights,
+            )
+        return _controller
+
+
+def set_admission_controller(controller: AdmissionController | None) -> None:
+    """アドミッション制御を差し替える（Noneで設定から再生成）"""
+    global _controller
+    with _controller_lock:
+        _controller = controller
+
+
+def tenant_key(department: str, doctor: str) -> str:
+    """公平に実行枠を割り当てる単位（設定により診療科、または診療科と医師）"""
+    if get_settings().admission_tenant_key == "doctor":
+        return f"{department}/{doctor}"
+    return department
+
+
+def enter_admission(key: str, tenant: str = "", cost: float = DEFAULT_COST) -> AdmissionTicket:
+    """実行枠を要求（無効化されていれば常に実行できる枠を返す）"""
+    controller = get_admission_controller()
+    if controller is None:
+        return AdmissionTicket(None, key, time.monotonic(), tenant, cost)
+    return controller.enter(key, tenant, cost)
+
+
+def admit(key: str, tenant: str = "", cost: float = DEFAULT_COST) -> AdmissionTicket:
+    """実行枠を得るまでスレッドを待たせる（無効化されていれば待たない）"""
+    controller = get_admission_controller()
+    if controller is None:
+        return AdmissionTicket(None, key, time.monotonic(), tenant, cost)
+    return controller.admit(key, tenant, cost)
+
+
+async def admit_async(key: str, tenant: str = "", cost: float = DEFAULT_COST) -> AdmissionTicket:
+    """実行枠を得るまで待つ（無効化されていれば待たない）"""
+    controller = get_admission_controller()
+    if controller is None:
+        return AdmissionTicket(None, key, time.monotonic(), tenant, cost)
+    return await controller.admit_async(key, tenant, cost)
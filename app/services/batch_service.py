@@ -0,0 +1,330 @@
+import csv
+import io
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.constants import MESSAGES, get_message
+from app.core.database import get_db_session
+from app.models.batch_job import BatchJob, BatchJobItem
+from app.schemas.batch import BatchJobResponse
+from app.schemas.summary import SummaryRequest, SummaryResponse
+from app.utils.exceptions import BatchInputError
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+
+ITEM_PENDING = "pending"
+ITEM_RUNNING = "running"
+ITEM_SUCCEEDED = "succeeded"
+ITEM_FAILED = "failed"
+
+# 入力エラーとして返す行の上限（全行分のエラーを返さない）
+_MAX_REPORTED_ERRORS = 5
+
+
+@dataclass(frozen=True)
+class ClaimedItem:
+    """ワーカーが取得したバッチ項目"""
+
+    id: int
+    job_id: str
+    line_no: int
+    request: SummaryRequest
+    attempts: int
+    user_ip: str | None
+
+
+def parse_batch_file(content: bytes, filename: str | None, max_items: int) -> list[SummaryRequest]:
+    """
+    アップロードされたJSONL・CSVをSummaryRequestの一覧に変換
+
+    CSVは1行目を列名とし、空欄の列は既定値を使う。不正な行があれば全体を受け付けない。
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise BatchInputError(MESSAGES["ERROR"]["BATCH_INVALID_ENCODING"]) from e
+
+    is_csv = (filename or "").lower().endswith(".csv")
+    rows = _csv_rows(text) if is_csv else _jsonl_rows(text)
+
+    requests: list[SummaryRequest] = []
+    errors: list[str] = []
+    for line, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            requests.append(SummaryRequest.model_validate(row))
+        except (ValueError, ValidationError) as e:
+            errors.append(get_message("ERROR", "BATCH_INVALID_ROW", line=str(line), error=_describe(e)))
+    if errors:
+        raise BatchInputError("\n".join(errors[:_MAX_REPORTED_ERRORS]))
+    if not requests:
+        raise BatchInputError(MESSAGES["ERROR"]["BATCH_EMPTY"])
+    if len(requests) > max_items:
+        raise BatchInputError(get_message("ERROR", "BATCH_TOO_MANY_ITEMS", max_items=str(max_items)))
+    return requests
+
+
+def _jsonl_rows(text: str) -> Iterator[tuple[int, Any]]:
+    for line, raw in enumerate(text.splitlines(), start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as e:
+            yield line, e
+            continue
+        yield line, row if isinstance(row, dict) else ValueError("JSON object expected")
+
+
+def _csv_rows(text: str) -> Iterator[tuple[int, Any]]:
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        values = {k.strip(): v for k, v in row.items() if k is not None and v not in (None, "")}
+        if values:
+            yield reader.line_num, values
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors()
+        )
+    return str(error)
+
+
+def create_job(
+    db: Session, requests: list[SummaryRequest], filename: str | None, user_ip: str | None
+) -> BatchJob:
+    """ジョブと項目を登録（ワーカーが順に取得して生成する）"""
+    now = datetime.now(UTC)
+    job = BatchJob(
+        id=str(uuid.uuid4()),
+        status=JOB_QUEUED,
+        filename=filename,
+        total_items=len(requests),
+        user_ip=user_ip,
+        created_at=now,
+    )
+    db.add(job)
+    db.flush()
+    db.execute(
+        insert(BatchJobItem),
+        [
+            {
+                "job_id": job.id,
+                "line_no": i,
+                "status": ITEM_PENDING,
+                "request": request.model_dump_json(),
+                "attempts": 0,
+                "available_at": now,
+                "updated_at": now,
+            }
+            for i, request in enumerate(requests, start=1)
+        ],
+    )
+    return job
+
+
+def get_job_status(db: Session, job_id: str) -> BatchJobResponse | None:
+    """ジョブの状態と項目の状態ごとの件数"""
+    job = db.get(BatchJob, job_id)
+    if job is None:
+        return None
+    counts: dict[str, int] = {
+        item_status: count
+        for item_status, count in db.execute(
+            select(BatchJobItem.status, func.count())
+            .where(BatchJobItem.job_id == job_id)
+            .group_by(BatchJobItem.status)
+        ).all()
+    }
+    succeeded = counts.get(ITEM_SUCCEEDED, 0)
+    failed = counts.get(ITEM_FAILED, 0)
+    return BatchJobResponse(
+        job_id=job.id,
+        status=job.status,
+        filename=job.filename,
+        total_items=job.total_items,
+        pending=counts.get(ITEM_PENDING, 0),
+        running=counts.get(ITEM_RUNNING, 0),
+        succeeded=succeeded,
+        failed=failed,
+        progress=round((succeeded + failed) / job.total_items, 4) if job.total_items else 1.0,
+        created_at=job.created_at,
+        completed_at=job.completed_at,
+    )
+
+
+def iter_job_results(job_id: str, after: int = 0, page_size: int = 100) -> Iterator[str]:
+    """
+    完了した項目の結果を行番号順にJSON Lines形式で返す
+
+    afterより後の行番号のみ返すため、前回受け取った最後の行番号を渡せば続きから取得できる。
+    レスポンスの送信中に読み込むため、リクエストのセッション（送信前に閉じられる）ではなく専用のセッションを使う
+    """
+    with get_db_session() as db:
+        while True:
+            items = db.execute(
+                select(BatchJobItem)
+                .where(
+                    BatchJobItem.job_id == job_id,
+                    BatchJobItem.line_no > after,
+                    BatchJobItem.status.in_((ITEM_SUCCEEDED, ITEM_FAILED)),
+                )
+                .order_by(BatchJobItem.line_no)
+                .limit(page_size)
+            ).scalars().all()
+            for item in items:
+                yield json.dumps({
+                    "line_no": item.line_no,
+                    "status": item.status,
+                    "attempts": item.attempts,
+                    "result": json.loads(item.result) if item.result else None,
+                    "error_message": item.error_message,
+                }, ensure_ascii=False) + "\n"
+            if len(items) < page_size:
+                return
+            after = items[-1].line_no
+            # 大量の結果を返す間に取得した行をセッションに溜めない
+            db.expunge_all()
+
+
+def claim_next_item(
+    db: Session, worker_id: str, lease_seconds: float, max_attempts: int
+) -> ClaimedItem | None:
+    """
+    処理待ちの項目を1件取得して処理中にする
+
+    PostgreSQLではFOR UPDATE SKIP LOCKEDで他のワーカーが取得中の行を飛ばす。
+    処理中のまま期限が切れた項目（ワーカーの停止・再起動）も取得し直す。
+    """
+    now = datetime.now(UTC)
+    while True:
+        item = db.execute(
+            select(BatchJobItem)
+            .where(or_(
+                and_(BatchJobItem.status == ITEM_PENDING, BatchJobItem.available_at <= now),
+                and_(BatchJobItem.status == ITEM_RUNNING, BatchJobItem.locked_until <= now),
+            ))
+            .order_by(BatchJobItem.available_at, BatchJobItem.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if item is None:
+            return None
+        if item.status == ITEM_RUNNING and item.attempts >= max_attempts:
+            # 処理中に停止したワーカーの分で再試行回数を使い切った
+            _set_failed(item, MESSAGES["ERROR"]["BATCH_ITEM_INTERRUPTED"], now)
+            db.flush()
+            finish_job_if_done(db, item.job_id)
+            continue
+        item.status = ITEM_RUNNING
+        item.attempts += 1
+        item.locked_by = worker_id
+        item.locked_until = now + timedelta(seconds=lease_seconds)
+        item.updated_at = now
+        job = db.get(BatchJob, item.job_id)
+        if job is not None and job.status == JOB_QUEUED:
+            job.status = JOB_RUNNING
+        return ClaimedItem(
+            id=item.id,
+            job_id=item.job_id,
+            line_no=item.line_no,
+            request=SummaryRequest.model_validate_json(item.request),
+            attempts=item.attempts,
+            user_ip=job.user_ip if job is not None else None,
+        )
+
+
+def complete_item(
+    db: Session, claimed: ClaimedItem, worker_id: str, response: SummaryResponse
+) -> BatchJob | None:
+    """生成結果を保存（他のワーカーに取得し直された項目は更新しない、ジョブが完了した場合はジョブを返す）"""
+    db.execute(
+        update(BatchJobItem)
+        .where(*_owned_by(claimed, worker_id))
+        .values(
+            status=ITEM_SUCCEEDED,
+            result=response.model_dump_json(exclude={"error_message"}),
+            error_message=None,
+            locked_by=None,
+            locked_until=None,
+            updated_at=datetime.now(UTC),
+        )
+    )
+    return finish_job_if_done(db, claimed.job_id)
+
+
+def fail_item(
+    db: Session, claimed: ClaimedItem, worker_id: str, error: str, retry_at: datetime | None
+) -> BatchJob | None:
+    """失敗を記録し、retry_atがあればその時刻以降に再試行する（ジョブが完了した場合はジョブを返す）"""
+    values: dict[str, Any] = {
+        "error_message": error,
+        "locked_by": None,
+        "locked_until": None,
+        "updated_at": datetime.now(UTC),
+    }
+    if retry_at is not None:
+        values.update(status=ITEM_PENDING, available_at=retry_at)
+    else:
+        values.update(status=ITEM_FAILED)
+    db.execute(update(BatchJobItem).where(*_owned_by(claimed, worker_id)).values(**values))
+    return finish_job_if_done(db, claimed.job_id) if retry_at is None else None
+
+
+def finish_job_if_done(db: Session, job_id: str) -> BatchJob | None:
+    """
+    全項目が完了していればジョブを完了にする（完了にした場合はジョブを返す）
+
+    最後の項目を複数のワーカーが同時に終えた場合に、互いの項目を処理中と数えて
+    どちらも完了にしないことがないよう、ジョブの行をロックしてから数える
+    """
+    job = db.execute(
+        select(BatchJob)
+        .where(BatchJob.id == job_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if job is None or job.status == JOB_COMPLETED:
+        return None
+    remaining = db.execute(
+        select(func.count())
+        .select_from(BatchJobItem)
+        .where(
+            BatchJobItem.job_id == job_id,
+            BatchJobItem.status.in_((ITEM_PENDING, ITEM_RUNNING)),
+        )
+    ).scalar_one()
+    if remaining:
+        return None
+    job.status = JOB_COMPLETED
+    job.completed_at = datetime.now(UTC)
+    return job
+
+
+def _owned_by(claimed: ClaimedItem, worker_id: str) -> tuple[Any, ...]:
+    return (
+        BatchJobItem.id == claimed.id,
+        BatchJobItem.status == ITEM_RUNNING,
+        BatchJobItem.locked_by == worker_id,
+        BatchJobItem.attempts == claimed.attempts,
+    )
+
+
+def _set_failed(item: BatchJobItem, error: str, now: datetime) -> None:
+    item.status = ITEM_FAILED
+    item.error_message = error
+    item.locked_by = None
+    item.locked_until = None
+    item.updated_at = now
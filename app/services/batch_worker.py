@@ -0,0 +1,231 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+from contextlib import AbstractContextManager
+from datetime import UTC, datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import get_message
+from app.core.database import get_db_session
+from app.schemas.summary import SummaryResponse
+from app.services.batch_service import (
+    ClaimedItem,
+    claim_next_item,
+    complete_item,
+    fail_item,
+    get_job_status,
+)
+from app.services import cache_invalidation
+from app.services.summary_service import execute_summary_generation
+from app.services.usage_writer import get_usage_writer, shutdown_usage_writer
+from app.utils.audit_logger import start_audit_logging, stop_audit_logging
+
+logger = logging.getLogger(__name__)
+
+Generate = Callable[..., SummaryResponse]
+
+
+class BatchWorker:
+    """
+    バッチジョブの項目をDBから取得して生成するワーカースレッド群
+
+    各スレッドが1件ずつ取得（PostgreSQLではFOR UPDATE SKIP LOCKED）して
+    execute_summary_generationで生成するため、レート制限・同時実行数の制御・使用統計の記録は
+    画面からの生成と同じになる。プロバイダー呼び出しの失敗は間隔を倍にしながらmax_attempts回まで再試行し、
+    入力エラーなど再試行しても成功しない項目は直ちに失敗とする。
+    処理中にプロセスが停止した項目はlease_seconds経過後に他のワーカー・再起動後のワーカーが取得し直す。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] = get_db_session,
+        generate: Generate = execute_summary_generation,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        retry_delay: float = 30.0,
+        lease_seconds: float = 600.0,
+        poll_interval: float = 2.0,
+    ):
+        self._session_factory = session_factory
+        self._generate = generate
+        self._concurrency = max(concurrency, 1)
+        self._max_attempts = max(max_attempts, 1)
+        self._retry_delay = retry_delay
+        self._lease_seconds = lease_seconds
+        self._poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads: list[threading.Thread] = []
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._retried = 0
+
+    def start(self) -> None:
+        """ワーカースレッドを開始（起動済みなら何もしない）"""
+        with self._start_lock:
+            if any(t.is_alive() for t in self._threads):
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"batch-worker-{i}", daemon=True)
+                for i in range(self._concurrency)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """新しい項目の取得をやめ、処理中の項目の完了を待つ（待ちきれない項目は再起動後に取得し直す）"""
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def run_once(self) -> bool:
+        """処理待ちの項目を1件処理（項目がなければFalse）"""
+        with self._session_factory() as db:
+            claimed = claim_next_item(db, self.worker_id, self._lease_seconds, self._max_attempts)
+        if claimed is None:
+            return False
+
+        try:
+            response = self._generate(**claimed.request.model_dump(), user_ip=claimed.user_ip)
+        except Exception as e:
+            self._record_failure(claimed, str(e))
+        else:
+            if response.success:
+                self._record_success(claimed, response)
+            else:
+                self._record_failure(claimed, response.error_message or "", response.retryable)
+        self._count("_processed")
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """処理状況"""
+        with self._stats_lock:
+            return {
+                "worker_id": self.worker_id,
+                "running": any(t.is_alive() for t in self._threads),
+                "concurrency": self._concurrency,
+                "processed": self._processed,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "retried": self._retried,
+            }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(get_message("LOG", "BATCH_WORKER_ERROR", error=str(e)))
+            self._stop.wait(self._poll_interval)
+
+    def _record_success(self, claimed: ClaimedItem, response: SummaryResponse) -> None:
+        with self._session_factory() as db:
+            job = complete_item(db, claimed, self.worker_id, response)
+            if job is not None:
+                self._log_completed(db, job.id)
+        self._count("_succeeded")
+
+    def _record_failure(self, claimed: ClaimedItem, error: str, retryable: bool = True) -> None:
+        logger.warning(get_message(
+            "LOG", "BATCH_ITEM_FAILED",
+            job_id=claimed.job_id, line=str(claimed.line_no), attempts=str(claimed.attempts),
+            error=error,
+        ))
+        retry_at = None
+        if retryable and claimed.attempts < self._max_attempts:
+            delay = self._retry_delay * 2 ** (claimed.attempts - 1)
+            retry_at = datetime.now(UTC) + timedelta(seconds=delay)
+        with self._session_factory() as db:
+            job = fail_item(db, claimed, self.worker_id, error, retry_at)
+            if job is not None:
+                self._log_completed(db, job.id)
+        self._count("_retried" if retry_at is not None else "_failed")
+
+    def _log_completed(self, db: Session, job_id: str) -> None:
+        db.flush()
+        status = get_job_status(db, job_id)
+        if status is not None:
+            logger.info(get_message(
+                "LOG", "BATCH_JOB_COMPLETED",
+                job_id=job_id, succeeded=str(status.succeeded), failed=str(status.failed),
+            ))
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+_worker: BatchWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def get_batch_worker() -> BatchWorker:
+    """設定に従ったプロセス共有のバッチワーカーを取得"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            settings = get_settings()
+            _worker = BatchWorker(
+                concurrency=settings.batch_worker_concurrency,
+                max_attempts=settings.batch_max_attempts,
+                retry_delay=settings.batch_retry_delay,
+                lease_seconds=settings.batch_lease_seconds,
+                poll_interval=settings.batch_poll_interval,
+            )
+        return _worker
+
+
+def set_batch_worker(worker: BatchWorker | None) -> None:
+    """バッチワーカーを差し替える（Noneで設定から再生成）"""
+    global _worker
+    with _worker_lock:
+        _worker = worker
+
+
+def shutdown_batch_worker(timeout: float = 10.0) -> None:
+    """起動済みのバッチワーカーを停止"""
+    with _worker_lock:
+        worker = _worker
+    if worker is not None:
+        worker.shutdown(timeout)
+
+
+def run_worker_process() -> None:
+    """
+    バッチワーカー専用のプロセスとして実行（SIGTERM・SIGINTで処理中の項目を終えて停止）
+
+    同期の生成処理でWebワーカーのスレッドを占有しないよう、Webプロセスとは別に起動する
+    """
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:\t%(name)s - %(message)s")
+    start_audit_logging()
+    cache_invalidation.start_listener()
+    get_usage_writer().start()
+    worker = get_batch_worker()
+    worker.start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    stop.wait()
+
+    shutdown_batch_worker()
+    cache_invalidation.stop_listener()
+    shutdown_usage_writer()
+    stop_audit_logging()
+
+
+if __name__ == "__main__":
+    run_worker_process()
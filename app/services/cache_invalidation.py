@@ -0,0 +1,216 @@
+import json
+import logging
+import select
+import threading
+from typing import Any, Callable, Sequence
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import get_message
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "medidocs_cache_invalidation"
+
+# 通知の種類（各サービスが対応するハンドラーを登録する）
+PROMPT = "prompt"
+EVALUATION_PROMPT = "evaluation_prompt"
+
+# 受信ハンドラー: 変更されたキー（不明な場合はNone）を受け取りキャッシュを破棄する
+InvalidationHandler = Callable[[list[str] | None], None]
+
+_handlers: dict[str, list[InvalidationHandler]] = {}
+_handlers_lock = threading.Lock()
+
+
+def register_handler(kind: str, handler: InvalidationHandler) -> None:
+    """通知の種類に対応するキャッシュ破棄処理を登録"""
+    with _handlers_lock:
+        _handlers.setdefault(kind, []).append(handler)
+
+
+def _encode(kind: str, key: Sequence[str] | None) -> str:
+    return json.dumps({"kind": kind, "key": list(key) if key is not None else None}, ensure_ascii=False)
+
+
+def dispatch(payload: str) -> None:
+    """受信した通知を登録済みハンドラーに振り分ける"""
+    try:
+        message = json.loads(payload)
+        kind = message["kind"]
+        key = message.get("key")
+    except (ValueError, KeyError, TypeError):
+        logger.warning(get_message("LOG", "CACHE_INVALIDATION_BAD_PAYLOAD", payload=payload))
+        return
+
+    with _handlers_lock:
+        handlers = list(_handlers.get(kind, []))
+    for handler in handlers:
+        handler(key)
+
+
+def dispatch_all() -> None:
+    """全てのキャッシュを破棄（通知を取りこぼした可能性がある場合に使用）"""
+    with _handlers_lock:
+        handlers = [h for hs in _handlers.values() for h in hs]
+    for handler in handlers:
+        handler(None)
+
+
+# コミット待ちの通知を保持するSession.infoのキー（自ワーカーへの配信用）
+_PENDING = "cache_invalidation_pending"
+
+
+class InMemoryInvalidationBus:
+    """
+    プロセス内のみで配信するバス（SQLite・テスト用）
+
+    自ワーカーへの配信は notify_change がコミット後に行うため、他ワーカーには送らない
+    """
+
+    def publish(self, db: Session, payload: str) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        pass
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session) -> None:
+    for payload in session.info.pop(_PENDING, []):
+        dispatch(payload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING, None)
+
+
+class PostgresInvalidationBus:
+    """
+    PostgreSQLのLISTEN/NOTIFYで全ワーカーに配信するバス
+
+    NOTIFYは書き込みと同じトランザクションで発行するため、コミットされた変更のみ通知される
+    """
+
+    def __init__(self, database_url: str, poll_interval: float = 1.0, reconnect_delay: float = 5.0):
+        # psycopg2はSQLAlchemyのドライバー指定を含まないURLを要求する
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._poll_interval = poll_interval
+        self._reconnect_delay = reconnect_delay
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def publish(self, db: Session, payload: str) -> None:
+        db.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen_forever, name="cache-invalidation-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _listen_forever(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                self._listen(resync=connected_before)
+            except Exception as e:
+                logger.warning(get_message("LOG", "CACHE_INVALIDATION_LISTENER_FAILED", error=str(e)))
+            connected_before = True
+            self._stop.wait(self._reconnect_delay)
+
+    def _listen(self, resync: bool) -> None:
+        conn = psycopg2.connect(self._dsn)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            if resync:
+                # 切断中の通知は届かないため全キャッシュを破棄して整合させる
+                dispatch_all()
+
+            while not self._stop.is_set():
+                readable, _, _ = select.select([conn], [], [], self._poll_interval)
+                if not readable:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    dispatch(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+
+InvalidationBus = InMemoryInvalidationBus | PostgresInvalidationBus
+
+_bus: InvalidationBus | None = None
+_bus_lock = threading.Lock()
+
+
+def _create_bus() -> InvalidationBus:
+    settings = get_settings()
+    backend = settings.cache_invalidation_backend
+    database_url = settings.get_database_url()
+    if backend == "auto":
+        backend = "postgres" if database_url.startswith("postgresql") else "memory"
+    if backend == "postgres":
+        return PostgresInvalidationBus(database_url)
+    return InMemoryInvalidationBus()
+
+
+def get_bus() -> InvalidationBus:
+    """設定に応じた通知バスを取得"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = _create_bus()
+        return _bus
+
+
+def set_bus(bus: InvalidationBus | None) -> None:
+    """通知バスを差し替える（Noneで設定から再生成）"""
+    global _bus
+    with _bus_lock:
+        _bus = bus
+
+
+def notify_change(db: Session, kind: str, key: Sequence[str] | None = None) -> None:
+    """
+    キャッシュ対象の変更を全ワーカーに通知（書き込みのコミット時に配信）
+
+    自ワーカーのキャッシュはコミット直後に同じスレッドで破棄し、
+    コミット前の古い内容が読み込まれて残らないようにする（ロールバック時は破棄しない）
+    """
+    payload = _encode(kind, key)
+    db.info.setdefault(_PENDING, []).append(payload)
+    get_bus().publish(db, payload)
+
+
+def start_listener() -> None:
+    """他ワーカーからの通知受信を開始"""
+    get_bus().start()
+
+
+def stop_listener() -> None:
+    """通知受信を停止"""
+    get_bus().stop()
@@ -1,7 +1,23 @@
+import threading
+
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.core.constants import MESSAGES
 from app.models.evaluation_prompt import EvaluationPrompt
+from app.services import cache_invalidation
+
+settings = get_settings()
+
+# 文書タイプ → 有効な評価プロンプト内容（未設定はNone）
+_evaluation_prompt_cache: TTLCache[str, str | None] = TTLCache(
+    maxsize=max(settings.prompt_cache_maxsize, 1),
+    ttl=max(settings.prompt_cache_ttl, 1),
+)
+_evaluation_prompt_cache_lock = threading.Lock()
+# 無効化の世代（DB読み込み中に無効化された結果をキャッシュしないため）
+_evaluation_prompt_cache_generation = 0
 
 
 def get_evaluation_prompt(db: Session, document_type: str) -> EvaluationPrompt | None:
@@ -12,6 +28,40 @@ def get_evaluation_prompt(db: Session, document_type: str) -> EvaluationPrompt |
     ).first()
 
 
+def resolve_evaluation_prompt(db: Session, document_type: str) -> str | None:
+    """有効な評価プロンプトの内容をキャッシュ経由で取得"""
+    with _evaluation_prompt_cache_lock:
+        if document_type in _evaluation_prompt_cache:
+            return _evaluation_prompt_cache[document_type]
+        generation = _evaluation_prompt_cache_generation
+
+    prompt = get_evaluation_prompt(db, document_type)
+    content = prompt.content if prompt else None
+
+    if settings.prompt_cache_ttl > 0:
+        with _evaluation_prompt_cache_lock:
+            if generation == _evaluation_prompt_cache_generation:
+                _evaluation_prompt_cache[document_type] = content
+    return content
+
+
+def invalidate_evaluation_prompt_cache(document_type: str | None = None) -> None:
+    """評価プロンプトのキャッシュを破棄（文書タイプ指定時はそのキーのみ）"""
+    global _evaluation_prompt_cache_generation
+    with _evaluation_prompt_cache_lock:
+        if document_type is None:
+            _evaluation_prompt_cache.clear()
+        else:
+            _evaluation_prompt_cache.pop(document_type, None)
+        _evaluation_prompt_cache_generation += 1
+
+
+cache_invalidation.register_handler(
+    cache_invalidation.EVALUATION_PROMPT,
+    lambda key: invalidate_evaluation_prompt_cache(key[0] if key else None),
+)
+
+
 def get_all_evaluation_prompts(db: Session) -> list[EvaluationPrompt]:
     """全ての評価プロンプトを取得"""
     return db.query(EvaluationPrompt).order_by(EvaluationPrompt.document_type).all()
@@ -26,6 +76,7 @@ def create_or_update_evaluation_prompt(
     if not content:
         return False, MESSAGES["VALIDATION"]["EVALUATION_PROMPT_CONTENT_REQUIRED"]
 
+    cache_invalidation.notify_change(db, cache_invalidation.EVALUATION_PROMPT, [document_type])
     existing = db.query(EvaluationPrompt).filter(
         EvaluationPrompt.document_type == document_type
     ).first()
@@ -57,5 +108,6 @@ def delete_evaluation_prompt(db: Session, document_type: str) -> tuple[bool, str
             document_type=document_type
         )
 
+    cache_invalidation.notify_change(db, cache_invalidation.EVALUATION_PROMPT, [document_type])
     db.delete(prompt)
     return True, MESSAGES["SUCCESS"]["EVALUATION_PROMPT_DELETED"]
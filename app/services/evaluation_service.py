@@ -1,19 +1,27 @@
+import asyncio
 import time
-from typing import AsyncGenerator, cast
+from typing import AsyncGenerator
 
 from app.core.config import get_settings
 from app.core.constants import MESSAGES, get_message
 from app.core.database import get_db_session
-from app.external.gemini_api import GeminiAPIClient
+from app.external.api_factory import evaluation_client_key, get_pooled_client
+from app.external.gemini_api import AsyncGeminiAPIClient, GeminiAPIClient
 from app.schemas.evaluation import EvaluationResponse
-from app.services.evaluation_prompt_service import get_evaluation_prompt
-from app.services.sse_helpers import sse_event, stream_with_heartbeat
+from app.services.admission import admit, admit_async, enter_admission, queued_events
+from app.services.evaluation_prompt_service import resolve_evaluation_prompt
+from app.services.input_preparation import PreparedInput, prepare_input
+from app.services.sse_helpers import await_with_heartbeat, sse_event
+from app.services.token_estimator import estimate_text_tokens
 from app.utils.audit_logger import log_audit_event
 from app.utils.exceptions import APIError
-from app.utils.input_sanitizer import sanitize_medical_text, validate_medical_input
+from app.utils.input_sanitizer import sanitize_medical_text
 
 settings = get_settings()
 
+# 評価はGeminiで行うため、文書生成のGemini呼び出しと同じ実行枠を使う
+_ADMISSION_KEY = "gemini"
+
 
 def _error_response(error_msg: str, processing_time: float = 0.0) -> EvaluationResponse:
     """エラーレスポンスを生成"""
@@ -28,22 +36,21 @@ def _error_response(error_msg: str, processing_time: float = 0.0) -> EvaluationR
 
 
 def _validate_and_get_prompt(
-    output_summary: str,
+    output_summary: PreparedInput,
     document_type: str,
-    input_text: str = "",
+    input_text: PreparedInput | None = None,
 ) -> tuple[str | None, str | None]:
     """バリデーションを実行してプロンプトを取得（プロンプトインジェクション検出を含む）"""
-    if not output_summary:
+    if not output_summary.text:
         return None, MESSAGES["VALIDATION"]["EVALUATION_NO_OUTPUT"]
 
-    # プロンプトインジェクション検出
-    if output_summary:
-        is_valid, error_msg = validate_medical_input(output_summary, settings.max_input_tokens)
-        if not is_valid:
-            return None, error_msg
+    # プロンプトインジェクション検出（生成時に走査済みのカルテは結果を再利用）
+    is_valid, error_msg = output_summary.validate(settings.max_input_tokens)
+    if not is_valid:
+        return None, error_msg
 
-    if input_text:
-        is_valid, error_msg = validate_medical_input(input_text, settings.max_input_tokens)
+    if input_text is not None and input_text.text:
+        is_valid, error_msg = input_text.validate(settings.max_input_tokens)
         if not is_valid:
             return None, error_msg
 
@@ -51,12 +58,12 @@ def _validate_and_get_prompt(
         return None, MESSAGES["CONFIG"]["EVALUATION_MODEL_MISSING"]
 
     with get_db_session() as db:
-        prompt_data = get_evaluation_prompt(db, document_type)
-        if not prompt_data:
-            return None, MESSAGES["VALIDATION"]["EVALUATION_PROMPT_NOT_SET"].format(
-                document_type=document_type
-            )
-        return cast(str, prompt_data.content), None
+        prompt_content = resolve_evaluation_prompt(db, document_type)
+    if not prompt_content:
+        return None, MESSAGES["VALIDATION"]["EVALUATION_PROMPT_NOT_SET"].format(
+            document_type=document_type
+        )
+    return prompt_content, None
 
 
 def build_evaluation_prompt(
@@ -83,15 +90,15 @@ def build_evaluation_prompt(
 """
 
 
-def execute_evaluation(
+def _prepare_evaluation(
     document_type: str,
     input_text: str,
     current_prescription: str,
     additional_info: str,
     output_summary: str,
-    user_ip: str | None = None,
-) -> EvaluationResponse:
-    """出力評価を実行"""
+    user_ip: str | None,
+) -> tuple[str | None, str | None]:
+    """サニタイズと検証を行い、評価用プロンプトまたはエラーメッセージを返す"""
     # 監査ログ: 開始
     log_audit_event(
         event_type=get_message("AUDIT", "EVALUATION_START"),
@@ -99,13 +106,15 @@ def execute_evaluation(
         document_type=document_type,
     )
 
-    # サニタイゼーション適用
-    input_text = sanitize_medical_text(input_text)
+    # サニタイゼーション適用（カルテと出力は長さ・インジェクション検出・ハッシュも同時に求める）
+    prepared_input = prepare_input(input_text)
+    prepared_output = prepare_input(output_summary)
     current_prescription = sanitize_medical_text(current_prescription or "")
     additional_info = sanitize_medical_text(additional_info or "")
-    output_summary = sanitize_medical_text(output_summary)
 
-    prompt_template, error_msg = _validate_and_get_prompt(output_summary, document_type, input_text)
+    prompt_template, error_msg = _validate_and_get_prompt(
+        prepared_output, document_type, prepared_input
+    )
     if error_msg:
         log_audit_event(
             event_type=get_message("AUDIT", "EVALUATION_FAILURE"),
@@ -114,95 +123,151 @@ def execute_evaluation(
             success=False,
             error_message=error_msg,
         )
-        return _error_response(error_msg)
+        return None, error_msg
 
     assert prompt_template is not None
-    model_name = settings.gemini_evaluation_model
-    assert model_name is not None
-
     full_prompt = build_evaluation_prompt(
         prompt_template,
-        input_text,
+        prepared_input.text,
         current_prescription,
         additional_info,
-        output_summary
+        prepared_output.text
     )
+    return full_prompt, None
 
-    start_time = time.time()
-    try:
-        client = GeminiAPIClient(model_name=model_name)
-        client.initialize()
 
-        evaluation_text, input_tokens, output_tokens = client._generate_content(
-            full_prompt, model_name
-        )
-        processing_time = time.time() - start_time
+def _evaluation_success(
+    document_type: str,
+    user_ip: str | None,
+    evaluation_text: str,
+    input_tokens: int,
+    output_tokens: int,
+    processing_time: float,
+) -> EvaluationResponse:
+    """成功を監査ログに記録してレスポンスを返す"""
+    log_audit_event(
+        event_type=get_message("AUDIT", "EVALUATION_SUCCESS"),
+        user_ip=user_ip,
+        document_type=document_type,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        processing_time=processing_time,
+    )
 
-        log_audit_event(
-            event_type=get_message("AUDIT", "EVALUATION_SUCCESS"),
-            user_ip=user_ip,
-            document_type=document_type,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            processing_time=processing_time,
-        )
+    return EvaluationResponse(
+        success=True,
+        evaluation_result=evaluation_text,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        processing_time=processing_time
+    )
 
-        return EvaluationResponse(
-            success=True,
-            evaluation_result=evaluation_text,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            processing_time=processing_time
-        )
 
-    except APIError as e:
-        log_audit_event(
-            event_type=get_message("AUDIT", "EVALUATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            success=False,
-            error_message=str(e),
-        )
-        return _error_response(str(e), time.time() - start_time)
-    except Exception as e:
-        error_msg = MESSAGES["ERROR"]["EVALUATION_API_ERROR"].format(error=str(e))
-        log_audit_event(
-            event_type=get_message("AUDIT", "EVALUATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            success=False,
-            error_message=error_msg,
-        )
-        return _error_response(error_msg, time.time() - start_time)
+def _evaluation_failure(
+    error: Exception,
+    document_type: str,
+    user_ip: str | None,
+    processing_time: float,
+) -> EvaluationResponse:
+    """失敗を監査ログに記録してエラーレスポンスを返す"""
+    if isinstance(error, APIError):
+        error_msg = str(error)
+    else:
+        error_msg = MESSAGES["ERROR"]["EVALUATION_API_ERROR"].format(error=str(error))
+
+    log_audit_event(
+        event_type=get_message("AUDIT", "EVALUATION_FAILURE"),
+        user_ip=user_ip,
+        document_type=document_type,
+        success=False,
+        error_message=error_msg,
+    )
+    return _error_response(error_msg, processing_time)
 
 
-def _run_sync_evaluation(
+def execute_evaluation(
     document_type: str,
     input_text: str,
     current_prescription: str,
     additional_info: str,
     output_summary: str,
-    prompt_template: str
-) -> tuple[str, int, int]:
-    """同期的に評価を実行"""
-    full_prompt = build_evaluation_prompt(
-        prompt_template,
-        input_text,
-        current_prescription,
-        additional_info,
-        output_summary
+    user_ip: str | None = None,
+) -> EvaluationResponse:
+    """出力評価を実行"""
+    full_prompt, error_msg = _prepare_evaluation(
+        document_type, input_text, current_prescription, additional_info, output_summary, user_ip
+    )
+    if error_msg:
+        return _error_response(error_msg)
+
+    assert full_prompt is not None
+    model_name = settings.gemini_evaluation_model
+    assert model_name is not None
+
+    # 待ち行列が満杯の場合はAdmissionRejectedErrorをそのまま送出し、503として応答させる
+    with admit(_ADMISSION_KEY, cost=estimate_text_tokens(full_prompt)):
+        start_time = time.time()
+        try:
+            client = get_pooled_client(
+                evaluation_client_key("sync", model_name),
+                lambda: GeminiAPIClient(model_name=model_name),
+            )
+            client.ensure_initialized()
+
+            evaluation_text, input_tokens, output_tokens = client._generate_content(
+                full_prompt, model_name
+            )
+        except Exception as e:
+            return _evaluation_failure(e, document_type, user_ip, time.time() - start_time)
+
+    return _evaluation_success(
+        document_type, user_ip, evaluation_text, input_tokens, output_tokens,
+        time.time() - start_time
     )
 
+
+async def _run_async_evaluation(full_prompt: str) -> tuple[str, int, int]:
+    """非同期クライアントで評価を実行"""
     model_name = settings.gemini_evaluation_model
     assert model_name is not None
-    client = GeminiAPIClient(model_name=model_name)
-    client.initialize()
+    client = get_pooled_client(
+        evaluation_client_key("async", model_name),
+        lambda: AsyncGeminiAPIClient(model_name=model_name),
+    )
+    await client.ensure_initialized()
+
+    return await client._generate_content(full_prompt, model_name)
 
-    evaluation_text, input_tokens, output_tokens = client._generate_content(
-        full_prompt, model_name
+
+async def execute_evaluation_async(
+    document_type: str,
+    input_text: str,
+    current_prescription: str,
+    additional_info: str,
+    output_summary: str,
+    user_ip: str | None = None,
+) -> EvaluationResponse:
+    """非同期クライアントで出力評価を実行"""
+    full_prompt, error_msg = await asyncio.to_thread(
+        _prepare_evaluation,
+        document_type, input_text, current_prescription, additional_info, output_summary, user_ip,
     )
+    if error_msg:
+        return _error_response(error_msg)
 
-    return evaluation_text, input_tokens, output_tokens
+    assert full_prompt is not None
+    # 待ち行列が満杯の場合はAdmissionRejectedErrorをそのまま送出し、503として応答させる
+    with await admit_async(_ADMISSION_KEY, cost=estimate_text_tokens(full_prompt)):
+        start_time = time.time()
+        try:
+            evaluation_text, input_tokens, output_tokens = await _run_async_evaluation(full_prompt)
+        except Exception as e:
+            return _evaluation_failure(e, document_type, user_ip, time.time() - start_time)
+
+    return _evaluation_success(
+        document_type, user_ip, evaluation_text, input_tokens, output_tokens,
+        time.time() - start_time
+    )
 
 
 async def execute_evaluation_stream(
@@ -214,66 +279,38 @@ async def execute_evaluation_stream(
     user_ip: str | None = None,
 ) -> AsyncGenerator[str, None]:
     """SSEストリーミングで評価を実行"""
-    # 監査ログ: 開始
-    log_audit_event(
-        event_type=get_message("AUDIT", "EVALUATION_START"),
-        user_ip=user_ip,
-        document_type=document_type,
+    full_prompt, error_msg = await asyncio.to_thread(
+        _prepare_evaluation,
+        document_type, input_text, current_prescription, additional_info, output_summary, user_ip,
     )
-
-    # サニタイゼーション適用
-    input_text = sanitize_medical_text(input_text)
-    current_prescription = sanitize_medical_text(current_prescription or "")
-    additional_info = sanitize_medical_text(additional_info or "")
-    output_summary = sanitize_medical_text(output_summary)
-
-    prompt_template, error_msg = _validate_and_get_prompt(output_summary, document_type, input_text)
     if error_msg:
-        log_audit_event(
-            event_type=get_message("AUDIT", "EVALUATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            success=False,
-            error_message=error_msg,
-        )
         yield sse_event("error", {
             "success": False,
             "error_message": error_msg
         })
         return
 
-    start_time = time.time()
-
-    async for item in stream_with_heartbeat(
-        sync_func=_run_sync_evaluation,
-        sync_func_args=(
-            document_type, input_text, current_prescription,
-            additional_info, output_summary, prompt_template
-        ),
-        start_message=MESSAGES["STATUS"]["EVALUATION_START"],
-        running_status="evaluating",
-        running_message=MESSAGES["STATUS"]["EVALUATING"],
-        elapsed_message_template=MESSAGES["STATUS"]["EVALUATING_ELAPSED"],
-    ):
-        if isinstance(item, str):
-            yield item
-        else:
-            evaluation_text, input_tokens, output_tokens = item
-            processing_time = time.time() - start_time
-
-            log_audit_event(
-                event_type=get_message("AUDIT", "EVALUATION_SUCCESS"),
-                user_ip=user_ip,
-                document_type=document_type,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                processing_time=processing_time,
-            )
-
-            yield sse_event("complete", {
-                "success": True,
-                "evaluation_result": evaluation_text,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "processing_time": processing_time,
-            })
+    # 待ち行列が満杯の場合は最初のイベントを返す前に送出し、503として応答させる
+    with enter_admission(_ADMISSION_KEY, cost=estimate_text_tokens(full_prompt or "")) as ticket:
+        async for event in queued_events(ticket):
+            yield event
+
+        start_time = time.time()
+
+        async for item in await_with_heartbeat(
+            async_func=_run_async_evaluation,
+            async_func_args=(full_prompt,),
+            start_message=MESSAGES["STATUS"]["EVALUATION_START"],
+            running_status="evaluating",
+            running_message=MESSAGES["STATUS"]["EVALUATING"],
+            elapsed_message_template=MESSAGES["STATUS"]["EVALUATING_ELAPSED"],
+        ):
+            if isinstance(item, str):
+                yield item
+            else:
+                evaluation_text, input_tokens, output_tokens = item
+                response = _evaluation_success(
+                    document_type, user_ip, evaluation_text, input_tokens, output_tokens,
+                    time.time() - start_time
+                )
+                yield sse_event("complete", response.model_dump(exclude={"error_message"}))
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import AbstractContextManager
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from cachetools import TTLCache
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import get_message
+from app.core.database import get_db_session
+from app.models.generation_cache import GenerationCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# キーの形式を変えた場合は更新して古いエントリを参照しないようにする
+_KEY_VERSION = 1
+
+# Claudeの最大出力トークン数（各クライアントの固定値）
+_CLAUDE_MAX_TOKENS = 6000
+
+
+@dataclass(frozen=True)
+class CachedGeneration:
+    """キャッシュした生成結果（整形・セクション分割済み）"""
+
+    output_summary: str
+    parsed_summary: dict[str, str]
+    input_tokens: int
+    output_tokens: int
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload: str) -> "CachedGeneration":
+        return cls(**json.loads(payload))
+
+
+def _generation_config(provider: str) -> dict[str, Any]:
+    """出力に影響する生成設定"""
+    if provider == "gemini":
+        return {"thinking_level": get_settings().gemini_thinking_level}
+    return {"max_tokens": _CLAUDE_MAX_TOKENS}
+
+
+def generation_cache_key(
+    prompt_template: str,
+    medical_text: str,
+    additional_info: str,
+    referral_purpose: str,
+    current_prescription: str,
+    provider: str,
+    model_name: str | None,
+) -> str:
+    """プロンプト・サニタイズ済み入力・プロバイダー・モデル・生成設定から求めるキャッシュキー"""
+    material = json.dumps(
+        {
+            "version": _KEY_VERSION,
+            "prompt": prompt_template,
+            "medical_text": medical_text,
+            "additional_info": additional_info,
+            "referral_purpose": referral_purpose,
+            "current_prescription": current_prescription,
+            "provider": provider,
+            "model_name": model_name,
+            "config": _generation_config(provider),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class MemoryGenerationCache:
+    """プロセス内のLRU（TTL付き）"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self._cache: TTLCache[str, CachedGeneration] = TTLCache(
+            maxsize=max(maxsize, 1), ttl=max(ttl, 1)
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedGeneration | None:
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(self, key: str, value: CachedGeneration) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class DatabaseGenerationCache:
+    """generation_cacheテーブル（全ワーカーで共有）"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] = get_db_session,
+        maxsize: int = 256,
+        ttl: float = 3600,
+    ):
+        self._session_factory = session_factory
+        self._maxsize = max(maxsize, 1)
+        self._ttl = timedelta(seconds=max(ttl, 1))
+
+    def get(self, key: str) -> CachedGeneration | None:
+        with self._session_factory() as db:
+            payload = db.execute(
+                select(GenerationCacheEntry.payload).where(
+                    GenerationCacheEntry.cache_key == key,
+                    GenerationCacheEntry.expires_at > datetime.now(UTC),
+                )
+            ).scalar_one_or_none()
+        return CachedGeneration.from_json(payload) if payload is not None else None
+
+    def put(self, key: str, value: CachedGeneration) -> None:
+        now = datetime.now(UTC)
+        with self._session_factory() as db:
+            db.merge(GenerationCacheEntry(
+                cache_key=key,
+                payload=value.to_json(),
+                created_at=now,
+                expires_at=now + self._ttl,
+            ))
+            db.flush()
+            self._prune(db, now)
+
+    def _prune(self, db: Session, now: datetime) -> None:
+        """期限切れと上限件数を超えた古いエントリを削除"""
+        db.execute(delete(GenerationCacheEntry).where(GenerationCacheEntry.expires_at <= now))
+        oldest_kept = db.execute(
+            select(GenerationCacheEntry.created_at)
+            .order_by(GenerationCacheEntry.created_at.desc())
+            .offset(self._maxsize - 1)
+            .limit(1)
+        ).scalar_one_or_none()
+        if oldest_kept is not None:
+            db.execute(
+                delete(GenerationCacheEntry).where(GenerationCacheEntry.created_at < oldest_kept)
+            )
+
+    def clear(self) -> None:
+        with self._session_factory() as db:
+            db.execute(delete(GenerationCacheEntry))
+
+
+class FileGenerationCache:
+    """ディレクトリ内のJSONファイル（同一ホストのワーカーで共有）"""
+
+    def __init__(self, directory: str | Path, maxsize: int = 256, ttl: float = 3600):
+        self._directory = Path(directory)
+        self._maxsize = max(maxsize, 1)
+        self._ttl = max(ttl, 1)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / f"{key}.json"
+
+    def get(self, key: str) -> CachedGeneration | None:
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self._ttl:
+                path.unlink(missing_ok=True)
+                return None
+            return CachedGeneration.from_json(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: CachedGeneration) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        # 書き込み途中のファイルを読まれないよう一時ファイルから置き換える
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value.to_json())
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._prune()
+
+    def _prune(self) -> None:
+        """期限切れと上限件数を超えた古いファイルを削除"""
+        entries = []
+        now = time.time()
+        for path in self._directory.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self._ttl:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+        if len(entries) > self._maxsize:
+            entries.sort()
+            for _, path in entries[:len(entries) - self._maxsize]:
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self._directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+GenerationCache = MemoryGenerationCache | DatabaseGenerationCache | FileGenerationCache
+
+_cache: GenerationCache | None = None
+_cache_configured = False
+_cache_lock = threading.Lock()
+
+
+def _create_cache() -> GenerationCache | None:
+    settings = get_settings()
+    backend = settings.generation_cache_backend
+    maxsize = settings.generation_cache_maxsize
+    ttl = settings.generation_cache_ttl
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryGenerationCache(maxsize=maxsize, ttl=ttl)
+    if backend == "database":
+        return DatabaseGenerationCache(maxsize=maxsize, ttl=ttl)
+    if backend == "file":
+        return FileGenerationCache(settings.generation_cache_dir, maxsize=maxsize, ttl=ttl)
+    logger.warning(get_message("LOG", "GENERATION_CACHE_UNKNOWN_BACKEND", backend=backend))
+    return None
+
+
+def get_generation_cache() -> GenerationCache | None:
+    """設定に応じた生成結果キャッシュを取得（無効な場合はNone）"""
+    global _cache, _cache_configured
+    with _cache_lock:
+        if not _cache_configured:
+            _cache = _create_cache()
+            _cache_configured = True
+        return _cache
+
+
+def set_generation_cache(cache: GenerationCache | None, configured: bool = True) -> None:
+    """生成結果キャッシュを差し替える（configured=Falseで次回取得時に設定から再生成）"""
+    global _cache, _cache_configured
+    with _cache_lock:
+        _cache = cache
+        _cache_configured = configured
+
+
+def lookup_generation(key: str) -> CachedGeneration | None:
+    """キャッシュ済みの生成結果を取得（キャッシュ無効・読み込み失敗時はNone）"""
+    cache = get_generation_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(get_message("LOG", "GENERATION_CACHE_READ_FAILED", error=str(e)))
+        return None
+
+
+def store_generation(key: str, value: CachedGeneration) -> None:
+    """生成結果をキャッシュに保存（失敗しても生成結果の返却は妨げない）"""
+    cache = get_generation_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(key, value)
+    except Exception as e:
+        logger.warning(get_message("LOG", "GENERATION_CACHE_WRITE_FAILED", error=str(e)))
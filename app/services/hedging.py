@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+from app.core.constants import get_message
+from app.external.provider_errors import is_retryable_error
+from app.services.single_flight import Chunk
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GenerationLane:
+    """生成の送信先（モデル・プロバイダー・接続経路）"""
+
+    model: str
+    provider: str
+    model_name: str
+    route: str | None = None  # Noneで設定どおりの経路
+
+    def describe(self) -> str:
+        return f"{self.model}（{self.route or 'default'}）"
+
+
+LaneStreamFactory = Callable[[GenerationLane], AsyncIterator[Chunk]]
+
+
+async def _close(stream: AsyncIterator[Chunk]) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        with contextlib.suppress(Exception):
+            await aclose()
+
+
+async def _cancel(task: "asyncio.Future[Chunk]", stream: AsyncIterator[Chunk]) -> None:
+    if not task.done():
+        task.cancel()
+        with contextlib.suppress(BaseException):
+            await task
+    await _close(stream)
+
+
+async def hedged_stream(
+    lanes: list[GenerationLane],
+    start: LaneStreamFactory,
+    hedge_delay: float | None,
+    failover: bool = True,
+) -> AsyncGenerator[Chunk, None]:
+    """
+    先頭の送信先でチャンクストリームを開始し、最初に応答した送信先のストリームを返す
+
+    hedge_delay秒以内に最初のチャンクが届かなければ次の送信先にも送り（Noneで送らない）、
+    レート制限・サーバーエラーで失敗した場合はfailoverに従い直ちに次の送信先に切り替える。
+    最初のチャンクを受け取った送信先以外は打ち切り、予備の送信先で生成した場合は
+    最後のトークン数dictにserved_modelを付ける。
+    """
+    waiting = deque(lanes)
+    running: dict[asyncio.Future[Chunk], tuple[GenerationLane, AsyncIterator[Chunk]]] = {}
+
+    def launch() -> None:
+        lane = waiting.popleft()
+        stream = start(lane)
+        running[asyncio.ensure_future(anext(stream))] = (lane, stream)
+
+    winner: tuple[GenerationLane, AsyncIterator[Chunk], Chunk | None] | None = None
+    last_error: Exception | None = None
+    launch()
+    try:
+        while running and winner is None:
+            timeout = hedge_delay if waiting and hedge_delay is not None else None
+            done, _ = await asyncio.wait(
+                running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                slow = next(iter(running.values()))[0]
+                logger.warning(get_message(
+                    "LOG", "GENERATION_HEDGED",
+                    lane=slow.describe(), next_lane=waiting[0].describe(), delay=f"{timeout:.1f}",
+                ))
+                launch()
+                continue
+
+            for task in done:
+                lane, stream = running.pop(task)
+                try:
+                    winner = (lane, stream, task.result())
+                    break
+                except StopAsyncIteration:
+                    winner = (lane, stream, None)
+                    break
+                except Exception as e:
+                    await _close(stream)
+                    last_error = e
+                    if failover and waiting and is_retryable_error(e):
+                        logger.warning(get_message(
+                            "LOG", "GENERATION_FAILOVER",
+                            lane=lane.describe(), next_lane=waiting[0].describe(), error=str(e),
+                        ))
+                        launch()
+
+        # 先に応答した送信先以外は打ち切る
+        for task, (_, stream) in list(running.items()):
+            await _cancel(task, stream)
+        running.clear()
+    finally:
+        for task, (_, stream) in running.items():
+            await _cancel(task, stream)
+
+    if winner is None:
+        # 全ての送信先が失敗した場合は最後の失敗を返す（送信先が1つ以上あれば必ず失敗が残る）
+        assert last_error is not None
+        raise last_error
+
+    lane, stream, first = winner
+    served_model = lane.model if lane != lanes[0] else None
+    try:
+        if first is None:
+            return
+        item: Chunk = first
+        while True:
+            if isinstance(item, dict) and served_model is not None:
+                item = {**item, "served_model": served_model}
+            yield item
+            try:
+                item = await anext(stream)
+            except StopAsyncIteration:
+                return
+    finally:
+        await _close(stream)
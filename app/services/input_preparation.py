@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+
+from cachetools import LRUCache
+
+from app.core.config import get_settings
+from app.utils.input_sanitizer import (
+    InjectionMatch,
+    sanitize_medical_text,
+    scan_prompt_injection,
+    validate_medical_input,
+)
+
+settings = get_settings()
+
+# 内容ハッシュごとのインジェクション検出結果（生成後の評価で同じカルテを再走査しないため）
+_scan_cache: LRUCache[str, tuple[InjectionMatch, ...]] = LRUCache(
+    maxsize=max(settings.input_scan_cache_size, 1)
+)
+_scan_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PreparedInput:
+    """サニタイズ済みテキストと長さ・インジェクション検出結果・内容ハッシュ"""
+
+    text: str
+    content_hash: str
+    stripped_length: int
+    injection_matches: tuple[InjectionMatch, ...]
+
+    @property
+    def is_suspicious(self) -> bool:
+        return len(self.injection_matches) > 0
+
+    def validate(self, max_length: int) -> tuple[bool, str | None]:
+        """validate_medical_inputと同じ検証を走査済みの結果で行う"""
+        return validate_medical_input(self.text, max_length, self.injection_matches)
+
+
+def content_hash(text: str) -> str:
+    """テキストの内容ハッシュ（SHA-256）"""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _scan(text: str, key: str) -> tuple[InjectionMatch, ...]:
+    with _scan_cache_lock:
+        cached = _scan_cache.get(key)
+    if cached is not None:
+        return cached
+
+    matches = tuple(scan_prompt_injection(text))
+    with _scan_cache_lock:
+        _scan_cache[key] = matches
+    return matches
+
+
+def inspect_text(text: str | None) -> PreparedInput:
+    """サニタイズ済みのテキストから長さ・検出結果・ハッシュを求める（検出結果はハッシュ単位で再利用）"""
+    text = text or ""
+    key = content_hash(text)
+    return PreparedInput(
+        text=text,
+        content_hash=key,
+        stripped_length=len(text.strip()),
+        injection_matches=_scan(text, key) if text else (),
+    )
+
+
+def prepare_input(text: str | None) -> PreparedInput:
+    """入力テキストをサニタイズして検証に必要な情報をまとめて求める"""
+    return inspect_text(sanitize_medical_text(text or ""))
+
+
+def clear_scan_cache() -> None:
+    """インジェクション検出結果のキャッシュを破棄"""
+    with _scan_cache_lock:
+        _scan_cache.clear()
+
@@ -0,0 +1,288 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import AbstractContextManager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import ModelType, get_message
+from app.core.database import get_db_session
+from app.models.usage import SummaryUsage
+from app.services.model_selector import model_fits
+from app.services.token_estimator import TokenEstimate
+
+logger = logging.getLogger(__name__)
+
+# プロンプトの大きさで応答時間が変わるため、推定トークン数の区分ごとにp95を求める
+_SIZE_BUCKETS = (8000, 32000, 128000)
+
+# 公開する直近の判定件数
+_DECISION_HISTORY = 50
+
+_MODELS = tuple(model.value for model in ModelType)
+
+
+def _size_bucket(tokens: int) -> int:
+    for i, upper in enumerate(_SIZE_BUCKETS):
+        if tokens <= upper:
+            return i
+    return len(_SIZE_BUCKETS)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(len(ordered) * percentile / 100) - 1, 0), len(ordered) - 1)]
+
+
+@dataclass(frozen=True)
+class _Sample:
+    at: float
+    latency: float
+    tokens: int
+    success: bool
+
+
+@dataclass(frozen=True)
+class ModelHealth:
+    """モデルの直近の応答時間p95とエラー率（件数不足の場合はNone）"""
+
+    samples: int
+    p95_latency: float | None
+    error_rate: float | None
+    healthy: bool
+
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    """モデル選択の結果と理由"""
+
+    preferred: str
+    model: str
+    reason: str  # preferred / latency_slo / error_rate / no_healthy_alternative
+    estimated_tokens: int
+    health: dict[str, ModelHealth] = field(default_factory=dict)
+    timestamp: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+    @property
+    def switched(self) -> bool:
+        return self.model != self.preferred
+
+
+class ModelRouter:
+    """
+    モデルごとの応答時間とエラー率を保持し、p95がSLOを満たすモデルを選ぶ
+
+    統計は起動後最初の判定時にsummary_usageの処理時間から初期化し、以降は生成ごとに更新する。
+    window_seconds秒より古い記録は使わないため、切り替えた後も件数不足になれば元のモデルに戻る。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] | None = get_db_session,
+        latency_slo: float = 60.0,
+        max_error_rate: float = 0.2,
+        window: int = 200,
+        window_seconds: float = 900,
+        min_samples: int = 10,
+    ):
+        self._session_factory = session_factory
+        self._latency_slo = latency_slo
+        self._max_error_rate = max_error_rate
+        self._window = max(window, 1)
+        self._window_seconds = window_seconds
+        self._min_samples = max(min_samples, 1)
+        self._samples: dict[str, deque[_Sample]] = {}
+        # 最初のチャンクまでの時間（ストリーミングと非ストリーミングで分けて保持）
+        self._first_chunks: dict[tuple[str, bool], deque[tuple[float, float]]] = {}
+        self._decisions: deque[RoutingDecision] = deque(maxlen=_DECISION_HISTORY)
+        self._seeded = session_factory is None
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency: float, tokens: int | None, success: bool) -> None:
+        """プロバイダー呼び出し1回の所要時間と成否を記録"""
+        sample = _Sample(time.monotonic(), latency, tokens or 0, success)
+        with self._lock:
+            self._series(model).append(sample)
+
+    def record_first_chunk(self, model: str, streaming: bool, seconds: float) -> None:
+        """呼び出し開始から最初のチャンクを受け取るまでの時間を記録"""
+        with self._lock:
+            series = self._first_chunks.get((model, streaming))
+            if series is None:
+                series = self._first_chunks[(model, streaming)] = deque(maxlen=self._window)
+            series.append((time.monotonic(), seconds))
+
+    def first_chunk_percentile(
+        self, model: str, streaming: bool, percentile: float
+    ) -> float | None:
+        """最初のチャンクまでの時間のパーセンタイル（件数不足の場合はNone）"""
+        cutoff = time.monotonic() - self._window_seconds
+        with self._lock:
+            values = [s for at, s in self._first_chunks.get((model, streaming), ()) if at >= cutoff]
+        if len(values) < self._min_samples:
+            return None
+        return _percentile(values, percentile)
+
+    def choose(self, preferred: str, estimate: TokenEstimate) -> RoutingDecision:
+        """preferredがSLOを満たさない場合、満たす他のモデルを選ぶ"""
+        self._seed_once()
+        health = {
+            model: self.health(model, estimate.for_model(model))
+            for model in _MODELS
+            if model == preferred or model_fits(model, estimate)
+        }
+        model, reason = preferred, "preferred"
+        current = health.get(preferred)
+        if current is not None and not current.healthy:
+            alternatives = [m for m, h in health.items() if m != preferred and h.healthy]
+            if alternatives:
+                model = alternatives[0]
+                reason = "error_rate" if self._error_rate_exceeded(current) else "latency_slo"
+            else:
+                reason = "no_healthy_alternative"
+
+        decision = RoutingDecision(
+            preferred=preferred,
+            model=model,
+            reason=reason,
+            estimated_tokens=estimate.raw_tokens,
+            health=health,
+        )
+        with self._lock:
+            self._decisions.append(decision)
+        if decision.switched:
+            logger.warning(get_message(
+                "LOG", "MODEL_ROUTED_AWAY", preferred=preferred, model=model, reason=reason
+            ))
+        return decision
+
+    def health(self, model: str, tokens: int | None = None) -> ModelHealth:
+        """推定トークン数が同じ区分の記録（不足時・未指定時はモデル全体の記録）から求めた状態"""
+        cutoff = time.monotonic() - self._window_seconds
+        with self._lock:
+            samples = [s for s in self._series(model) if s.at >= cutoff]
+        basis = samples
+        if tokens is not None:
+            bucket = _size_bucket(tokens)
+            sized = [s for s in samples if _size_bucket(s.tokens) == bucket]
+            if len(sized) >= self._min_samples:
+                basis = sized
+
+        latencies = [s.latency for s in basis if s.success]
+        p95 = _percentile(latencies, 95) if len(latencies) >= self._min_samples else None
+        error_rate = None
+        if len(samples) >= self._min_samples:
+            error_rate = sum(1 for s in samples if not s.success) / len(samples)
+
+        healthy = (p95 is None or p95 <= self._latency_slo) and (
+            error_rate is None or error_rate <= self._max_error_rate
+        )
+        return ModelHealth(len(samples), p95, error_rate, healthy)
+
+    def snapshot(self) -> dict[str, Any]:
+        """現在の統計と直近の判定"""
+        with self._lock:
+            models = list(self._samples)
+            decisions = list(self._decisions)
+        return {
+            "latency_slo": self._latency_slo,
+            "max_error_rate": self._max_error_rate,
+            "models": {model: asdict(self.health(model)) for model in models},
+            "decisions": [
+                {**asdict(d), "switched": d.switched} for d in reversed(decisions)
+            ],
+        }
+
+    def seed(self) -> None:
+        """summary_usageの直近の処理時間で統計を初期化（失敗時は記録なしで開始）"""
+        if self._session_factory is None:
+            return
+        actual = (
+            SummaryUsage.input_tokens
+            + SummaryUsage.cache_read_tokens
+            + SummaryUsage.cache_write_tokens
+        )
+        try:
+            with self._session_factory() as db:
+                rows = {
+                    model: db.execute(
+                        select(
+                            SummaryUsage.processing_time,
+                            SummaryUsage.estimated_input_tokens,
+                            actual,
+                        )
+                        .where(
+                            SummaryUsage.model == model,
+                            SummaryUsage.cache_hit.is_(False),
+                            SummaryUsage.processing_time.is_not(None),
+                        )
+                        .order_by(SummaryUsage.date.desc())
+                        .limit(self._window)
+                    ).all()
+                    for model in _MODELS
+                }
+        except Exception as e:
+            logger.warning(get_message("LOG", "MODEL_ROUTER_SEED_FAILED", error=str(e)))
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            for model, model_rows in rows.items():
+                seeded = [
+                    _Sample(now, latency, estimated or tokens or 0, True)
+                    for latency, estimated, tokens in reversed(model_rows)
+                ]
+                # 起動後の記録を優先して残すため、初期化分はその前に並べる
+                self._samples[model] = deque(
+                    [*seeded, *self._series(model)], maxlen=self._window
+                )
+
+    def _seed_once(self) -> None:
+        with self._lock:
+            if self._seeded:
+                return
+            self._seeded = True
+        self.seed()
+
+    def _series(self, model: str) -> deque[_Sample]:
+        series = self._samples.get(model)
+        if series is None:
+            series = self._samples[model] = deque(maxlen=self._window)
+        return series
+
+    def _error_rate_exceeded(self, health: ModelHealth) -> bool:
+        return health.error_rate is not None and health.error_rate > self._max_error_rate
+
+
+_router: ModelRouter | None = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """設定に従ったプロセス共有のモデルルーターを取得"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            settings = get_settings()
+            _router = ModelRouter(
+                latency_slo=settings.routing_latency_slo,
+                max_error_rate=settings.routing_max_error_rate,
+                window=settings.routing_window,
+                window_seconds=settings.routing_window_seconds,
+                min_samples=settings.routing_min_samples,
+            )
+        return _router
+
+
+def set_model_router(router: ModelRouter | None) -> None:
+    """モデルルーターを差し替える（Noneで設定から再生成）"""
+    global _router
+    with _router_lock:
+        _router = router
@@ -2,39 +2,81 @@ from app.core.config import get_settings
 from app.core.constants import MESSAGES, ModelType
 from app.core.database import get_db_session
 from app.external.api_factory import APIProvider
+from app.services.prompt_service import ResolvedPrompt
+from app.services.token_estimator import TokenEstimate
 
 settings = get_settings()
 
+# コンテキスト長のうち出力用に残すトークン数（各クライアントの最大出力トークン数以上）
+_OUTPUT_TOKEN_RESERVE = 8192
+
+
+def prompt_token_budget(model: str) -> int:
+    """モデルに送れるプロンプトのトークン数（コンテキスト長から出力分を除き、Claudeはレイテンシ予算で制限）"""
+    if model == ModelType.CLAUDE:
+        return min(
+            settings.max_token_threshold,
+            settings.claude_context_window - _OUTPUT_TOKEN_RESERVE,
+        )
+    return settings.gemini_context_window - _OUTPUT_TOKEN_RESERVE
+
 
 def determine_model(
     requested_model: str,
-    input_length: int,
+    estimate: TokenEstimate,
     department: str,
     document_type: str,
     doctor: str,
-    model_explicitly_selected: bool = False
+    model_explicitly_selected: bool = False,
+    resolved_prompt: ResolvedPrompt | None = None,
 ) -> tuple[str, bool]:
-    """モデル自動切替判定"""
+    """
+    モデル自動切替判定（resolved_promptがあればDBを参照しない）
+
+    estimate: プロンプト全体の推定トークン数（モデルごとに実測値で補正して予算と比べる）
+    """
     if not model_explicitly_selected:
-        try:
-            from app.services.prompt_service import get_selected_model
-
-            with get_db_session() as db:
-                selected = get_selected_model(db, department, document_type, doctor)
-                if selected is not None:
-                    requested_model = selected
-        except Exception:
-            # プロンプト取得に失敗しても処理を続行
-            pass
-
-    # 入力長による自動切替
-    if input_length > settings.max_token_threshold and requested_model == ModelType.CLAUDE:
-        if settings.gemini_model:
-            return ModelType.GEMINI_PRO, True
+        if resolved_prompt is not None:
+            if resolved_prompt.selected_model is not None:
+                requested_model = resolved_prompt.selected_model
         else:
+            try:
+                from app.services.prompt_service import get_selected_model
+
+                with get_db_session() as db:
+                    selected = get_selected_model(db, department, document_type, doctor)
+                    if selected is not None:
+                        requested_model = selected
+            except Exception:
+                # プロンプト取得に失敗しても処理を続行
+                pass
+
+    # 推定トークン数による自動切替
+    model_switched = False
+    if (
+        requested_model == ModelType.CLAUDE
+        and estimate.for_model(ModelType.CLAUDE) > prompt_token_budget(ModelType.CLAUDE)
+    ):
+        if not settings.gemini_model:
             raise ValueError(MESSAGES["CONFIG"]["THRESHOLD_EXCEEDED_NO_GEMINI"])
+        requested_model, model_switched = ModelType.GEMINI_PRO, True
+
+    if (
+        requested_model == ModelType.GEMINI_PRO
+        and estimate.for_model(ModelType.GEMINI_PRO) > prompt_token_budget(ModelType.GEMINI_PRO)
+    ):
+        raise ValueError(MESSAGES["VALIDATION"]["INPUT_EXCEEDS_CONTEXT"])
+
+    return requested_model, model_switched
+
 
-    return requested_model, False
+def model_fits(model: str, estimate: TokenEstimate) -> bool:
+    """設定済みで、推定トークン数がプロンプトの予算内のモデルか（自動切替先の判定用）"""
+    try:
+        get_provider_and_model(model)
+    except ValueError:
+        return False
+    return estimate.for_model(model) <= prompt_token_budget(model)
 
 
 def get_provider_and_model(selected_model: str) -> tuple[str, str]:
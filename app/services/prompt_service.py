@@ -1,7 +1,36 @@
-from sqlalchemy import select
+import threading
+from typing import Iterable, NamedTuple
+
+from cachetools import TTLCache
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.models.prompt import Prompt
+from app.services import cache_invalidation
+
+settings = get_settings()
+
+PromptKey = tuple[str, str, str]
+
+# 1クエリあたりの候補キー数の上限（バインドパラメータ数を抑えるため）
+_BULK_QUERY_CHUNK_SIZE = 300
+
+
+class ResolvedPrompt(NamedTuple):
+    """階層解決済みのプロンプト内容と選択モデル（該当プロンプトなしはNone）"""
+
+    content: str | None
+    selected_model: str | None
+
+
+_prompt_cache: TTLCache[PromptKey, ResolvedPrompt] = TTLCache(
+    maxsize=max(settings.prompt_cache_maxsize, 1),
+    ttl=max(settings.prompt_cache_ttl, 1),
+)
+_prompt_cache_lock = threading.Lock()
+# 無効化の世代（DB読み込み中に無効化された結果をキャッシュしないため）
+_prompt_cache_generation = 0
 
 
 def get_all_prompts(db: Session) -> list[Prompt]:
@@ -10,6 +39,36 @@ def get_all_prompts(db: Session) -> list[Prompt]:
     return list(db.execute(query).scalars().all())
 
 
+def _fallback_chain(department: str, document_type: str, doctor: str) -> list[PromptKey]:
+    """検索候補を具体的なものから順に返す（医師別 → 診療科別 → 全科共通）"""
+    chain = [
+        (department, document_type, doctor),
+        (department, document_type, "default"),
+        ("default", document_type, "default"),
+    ]
+    return list(dict.fromkeys(chain))
+
+
+def get_prompts_bulk(db: Session, keys: Iterable[PromptKey]) -> dict[PromptKey, Prompt | None]:
+    """複数キーのプロンプトを階層的に一括取得（ix_prompts_lookupを使う1クエリで候補を取得）"""
+    chains = {key: _fallback_chain(*key) for key in dict.fromkeys(keys)}
+    candidates = list(dict.fromkeys(c for chain in chains.values() for c in chain))
+
+    rows: dict[PromptKey, Prompt] = {}
+    lookup_columns = tuple_(Prompt.department, Prompt.document_type, Prompt.doctor)
+    for i in range(0, len(candidates), _BULK_QUERY_CHUNK_SIZE):
+        query = select(Prompt).where(
+            lookup_columns.in_(candidates[i:i + _BULK_QUERY_CHUNK_SIZE])
+        )
+        for prompt in db.execute(query).scalars():
+            rows.setdefault((prompt.department, prompt.document_type, prompt.doctor), prompt)
+
+    return {
+        key: next((rows[c] for c in chain if c in rows), None)
+        for key, chain in chains.items()
+    }
+
+
 def get_prompt(
     db: Session,
     department: str,
@@ -17,26 +76,79 @@ def get_prompt(
     doctor: str,
 ) -> Prompt | None:
     """プロンプトを階層的に取得"""
-    search_conditions = [
-        (department, document_type, doctor),
-        (department, document_type, "default"),
-        ("default", document_type, "default"),
-    ]
+    key = (department, document_type, doctor)
+    return get_prompts_bulk(db, [key])[key]
 
-    for dept, doc_type, doc in search_conditions:
-        prompt = (
-            db.query(Prompt)
-            .filter(
-                Prompt.department == dept,
-                Prompt.document_type == doc_type,
-                Prompt.doctor == doc,
-            )
-            .first()
-        )
-        if prompt:
-            return prompt
 
-    return None
+def _to_resolved(prompt: Prompt | None) -> ResolvedPrompt:
+    return ResolvedPrompt(
+        content=prompt.content if prompt else None,
+        selected_model=str(prompt.selected_model) if prompt and prompt.selected_model else None,
+    )
+
+
+def resolve_prompt(
+    db: Session,
+    department: str,
+    document_type: str,
+    doctor: str,
+) -> ResolvedPrompt:
+    """階層的に解決したプロンプトをキャッシュ経由で取得"""
+    key = (department, document_type, doctor)
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(key)
+        generation = _prompt_cache_generation
+    if cached is not None:
+        return cached
+
+    resolved = _to_resolved(get_prompt(db, department, document_type, doctor))
+    _store_resolved({key: resolved}, generation)
+    return resolved
+
+
+def resolve_prompts_bulk(
+    db: Session,
+    keys: Iterable[PromptKey],
+) -> dict[PromptKey, ResolvedPrompt]:
+    """複数キーのプロンプトをキャッシュ経由で一括解決（未キャッシュ分のみ1クエリで取得）"""
+    keys = list(dict.fromkeys(keys))
+    with _prompt_cache_lock:
+        cached = {key: _prompt_cache.get(key) for key in keys}
+        generation = _prompt_cache_generation
+
+    results = {key: resolved for key, resolved in cached.items() if resolved is not None}
+    missing = [key for key in keys if key not in results]
+    if missing:
+        fetched = {
+            key: _to_resolved(prompt)
+            for key, prompt in get_prompts_bulk(db, missing).items()
+        }
+        _store_resolved(fetched, generation)
+        results.update(fetched)
+    return results
+
+
+def _store_resolved(entries: dict[PromptKey, ResolvedPrompt], generation: int) -> None:
+    """読み込み開始後に無効化されていなければキャッシュに保存"""
+    if settings.prompt_cache_ttl <= 0:
+        return
+    with _prompt_cache_lock:
+        if generation == _prompt_cache_generation:
+            _prompt_cache.update(entries)
+
+
+def invalidate_prompt_cache() -> None:
+    """解決済みプロンプトのキャッシュを全て破棄（上位階層の変更は多数のキーに波及するため）"""
+    global _prompt_cache_generation
+    with _prompt_cache_lock:
+        _prompt_cache.clear()
+        _prompt_cache_generation += 1
+
+
+# 他ワーカーでの変更通知を受けたら破棄（上位階層の変更が波及するためキーによらず全破棄）
+cache_invalidation.register_handler(
+    cache_invalidation.PROMPT, lambda key: invalidate_prompt_cache()
+)
 
 
 def get_prompt_by_id(db: Session, prompt_id: int) -> Prompt | None:
@@ -51,10 +163,7 @@ def get_selected_model(
     doctor: str
 ) -> str | None:
     """プロンプトから選択されたモデル名を取得"""
-    prompt = get_prompt(db, department, document_type, doctor)
-    if prompt and prompt.selected_model:
-        return str(prompt.selected_model)
-    return None
+    return resolve_prompt(db, department, document_type, doctor).selected_model
 
 
 def create_or_update_prompt(
@@ -65,7 +174,10 @@ def create_or_update_prompt(
     content: str,
     selected_model: str | None = None,
 ) -> Prompt:
-    """プロンプトを作成または更新"""
+    """プロンプトを作成または更新（キャッシュはコミット後に破棄される）"""
+    cache_invalidation.notify_change(
+        db, cache_invalidation.PROMPT, [department, document_type, doctor]
+    )
     existing = (
         db.query(Prompt)
         .filter(
@@ -92,9 +204,12 @@ def create_or_update_prompt(
 
 
 def delete_prompt(db: Session, prompt_id: int) -> bool:
-    """プロンプトを削除"""
+    """プロンプトを削除（キャッシュはコミット後に破棄される）"""
     prompt = db.query(Prompt).filter(Prompt.id == prompt_id).first()
     if prompt:
+        cache_invalidation.notify_change(
+            db, cache_invalidation.PROMPT, [prompt.department, prompt.document_type, prompt.doctor]
+        )
         db.delete(prompt)
         return True
     return False
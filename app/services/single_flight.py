@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from app.core.constants import get_message
+
+logger = logging.getLogger(__name__)
+
+# プロバイダーのストリームと同じ形式（本文チャンク、最後にトークン数のdict）
+Chunk = str | dict[str, Any]
+ChunkStreamFactory = Callable[[], AsyncIterator[Chunk]]
+
+
+class _Flight:
+    """1回のプロバイダー呼び出しの出力を記録し、参加中の全リクエストに配る"""
+
+    def __init__(self, key: str, chunk_stream: AsyncIterator[Chunk], group: "SingleFlight"):
+        self.key = key
+        self.items: list[Chunk] = []
+        self.error: BaseException | None = None
+        self.finished = False
+        self.waiters = 0
+        self.changed = asyncio.Event()
+        self._group = group
+        # 呼び出し元のリクエストが切断されても他の参加者のために生成を続ける
+        self._task = asyncio.ensure_future(self._run(chunk_stream))
+
+    async def _run(self, chunk_stream: AsyncIterator[Chunk]) -> None:
+        try:
+            async for item in chunk_stream:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._group._forget(self)
+            self._notify()
+            aclose = getattr(chunk_stream, "aclose", None)
+            if aclose is not None:
+                with contextlib.suppress(Exception):
+                    await aclose()
+
+    def _notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+
+class FlightSubscription:
+    """
+    参加したプロバイダー呼び出しのチャンクを先頭から順に返す非同期イテレーター
+
+    途中から参加した場合も、それまでのチャンクを再送してから続きを返す
+    """
+
+    def __init__(self, flight: _Flight, group: "SingleFlight", leader: bool):
+        self.leader = leader
+        self._flight = flight
+        self._group = group
+        self._index = 0
+        self._closed = False
+
+    def __aiter__(self) -> "FlightSubscription":
+        return self
+
+    async def __anext__(self) -> Chunk:
+        flight = self._flight
+        while self._index >= len(flight.items):
+            if flight.finished:
+                if flight.error is not None:
+                    raise flight.error
+                raise StopAsyncIteration
+            await flight.changed.wait()
+        item = flight.items[self._index]
+        self._index += 1
+        return item
+
+    async def aclose(self) -> None:
+        """参加をやめる（全員が抜けた場合はプロバイダー呼び出しを打ち切る）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._group._release(self._flight)
+
+
+class SingleFlight:
+    """同じキーの同時リクエストを1回のプロバイダー呼び出しにまとめる"""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+        self._coalesced = 0
+
+    def subscribe(self, key: str, start: ChunkStreamFactory) -> FlightSubscription:
+        """進行中の同じキーの呼び出しに参加し、なければstartで新しく開始する"""
+        flight = self._flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = _Flight(key, start(), self)
+            self._flights[key] = flight
+        else:
+            self._coalesced += 1
+            logger.info(get_message(
+                "LOG", "GENERATION_COALESCED", waiters=str(flight.waiters + 1)
+            ))
+        flight.waiters += 1
+        return FlightSubscription(flight, self, leader)
+
+    def in_flight(self, key: str) -> bool:
+        """同じキーの呼び出しが進行中か（参加するリクエストは新たな実行枠を使わない）"""
+        return key in self._flights
+
+    def stats(self) -> dict[str, int]:
+        """進行中の呼び出し数とまとめたリクエスト数"""
+        return {"in_flight": len(self._flights), "coalesced": self._coalesced}
+
+    def _release(self, flight: _Flight) -> None:
+        flight.waiters -= 1
+        if flight.waiters <= 0 and not flight.finished:
+            self._forget(flight)
+            flight.cancel()
+
+    def _forget(self, flight: _Flight) -> None:
+        # 完了後に届いた同じリクエストは生成結果キャッシュ（有効時）か新しい呼び出しで処理する
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """プロセス共有のSingleFlightを取得"""
+    return _single_flight
+
+
+def set_single_flight(group: SingleFlight) -> None:
+    """SingleFlightを差し替える（テスト用）"""
+    global _single_flight
+    _single_flight = group
@@ -1,16 +1,70 @@
 import asyncio
+import contextlib
 import json
 import logging
 import time
-from collections.abc import Callable
+from collections.abc import AsyncIterator, Awaitable, Callable
 from typing import Any, AsyncGenerator
 
+from app.external.base_api import GenerationResult
+
 
 def sse_event(event_type: str, data: dict[str, Any]) -> str:
     """SSEイベント文字列を生成"""
     return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
+async def await_with_heartbeat(
+    async_func: Callable[..., Awaitable[tuple[str, int, int]]],
+    async_func_args: tuple[Any, ...],
+    start_message: str,
+    running_status: str,
+    running_message: str,
+    elapsed_message_template: str,
+    heartbeat_interval: float = 5,
+) -> AsyncGenerator[tuple[str, int, int] | str, None]:
+    """ハートビート付きでコルーチンを実行"""
+    yield sse_event("progress", {
+        "status": "starting",
+        "message": start_message,
+    })
+
+    start_time = time.time()
+    task = asyncio.ensure_future(async_func(*async_func_args))
+
+    yield sse_event("progress", {
+        "status": running_status,
+        "message": running_message,
+    })
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=heartbeat_interval)
+            if not done:
+                elapsed = int(time.time() - start_time)
+                yield sse_event("progress", {
+                    "status": running_status,
+                    "message": elapsed_message_template.format(elapsed=elapsed),
+                })
+                continue
+
+            try:
+                result = task.result()
+            except Exception as e:
+                logging.error(f"Task error: {e}", exc_info=True)
+                yield sse_event("error", {
+                    "success": False,
+                    "error_message": str(e),
+                })
+                return
+            yield result
+            return
+    finally:
+        # クライアント切断時は処理を打ち切る
+        if not task.done():
+            task.cancel()
+
+
 async def stream_with_heartbeat(
     sync_func: Callable[..., tuple[str, int, int]],
     sync_func_args: tuple[Any, ...],
@@ -18,48 +72,122 @@ async def stream_with_heartbeat(
     running_status: str,
     running_message: str,
     elapsed_message_template: str,
-    heartbeat_interval: int = 5,
+    heartbeat_interval: float = 5,
 ) -> AsyncGenerator[tuple[str, int, int] | str, None]:
     """ハートビート付きでスレッドプール上の同期処理を実行"""
+    async def _run_in_thread(*args: Any) -> tuple[str, int, int]:
+        return await asyncio.to_thread(sync_func, *args)
+
+    async for item in await_with_heartbeat(
+        async_func=_run_in_thread,
+        async_func_args=sync_func_args,
+        start_message=start_message,
+        running_status=running_status,
+        running_message=running_message,
+        elapsed_message_template=elapsed_message_template,
+        heartbeat_interval=heartbeat_interval,
+    ):
+        yield item
+
+
+async def stream_chunks_with_heartbeat(
+    chunk_stream: AsyncIterator[str | dict],
+    start_message: str,
+    running_status: str,
+    running_message: str,
+    elapsed_message_template: str,
+    heartbeat_interval: float = 5,
+) -> AsyncGenerator[tuple[str, int, int] | str, None]:
+    """
+    非同期ストリームのチャンクを逐次deltaイベントとして転送
+
+    チャンクが届かない間のみハートビートを送信し、
+    最後に (全文, 入力トークン数, 出力トークン数) として展開できるGenerationResultを返す
+    """
     yield sse_event("progress", {
         "status": "starting",
         "message": start_message,
     })
 
     start_time = time.time()
-    queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
-
-    async def _task() -> None:
-        try:
-            result = await asyncio.to_thread(sync_func, *sync_func_args)
-            await queue.put(("result", result))
-        except Exception as e:
-            logging.error(f"Task error: {e}", exc_info=True)
-            await queue.put(("error", str(e)))
-
-    task = asyncio.create_task(_task())
 
     yield sse_event("progress", {
         "status": running_status,
         "message": running_message,
     })
 
-    while not task.done():
-        try:
-            msg_type, msg_data = await asyncio.wait_for(
-                queue.get(), timeout=heartbeat_interval
-            )
-            if msg_type == "error":
+    chunks: list[str] = []
+    metadata: dict[str, Any] = {}
+    next_item: asyncio.Future[str | dict] | None = None
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.ensure_future(anext(chunk_stream))
+
+            done, _ = await asyncio.wait({next_item}, timeout=heartbeat_interval)
+            if not done:
+                elapsed = int(time.time() - start_time)
+                yield sse_event("progress", {
+                    "status": running_status,
+                    "message": elapsed_message_template.format(elapsed=elapsed),
+                })
+                continue
+
+            finished, next_item = next_item, None
+            try:
+                item = finished.result()
+            except StopAsyncIteration:
+                yield GenerationResult.from_usage("".join(chunks), metadata)
+                return
+            except Exception as e:
+                logging.error(f"Stream error: {e}", exc_info=True)
                 yield sse_event("error", {
                     "success": False,
-                    "error_message": msg_data,
+                    "error_message": str(e),
                 })
                 return
-            yield msg_data
+
+            if isinstance(item, dict):
+                metadata = item
+            elif item:
+                chunks.append(item)
+                yield sse_event("delta", {"text": item})
+    finally:
+        # クライアント切断時はプロバイダーのストリームを閉じる
+        if next_item is not None and not next_item.done():
+            next_item.cancel()
+            with contextlib.suppress(BaseException):
+                await next_item
+        aclose = getattr(chunk_stream, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+
+async def start_event_stream(events: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    最初のイベントまで進めてからSSEストリームを返す
+
+    実行枠の待ち行列が満杯の場合など、応答を始める前の例外をルートから送出させ、
+    例外ハンドラーでステータスコード付きのエラーとして返せるようにする
+    """
+    try:
+        first = await anext(events)
+    except StopAsyncIteration:
+        first = None
+
+    async def _stream() -> AsyncGenerator[str, None]:
+        if first is None:
             return
-        except asyncio.TimeoutError:
-            elapsed = int(time.time() - start_time)
-            yield sse_event("progress", {
-                "status": running_status,
-                "message": elapsed_message_template.format(elapsed=elapsed),
-            })
+        try:
+            yield first
+            async for event in events:
+                yield event
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    return _stream()
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import desc, func
+from sqlalchemy import case, desc, func
 from sqlalchemy.orm import Session
 
 from app.core.constants import DEFAULT_STATISTICS_PERIOD_DAYS, MESSAGES
@@ -37,6 +37,9 @@ def get_usage_summary(
         func.sum(SummaryUsage.input_tokens),
         func.sum(SummaryUsage.output_tokens),
         func.avg(SummaryUsage.processing_time),
+        func.sum(case((SummaryUsage.cache_hit.is_(True), 1), else_=0)),
+        func.sum(SummaryUsage.cache_read_tokens),
+        func.sum(SummaryUsage.cache_write_tokens),
     )
 
     query = query.filter(SummaryUsage.date >= start_date)
@@ -52,6 +55,9 @@ def get_usage_summary(
             "total_input_tokens": 0,
             "total_output_tokens": 0,
             "average_processing_time": 0.0,
+            "cache_hit_count": 0,
+            "total_cache_read_tokens": 0,
+            "total_cache_write_tokens": 0,
         }
 
     return {
@@ -59,6 +65,9 @@ def get_usage_summary(
         "total_input_tokens": int(stats[1]) if stats[1] is not None else 0,
         "total_output_tokens": int(stats[2]) if stats[2] is not None else 0,
         "average_processing_time": round(float(stats[3]), 2) if stats[3] is not None else 0.0,
+        "cache_hit_count": int(stats[4]) if stats[4] is not None else 0,
+        "total_cache_read_tokens": int(stats[5]) if stats[5] is not None else 0,
+        "total_cache_write_tokens": int(stats[6]) if stats[6] is not None else 0,
     }
 
 
@@ -79,6 +88,7 @@ def get_aggregated_records(
         func.count(SummaryUsage.id).label("count"),
         func.sum(SummaryUsage.input_tokens).label("input_tokens"),
         func.sum(SummaryUsage.output_tokens).label("output_tokens"),
+        func.sum(SummaryUsage.cache_read_tokens).label("cache_read_tokens"),
     )
 
     query = query.filter(SummaryUsage.date >= start_date)
@@ -104,6 +114,7 @@ def get_aggregated_records(
             "count": r.count,
             "input_tokens": r.input_tokens or 0,
             "output_tokens": r.output_tokens or 0,
+            "cache_read_tokens": r.cache_read_tokens or 0,
         }
         for r in results
     ]
@@ -1,24 +1,127 @@
+import asyncio
+import contextlib
+import logging
 import time
-from typing import AsyncGenerator
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, NotRequired, TypedDict
 
 from app.core.config import get_settings
-from app.core.constants import MESSAGES, get_message
-from app.external.api_factory import generate_summary_with_provider, generate_summary_stream_with_provider
+from app.core.constants import DEFAULT_SUMMARY_PROMPT, MESSAGES, ModelType, get_message
+from app.core.database import get_db_session
+from app.external.api_factory import (
+    available_routes,
+    generate_summary_stream_with_provider_async,
+    generate_summary_with_provider,
+    generate_summary_with_provider_async,
+)
+from app.external.base_api import GenerationResult, cache_token_counts, usage_dict
+from app.external.provider_errors import is_retryable_error
 from app.schemas.summary import SummaryResponse
-from app.services.model_selector import determine_model, get_provider_and_model
-from app.services.sse_helpers import sse_event, stream_with_heartbeat
+from app.services.admission import (
+    DEFAULT_COST,
+    AdmissionTicket,
+    admit,
+    admit_async,
+    enter_admission,
+    queued_events,
+    tenant_key,
+)
+from app.services.generation_cache import (
+    CachedGeneration,
+    generation_cache_key,
+    get_generation_cache,
+    lookup_generation,
+    store_generation,
+)
+from app.services.hedging import GenerationLane, hedged_stream
+from app.services.input_preparation import PreparedInput, inspect_text, prepare_input
+from app.services.model_router import get_model_router
+from app.services.model_selector import determine_model, get_provider_and_model, model_fits
+from app.services.prompt_service import ResolvedPrompt, resolve_prompt
+from app.services.single_flight import Chunk, FlightSubscription, get_single_flight
+from app.services.sse_helpers import sse_event, stream_chunks_with_heartbeat
+from app.services.token_estimator import TokenEstimate, estimate_tokens
 from app.services.usage_service import save_usage
 from app.utils.audit_logger import log_audit_event
-from app.utils.input_sanitizer import sanitize_medical_text, validate_medical_input
+from app.utils.input_sanitizer import sanitize_medical_text
 from app.utils.text_processor import format_output_summary, parse_output_summary
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
 
+class _ProviderCallArgs(TypedDict):
+    """generate_summary_*_with_provider に渡す引数"""
+
+    provider: str
+    medical_text: str
+    additional_info: str
+    referral_purpose: str
+    current_prescription: str
+    department: str
+    document_type: str
+    doctor: str
+    model_name: str | None
+    prompt_template: str | None
+    route: NotRequired[str]
+
+
+@dataclass
+class _GenerationPlan:
+    """検証済み入力と決定済みモデル"""
+
+    medical_text: str
+    additional_info: str
+    referral_purpose: str
+    current_prescription: str
+    department: str
+    doctor: str
+    document_type: str
+    final_model: str
+    model_switched: bool
+    provider: str
+    model_name: str
+    user_ip: str | None
+    prompt_template: str | None = None
+    input_hash: str | None = None
+    cache_key: str | None = None
+    bypass_cache: bool = False
+    estimated_input_tokens: int | None = None
+    fallback_lanes: list[GenerationLane] = field(default_factory=list)
+
+    def primary_lane(self) -> GenerationLane:
+        return GenerationLane(self.final_model, self.provider, self.model_name)
+
+    def lane_kwargs(self, lane: GenerationLane) -> _ProviderCallArgs:
+        """送信先に合わせたプロバイダー呼び出しの引数（経路は指定した場合のみ渡す）"""
+        kwargs = self.provider_kwargs()
+        kwargs["provider"] = lane.provider
+        kwargs["model_name"] = lane.model_name
+        if lane.route is not None:
+            kwargs["route"] = lane.route
+        return kwargs
+
+    def provider_kwargs(self) -> _ProviderCallArgs:
+        return {
+            "provider": self.provider,
+            "medical_text": self.medical_text,
+            "additional_info": self.additional_info,
+            "referral_purpose": self.referral_purpose,
+            "current_prescription": self.current_prescription,
+            "department": self.department,
+            "document_type": self.document_type,
+            "doctor": self.doctor,
+            "model_name": self.model_name,
+            "prompt_template": self.prompt_template,
+        }
+
+
 def _error_response(
         error_msg: str,
         model: str,
-        model_switched: bool = False
+        model_switched: bool = False,
+        retryable: bool = False,
 ) -> SummaryResponse:
     return SummaryResponse(
         success=False,
@@ -29,30 +132,78 @@ def _error_response(
         processing_time=0,
         model_used=model,
         model_switched=model_switched,
+        retryable=retryable,
         error_message=error_msg,
     )
 
 
-def validate_input(medical_text: str) -> tuple[bool, str | None]:
+def validate_input(medical_text: str | PreparedInput | None) -> tuple[bool, str | None]:
     """テキスト入力検証（長さチェックとプロンプトインジェクション検出）"""
-    if not medical_text or not medical_text.strip():
+    prepared = medical_text if isinstance(medical_text, PreparedInput) else inspect_text(medical_text)
+    if prepared.stripped_length == 0:
         return False, MESSAGES["VALIDATION"]["NO_INPUT"]
 
-    input_length = len(medical_text.strip())
-    if input_length < settings.min_input_tokens:
+    if prepared.stripped_length < settings.min_input_tokens:
         return False, MESSAGES["VALIDATION"]["INPUT_TOO_SHORT"]
-    if input_length > settings.max_input_tokens:
+    if prepared.stripped_length > settings.max_input_tokens:
         return False, MESSAGES["VALIDATION"]["INPUT_TOO_LONG"]
 
     # プロンプトインジェクション検出
-    is_valid, error_msg = validate_medical_input(medical_text, settings.max_input_tokens)
+    is_valid, error_msg = prepared.validate(settings.max_input_tokens)
     if not is_valid:
         return False, error_msg
 
     return True, None
 
 
-def execute_summary_generation(
+def _lookup_prompt(department: str, document_type: str, doctor: str) -> ResolvedPrompt | None:
+    """リクエスト内で一度だけプロンプトを解決（失敗時はNoneで各処理の既定動作に任せる）"""
+    try:
+        with get_db_session() as db:
+            return resolve_prompt(db, department, document_type, doctor)
+    except Exception:
+        return None
+
+
+def _is_model_fixed(
+    model_explicitly_selected: bool, resolved_prompt: ResolvedPrompt | None
+) -> bool:
+    """ユーザーかプロンプト設定がモデルを指定しているか（プロンプトを解決できなかった場合も固定とする）"""
+    return (
+        model_explicitly_selected
+        or resolved_prompt is None
+        or resolved_prompt.selected_model is not None
+    )
+
+
+def _fallback_lanes(
+    final_model: str,
+    provider: str,
+    model_name: str,
+    estimate: TokenEstimate,
+    model_fixed: bool,
+) -> list[GenerationLane]:
+    """
+    主の送信先が遅い・失敗した場合の予備の送信先
+
+    同じモデルの別経路（AI Gateway⇔直結）、ユーザーもプロンプト設定もモデルを
+    指定していなければ別のモデルの順（プロンプトを解決できなかった場合も別のモデルには送らない）
+    """
+    if not (settings.hedging_enabled or settings.failover_enabled):
+        return []
+    lanes = []
+    routes = available_routes()
+    if "route" in settings.hedge_targets and len(routes) > 1:
+        lanes.append(GenerationLane(final_model, provider, model_name, routes[1]))
+    if "model" in settings.hedge_targets and not model_fixed:
+        for other in ModelType:
+            if other.value != final_model and model_fits(other.value, estimate):
+                other_provider, other_model_name = get_provider_and_model(other.value)
+                lanes.append(GenerationLane(other.value, other_provider, other_model_name))
+    return lanes
+
+
+def _prepare_generation(
     medical_text: str,
     additional_info: str,
     referral_purpose: str,
@@ -61,10 +212,11 @@ def execute_summary_generation(
     doctor: str,
     document_type: str,
     model: str,
-    model_explicitly_selected: bool = False,
-    user_ip: str | None = None,
-) -> SummaryResponse:
-    """文書生成を実行"""
+    model_explicitly_selected: bool,
+    user_ip: str | None,
+    bypass_cache: bool = False,
+) -> _GenerationPlan | SummaryResponse:
+    """サニタイズ・入力検証・モデル決定を行い、失敗時はエラーレスポンスを返す"""
     # 監査ログ: 開始
     log_audit_event(
         event_type=get_message("AUDIT", "DOCUMENT_GENERATION_START"),
@@ -75,14 +227,15 @@ def execute_summary_generation(
         doctor=doctor,
     )
 
-    # サニタイゼーション適用
-    medical_text = sanitize_medical_text(medical_text)
+    # サニタイゼーション適用（カルテ本文は長さ・インジェクション検出・ハッシュも同時に求める）
+    prepared = prepare_input(medical_text)
+    medical_text = prepared.text
     additional_info = sanitize_medical_text(additional_info or "")
     referral_purpose = sanitize_medical_text(referral_purpose)
     current_prescription = sanitize_medical_text(current_prescription or "")
 
     # 入力検証
-    is_valid, error_msg = validate_input(medical_text)
+    is_valid, error_msg = validate_input(prepared)
     if not is_valid:
         log_audit_event(
             event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
@@ -94,12 +247,28 @@ def execute_summary_generation(
         )
         return _error_response(error_msg or MESSAGES["ERROR"]["INPUT_ERROR"], model)
 
-    # モデル決定
-    total_length = len(medical_text) + len(additional_info or "")
+    resolved_prompt = _lookup_prompt(department, document_type, doctor)
+    prompt_template = (
+        (resolved_prompt.content or DEFAULT_SUMMARY_PROMPT) if resolved_prompt else None
+    )
+
+    # モデル決定（テンプレートを含むプロンプト全体の推定トークン数で判定）
+    estimate = estimate_tokens(
+        prompt_template or DEFAULT_SUMMARY_PROMPT, medical_text, additional_info,
+        referral_purpose, current_prescription,
+    )
+    # ユーザー・プロンプト設定が選んだモデルは切り替えない（プロンプトを解決できなかった場合も同様）
+    model_fixed = _is_model_fixed(model_explicitly_selected, resolved_prompt)
     try:
         final_model, model_switched = determine_model(
-            model, total_length, department, document_type, doctor, model_explicitly_selected
+            model, estimate, department, document_type, doctor,
+            model_explicitly_selected, resolved_prompt,
         )
+        # モデルが固定されていなければ応答時間・エラー率のSLOを満たすモデルに切り替える
+        if settings.adaptive_routing and not model_fixed:
+            decision = get_model_router().choose(final_model, estimate)
+            final_model = decision.model
+            model_switched = model_switched or decision.switched
     except ValueError as e:
         log_audit_event(
             event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
@@ -125,53 +294,287 @@ def execute_summary_generation(
         )
         return _error_response(str(e), final_model, model_switched)
 
+    # プロンプトを解決できなかった場合はプロバイダー側で解決されるためキャッシュ・集約しない
+    cache_key = None
+    if prompt_template is not None:
+        cache_key = generation_cache_key(
+            prompt_template, medical_text, additional_info, referral_purpose,
+            current_prescription, provider, model_name,
+        )
+
+    return _GenerationPlan(
+        medical_text=medical_text,
+        additional_info=additional_info,
+        referral_purpose=referral_purpose,
+        current_prescription=current_prescription,
+        department=department,
+        doctor=doctor,
+        document_type=document_type,
+        final_model=final_model,
+        model_switched=model_switched,
+        provider=provider,
+        model_name=model_name,
+        user_ip=user_ip,
+        prompt_template=prompt_template,
+        input_hash=prepared.content_hash,
+        cache_key=cache_key,
+        bypass_cache=bypass_cache,
+        estimated_input_tokens=estimate.raw_tokens,
+        fallback_lanes=_fallback_lanes(
+            final_model, provider, model_name, estimate, model_fixed
+        ),
+    )
+
+
+def _generation_failure(plan: _GenerationPlan, error_msg: str) -> SummaryResponse:
+    """生成失敗を監査ログに記録してエラーレスポンスを返す（プロバイダー呼び出しの失敗のため再試行可能）"""
+    log_audit_event(
+        event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
+        user_ip=plan.user_ip,
+        document_type=plan.document_type,
+        model=plan.final_model,
+        success=False,
+        error_message=error_msg,
+    )
+    return _error_response(error_msg, plan.final_model, plan.model_switched, retryable=True)
+
+
+def _replay_cached(plan: _GenerationPlan) -> SummaryResponse | None:
+    """同じ入力の生成結果がキャッシュにあれば、LLMを呼ばずに成功レスポンスを返す"""
+    if plan.cache_key is None or plan.bypass_cache or get_generation_cache() is None:
+        return None
     start_time = time.time()
-    try:
-        output_summary, input_tokens, output_tokens = generate_summary_with_provider(
-            provider=provider,
-            medical_text=medical_text,
-            additional_info=additional_info,
-            referral_purpose=referral_purpose,
-            current_prescription=current_prescription,
-            department=department,
-            document_type=document_type,
-            doctor=doctor,
-            model_name=model_name,
+    cached = lookup_generation(plan.cache_key)
+    if cached is None:
+        return None
+    processing_time = time.time() - start_time
+
+    # プロバイダーのトークンを消費していないため、使用統計はトークン数0のキャッシュ応答として記録
+    save_usage(
+        department=plan.department,
+        doctor=plan.doctor,
+        document_type=plan.document_type,
+        model=plan.final_model,
+        input_tokens=0,
+        output_tokens=0,
+        processing_time=processing_time,
+        cache_hit=True,
+    )
+
+    log_audit_event(
+        event_type=get_message("AUDIT", "DOCUMENT_GENERATION_SUCCESS"),
+        user_ip=plan.user_ip,
+        document_type=plan.document_type,
+        model=plan.final_model,
+        input_tokens=0,
+        output_tokens=0,
+        processing_time=processing_time,
+        cache_hit=True,
+    )
+
+    return SummaryResponse(
+        success=True,
+        output_summary=cached.output_summary,
+        parsed_summary=cached.parsed_summary,
+        input_tokens=cached.input_tokens,
+        output_tokens=cached.output_tokens,
+        processing_time=processing_time,
+        model_used=plan.final_model,
+        model_switched=plan.model_switched,
+        cache_hit=True,
+    )
+
+
+def _hedge_delay(model: str, streaming: bool) -> float | None:
+    """
+    予備の送信先にも送るまでの待ち時間（最初のチャンクまでの時間のパーセンタイル）
+
+    非ストリーミングでは最初のチャンクが生成完了と同時に届き、長い文書ほど
+    重複して課金されるため予備には送らない（失敗時の切り替えのみ行う）
+    """
+    if not settings.hedging_enabled or not streaming:
+        return None
+    observed = get_model_router().first_chunk_percentile(
+        model, streaming, settings.hedge_percentile
+    )
+    if observed is None:
+        return settings.hedge_default_delay
+    return max(observed, settings.hedge_min_delay)
+
+
+def _open_generation(
+    plan: _GenerationPlan,
+    call: Callable[[_ProviderCallArgs], AsyncIterator[Chunk]],
+    streaming: bool,
+) -> tuple[AsyncGenerator[Chunk, None] | FlightSubscription, bool]:
+    """
+    プロバイダー呼び出しのチャンクストリームを開く
+
+    予備の送信先があれば応答の遅い・失敗した呼び出しを切り替え、
+    同じ内容の生成が進行中であれば新たに呼び出さずに参加し、(ストリーム, 参加したか) を返す
+    """
+    def open_lane(lane: GenerationLane) -> AsyncGenerator[Chunk, None]:
+        return _observe_provider(
+            lane.model, plan.estimated_input_tokens, streaming, call(plan.lane_kwargs(lane))
         )
-    except Exception as e:
-        log_audit_event(
-            event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            model=final_model,
-            success=False,
-            error_message=str(e),
+
+    def start() -> AsyncGenerator[Chunk, None]:
+        if not plan.fallback_lanes:
+            return open_lane(plan.primary_lane())
+        return hedged_stream(
+            [plan.primary_lane(), *plan.fallback_lanes],
+            open_lane,
+            _hedge_delay(plan.final_model, streaming),
+            failover=settings.failover_enabled,
         )
-        return _error_response(str(e), final_model, model_switched)
 
-    processing_time = time.time() - start_time
+    if plan.cache_key is None or plan.bypass_cache or not settings.generation_coalescing:
+        return start(), False
+    subscription = get_single_flight().subscribe(plan.cache_key, start)
+    return subscription, not subscription.leader
+
+
+def _admission_key(plan: _GenerationPlan) -> str | None:
+    """
+    同時生成数を制限する単位（プロバイダー）
+
+    同じ内容の生成が進行中で参加するだけの場合はプロバイダーを呼び出さないためNone
+    """
+    if (
+        plan.cache_key is not None
+        and not plan.bypass_cache
+        and settings.generation_coalescing
+        and get_single_flight().in_flight(plan.cache_key)
+    ):
+        return None
+    return plan.provider
+
 
+def _admission_share(plan: _GenerationPlan) -> tuple[str, float]:
+    """公平に実行枠を割り当てる単位と、入力の大きさによる重み（短い入力ほど先に実行される）"""
+    return (
+        tenant_key(plan.department, plan.doctor),
+        float(plan.estimated_input_tokens or DEFAULT_COST),
+    )
+
+
+def _release_admission(ticket: AdmissionTicket | None) -> None:
+    if ticket is not None:
+        ticket.release()
+
+
+def _record_provider_call(
+    model: str, tokens: int | None, latency: float, success: bool
+) -> None:
+    """プロバイダー呼び出しの所要時間と成否をモデル選択の統計に記録"""
+    get_model_router().record(model, latency, tokens, success)
+
+
+async def _observe_provider(
+    model: str, tokens: int | None, streaming: bool, chunk_stream: AsyncIterator[Chunk]
+) -> AsyncGenerator[Chunk, None]:
+    """
+    チャンクストリームを中継し、最初のチャンクまでの時間と完了・失敗を記録
+
+    打ち切られた呼び出しは記録せず、集約時も呼び出し1回分として記録する
+    """
+    start_time = time.monotonic()
+    first = True
+    try:
+        async for item in chunk_stream:
+            if first:
+                first = False
+                get_model_router().record_first_chunk(
+                    model, streaming, time.monotonic() - start_time
+                )
+            yield item
+    except Exception:
+        _record_provider_call(model, tokens, time.monotonic() - start_time, success=False)
+        raise
+    finally:
+        aclose = getattr(chunk_stream, "aclose", None)
+        if aclose is not None:
+            with contextlib.suppress(Exception):
+                await aclose()
+    _record_provider_call(model, tokens, time.monotonic() - start_time, success=True)
+
+
+async def _as_chunks(
+    generation: Awaitable[tuple[str, int, int]],
+) -> AsyncGenerator[Chunk, None]:
+    """非ストリーミングの生成結果をストリームと同じチャンク形式で返す"""
+    result = await generation
+    yield result[0]
+    yield usage_dict(*result[1:], *cache_token_counts(result))
+
+
+async def _collect_chunks(chunk_stream: AsyncIterator[Chunk]) -> GenerationResult:
+    """チャンクストリームを1つの生成結果にまとめる"""
+    chunks: list[str] = []
+    metadata: dict = {}
+    async for item in chunk_stream:
+        if isinstance(item, dict):
+            metadata = item
+        elif item:
+            chunks.append(item)
+    return GenerationResult.from_usage("".join(chunks), metadata)
+
+
+def _complete_generation(
+    plan: _GenerationPlan,
+    generated: tuple[str, int, int],
+    processing_time: float,
+    coalesced: bool = False,
+) -> SummaryResponse:
+    """
+    出力を整形し、使用統計と監査ログを記録して成功レスポンスを返す
+
+    generated: (生成テキスト, 入力トークン数, 出力トークン数)（GenerationResultならキャッシュのトークン数も記録）
+    coalesced: 進行中の同じ生成に参加した場合True（キャッシュ保存は呼び出したリクエストのみ行う）
+    """
+    output_summary, input_tokens, output_tokens = generated
+    cache_read_tokens, cache_write_tokens = (0, 0) if coalesced else cache_token_counts(generated)
+    # 予備のモデルで生成した場合は実際に生成したモデルを記録する
+    served_model = getattr(generated, "served_model", None) or plan.final_model
     formatted_summary = format_output_summary(output_summary)
     parsed_summary = parse_output_summary(formatted_summary)
 
+    # キャッシュキーは主のモデルで求めているため、別のモデルの結果は保存しない
+    if plan.cache_key is not None and not coalesced and served_model == plan.final_model:
+        store_generation(plan.cache_key, CachedGeneration(
+            output_summary=formatted_summary,
+            parsed_summary=parsed_summary,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+        ))
+
+    # 参加したリクエストはトークンを消費していないため、キャッシュ応答と同様にトークン数0で記録
     save_usage(
-        department=department,
-        doctor=doctor,
-        document_type=document_type,
-        model=final_model,
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
+        department=plan.department,
+        doctor=plan.doctor,
+        document_type=plan.document_type,
+        model=served_model,
+        input_tokens=0 if coalesced else input_tokens,
+        output_tokens=0 if coalesced else output_tokens,
         processing_time=processing_time,
+        cache_hit=coalesced,
+        cache_read_tokens=cache_read_tokens,
+        cache_write_tokens=cache_write_tokens,
+        estimated_input_tokens=None if coalesced else plan.estimated_input_tokens,
     )
 
     log_audit_event(
         event_type=get_message("AUDIT", "DOCUMENT_GENERATION_SUCCESS"),
-        user_ip=user_ip,
-        document_type=document_type,
-        model=final_model,
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
+        user_ip=plan.user_ip,
+        document_type=plan.document_type,
+        model=served_model,
+        input_tokens=0 if coalesced else input_tokens,
+        output_tokens=0 if coalesced else output_tokens,
         processing_time=processing_time,
+        coalesced=coalesced,
+        cache_read_tokens=cache_read_tokens,
+        cache_write_tokens=cache_write_tokens,
+        requested_model=plan.final_model if served_model != plan.final_model else None,
     )
 
     return SummaryResponse(
@@ -181,42 +584,125 @@ def execute_summary_generation(
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         processing_time=processing_time,
-        model_used=final_model,
-        model_switched=model_switched,
+        model_used=served_model,
+        model_switched=plan.model_switched or served_model != plan.final_model,
+        coalesced=coalesced,
     )
 
 
-def _run_sync_generation(
-    provider: str,
+def execute_summary_generation(
     medical_text: str,
     additional_info: str,
     referral_purpose: str,
     current_prescription: str,
     department: str,
+    doctor: str,
     document_type: str,
+    model: str,
+    model_explicitly_selected: bool = False,
+    user_ip: str | None = None,
+    bypass_cache: bool = False,
+) -> SummaryResponse:
+    """文書生成を実行"""
+    plan = _prepare_generation(
+        medical_text, additional_info, referral_purpose, current_prescription,
+        department, doctor, document_type, model, model_explicitly_selected, user_ip,
+        bypass_cache,
+    )
+    if isinstance(plan, SummaryResponse):
+        return plan
+    cached_response = _replay_cached(plan)
+    if cached_response is not None:
+        return cached_response
+
+    with admit(plan.provider, *_admission_share(plan)):
+        return _run_generation(plan)
+
+
+def _run_generation(plan: _GenerationPlan) -> SummaryResponse:
+    """同期クライアントで生成し、失敗時は予備の送信先へ順に切り替える"""
+    start_time = time.time()
+    lanes = [plan.primary_lane(), *plan.fallback_lanes]
+    generated: tuple[str, int, int] | None = None
+    for i, lane in enumerate(lanes):
+        lane_start = time.time()
+        try:
+            generated = generate_summary_with_provider(**plan.lane_kwargs(lane))
+        except Exception as e:
+            _record_provider_call(
+                lane.model, plan.estimated_input_tokens, time.time() - lane_start, success=False
+            )
+            # 同期処理では並行して送れないため、レート制限・サーバーエラー時の切り替えのみ行う
+            if settings.failover_enabled and i + 1 < len(lanes) and is_retryable_error(e):
+                logger.warning(get_message(
+                    "LOG", "GENERATION_FAILOVER",
+                    lane=lane.describe(), next_lane=lanes[i + 1].describe(), error=str(e),
+                ))
+                continue
+            return _generation_failure(plan, str(e))
+        _record_provider_call(
+            lane.model, plan.estimated_input_tokens, time.time() - lane_start, success=True
+        )
+        if i > 0:
+            generated = GenerationResult(
+                *generated, *cache_token_counts(generated), served_model=lane.model
+            )
+        break
+
+    # 最後の送信先の失敗は切り替えずに返すため、ここでは必ず生成済み
+    assert generated is not None
+    processing_time = time.time() - start_time
+    return _complete_generation(plan, generated, processing_time)
+
+
+async def execute_summary_generation_async(
+    medical_text: str,
+    additional_info: str,
+    referral_purpose: str,
+    current_prescription: str,
+    department: str,
     doctor: str,
-    model_name: str,
-) -> tuple[str, int, int]:
-    """同期ストリーミングジェネレータをスレッドプールで実行"""
-    stream = generate_summary_stream_with_provider(
-        provider=provider,
-        medical_text=medical_text,
-        additional_info=additional_info,
-        referral_purpose=referral_purpose,
-        current_prescription=current_prescription,
-        department=department,
-        document_type=document_type,
-        doctor=doctor,
-        model_name=model_name,
+    document_type: str,
+    model: str,
+    model_explicitly_selected: bool = False,
+    user_ip: str | None = None,
+    bypass_cache: bool = False,
+) -> SummaryResponse:
+    """非同期クライアントで文書生成を実行（LLM呼び出し中はスレッドを占有しない）"""
+    plan = await asyncio.to_thread(
+        _prepare_generation,
+        medical_text, additional_info, referral_purpose, current_prescription,
+        department, doctor, document_type, model, model_explicitly_selected, user_ip,
+        bypass_cache,
     )
-    chunks = []
-    metadata = {}
-    for item in stream:
-        if isinstance(item, dict):
-            metadata = item
-        else:
-            chunks.append(item)
-    return "".join(chunks), metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+    if isinstance(plan, SummaryResponse):
+        return plan
+    cached_response = await asyncio.to_thread(_replay_cached, plan)
+    if cached_response is not None:
+        return cached_response
+
+    admission_key = _admission_key(plan)
+    ticket = None
+    if admission_key is not None:
+        ticket = await admit_async(admission_key, *_admission_share(plan))
+    try:
+        start_time = time.time()
+        chunk_stream, coalesced = _open_generation(
+            plan,
+            lambda kwargs: _as_chunks(generate_summary_with_provider_async(**kwargs)),
+            streaming=False,
+        )
+        try:
+            generated = await _collect_chunks(chunk_stream)
+        except Exception as e:
+            return _generation_failure(plan, str(e))
+        finally:
+            await chunk_stream.aclose()
+    finally:
+        _release_admission(ticket)
+
+    processing_time = time.time() - start_time
+    return await asyncio.to_thread(_complete_generation, plan, generated, processing_time, coalesced)
 
 
 async def execute_summary_generation_stream(
@@ -230,121 +716,55 @@ async def execute_summary_generation_stream(
     model: str,
     model_explicitly_selected: bool = False,
     user_ip: str | None = None,
+    bypass_cache: bool = False,
 ) -> AsyncGenerator[str, None]:
     """SSEストリーミングで文書生成を実行"""
-    # 監査ログ: 開始
-    log_audit_event(
-        event_type=get_message("AUDIT", "DOCUMENT_GENERATION_START"),
-        user_ip=user_ip,
-        document_type=document_type,
-        model=model,
-        department=department,
-        doctor=doctor,
+    plan = await asyncio.to_thread(
+        _prepare_generation,
+        medical_text, additional_info, referral_purpose, current_prescription,
+        department, doctor, document_type, model, model_explicitly_selected, user_ip,
+        bypass_cache,
     )
-
-    # サニタイゼーション適用
-    medical_text = sanitize_medical_text(medical_text)
-    additional_info = sanitize_medical_text(additional_info or "")
-    referral_purpose = sanitize_medical_text(referral_purpose)
-    current_prescription = sanitize_medical_text(current_prescription or "")
-
-    # 入力検証
-    is_valid, error_msg = validate_input(medical_text)
-    if not is_valid:
-        log_audit_event(
-            event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            model=model,
-            success=False,
-            error_message=error_msg or MESSAGES["ERROR"]["INPUT_ERROR"],
-        )
-        yield sse_event("error", {
-            "success": False,
-            "error_message": error_msg or MESSAGES["ERROR"]["INPUT_ERROR"]
-        })
+    if isinstance(plan, SummaryResponse):
+        yield sse_event("error", {"success": False, "error_message": plan.error_message})
         return
-
-    # モデル決定
-    total_length = len(medical_text) + len(additional_info or "")
-    try:
-        final_model, model_switched = determine_model(
-            model, total_length, department, document_type,
-            doctor, model_explicitly_selected
-        )
-    except ValueError as e:
-        log_audit_event(
-            event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            model=model,
-            success=False,
-            error_message=str(e),
-        )
-        yield sse_event("error", {"success": False, "error_message": str(e)})
+    cached_response = await asyncio.to_thread(_replay_cached, plan)
+    if cached_response is not None:
+        yield sse_event("complete", cached_response.model_dump(exclude={"error_message"}))
         return
 
-    # プロバイダーとモデル名を取得
+    # 待ち行列が満杯の場合は最初のイベントを返す前に送出し、503として応答させる
+    admission_key = _admission_key(plan)
+    ticket = None
+    if admission_key is not None:
+        ticket = enter_admission(admission_key, *_admission_share(plan))
     try:
-        provider, model_name = get_provider_and_model(final_model)
-    except ValueError as e:
-        log_audit_event(
-            event_type=get_message("AUDIT", "DOCUMENT_GENERATION_FAILURE"),
-            user_ip=user_ip,
-            document_type=document_type,
-            model=final_model,
-            success=False,
-            error_message=str(e),
+        if ticket is not None:
+            async for event in queued_events(ticket):
+                yield event
+
+        start_time = time.time()
+        chunk_stream, coalesced = _open_generation(
+            plan,
+            lambda kwargs: generate_summary_stream_with_provider_async(**kwargs),
+            streaming=True,
         )
-        yield sse_event("error", {"success": False, "error_message": str(e)})
-        return
-
-    start_time = time.time()
-
-    async for item in stream_with_heartbeat(
-        sync_func=_run_sync_generation,
-        sync_func_args=(
-            provider, medical_text, additional_info, referral_purpose,
-            current_prescription, department, document_type, doctor, model_name
-        ),
-        start_message=MESSAGES["STATUS"]["DOCUMENT_GENERATION_START"],
-        running_status="generating",
-        running_message=MESSAGES["STATUS"]["DOCUMENT_GENERATING"],
-        elapsed_message_template=MESSAGES["STATUS"]["DOCUMENT_GENERATING_ELAPSED"],
-    ):
-        if isinstance(item, str):
-            yield item
-        else:
-            full_text, input_tokens, output_tokens = item
-            processing_time = time.time() - start_time
-
-            formatted_summary = format_output_summary(full_text)
-            parsed_summary = parse_output_summary(formatted_summary)
-
-            save_usage(
-                department=department, doctor=doctor, document_type=document_type,
-                model=final_model, input_tokens=input_tokens,
-                output_tokens=output_tokens, processing_time=processing_time,
-            )
-
-            # 監査ログ: 成功
-            log_audit_event(
-                event_type=get_message("AUDIT", "DOCUMENT_GENERATION_SUCCESS"),
-                user_ip=user_ip,
-                document_type=document_type,
-                model=final_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                processing_time=processing_time,
-            )
 
-            yield sse_event("complete", {
-                "success": True,
-                "output_summary": formatted_summary,
-                "parsed_summary": parsed_summary,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "processing_time": processing_time,
-                "model_used": final_model,
-                "model_switched": model_switched,
-            })
+        async for item in stream_chunks_with_heartbeat(
+            chunk_stream=chunk_stream,
+            start_message=MESSAGES["STATUS"]["DOCUMENT_GENERATION_START"],
+            running_status="generating",
+            running_message=MESSAGES["STATUS"]["DOCUMENT_GENERATING"],
+            elapsed_message_template=MESSAGES["STATUS"]["DOCUMENT_GENERATING_ELAPSED"],
+        ):
+            if isinstance(item, str):
+                yield item
+            else:
+                processing_time = time.time() - start_time
+
+                response = await asyncio.to_thread(
+                    _complete_generation, plan, item, processing_time, coalesced
+                )
+                yield sse_event("complete", response.model_dump(exclude={"error_message"}))
+    finally:
+        _release_admission(ticket)
@@ -0,0 +1,179 @@
+import logging
+import math
+import threading
+import time
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import get_message
+from app.core.database import get_db_session
+from app.external.base_api import build_prompt_body
+from app.models.usage import SummaryUsage
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+
+# 補正前の1文字あたりのトークン数（日本語はほぼ1文字1トークン、英数字は約4文字1トークン）
+_MULTIBYTE_TOKENS_PER_CHAR = 1.0
+_ASCII_TOKENS_PER_CHAR = 0.25
+
+# 補正係数を求めるのに必要な件数と、外れ値で極端な係数にならないための範囲
+_MIN_CALIBRATION_SAMPLES = 20
+_MIN_FACTOR = 0.25
+_MAX_FACTOR = 4.0
+
+
+def estimate_text_tokens(text: str) -> int:
+    """文字種から求める補正前のトークン数"""
+    if not text:
+        return 0
+    # UTF-8で3バイトになる日本語の文字数をエンコード後の長さから求める（1文字ずつ判定しない）
+    multibyte = (len(text.encode("utf-8", "surrogatepass")) - len(text)) // 2
+    ascii_chars = max(len(text) - multibyte, 0)
+    return math.ceil(
+        multibyte * _MULTIBYTE_TOKENS_PER_CHAR + ascii_chars * _ASCII_TOKENS_PER_CHAR
+    )
+
+
+def estimate_prompt_tokens(
+    prompt_template: str,
+    medical_text: str,
+    additional_info: str = "",
+    referral_purpose: str = "",
+    current_prescription: str = "",
+) -> int:
+    """プロバイダーに送るプロンプト全体（テンプレートと可変部分）の補正前のトークン数"""
+    body = build_prompt_body(medical_text, additional_info, referral_purpose, current_prescription)
+    return estimate_text_tokens(f"{prompt_template}\n{body}")
+
+
+@dataclass(frozen=True)
+class TokenEstimate:
+    """補正前の推定トークン数とモデルごとの補正係数"""
+
+    raw_tokens: int
+    factors: dict[str, float] = field(default_factory=dict)
+
+    def for_model(self, model: str) -> int:
+        """モデルの実測値で補正した推定トークン数"""
+        return math.ceil(self.raw_tokens * self.factors.get(model, 1.0))
+
+
+class TokenCalibration:
+    """
+    summary_usageに記録した推定値と実際の入力トークン数からモデルごとの補正係数を求める
+
+    係数はttl秒ごとに直近days日分から再計算し、件数が足りないモデルは補正しない
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] = get_db_session,
+        ttl: float = 600,
+        days: int = 30,
+    ):
+        self._session_factory = session_factory
+        self._ttl = ttl
+        self._days = days
+        self._factors: dict[str, float] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def factors(self) -> dict[str, float]:
+        """現在の補正係数（期限切れなら再計算、ttl=0では補正しない）"""
+        if self._ttl <= 0:
+            return {}
+        if time.monotonic() >= self._expires_at and self._lock.acquire(blocking=False):
+            # 再計算中の他のリクエストは待たずに前回の係数を使う
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+        return self._factors
+
+    def refresh(self) -> None:
+        """直近の使用統計から補正係数を再計算（失敗時は前回の係数を使い続ける）"""
+        self._expires_at = time.monotonic() + max(self._ttl, 0)
+        try:
+            self._factors = self._load()
+        except Exception as e:
+            logger.warning(get_message("LOG", "TOKEN_CALIBRATION_FAILED", error=str(e)))
+
+    def _load(self) -> dict[str, float]:
+        # input_tokensはプロンプトキャッシュ分を含まないため足し戻して送信したプロンプト全体と比べる
+        actual = (
+            SummaryUsage.input_tokens
+            + SummaryUsage.cache_read_tokens
+            + SummaryUsage.cache_write_tokens
+        )
+        since = datetime.now(JST) - timedelta(days=self._days)
+        with self._session_factory() as db:
+            rows = db.execute(
+                select(
+                    SummaryUsage.model,
+                    func.count(SummaryUsage.id),
+                    func.sum(actual),
+                    func.sum(SummaryUsage.estimated_input_tokens),
+                )
+                .where(
+                    SummaryUsage.estimated_input_tokens > 0,
+                    SummaryUsage.cache_hit.is_(False),
+                    SummaryUsage.date >= since,
+                )
+                .group_by(SummaryUsage.model)
+            ).all()
+
+        factors = {}
+        for model, count, actual_total, estimated_total in rows:
+            if count < _MIN_CALIBRATION_SAMPLES or not estimated_total or not actual_total:
+                continue
+            factors[model] = min(max(actual_total / estimated_total, _MIN_FACTOR), _MAX_FACTOR)
+        return factors
+
+
+_calibration: TokenCalibration | None = None
+_calibration_lock = threading.Lock()
+
+
+def get_token_calibration() -> TokenCalibration:
+    """設定に従ったプロセス共有の補正係数を取得"""
+    global _calibration
+    with _calibration_lock:
+        if _calibration is None:
+            settings = get_settings()
+            _calibration = TokenCalibration(
+                ttl=settings.token_calibration_ttl,
+                days=settings.token_calibration_days,
+            )
+        return _calibration
+
+
+def set_token_calibration(calibration: TokenCalibration | None) -> None:
+    """補正係数を差し替える（Noneで設定から再生成）"""
+    global _calibration
+    with _calibration_lock:
+        _calibration = calibration
+
+
+def estimate_tokens(
+    prompt_template: str,
+    medical_text: str,
+    additional_info: str = "",
+    referral_purpose: str = "",
+    current_prescription: str = "",
+) -> TokenEstimate:
+    """プロンプト全体の推定トークン数（モデルごとの補正係数付き）"""
+    return TokenEstimate(
+        raw_tokens=estimate_prompt_tokens(
+            prompt_template, medical_text, additional_info, referral_purpose, current_prescription
+        ),
+        factors=get_token_calibration().factors(),
+    )
@@ -1,10 +1,7 @@
-import logging
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from app.core.constants import get_message
-from app.core.database import get_db_session
-from app.models.usage import SummaryUsage
+from app.services.usage_writer import get_usage_writer
 
 JST = ZoneInfo("Asia/Tokyo")
 
@@ -17,22 +14,24 @@ def save_usage(
     input_tokens: int,
     output_tokens: int,
     processing_time: float,
+    cache_hit: bool = False,
+    cache_read_tokens: int = 0,
+    cache_write_tokens: int = 0,
+    estimated_input_tokens: int | None = None,
 ) -> None:
-    """使用統計を保存"""
-    try:
-        with get_db_session() as db:
-            usage = SummaryUsage(
-                date=datetime.now(JST),
-                department=department,
-                doctor=doctor,
-                document_type=document_type,
-                model=model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                app_type="referral_letter",
-                processing_time=processing_time,
-            )
-            db.add(usage)
-    except Exception as e:
-        # ログに記録するがエラーは無視
-        logging.error(get_message("ERROR", "USAGE_SAVE_FAILED", error=str(e)), exc_info=True)
+    """使用統計を保存（バックグラウンドでまとめて書き込むため待たない）"""
+    get_usage_writer().submit({
+        "date": datetime.now(JST),
+        "department": department,
+        "doctor": doctor,
+        "document_type": document_type,
+        "model": model,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "app_type": "referral_letter",
+        "processing_time": processing_time,
+        "cache_hit": cache_hit,
+        "cache_read_tokens": cache_read_tokens,
+        "cache_write_tokens": cache_write_tokens,
+        "estimated_input_tokens": estimated_input_tokens,
+    })
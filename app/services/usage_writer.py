@@ -0,0 +1,303 @@
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextlib import AbstractContextManager, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+if sys.platform != "win32":
+    import fcntl
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.constants import get_message
+from app.core.database import get_db_session
+from app.models.usage import SummaryUsage
+
+logger = logging.getLogger(__name__)
+
+# 書き込みスレッドへの終了指示
+_STOP = object()
+
+
+class UsageWriter:
+    """
+    使用統計をバックグラウンドでまとめてINSERTする書き込みスレッド
+
+    件数（batch_size）または経過時間（flush_interval）で複数行INSERTを発行する。
+    キューが満杯の場合はリクエストを待たせず、overflowに従いファイル退避または破棄する。
+    DBに書き込めなかったバッチはspill_pathに退避し、次回の書き込み成功時に再投入する。
+    退避ファイルはWebの各ワーカー・バッチワーカーのプロセスで共有するため、ファイルロックで排他する。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] = get_db_session,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        max_queue_size: int = 10000,
+        overflow: str = "spill",
+        spill_path: str | Path = "data/usage_spill.jsonl",
+    ):
+        self._session_factory = session_factory
+        self._batch_size = max(batch_size, 1)
+        self._flush_interval = flush_interval
+        self._overflow = overflow
+        self._spill_path = Path(spill_path)
+        self._spill_lock_path = self._spill_path.with_name(self._spill_path.name + ".lock")
+        self._replay_lock_path = self._spill_path.with_name(self._spill_path.name + ".replay.lock")
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(max_queue_size, 1))
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._spilled = 0
+        self._dropped = 0
+        self._failed_flushes = 0
+
+    def start(self) -> None:
+        """書き込みスレッドを開始（起動済みなら何もしない）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: dict[str, Any]) -> None:
+        """使用統計をキューに追加（呼び出し元をブロックしない）"""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self._overflow == "spill":
+                self._spill([record])
+            else:
+                self._count("_dropped", 1)
+                logger.warning(get_message("LOG", "USAGE_QUEUE_FULL_DROPPED"))
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """キューに残った使用統計を書き込んでスレッドを停止"""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        # 終了指示がキュー満杯で入らない場合もスレッドが確実に止まるようブロックして待つ
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        """書き込み状況"""
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self._written,
+                "spilled": self._spilled,
+                "dropped": self._dropped,
+                "failed_flushes": self._failed_flushes,
+                "spill_pending": self._spill_path.exists()
+                or self._spill_path.with_name(self._spill_path.name + ".replay").exists(),
+            }
+
+    def _count(self, name: str, n: int) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _run(self) -> None:
+        # 前回プロセスで退避した分を先に書き込む
+        self._replay_spill()
+        batch: list[dict[str, Any]] = []
+        deadline = time.monotonic() + self._flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._drain_into(batch)
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self._batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self._flush_interval
+
+    def _drain_into(self, batch: list[dict[str, Any]]) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                batch.append(item)
+
+    def _flush(self, batch: list[dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            self._insert(batch)
+        except Exception as e:
+            self._count("_failed_flushes", 1)
+            logger.error(get_message("ERROR", "USAGE_SAVE_FAILED", error=str(e)))
+            self._spill(batch)
+            return
+        self._count("_written", len(batch))
+        self._replay_spill()
+
+    def _insert(self, rows: list[dict[str, Any]]) -> None:
+        # 途中で失敗したら全体をロールバックし、退避・再投入で同じ行を二重に書き込まない
+        with self._session_factory() as db:
+            for i in range(0, len(rows), self._batch_size):
+                db.execute(insert(SummaryUsage).values(rows[i:i + self._batch_size]))
+
+    def _spill(self, rows: list[dict[str, Any]]) -> None:
+        """書き込めなかった使用統計をJSONLファイルに退避"""
+        try:
+            with self._spill_lock, _process_lock(self._spill_lock_path):
+                with self._spill_path.open("a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(_to_json(row), ensure_ascii=False) + "\n")
+        except OSError as e:
+            self._count("_dropped", len(rows))
+            logger.error(get_message("LOG", "USAGE_SPILL_FAILED", error=str(e)))
+            return
+        self._count("_spilled", len(rows))
+
+    def _replay_spill(self) -> None:
+        """退避ファイルの使用統計をDBに書き込む（失敗時は退避ファイルに戻して次回再試行）"""
+        # 他のプロセスが再投入中であれば同じ行を二重に書き込まないよう任せる
+        with _process_lock(self._replay_lock_path, blocking=False) as acquired:
+            if acquired:
+                self._replay_locked()
+
+    def _replay_locked(self) -> None:
+        # 読み込み中も退避を受け付けられるよう、対象ファイルを別名に移してから処理する
+        replaying = self._spill_path.with_name(self._spill_path.name + ".replay")
+        with self._spill_lock, _process_lock(self._spill_lock_path):
+            if self._spill_path.exists():
+                if replaying.exists():
+                    _append_file(self._spill_path, replaying)
+                    self._spill_path.unlink()
+                else:
+                    self._spill_path.replace(replaying)
+            if not replaying.exists():
+                return
+
+        try:
+            rows = _read_spill(replaying)
+            if rows:
+                self._insert(rows)
+        except Exception as e:
+            logger.warning(get_message("LOG", "USAGE_SPILL_REPLAY_FAILED", error=str(e)))
+            with self._spill_lock, _process_lock(self._spill_lock_path):
+                _append_file(replaying, self._spill_path)
+                replaying.unlink()
+            return
+
+        replaying.unlink()
+        self._count("_written", len(rows))
+        logger.info(get_message("LOG", "USAGE_SPILL_REPLAYED", count=str(len(rows))))
+
+
+@contextmanager
+def _process_lock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    プロセス間で共有するファイルロック（取得できたかを返す、blocking=Falseなら待たない）
+
+    Windowsでは開発用の単一プロセスでの実行を想定し、ロックを取らない
+    """
+    if sys.platform == "win32":
+        yield True
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            acquired = False
+        else:
+            acquired = True
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_spill(path: Path) -> list[dict[str, Any]]:
+    rows = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rows.append(_from_json(json.loads(line)))
+            except ValueError:
+                logger.warning(get_message("LOG", "USAGE_SPILL_INVALID_LINE"))
+    return rows
+
+
+def _append_file(src: Path, dst: Path) -> None:
+    with src.open(encoding="utf-8") as f_src, dst.open("a", encoding="utf-8") as f_dst:
+        f_dst.write(f_src.read())
+
+
+def _to_json(row: dict[str, Any]) -> dict[str, Any]:
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()}
+
+
+def _from_json(row: dict[str, Any]) -> dict[str, Any]:
+    if isinstance(row.get("date"), str):
+        row["date"] = datetime.fromisoformat(row["date"])
+    # 複数行INSERTは全行で同じ列が必要なため、列追加前に退避した行を補う
+    row.setdefault("cache_hit", False)
+    row.setdefault("cache_read_tokens", 0)
+    row.setdefault("cache_write_tokens", 0)
+    row.setdefault("estimated_input_tokens", None)
+    return row
+
+
+_writer: UsageWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_usage_writer() -> UsageWriter:
+    """設定に従ったプロセス共有の書き込みスレッドを取得"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            settings = get_settings()
+            _writer = UsageWriter(
+                batch_size=settings.usage_batch_size,
+                flush_interval=settings.usage_flush_interval,
+                max_queue_size=settings.usage_queue_maxsize,
+                overflow=settings.usage_queue_overflow,
+                spill_path=settings.usage_spill_path,
+            )
+        return _writer
+
+
+def set_usage_writer(writer: UsageWriter | None) -> None:
+    """書き込みスレッドを差し替える（Noneで設定から再生成）"""
+    global _writer
+    with _writer_lock:
+        _writer = writer
+
+
+def shutdown_usage_writer(timeout: float = 10.0) -> None:
+    """キューに残った使用統計を書き込んで停止（アプリ終了時に使用）"""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.shutdown(timeout)
@@ -1,10 +1,209 @@
 import json
 import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import AbstractContextManager
 from datetime import UTC, datetime
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable
 
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_settings
+from app.core.constants import get_message
+from app.core.database import get_db_session
+from app.models.audit_log import AuditLog
 
 audit_logger = logging.getLogger("audit")
+logger = logging.getLogger(__name__)
+
+# 整形を省いた高速なJSONエンコーダー（1行1イベント）
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+# 一定時間イベントがない場合にバッファを書き出すための合図
+_FLUSH_TICK = object()
+
+
+def serialize_audit_event(log_data: dict[str, Any]) -> str:
+    """監査イベントをJSON文字列に変換"""
+    return _encoder.encode(log_data)
+
+
+class AuditJsonFormatter(logging.Formatter):
+    """監査イベントをJSONL形式で出力するフォーマッター"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = getattr(record, "audit", None)
+        if log_data is None:
+            return record.getMessage()
+        return serialize_audit_event(log_data)
+
+
+class DatabaseAuditHandler(logging.Handler):
+    """監査イベントをバッファしてaudit_logsテーブルに複数行INSERTするハンドラー"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]] = get_db_session,
+        batch_size: int = 50,
+    ):
+        super().__init__()
+        self._session_factory = session_factory
+        self._batch_size = max(batch_size, 1)
+        self._buffer: list[dict[str, Any]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        log_data = getattr(record, "audit", None)
+        if log_data is None:
+            return
+        self._buffer.append(log_data)
+        if len(self._buffer) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # createLockで__init__時に生成されるため常に存在する
+        lock = self.lock
+        assert lock is not None
+        with lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        try:
+            with self._session_factory() as db:
+                db.execute(insert(AuditLog).values([_to_row(data) for data in rows]))
+        except Exception as e:
+            # ファイル・標準出力のシンクには記録済みのため、DB分のみ失う
+            logger.error(get_message(
+                "LOG", "AUDIT_DB_WRITE_FAILED", count=str(len(rows)), error=str(e)
+            ))
+
+
+def _to_row(log_data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "timestamp": datetime.fromisoformat(log_data["timestamp"]),
+        "event_type": log_data["event_type"],
+        "success": log_data["success"],
+        "user_ip": log_data.get("user_ip"),
+        "document_type": log_data.get("document_type"),
+        "model": log_data.get("model"),
+        "payload": serialize_audit_event(log_data),
+    }
+
+
+class _AuditQueueHandler(logging.handlers.QueueHandler):
+    """呼び出し元ではキューに積むだけにする（整形は受信スレッドで行う）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _AuditQueueListener(logging.handlers.QueueListener):
+    """一定時間イベントがなければ各シンクのバッファを書き出すキューリスナー"""
+
+    def __init__(self, q: queue.SimpleQueue, *handlers: logging.Handler, flush_interval: float):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        # 基底クラスのqueueはget_nowaitのみの型のため、タイムアウト付きで待つ側は具体型で保持
+        self._queue = q
+        self._flush_interval = flush_interval
+
+    def dequeue(self, block: bool) -> Any:
+        if not block:
+            return super().dequeue(block)
+        try:
+            return self._queue.get(timeout=self._flush_interval)
+        except queue.Empty:
+            return _FLUSH_TICK
+
+    def handle(self, record: Any) -> None:
+        if record is _FLUSH_TICK:
+            for handler in self.handlers:
+                handler.flush()
+            return
+        super().handle(record)
+
+
+def build_audit_sinks(settings: Settings) -> list[logging.Handler]:
+    """設定に従い監査ログの出力先ハンドラーを生成"""
+    sinks: list[logging.Handler] = []
+    for name in settings.audit_log_sinks:
+        if name == "stdout":
+            sinks.append(logging.StreamHandler(sys.stdout))
+        elif name == "file":
+            path = Path(settings.audit_log_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            sinks.append(logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=settings.audit_log_max_bytes,
+                backupCount=settings.audit_log_backup_count,
+                encoding="utf-8",
+            ))
+        elif name == "database":
+            sinks.append(DatabaseAuditHandler(batch_size=settings.audit_db_batch_size))
+        else:
+            logger.warning(get_message("LOG", "AUDIT_UNKNOWN_SINK", sink=name))
+
+    formatter = AuditJsonFormatter()
+    for sink in sinks:
+        sink.setFormatter(formatter)
+    return sinks
+
+
+class AuditPipeline:
+    """監査イベントを専用スレッドで各シンクに書き出すパイプライン"""
+
+    def __init__(self, sinks: list[logging.Handler], flush_interval: float = 1.0):
+        self._sinks = sinks
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._queue_handler = _AuditQueueHandler(self._queue)
+        self._listener = _AuditQueueListener(
+            self._queue, *sinks, flush_interval=flush_interval
+        )
+
+    def start(self) -> None:
+        self._listener.start()
+        audit_logger.addHandler(self._queue_handler)
+        audit_logger.setLevel(logging.INFO)
+        audit_logger.propagate = False
+
+    def stop(self) -> None:
+        """キューに残ったイベントを全て書き出してから停止"""
+        audit_logger.removeHandler(self._queue_handler)
+        audit_logger.propagate = True
+        self._listener.stop()
+        for sink in self._sinks:
+            sink.flush()
+            sink.close()
+
+
+_pipeline: AuditPipeline | None = None
+_pipeline_lock = threading.Lock()
+
+
+def start_audit_logging(sinks: list[logging.Handler] | None = None) -> None:
+    """監査ログパイプラインを開始（sinks未指定時は設定から生成）"""
+    global _pipeline
+    settings = get_settings()
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return
+        pipeline = AuditPipeline(
+            sinks if sinks is not None else build_audit_sinks(settings),
+            flush_interval=settings.audit_flush_interval,
+        )
+        pipeline.start()
+        _pipeline = pipeline
+
+
+def stop_audit_logging() -> None:
+    """監査ログパイプラインを停止（未出力のイベントは全て書き出す）"""
+    global _pipeline
+    with _pipeline_lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline is not None:
+        pipeline.stop()
 
 
 def log_audit_event(
@@ -39,4 +238,9 @@ def log_audit_event(
 
     log_data.update(kwargs)
 
-    audit_logger.info(json.dumps(log_data, ensure_ascii=False))
+    if _pipeline is None:
+        # パイプライン未起動時（スクリプト・テスト）は従来どおり同期出力
+        audit_logger.info(serialize_audit_event(log_data))
+        return
+    # JSON化と書き込みは受信スレッドで行う
+    audit_logger.info(event_type, extra={"audit": log_data})
@@ -1,3 +1,5 @@
+import math
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
@@ -14,3 +16,13 @@ async def validation_exception_handler(request: Request, exc: Exception) -> JSON
         status_code=422,
         content={"success": False, "error_message": str(exc)},
     )
+
+
+async def overloaded_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    retry_after = getattr(exc, "retry_after", None)
+    headers = {"Retry-After": str(max(math.ceil(retry_after), 1))} if retry_after is not None else None
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "error_message": str(exc)},
+        headers=headers,
+    )
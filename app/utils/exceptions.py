@@ -3,4 +3,38 @@ class AppError(Exception):
 
 
 class APIError(AppError):
-    pass
+    def __init__(self, message: str = "", status_code: int | None = None):
+        super().__init__(message)
+        # プロバイダーが返したHTTPステータス（不明な場合はNone）
+        self.status_code = status_code
+
+
+class CircuitOpenError(APIError):
+    """サーキットブレーカーが開いているためプロバイダーを呼び出さずに失敗した"""
+
+    def __init__(self, message: str = "", retry_after: float | None = None):
+        super().__init__(message, status_code=503)
+        # 再び試行できるまでの秒数
+        self.retry_after = retry_after
+
+
+class RateLimitedError(APIError):
+    """レート制限の上限に達し、待ち時間が長すぎるためプロバイダーを呼び出さずに失敗した"""
+
+    def __init__(self, message: str = "", retry_after: float | None = None):
+        super().__init__(message, status_code=429)
+        # 上限内で送信できるまでの秒数
+        self.retry_after = retry_after
+
+
+class AdmissionRejectedError(AppError):
+    """同時生成数の待ち行列が満杯のため受け付けなかった"""
+
+    def __init__(self, message: str = "", retry_after: float | None = None):
+        super().__init__(message)
+        # 再度受け付けられる見込みの秒数
+        self.retry_after = retry_after
+
+
+class BatchInputError(AppError):
+    """アップロードしたバッチファイルの内容が不正"""
@@ -1,5 +1,5 @@
 import re
-from typing import Tuple
+from typing import NamedTuple, Sequence, Tuple
 
 
 # プロンプトインジェクション攻撃のパターン
@@ -31,58 +31,352 @@ PROMPT_INJECTION_PATTERNS = [
     r'### (System|User|Assistant):',
 ]
 
+# 各パターンの一致に必ず含まれる小文字リテラル（PROMPT_INJECTION_PATTERNSと同順）
+# いずれも含まないテキストでは正規表現を実行しない
+_PATTERN_ANCHORS: list[tuple[str, ...]] = [
+    ("ignore",),
+    ("disregard",),
+    ("forget",),
+    ("を無視", "を忘れ", "を破棄"),
+    ("新しい",),
+    ("you",),
+    ("act",),
+    ("pretend",),
+    ("今から", "これから"),
+    ("tell", "show", "give", "provide"),
+    ("reveal",),
+    ("を教え", "を見せ", "を表示"),
+    ("<|im_",),
+    ("[inst]", "[/inst]"),
+    ("<system>", "</system>"),
+    ("### ",),
+]
 
-def detect_prompt_injection(text: str) -> Tuple[bool, list[str]]:
+# IGNORECASEでASCII英字に一致するが、lower()ではASCII英字にならない文字
+# これらを含むテキストではリテラルによる事前判定を行わない
+_CASE_FOLD_EXCEPTIONS = ("İ", "ı", "ſ")
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# 「.*」の後戻りで行長の二乗になるパターンは前後の2つに分けて線形に確認する
+_SPLIT_PATTERNS = {
+    r'(あなた|君)は(今から|これから).*として(振る舞|行動)': (
+        re.compile(r'(あなた|君)は(今から|これから)', _FLAGS),
+        re.compile(r'として(振る舞|行動)', _FLAGS),
+    ),
+}
+
+REPEATED_PATTERN = "repeated_pattern_detected"
+EXCESSIVE_LENGTH = "excessive_length"
+
+# 異常な長さとみなす文字数（100KB）
+_EXCESSIVE_LENGTH = 100000
+
+# 繰り返しとみなす最短の単位長と連続回数（同じ文字列が10回以上連続）
+_MIN_REPEAT_UNIT = 20
+_MIN_REPEAT_COUNT = 10
+
+# 小さい周期（単位長未満）の判定に使う窓の長さ
+_SMALL_PERIOD_WINDOW = 100
+
+
+class InjectionMatch(NamedTuple):
+    """検出されたパターンと元テキスト上の位置（監査用、テキスト内容は含まない）"""
+
+    pattern: str
+    start: int
+    end: int
+
+
+class _InjectionRule(NamedTuple):
+    pattern: str
+    regex: re.Pattern[str]
+    anchors: tuple[str, ...]
+
+
+_RULES = [
+    _InjectionRule(pattern, re.compile(pattern, _FLAGS), anchors)
+    for pattern, anchors in zip(PROMPT_INJECTION_PATTERNS, _PATTERN_ANCHORS, strict=True)
+]
+
+
+def _search_rule(rule: _InjectionRule, text: str) -> tuple[int, int] | None:
+    split = _SPLIT_PATTERNS.get(rule.pattern)
+    if split is None:
+        match = rule.regex.search(text)
+        return match.span() if match else None
+
+    # 行内で最初に現れる前半の後ろに後半があるかを確認（後の前半で見つかる場合は必ず最初の前半でも見つかる）
+    head, tail = split
+    pos = 0
+    while (first := head.search(text, pos)) is not None:
+        line_end = text.find("\n", first.end())
+        if line_end == -1:
+            line_end = len(text)
+        second = tail.search(text, first.end(), line_end)
+        if second is not None:
+            return first.start(), second.end()
+        pos = line_end + 1
+    return None
+
+
+def _common_prefix(text: str, i: int, j: int, limit: int) -> int:
+    """text[i:]とtext[j:]の共通接頭辞長（limitで打ち切り）"""
+    hi = min(limit, len(text) - max(i, j))
+    if hi <= 0:
+        return 0
+    # 16文字から倍々に比較して一致長に比例した比較量に抑え、一致する長さlo、
+    # 一致しない長さhiを保って二分探索
+    lo, step = 0, 16
+    while step < hi and text.startswith(text[j:j + step], i):
+        lo, step = step, step * 2
+    if step >= hi:
+        if text.startswith(text[j:j + hi], i):
+            return hi
+    else:
+        hi = step
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if text.startswith(text[j:j + mid], i):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def _common_suffix(text: str, i: int, j: int, limit: int) -> int:
+    """text[:i]とtext[:j]の共通接尾辞長（limitで打ち切り）"""
+    hi = min(limit, i, j)
+    if hi <= 0:
+        return 0
+    lo, step = 0, 16
+    while step < hi and text.endswith(text[j - step:j], 0, i):
+        lo, step = step, step * 2
+    if step >= hi:
+        if text.endswith(text[j - hi:j], 0, i):
+            return hi
+    else:
+        hi = step
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if text.endswith(text[j - mid:j], 0, i):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def _find_small_period_run(line: str) -> tuple[int, int] | None:
     """
-    プロンプトインジェクション攻撃の疑いがあるパターンを検出
+    周期が単位長未満の繰り返し（例: 同じ1文字の連続）を検出
+
+    該当する繰り返しは窓長の2倍以上あるため、窓長ごとの整列位置の窓を必ず含む。
+    窓の最小周期qで前後に伸ばし、qの倍数で単位長以上となる周期の10回分に届くかを確認する。
+    """
+    n = len(line)
+    w = _SMALL_PERIOD_WINDOW
+    skip_until = 0
+    for x in range(0, n - w + 1, w):
+        if x < skip_until:
+            continue
+        window = line[x:x + w]
+        head = window[:_MIN_REPEAT_UNIT]
+        q = window.find(head, 1)
+        while 0 < q < _MIN_REPEAT_UNIT and window[q:] != window[:-q]:
+            q = window.find(head, q + 1)
+        if not 0 < q < _MIN_REPEAT_UNIT:
+            continue
+
+        unit = q * -(-_MIN_REPEAT_UNIT // q)
+        required = unit * _MIN_REPEAT_COUNT
+        left = _common_suffix(line, x, x + q, required)
+        right = _common_prefix(line, x + w, x + w - q, required)
+        if left + w + right >= required:
+            start = x - left
+            return start, start + required
+        # 繰り返しの内側に収まる窓は同じ結果になるため飛ばす
+        skip_until = x + right + 1
+    return None
+
+
+def _find_long_period_run(line: str) -> tuple[int, int] | None:
+    """
+    周期が単位長以上の繰り返しを検出（小さい周期の繰り返しがないことが前提）
+
+    周期pを[G, 2G)の範囲ごとに調べる。長さ10p以上の繰り返しは先頭からG未満の位置に
+    G刻みの整列位置xを含み、text[x:x+G]はx+pにも現れる。その出現位置だけを候補とし、
+    text[x:x+9p]が周期pを持つか、前後合わせて10p以上に伸ばせるかを確認する。
+    text[x:x+G]自体が短い周期dを持つ場合は出現が連続するため、周期dの連続が途切れる位置の
+    差を候補のpとする（より短い周期の繰り返しは前段で検出済みのため候補はこれに限られる）。
+    """
+    n = len(line)
+    # 周期dの連続の終端は連続内のどの位置から求めても同じため、周期ごとに直近の結果を再利用する
+    known_runs: dict[int, tuple[int, int]] = {}
+
+    def periodic_end(pos: int, d: int) -> int:
+        known = known_runs.get(d)
+        if known is not None and known[0] <= pos and pos + d <= known[1]:
+            return known[1]
+        end = pos + d + _common_prefix(line, pos, pos + d, n)
+        known_runs[d] = (pos, end)
+        return end
+
+    g = 16
+    while _MIN_REPEAT_COUNT * max(g, _MIN_REPEAT_UNIT) <= n:
+        min_period = max(g, _MIN_REPEAT_UNIT)
+        for x in range(0, n - (_MIN_REPEAT_COUNT - 1) * min_period + 1, g):
+            anchor = line[x:x + g]
+            search_end = x + 3 * g - 1
+            y = line.find(anchor, x + min_period, search_end)
+            if y == -1:
+                continue
+
+            d = line.find(anchor, x + 1, x + g + g // 2)
+            d = d - x if d != -1 and d - x <= g // 2 else 0
+            run_end = periodic_end(x, d) if d else 0
+
+            while y != -1:
+                if d:
+                    y_end = periodic_end(y, d)
+                    p = y_end - run_end
+                    next_from = max(y + 1, y_end - g + 1)
+                else:
+                    p = y - x
+                    next_from = y + 1
+                if min_period <= p < 2 * g and _is_repeated(line, x, p):
+                    return _extend_run(line, x, p)
+                y = line.find(anchor, next_from, search_end)
+        g *= 2
+    return None
+
+
+def _is_repeated(line: str, x: int, p: int) -> bool:
+    span = (_MIN_REPEAT_COUNT - 1) * p
+    if x + span > len(line):
+        return False
+    if not line.startswith(line[x + p:x + 2 * p], x):
+        return False
+    if not line.startswith(line[x + p:x + p + span - p], x):
+        return False
+    # text[x:x+9p]は周期pを持つので、前後に合わせてp以上伸ばせれば10回連続となる
+    left = _common_suffix(line, x, x + p, p)
+    right = _common_prefix(line, x + span, x + span - p, p - left)
+    return left + right >= p
+
+
+def _extend_run(line: str, x: int, p: int) -> tuple[int, int]:
+    start = x - _common_suffix(line, x, x + p, p)
+    return start, start + _MIN_REPEAT_COUNT * p
+
+
+def find_repeated_pattern(text: str) -> tuple[int, int] | None:
+    """
+    20文字以上の同じ文字列が10回以上連続する箇所を検出（行をまたがない）
+
+    正規表現 (.{20,}?)\\1{9,} と同じ判定を後戻りなしで行い、該当範囲を返す。
+    """
+    pos = 0
+    for line in text.split("\n"):
+        if len(line) >= _MIN_REPEAT_UNIT * _MIN_REPEAT_COUNT:
+            found = _find_small_period_run(line) or _find_long_period_run(line)
+            if found is not None:
+                return pos + found[0], pos + found[1]
+        pos += len(line) + 1
+    return None
+
+
+def scan_prompt_injection(text: str) -> list[InjectionMatch]:
+    """
+    プロンプトインジェクション攻撃の疑いがある箇所を検出
+
+    各パターンに必ず含まれるリテラルの有無で事前に絞り込み、該当するパターンのみ
+    正規表現で確認する。繰り返しの検出も含めて入力長に対しほぼ線形時間で完了する。
 
     Returns:
-        (is_suspicious, matched_patterns): 疑わしい場合True、検出されたパターンのリスト
+        検出されたパターンと位置のリスト（PROMPT_INJECTION_PATTERNSの順、該当なしは空）
     """
     if not text:
-        return False, []
+        return []
 
-    matched_patterns = []
     text_lower = text.lower()
+    prefilter = not any(c in text_lower for c in _CASE_FOLD_EXCEPTIONS)
 
-    for pattern in PROMPT_INJECTION_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE | re.MULTILINE):
-            matched_patterns.append(pattern)
+    matches = []
+    for rule in _RULES:
+        if prefilter and not any(anchor in text_lower for anchor in rule.anchors):
+            continue
+        span = _search_rule(rule, text)
+        if span is not None:
+            matches.append(InjectionMatch(rule.pattern, *span))
 
-    # 異常な繰り返しパターンの検出（同じ文字列が10回以上連続）
-    repeated_pattern = re.search(r'(.{20,}?)\1{9,}', text)
-    if repeated_pattern:
-        matched_patterns.append("repeated_pattern_detected")
+    repeated = find_repeated_pattern(text)
+    if repeated is not None:
+        matches.append(InjectionMatch(REPEATED_PATTERN, *repeated))
 
-    # 異常な長さの検出（100KB以上）
-    if len(text) > 100000:
-        matched_patterns.append("excessive_length")
+    if len(text) > _EXCESSIVE_LENGTH:
+        matches.append(InjectionMatch(EXCESSIVE_LENGTH, _EXCESSIVE_LENGTH, len(text)))
+
+    return matches
+
+
+def detect_prompt_injection(text: str) -> Tuple[bool, list[str]]:
+    """
+    プロンプトインジェクション攻撃の疑いがあるパターンを検出
 
+    Returns:
+        (is_suspicious, matched_patterns): 疑わしい場合True、検出されたパターンのリスト
+    """
+    matched_patterns = [match.pattern for match in scan_prompt_injection(text)]
     return len(matched_patterns) > 0, matched_patterns
 
 
+# 除去するタグブロック（開始・終了タグの有無で事前判定し、存在する場合のみ置換）
+_TAG_BLOCKS = [
+    (
+        re.compile(rf'<{tag}', re.IGNORECASE),
+        re.compile(rf'</{tag}>', re.IGNORECASE),
+        re.compile(rf'<{tag}[^>]*>.*?</{tag}>', re.DOTALL | re.IGNORECASE),
+    )
+    for tag in ("script", "style", "iframe")
+]
+
+_EVENT_HANDLER = re.compile(r'\son\w+\s*=\s*["\'][^"\']*["\']', re.IGNORECASE)
+
+# 除去する制御文字（改行とタブは保持）。UTF-8ではASCII範囲のバイトは
+# 他の文字の一部にならないため、エンコード後のバイト列から直接取り除ける
+_CONTROL_BYTES = bytes([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+
+
+def _strip_control_characters(text: str) -> str:
+    encoded = text.encode("utf-8", "surrogatepass")
+    stripped = encoded.translate(None, _CONTROL_BYTES)
+    if len(stripped) == len(encoded):
+        return text
+    return stripped.decode("utf-8", "surrogatepass")
+
+
 def sanitize_medical_text(text: str) -> str:
     """
     医療テキストのサニタイゼーション
 
     XSS対策とプロンプトインジェクション軽減のため入力を整形
     医療情報の可読性を保ちつつ危険なパターンを除去
+    HTMLを含まないテキストはタグ除去を省略し、制御文字の確認のみで返す
     """
     if not text:
         return text
 
-    # スクリプトタグの完全除去
-    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<iframe[^>]*>.*?</iframe>', '', text, flags=re.DOTALL | re.IGNORECASE)
+    # スクリプト・スタイル・iframeタグの完全除去（前の除去で新たに生じたタグも対象とするため順に適用）
+    if "<" in text:
+        for opening, closing, block in _TAG_BLOCKS:
+            if opening.search(text) and closing.search(text):
+                text = block.sub('', text)
 
     # イベントハンドラ属性の除去
-    text = re.sub(r'\son\w+\s*=\s*["\'][^"\']*["\']', '', text, flags=re.IGNORECASE)
-
-    # 制御文字の除去（改行とタブは保持）
-    text = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', text)
+    if "=" in text and any(on in text for on in ("on", "On", "oN", "ON")):
+        text = _EVENT_HANDLER.sub('', text)
 
-    return text
+    return _strip_control_characters(text)
 
 
 def sanitize_prompt_text(text: str) -> str:
@@ -97,11 +391,16 @@ def sanitize_prompt_text(text: str) -> str:
     return sanitize_medical_text(text)
 
 
-def validate_medical_input(text: str, max_length: int = 100000) -> Tuple[bool, str | None]:
+def validate_medical_input(
+    text: str,
+    max_length: int = 100000,
+    injection_matches: Sequence[InjectionMatch] | None = None,
+) -> Tuple[bool, str | None]:
     """
     医療テキスト入力の検証
 
     プロンプトインジェクション攻撃や異常な入力を検出
+    injection_matchesを渡した場合は走査済みの結果を使い、再走査しない
 
     Returns:
         (is_valid, error_message): 有効な場合True、エラーメッセージ
@@ -113,8 +412,9 @@ def validate_medical_input(text: str, max_length: int = 100000) -> Tuple[bool, s
         return False, f"入力テキストが長すぎます（最大{max_length}文字）"
 
     # プロンプトインジェクション検出
-    is_suspicious, _ = detect_prompt_injection(text)
-    if is_suspicious:
+    if injection_matches is None:
+        injection_matches = scan_prompt_injection(text)
+    if injection_matches:
         return False, "入力テキストに不正なパターンが検出されました"
 
     return True, None
@@ -1,4 +1,6 @@
 import re
+from functools import lru_cache
+from typing import Mapping, Sequence
 
 from app.core.constants import DEFAULT_SECTION_NAMES, SECTION_DETECTION_PATTERNS
 
@@ -21,55 +23,127 @@ def format_output_summary(summary_text: str) -> str:
     return processed_text
 
 
-def parse_output_summary(summary_text: str) -> dict[str, str]:
-    """AI出力をセクションごとに分割してパース"""
-    sections = {section: "" for section in DEFAULT_SECTION_NAMES}
-    lines = summary_text.split('\n')
-    current_section = None
-
-    all_section_names = list(sections.keys()) + list(section_aliases.keys())
-
-    for line in lines:
+class SectionParser:
+    """
+    見出し行を1回の照合でセクションに分類するパーサー
+
+    セクション名・別名・検出パターンの全組み合わせを1つの正規表現にまとめてコンパイルする。
+    選択肢はセクション順 → パターン順に並べるため、判定結果は先頭から順に照合した場合と同じ
+    """
+
+    def __init__(
+        self,
+        section_names: Sequence[str],
+        aliases: Mapping[str, str],
+        patterns: Sequence[str],
+    ):
+        self.section_names = list(section_names)
+        candidates = [(name, name) for name in self.section_names]
+        candidates += list(aliases.items())
+
+        alternatives = []
+        group_targets: dict[str, tuple[str, bool]] = {}
+        for i, (name, canonical) in enumerate(candidates):
+            for j, pattern in enumerate(patterns):
+                group = f"s{i}_{j}"
+                formatted = pattern.format(section=re.escape(name))
+                alternatives.append(f"(?P<{group}>{formatted})")
+                group_targets[group] = (canonical, re.compile(formatted).groups > 0)
+
+        self._regex = re.compile("|".join(alternatives))
+        # 見出しのグループ番号 → (セクション名, 本文グループ番号)
+        self._targets = {
+            self._regex.groupindex[group]: (
+                canonical,
+                self._regex.groupindex[group] + 1 if has_content else None,
+            )
+            for group, (canonical, has_content) in group_targets.items()
+        }
+
+    def classify(self, line: str) -> tuple[str, str] | None:
+        """見出し行なら(セクション名, 見出しと同じ行の本文)を返す"""
+        match = self._regex.match(line)
+        if not match or match.lastindex is None:
+            return None
+        section, content_group = self._targets[match.lastindex]
+        content = match.group(content_group) if content_group else None
+        return section, content.strip() if content else ""
+
+    def parse(self, summary_text: str) -> dict[str, str]:
+        """テキスト全体をセクションごとに分割"""
+        accumulator = _SectionAccumulator(self)
+        for line in summary_text.split('\n'):
+            accumulator.add_line(line)
+        return accumulator.result()
+
+
+class _SectionAccumulator:
+    """行ごとにセクションへ振り分けた結果を保持"""
+
+    def __init__(self, parser: SectionParser):
+        self._parser = parser
+        self._sections = {section: "" for section in parser.section_names}
+        self._current: str | None = None
+
+    def add_line(self, line: str) -> None:
         line = line.strip()
         if not line:
-            continue
-
-        found_section = False
-        detected_section = None
-        remaining_content = ""
-
-        for section in all_section_names:
-            patterns = [
-                pattern.format(section=re.escape(section)) for pattern in SECTION_DETECTION_PATTERNS
-            ]
-
-            for pattern in patterns:
-                match = re.match(pattern, line)
-                if match:
-                    if section in section_aliases:
-                        detected_section = section_aliases[section]
-                    else:
-                        detected_section = section
-
-                    if match.groups():
-                        remaining_content = match.group(1).strip()
-                    else:
-                        remaining_content = ""
-
-                    found_section = True
-                    break
-
-            if found_section:
-                break
-
-        if found_section:
-            current_section = detected_section
-            if remaining_content and current_section:
-                sections[current_section] = remaining_content
-        elif current_section and line:
-            if sections[current_section]:
-                sections[current_section] += "\n" + line
+            return
+
+        heading = self._parser.classify(line)
+        if heading:
+            self._current, content = heading
+            if content:
+                self._sections[self._current] = content
+        elif self._current:
+            if self._sections[self._current]:
+                self._sections[self._current] += "\n" + line
             else:
-                sections[current_section] = line
+                self._sections[self._current] = line
+
+    def result(self) -> dict[str, str]:
+        return {k: self._sections.get(k, "") for k in self._parser.section_names}
+
+
+class SectionStreamParser:
+    """チャンク単位で受け取りながらセクションを解析するパーサー（未完の行は次のチャンクまで保留）"""
+
+    def __init__(self, parser: SectionParser | None = None):
+        self._accumulator = _SectionAccumulator(parser or get_section_parser())
+        self._pending = ""
+
+    def feed(self, chunk: str) -> dict[str, str]:
+        """チャンクを追加し、確定した行までの解析結果を返す"""
+        *lines, self._pending = (self._pending + chunk).split('\n')
+        for line in lines:
+            self._accumulator.add_line(line)
+        return self._accumulator.result()
 
-    return {k: sections.get(k, "") for k in DEFAULT_SECTION_NAMES}
+    def close(self) -> dict[str, str]:
+        """残りの行を解析して最終結果を返す"""
+        self._accumulator.add_line(self._pending)
+        self._pending = ""
+        return self._accumulator.result()
+
+
+@lru_cache(maxsize=32)
+def _compile_section_parser(
+    section_names: tuple[str, ...],
+    aliases: tuple[tuple[str, str], ...],
+    patterns: tuple[str, ...],
+) -> SectionParser:
+    return SectionParser(section_names, dict(aliases), patterns)
+
+
+def get_section_parser(section_names: Sequence[str] | None = None) -> SectionParser:
+    """セクション構成ごとにコンパイル済みのパーサーを取得"""
+    return _compile_section_parser(
+        tuple(section_names if section_names is not None else DEFAULT_SECTION_NAMES),
+        tuple(section_aliases.items()),
+        tuple(SECTION_DETECTION_PATTERNS),
+    )
+
+
+def parse_output_summary(summary_text: str) -> dict[str, str]:
+    """AI出力をセクションごとに分割してパース"""
+    return get_section_parser().parse(summary_text)
@@ -8,6 +8,7 @@ import type {
     DoctorsResponse,
     SelectedModelResponse,
     SSECompleteEvent,
+    SSEDeltaEvent,
     SSEErrorEvent,
     SSEEvaluationCompleteEvent
 } from './types';
@@ -20,6 +21,7 @@ interface AppState {
     form: FormData;
     result: GenerationResult;
     isGenerating: boolean;
+    streamingText: string;
     elapsedTime: number;
     timerInterval: ReturnType<typeof setInterval> | null;
     showCopySuccess: boolean;
@@ -96,6 +98,7 @@ export function appState(): AppState {
 
         // UI state
         isGenerating: false,
+        streamingText: '',
         elapsedTime: 0,
         timerInterval: null,
         showCopySuccess: false,
@@ -188,6 +191,7 @@ export function appState(): AppState {
             }
 
             this.isGenerating = true;
+            this.streamingText = '';
             this.error = null;
             this.startTimer();
 
@@ -288,6 +292,9 @@ export function appState(): AppState {
                 case 'progress':
                     // ハートビート - UIのステータス表示を更新可能
                     break;
+                case 'delta':
+                    this.streamingText += (parsed as SSEDeltaEvent).text || '';
+                    break;
                 case 'complete':
                     if ((parsed as SSECompleteEvent).success) {
                         const completeData = parsed as SSECompleteEvent;
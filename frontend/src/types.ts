@@ -59,6 +59,12 @@ export interface SelectedModelResponse {
 export interface SSEProgressEvent {
     status: string;
     message: string;
+    position?: number;
+    estimated_wait?: number;
+}
+
+export interface SSEDeltaEvent {
+    text: string;
 }
 
 export interface SSECompleteEvent {
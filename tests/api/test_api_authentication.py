@@ -111,3 +111,19 @@ class TestCsrfAuthentication:
             headers=csrf_headers,
         )
         assert response.status_code == 200
+
+    def test_health_metrics_require_csrf(self, client: TestClient, csrf_headers):
+        """運用状況のエンドポイントはCSRF認証必須（/health自体は公開）"""
+        assert client.get("/health").status_code == 200
+
+        for path in [
+            "/health/connections",
+            "/health/admission",
+            "/health/batch-worker",
+            "/health/circuit-breakers",
+            "/health/rate-limits",
+            "/health/routing",
+            "/health/usage-writer",
+        ]:
+            assert client.get(path).status_code == 401
+            assert client.get(path, headers=csrf_headers).status_code == 200
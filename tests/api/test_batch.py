@@ -0,0 +1,118 @@
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from fastapi import status
+from sqlalchemy.orm import sessionmaker
+
+from app.schemas.summary import SummaryResponse
+from app.services.batch_worker import BatchWorker
+
+JSONL = (
+    '{"medical_text": "患者は60歳男性", "department": "眼科", "document_type": "返書"}\n'
+    '{"medical_text": "患者は45歳女性"}\n'
+)
+
+
+def _upload(client, headers, content: str = JSONL, filename: str = "charts.jsonl"):
+    return client.post(
+        "/api/batch/jobs",
+        files={"file": (filename, content.encode("utf-8"), "application/x-ndjson")},
+        headers=headers,
+    )
+
+
+def _session_factory(test_db):
+    """テスト用DBに書き込むセッションファクトリ（get_db_sessionの代わり）"""
+    Session = sessionmaker(bind=test_db.get_bind())
+
+    @contextmanager
+    def factory():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    return factory
+
+
+def _run_worker(test_db):
+    """テスト用DBに対して偽の生成でワーカーを1巡させる"""
+    factory = _session_factory(test_db)
+
+    def generate(**kwargs):
+        return SummaryResponse(
+            success=True,
+            output_summary=f"{kwargs['document_type']}: {kwargs['medical_text']}",
+            parsed_summary={},
+            input_tokens=100,
+            output_tokens=50,
+            processing_time=1.0,
+            model_used="Claude",
+            model_switched=False,
+        )
+
+    worker = BatchWorker(session_factory=factory, generate=generate)
+    while worker.run_once():
+        pass
+
+
+def test_create_batch_job(client, test_db, csrf_headers):
+    """バッチ生成API - 登録すると202とジョブIDを返す"""
+    response = _upload(client, csrf_headers)
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    data = response.json()
+    assert data["status"] == "queued"
+    assert data["total_items"] == 2
+    assert data["pending"] == 2
+
+
+def test_batch_job_progress_and_results(client, test_db, csrf_headers):
+    """バッチ生成API - 処理後は進捗が100%になり、結果を行番号順に取得できる"""
+    job_id = _upload(client, csrf_headers).json()["job_id"]
+    _run_worker(test_db)
+
+    job = client.get(f"/api/batch/jobs/{job_id}", headers=csrf_headers).json()
+    with patch("app.services.batch_service.get_db_session", _session_factory(test_db)):
+        results = client.get(f"/api/batch/jobs/{job_id}/results", headers=csrf_headers)
+
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
+    assert results.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in results.text.splitlines()]
+    assert [line["line_no"] for line in lines] == [1, 2]
+    assert lines[0]["result"]["output_summary"] == "返書: 患者は60歳男性"
+
+
+def test_create_batch_job_csv(client, test_db, csrf_headers):
+    """バッチ生成API - CSVも受け付ける"""
+    content = "medical_text,department\n患者は60歳男性,眼科\n"
+
+    response = _upload(client, csrf_headers, content, filename="charts.csv")
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["total_items"] == 1
+
+
+def test_create_batch_job_invalid(client, test_db, csrf_headers):
+    """バッチ生成API - 不正な行があれば400と行番号"""
+    response = _upload(client, csrf_headers, '{"medical_text": ""}\n')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "1行目" in response.json()["detail"]
+
+
+def test_batch_job_not_found(client, test_db, csrf_headers):
+    """バッチ生成API - 存在しないジョブは404"""
+    assert client.get("/api/batch/jobs/unknown", headers=csrf_headers).status_code == 404
+    assert client.get("/api/batch/jobs/unknown/results", headers=csrf_headers).status_code == 404
+
+
+def test_batch_csrf_required(client, test_db):
+    """バッチ生成API - CSRF認証必須"""
+    response = _upload(client, {})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -1,10 +1,11 @@
 from datetime import datetime
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import status
 
 from app.schemas.evaluation import EvaluationResponse
+from app.services.admission import AdmissionController, enter_admission, set_admission_controller
 
 
 @pytest.fixture
@@ -47,7 +48,7 @@ def mock_evaluation_prompt():
 
 def test_evaluate_output_success(client, test_db, csrf_headers, mock_evaluation_result_success):
     """評価実行API - 正常系"""
-    with patch("app.api.evaluation.evaluation_service.execute_evaluation") as mock_execute:
+    with patch("app.api.evaluation.evaluation_service.execute_evaluation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_evaluation_result_success
 
         payload = {
@@ -74,7 +75,7 @@ def test_evaluate_output_success(client, test_db, csrf_headers, mock_evaluation_
 
 def test_evaluate_output_no_output_error(client, test_db, csrf_headers, mock_evaluation_result_failure):
     """評価実行API - 出力なしエラー"""
-    with patch("app.api.evaluation.evaluation_service.execute_evaluation") as mock_execute:
+    with patch("app.api.evaluation.evaluation_service.execute_evaluation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_evaluation_result_failure
 
         payload = {
@@ -106,7 +107,7 @@ def test_evaluate_output_model_missing_error(client, test_db, csrf_headers):
         error_message="GEMINI_EVALUATION_MODEL環境変数が設定されていません",
     )
 
-    with patch("app.api.evaluation.evaluation_service.execute_evaluation") as mock_execute:
+    with patch("app.api.evaluation.evaluation_service.execute_evaluation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = error_result
 
         payload = {
@@ -125,6 +126,33 @@ def test_evaluate_output_model_missing_error(client, test_db, csrf_headers):
         assert "GEMINI_EVALUATION_MODEL" in data["error_message"]
 
 
+def test_evaluate_output_queue_full(client, test_db, csrf_headers):
+    """評価実行API - 待ち行列が満杯なら評価せずに503とRetry-After"""
+    set_admission_controller(AdmissionController(concurrency={"gemini": 1}, max_queue=0))
+    running = enter_admission("gemini")
+
+    with patch(
+        "app.services.evaluation_service._prepare_evaluation", return_value=("評価プロンプト", None)
+    ), patch(
+        "app.services.evaluation_service._run_async_evaluation", new_callable=AsyncMock
+    ) as mock_run:
+        payload = {
+            "document_type": "他院への紹介",
+            "input_text": "患者情報",
+            "current_prescription": "",
+            "additional_info": "",
+            "output_summary": "出力内容",
+        }
+
+        response = client.post("/api/evaluation/evaluate", json=payload, headers=csrf_headers)
+
+    running.release()
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "30"
+    assert response.json()["success"] is False
+    mock_run.assert_not_awaited()
+
+
 def test_get_all_evaluation_prompts(client, test_db, mock_evaluation_prompt):
     """全プロンプト取得API - 正常系"""
     with patch("app.api.evaluation.evaluation_prompt_service.get_all_evaluation_prompts") as mock_get_all:
@@ -296,7 +324,7 @@ def test_save_evaluation_prompt_missing_required_field(client, test_db, csrf_hea
 def test_evaluate_output_stream_success(client, test_db, csrf_headers):
     """SSEストリーミング評価API - 正常系"""
 
-    def mock_stream():
+    async def mock_stream():
         yield 'event: progress\ndata: {"status": "evaluating", "message": "評価中..."}\n\n'
         yield 'event: complete\ndata: {"success": true, "evaluation_result": "評価結果: 良好です", "input_tokens": 1000, "output_tokens": 500, "processing_time": 2.5}\n\n'
 
@@ -318,7 +346,7 @@ def test_evaluate_output_stream_success(client, test_db, csrf_headers):
 def test_evaluate_output_stream_error(client, test_db, csrf_headers):
     """SSEストリーミング評価API - エラー"""
 
-    def mock_stream():
+    async def mock_stream():
         yield 'event: error\ndata: {"success": false, "error_message": "評価対象の出力がありません"}\n\n'
 
     with patch("app.api.evaluation.execute_evaluation_stream", return_value=mock_stream()):
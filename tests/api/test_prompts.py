@@ -74,3 +74,37 @@ def test_delete_prompt_not_found(client, test_db, csrf_headers):
     response = client.delete("/api/prompts/9999", headers=csrf_headers)
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert "not found" in response.json()["detail"].lower()
+
+
+def test_create_prompt_refreshes_selected_model(client, sample_prompts, csrf_headers):
+    """プロンプト作成 - 選択モデル取得にキャッシュ済みの古い値が残らない"""
+    params = {"department": "眼科", "document_type": "他院への紹介", "doctor": "橋本義弘"}
+    response = client.get("/api/settings/selected-model", params=params)
+    assert response.json()["selected_model"] == "Claude"
+
+    payload = {**params, "content": "更新されたプロンプト", "selected_model": "Gemini_Pro"}
+    response = client.post("/api/prompts/", json=payload, headers=csrf_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/api/settings/selected-model", params=params)
+    assert response.json()["selected_model"] == "Gemini_Pro"
+
+
+def test_list_effective_prompts(client, sample_prompts):
+    """適用プロンプト一覧 - 医師・文書タイプごとの解決結果"""
+    response = client.get("/api/prompts/effective", params={"department": "眼科"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    # 医師2名 × 文書タイプ4種
+    assert len(data) == 8
+
+    by_key = {(item["doctor"], item["document_type"]): item for item in data}
+    doctor_level = by_key[("橋本義弘", "他院への紹介")]
+    assert doctor_level["prompt_id"] == sample_prompts[1].id
+    assert doctor_level["selected_model"] == "Claude"
+
+    fallback = by_key[("default", "他院への紹介")]
+    assert fallback["prompt_id"] == sample_prompts[0].id
+    assert fallback["source_department"] == "default"
+
+    assert by_key[("橋本義弘", "返書")]["prompt_id"] is None
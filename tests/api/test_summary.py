@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi import status
@@ -57,7 +57,7 @@ def mock_summary_result_model_switched():
 
 def test_generate_summary_success(client, test_db, csrf_headers, mock_summary_result_success):
     """文書生成API - 正常系"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_summary_result_success
 
         payload = {
@@ -91,7 +91,7 @@ def test_generate_summary_success(client, test_db, csrf_headers, mock_summary_re
 
 def test_generate_summary_validation_error(client, test_db, csrf_headers, mock_summary_result_failure):
     """文書生成API - 検証エラー"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_summary_result_failure
 
         # 空文字列はPydanticでバリデーションエラー（422）になるため、
@@ -120,7 +120,7 @@ def test_generate_summary_validation_error(client, test_db, csrf_headers, mock_s
 
 def test_generate_summary_model_switched(client, test_db, csrf_headers, mock_summary_result_model_switched):
     """文書生成API - モデル自動切り替え"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_summary_result_model_switched
 
         # 長い入力テキスト（40,000文字超を想定）
@@ -162,7 +162,7 @@ def test_generate_summary_missing_required_field(client, test_db, csrf_headers):
 
 def test_generate_summary_all_optional_fields(client, test_db, csrf_headers, mock_summary_result_success):
     """文書生成API - オプションフィールドすべて省略"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_summary_result_success
 
         payload = {
@@ -247,21 +247,21 @@ def test_get_available_models_none(client, test_db):
 
 def test_generate_summary_with_exception(client, test_db, csrf_headers):
     """文書生成API - 例外処理"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.side_effect = Exception("予期しないエラー")
 
         payload = {
             "medical_text": "テストデータ",
         }
 
-        # execute_summary_generation が例外を投げた場合、FastAPIが500エラーを返す
+        # execute_summary_generation_async が例外を投げた場合、FastAPIが500エラーを返す
         with pytest.raises(Exception):
             client.post("/api/summary/generate", json=payload, headers=csrf_headers)
 
 
 def test_generate_summary_model_explicitly_selected(client, test_db, csrf_headers, mock_summary_result_success):
     """文書生成API - モデルが明示的に選択された場合"""
-    with patch("app.api.summary.execute_summary_generation") as mock_execute:
+    with patch("app.api.summary.execute_summary_generation_async", new_callable=AsyncMock) as mock_execute:
         mock_execute.return_value = mock_summary_result_success
 
         payload = {
@@ -5,6 +5,7 @@ from fastapi import status
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.admission import AdmissionController, enter_admission, set_admission_controller
 
 
 @pytest.fixture
@@ -20,7 +21,7 @@ def mock_csrf_token():
 def test_generate_summary_stream_success(client, mock_csrf_token):
     """SSEストリーミング文書生成API - 正常系"""
 
-    def mock_stream():
+    async def mock_stream():
         yield 'event: progress\ndata: {"status": "generating", "message": "文書を生成中..."}\n\n'
         yield 'event: complete\ndata: {"success": true, "output_summary": "生成された文書", "parsed_summary": {}, "input_tokens": 100, "output_tokens": 200, "processing_time": 1.5, "model_used": "Claude", "model_switched": false}\n\n'
 
@@ -58,3 +59,26 @@ def test_generate_summary_stream_csrf_required(client):
 
     # CSRF認証がないため401が返る
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_generate_summary_stream_queue_full(client, mock_csrf_token):
+    """SSEストリーミングAPI - 待ち行列が満杯ならストリームを始めずに503とRetry-After"""
+    set_admission_controller(AdmissionController(concurrency={"claude": 1}, max_queue=0))
+    running = enter_admission("claude")
+
+    async def mock_stream():
+        with enter_admission("claude"):
+            yield 'event: progress\ndata: {"status": "starting"}\n\n'
+
+    with patch("app.api.summary.execute_summary_generation_stream", return_value=mock_stream()):
+        with patch("app.core.security.verify_csrf_token", return_value=True):
+            response = client.post(
+                "/api/summary/generate-stream",
+                json={"medical_text": "患者は60歳男性", "model": "Claude"},
+                headers={"X-CSRF-Token": mock_csrf_token}
+            )
+
+    running.release()
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "30"
+    assert response.json()["success"] is False
@@ -1,6 +1,8 @@
+from contextlib import nullcontext
 from datetime import datetime
 import sys
 from pathlib import Path
+from unittest.mock import MagicMock
 from zoneinfo import ZoneInfo
 
 import pytest
@@ -16,6 +18,20 @@ sys.path.insert(0, str(project_root))
 from app.core.config import Settings, get_settings
 from app.core.database import get_db
 from app.core.security import generate_csrf_token
+from app.external.api_factory import invalidate_clients
+from app.external.circuit_breaker import set_circuit_breakers
+from app.external.rate_limiter import BackoffPolicy, RateLimiterRegistry, set_rate_limiters
+from app.external.gemini_api import clear_context_caches
+from app.services import cache_invalidation
+from app.services.admission import set_admission_controller
+from app.services.generation_cache import set_generation_cache
+from app.services.evaluation_prompt_service import invalidate_evaluation_prompt_cache
+from app.services.input_preparation import clear_scan_cache
+from app.services.prompt_service import invalidate_prompt_cache
+from app.services.model_router import ModelRouter, set_model_router
+from app.services.single_flight import SingleFlight, set_single_flight
+from app.services.token_estimator import TokenCalibration, set_token_calibration
+from app.services.usage_writer import UsageWriter, set_usage_writer
 from app.main import app
 from app.models.base import Base
 from app.models.prompt import Prompt
@@ -35,6 +51,115 @@ def override_settings(monkeypatch):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function", autouse=True)
+def reset_client_pool():
+    """テスト間でプール済みAPIクライアントを共有しない"""
+    yield
+    invalidate_clients()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_circuit_breakers():
+    """テスト間でサーキットブレーカーの状態を共有しない"""
+    set_circuit_breakers(None)
+    yield
+    set_circuit_breakers(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def disable_rate_limits():
+    """レート制限・レート制限時の再試行はしない（使うテストは個別に差し替える）"""
+    set_rate_limiters(RateLimiterRegistry(backoff=BackoffPolicy(max_retries=0)))
+    yield
+    set_rate_limiters(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_admission_controller():
+    """テスト間で実行枠・待ち行列を共有しない"""
+    set_admission_controller(None)
+    yield
+    set_admission_controller(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_context_caches():
+    """テスト間で作成済みGeminiコンテキストキャッシュの記録を共有しない"""
+    yield
+    clear_context_caches()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_prompt_cache():
+    """テスト間で解決済みプロンプトのキャッシュを共有しない"""
+    invalidate_prompt_cache()
+    invalidate_evaluation_prompt_cache()
+    yield
+    invalidate_prompt_cache()
+    invalidate_evaluation_prompt_cache()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_scan_cache():
+    """テスト間でインジェクション検出結果のキャッシュを共有しない"""
+    clear_scan_cache()
+    yield
+    clear_scan_cache()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def disable_generation_cache():
+    """生成結果キャッシュは無効にする（キャッシュを使うテストは個別に差し替える）"""
+    set_generation_cache(None)
+    yield
+    set_generation_cache(None, configured=False)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_single_flight():
+    """進行中の生成はテストのイベントループごとに管理する"""
+    set_single_flight(SingleFlight())
+    yield
+
+
+@pytest.fixture(scope="function", autouse=True)
+def disable_token_calibration():
+    """推定トークン数は補正しない（使用統計のDBを参照しない）"""
+    set_token_calibration(TokenCalibration(ttl=0))
+    yield
+    set_token_calibration(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_model_router():
+    """モデル選択の統計はテストごとに空から始める（使用統計のDBで初期化しない）"""
+    set_model_router(ModelRouter(session_factory=None))
+    yield
+    set_model_router(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def in_memory_invalidation_bus():
+    """キャッシュ無効化通知はプロセス内バスで配信（テストはSQLiteのため）"""
+    bus = cache_invalidation.InMemoryInvalidationBus()
+    cache_invalidation.set_bus(bus)
+    yield bus
+    cache_invalidation.set_bus(None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def usage_writer(tmp_path):
+    """使用統計の書き込み先をテスト用に差し替える（実DBや作業ディレクトリに書き込まない）"""
+    writer = UsageWriter(
+        session_factory=lambda: nullcontext(MagicMock()),
+        spill_path=tmp_path / "usage_spill.jsonl",
+    )
+    set_usage_writer(writer)
+    yield writer
+    writer.shutdown()
+    set_usage_writer(None)
+
+
 @pytest.fixture(scope="function")
 def test_db():
     """テスト用のインメモリSQLiteデータベース"""
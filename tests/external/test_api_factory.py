@@ -4,13 +4,17 @@ import pytest
 
 from app.external.api_factory import (
     APIProvider,
+    create_async_client,
     create_client,
     generate_summary_with_provider,
+    get_client_pool_stats,
+    invalidate_clients,
+    shutdown_clients,
 )
-from app.external.claude_api import ClaudeAPIClient
-from app.external.cloudflare_claude_api import CloudflareClaudeAPIClient
-from app.external.cloudflare_gemini_api import CloudflareGeminiAPIClient
-from app.external.gemini_api import GeminiAPIClient
+from app.external.claude_api import AsyncClaudeAPIClient, ClaudeAPIClient
+from app.external.cloudflare_claude_api import AsyncCloudflareClaudeAPIClient, CloudflareClaudeAPIClient
+from app.external.cloudflare_gemini_api import AsyncCloudflareGeminiAPIClient, CloudflareGeminiAPIClient
+from app.external.gemini_api import AsyncGeminiAPIClient, GeminiAPIClient
 from app.utils.exceptions import APIError
 
 
@@ -33,6 +37,33 @@ class TestAPIProvider:
             APIProvider("invalid")
 
 
+class TestCreateAsyncClient:
+    """create_async_client 関数のテスト"""
+
+    @pytest.mark.parametrize("provider,use_cloudflare,expected", [
+        ("claude", False, AsyncClaudeAPIClient),
+        ("claude", True, AsyncCloudflareClaudeAPIClient),
+        ("gemini", False, AsyncGeminiAPIClient),
+        ("gemini", True, AsyncCloudflareGeminiAPIClient),
+    ])
+    @patch("app.external.api_factory.get_settings")
+    def test_create_async_client(self, mock_get_settings, provider, use_cloudflare, expected):
+        """非同期クライアント作成 - プロバイダーとCloudflare設定で切り替え"""
+        mock_settings = MagicMock()
+        mock_settings.cloudflare_account_id = "test-account" if use_cloudflare else None
+        mock_settings.cloudflare_gateway_id = "test-gateway" if use_cloudflare else None
+        mock_settings.cloudflare_aig_token = "test-token" if use_cloudflare else None
+        mock_get_settings.return_value = mock_settings
+
+        client = create_async_client(provider)
+        assert isinstance(client, expected)
+
+    def test_create_async_client_invalid_provider(self):
+        """非同期クライアント作成 - 無効なプロバイダー"""
+        with pytest.raises(APIError):
+            create_async_client("invalid")
+
+
 class TestCreateClient:
     """create_client 関数のテスト"""
 
@@ -303,8 +334,8 @@ class TestEdgeCases:
     """API Factory 関数のエッジケース"""
 
     @patch("app.external.api_factory.get_settings")
-    def test_create_multiple_clients_independence(self, mock_get_settings):
-        """複数クライアント作成 - 独立性確認"""
+    def test_create_multiple_clients_reuses_pooled_client(self, mock_get_settings):
+        """複数クライアント作成 - 同一設定ではプール済みクライアントを再利用"""
         mock_settings = MagicMock()
         mock_settings.cloudflare_account_id = None
         mock_settings.cloudflare_gateway_id = None
@@ -314,9 +345,8 @@ class TestEdgeCases:
         client1 = create_client("claude")
         client2 = create_client("claude")
 
-        assert client1 is not client2
+        assert client1 is client2
         assert isinstance(client1, ClaudeAPIClient)
-        assert isinstance(client2, ClaudeAPIClient)
 
     @patch("app.external.api_factory.get_settings")
     def test_create_different_clients(self, mock_get_settings):
@@ -385,3 +415,66 @@ class TestEdgeCases:
 
         call_args = mock_generate.call_args[0]
         assert call_args[7] is None
+
+
+class TestClientPooling:
+    """create_client のクライアントプールのテスト"""
+
+    @patch("app.external.api_factory.get_settings")
+    def test_settings_change_rebuilds_client(self, mock_get_settings):
+        """認証情報が変わると新しいクライアントを生成"""
+        mock_settings = MagicMock()
+        mock_settings.cloudflare_account_id = "test-account"
+        mock_settings.cloudflare_gateway_id = "test-gateway"
+        mock_settings.cloudflare_aig_token = "token-1"
+        mock_get_settings.return_value = mock_settings
+
+        client1 = create_client("gemini")
+        mock_settings.cloudflare_aig_token = "token-2"
+        client2 = create_client("gemini")
+
+        assert client1 is not client2
+        assert get_client_pool_stats()["size"] == 1
+
+    @patch("app.external.api_factory.get_settings")
+    def test_invalidate_clients(self, mock_get_settings):
+        """明示的な破棄後は新しいクライアントを生成"""
+        mock_settings = MagicMock()
+        mock_settings.cloudflare_account_id = None
+        mock_settings.cloudflare_gateway_id = None
+        mock_settings.cloudflare_aig_token = None
+        mock_get_settings.return_value = mock_settings
+
+        client1 = create_client(APIProvider.GEMINI)
+        assert invalidate_clients(APIProvider.GEMINI) == 1
+        client2 = create_client(APIProvider.GEMINI)
+
+        assert client1 is not client2
+
+    @patch("app.external.api_factory.get_settings")
+    def test_sync_and_async_clients_are_pooled_separately(self, mock_get_settings):
+        """同期・非同期クライアントは別々にプールされる"""
+        mock_settings = MagicMock()
+        mock_settings.cloudflare_account_id = None
+        mock_settings.cloudflare_gateway_id = None
+        mock_settings.cloudflare_aig_token = None
+        mock_get_settings.return_value = mock_settings
+
+        assert isinstance(create_client("claude"), ClaudeAPIClient)
+        assert isinstance(create_async_client("claude"), AsyncClaudeAPIClient)
+        assert get_client_pool_stats()["size"] == 2
+
+    @pytest.mark.asyncio
+    @patch("app.external.api_factory.get_settings")
+    async def test_shutdown_clients(self, mock_get_settings):
+        """終了処理でプールが空になる"""
+        mock_settings = MagicMock()
+        mock_settings.cloudflare_account_id = None
+        mock_settings.cloudflare_gateway_id = None
+        mock_settings.cloudflare_aig_token = None
+        mock_get_settings.return_value = mock_settings
+
+        create_client("claude")
+        await shutdown_clients()
+
+        assert get_client_pool_stats()["size"] == 0
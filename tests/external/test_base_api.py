@@ -3,7 +3,8 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from app.core.constants import DEFAULT_DOCUMENT_TYPE
-from app.external.base_api import BaseAPIClient
+from app.external.base_api import BaseAPIClient, GenerationResult, SummaryPrompt
+from app.services.prompt_service import ResolvedPrompt
 from app.utils.exceptions import APIError
 
 
@@ -45,13 +46,13 @@ class TestBaseAPIClientInitialization:
 class TestCreateSummaryPrompt:
     """create_summary_prompt メソッドのテスト"""
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_create_summary_prompt_minimal(self, mock_db_session, mock_get_prompt):
+    def test_create_summary_prompt_minimal(self, mock_db_session, mock_resolve_prompt):
         """プロンプト生成 - 最小パラメータ"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(medical_text="患者情報")
@@ -61,13 +62,13 @@ class TestCreateSummaryPrompt:
         assert "患者情報" in prompt
         assert "【追加情報】" in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_create_summary_prompt_all_params(self, mock_db_session, mock_get_prompt):
+    def test_create_summary_prompt_all_params(self, mock_db_session, mock_resolve_prompt):
         """プロンプト生成 - 全パラメータ"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(
@@ -88,15 +89,15 @@ class TestCreateSummaryPrompt:
         assert "処方内容" in prompt
         assert "【追加情報】追加情報" in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_empty_optional_fields(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - 空のオプションフィールド"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(medical_text="データ")
@@ -110,15 +111,15 @@ class TestCreateSummaryPrompt:
         # 追加情報は空でも含まれる
         assert "【追加情報】" in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_whitespace_optional_fields(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - 空白のみのオプションフィールド"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(
@@ -133,9 +134,9 @@ class TestCreateSummaryPrompt:
         assert "【紹介目的】\n  \n  " not in prompt
         assert "【現在の処方】\n\t" not in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_create_summary_prompt_with_custom_prompt(self, mock_db_session, mock_get_prompt):
+    def test_create_summary_prompt_with_custom_prompt(self, mock_db_session, mock_resolve_prompt):
         """プロンプト生成 - カスタムプロンプト使用"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
@@ -143,7 +144,7 @@ class TestCreateSummaryPrompt:
         mock_prompt = MagicMock()
         mock_prompt.content = "カスタムプロンプトテンプレート"
         mock_prompt.selected_model = "gemini-1.5-pro-002"
-        mock_get_prompt.return_value = mock_prompt
+        mock_resolve_prompt.return_value = mock_prompt
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(
@@ -157,23 +158,23 @@ class TestCreateSummaryPrompt:
         assert "【カルテ情報】" in prompt
         assert "データ" in prompt
 
-        # get_prompt が呼ばれたことを確認
-        assert mock_get_prompt.called
-        call_args = mock_get_prompt.call_args[0]
+        # resolve_prompt が呼ばれたことを確認
+        assert mock_resolve_prompt.called
+        call_args = mock_resolve_prompt.call_args[0]
         # 第1引数はdbセッション、第2-4引数はdepartment, document_type, doctor
         assert call_args[1] == "眼科"
         assert call_args[2] == "他院への紹介"
         assert call_args[3] == "橋本義弘"
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_fallback_to_default(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - デフォルトプロンプトへのフォールバック"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(medical_text="テスト", department="眼科", document_type="他院への紹介")
@@ -183,22 +184,22 @@ class TestCreateSummaryPrompt:
         assert "【カルテ情報】" in prompt
         assert "テスト" in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_default_document_type(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - デフォルト文書タイプ使用"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         prompt = client.create_summary_prompt(medical_text="データ")
 
-        # get_promptが呼ばれ、DEFAULT_DOCUMENT_TYPEで呼ばれることを確認
-        assert mock_get_prompt.called
-        call_args = mock_get_prompt.call_args[0]
+        # resolve_promptが呼ばれ、DEFAULT_DOCUMENT_TYPEで呼ばれることを確認
+        assert mock_resolve_prompt.called
+        call_args = mock_resolve_prompt.call_args[0]
         assert call_args[1] == "default"
         assert call_args[2] == DEFAULT_DOCUMENT_TYPE
         assert call_args[3] == "default"
@@ -291,13 +292,13 @@ class TestGetModelName:
 class TestGenerateSummary:
     """generate_summary メソッドのテスト"""
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_generate_summary_success(self, mock_db_session, mock_get_prompt):
+    def test_generate_summary_success(self, mock_db_session, mock_resolve_prompt):
         """文書生成 - 正常系"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         result = client.generate_summary(medical_text="患者情報", additional_info="追加情報",
@@ -307,13 +308,13 @@ class TestGenerateSummary:
         assert result == ("生成されたテキスト", 1000, 500)
         assert client.initialized is True
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_generate_summary_with_model_name(self, mock_db_session, mock_get_prompt):
+    def test_generate_summary_with_model_name(self, mock_db_session, mock_resolve_prompt):
         """文書生成 - model_name 指定"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         result = client.generate_summary(
@@ -323,9 +324,9 @@ class TestGenerateSummary:
 
         assert result == ("生成されたテキスト", 1000, 500)
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_generate_summary_without_model_name(self, mock_db_session, mock_get_prompt):
+    def test_generate_summary_without_model_name(self, mock_db_session, mock_resolve_prompt):
         """文書生成 - model_name なし（デフォルト使用）"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
@@ -333,7 +334,7 @@ class TestGenerateSummary:
         mock_prompt = MagicMock()
         mock_prompt.content = "プロンプト"
         mock_prompt.selected_model = "gemini-1.5-pro-002"
-        mock_get_prompt.return_value = mock_prompt
+        mock_resolve_prompt.return_value = mock_prompt
 
         client = MockAPIClient(default_model="default-model")
         result = client.generate_summary(
@@ -359,10 +360,36 @@ class TestGenerateSummary:
 
         assert "初期化エラー" in str(exc_info.value)
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
+    @patch("app.external.base_api.get_db_session")
+    def test_generate_summary_initializes_once(self, mock_db_session, mock_resolve_prompt):
+        """文書生成 - 再利用時はinitializeを繰り返さない"""
+        mock_db_session.return_value.__enter__.return_value = MagicMock()
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
+
+        client = MockAPIClient()
+        client.initialize = MagicMock(return_value=True)
+
+        client.generate_summary(medical_text="データ", model_name="test-model")
+        client.generate_summary(medical_text="データ", model_name="test-model")
+
+        client.initialize.assert_called_once()
+
+    def test_generate_summary_retries_initialize_after_failure(self):
+        """文書生成 - 初期化失敗後は次回呼び出しで再度初期化する"""
+        client = MockAPIClient()
+        client.initialize = MagicMock(side_effect=[APIError("初期化エラー"), True])
+
+        with pytest.raises(APIError):
+            client.ensure_initialized()
+        client.ensure_initialized()
+
+        assert client.initialize.call_count == 2
+
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_generate_summary_generate_content_failure(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """文書生成 - コンテンツ生成失敗"""
 
@@ -372,7 +399,7 @@ class TestGenerateSummary:
 
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = FailingGenerateClient()
 
@@ -382,10 +409,10 @@ class TestGenerateSummary:
         assert "FailingGenerateClient" in str(exc_info.value)
         assert "生成エラー" in str(exc_info.value)
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_generate_summary_api_error_propagation(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """文書生成 - APIError の伝播"""
 
@@ -395,7 +422,7 @@ class TestGenerateSummary:
 
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = APIErrorClient()
 
@@ -405,13 +432,13 @@ class TestGenerateSummary:
         # APIError はそのまま伝播される
         assert "API呼び出しエラー" in str(exc_info.value)
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
-    def test_generate_summary_minimal_params(self, mock_db_session, mock_get_prompt):
+    def test_generate_summary_minimal_params(self, mock_db_session, mock_resolve_prompt):
         """文書生成 - 最小パラメータ"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         client = MockAPIClient()
         result = client.generate_summary(medical_text="最小データ")
@@ -452,15 +479,15 @@ class TestBaseAPIClientAbstractMethods:
 class TestBaseAPIClientEdgeCases:
     """BaseAPIClient のエッジケース"""
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_very_long_medical_text(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - 非常に長いカルテ情報"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         long_text = "あ" * 100000
         client = MockAPIClient()
@@ -469,15 +496,15 @@ class TestBaseAPIClientEdgeCases:
         assert "以下のカルテ情報を要約してください" in prompt
         assert long_text in prompt
 
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     def test_create_summary_prompt_special_characters(
-        self, mock_db_session, mock_get_prompt
+        self, mock_db_session, mock_resolve_prompt
     ):
         """プロンプト生成 - 特殊文字を含むテキスト"""
         mock_db = MagicMock()
         mock_db_session.return_value.__enter__.return_value = mock_db
-        mock_get_prompt.return_value = None
+        mock_resolve_prompt.return_value = ResolvedPrompt(content=None, selected_model=None)
 
         special_text = "特殊文字: \n\t\r\n!@#$%^&*(){}[]<>?/\\|`~"
         client = MockAPIClient()
@@ -502,3 +529,69 @@ class TestBaseAPIClientEdgeCases:
         )
 
         assert model_name == "fallback-model"
+
+
+class TestSummaryPromptParts:
+    """テンプレート部分と可変部分に分けたプロンプトのテスト"""
+
+    def test_create_summary_prompt_splits_template_prefix(self):
+        """プロンプト生成 - テンプレートを先頭の固定部分として分離"""
+        client = MockAPIClient()
+        prompt = client.create_summary_prompt(
+            medical_text="患者情報",
+            referral_purpose="精査",
+            prompt_template="眼科用プロンプト",
+        )
+
+        assert isinstance(prompt, SummaryPrompt)
+        assert prompt.prefix == "眼科用プロンプト"
+        assert prompt.body == "【カルテ情報】\n患者情報\n【紹介目的】\n精査\n【追加情報】"
+        # 文字列としては従来と同じ全文
+        assert prompt == "眼科用プロンプト\n【カルテ情報】\n患者情報\n【紹介目的】\n精査\n【追加情報】"
+
+    def test_same_template_same_prefix(self):
+        """プロンプト生成 - カルテが異なっても同じテンプレートなら固定部分は同一"""
+        client = MockAPIClient()
+        first = client.create_summary_prompt(medical_text="患者A", prompt_template="テンプレート")
+        second = client.create_summary_prompt(medical_text="患者B", prompt_template="テンプレート")
+
+        assert first.prefix == second.prefix
+        assert first.body != second.body
+
+
+class TestGenerationResult:
+    """GenerationResult のテスト"""
+
+    def test_unpacks_as_three_tuple(self):
+        """生成結果 - 従来どおり3要素として展開でき、キャッシュのトークン数を属性で持つ"""
+        result = GenerationResult("要約", 100, 50, cache_read_tokens=2000, cache_write_tokens=10)
+        text, input_tokens, output_tokens = result
+
+        assert (text, input_tokens, output_tokens) == ("要約", 100, 50)
+        assert result == ("要約", 100, 50)
+        assert result.cache_read_tokens == 2000
+        assert result.cache_write_tokens == 10
+
+    def test_from_usage(self):
+        """生成結果 - ストリーム最後のトークン数dictから作成"""
+        result = GenerationResult.from_usage(
+            "要約", {"input_tokens": 100, "output_tokens": 50, "cache_read_tokens": 2000}
+        )
+
+        assert result == ("要約", 100, 50)
+        assert result.cache_read_tokens == 2000
+        assert result.cache_write_tokens == 0
+
+    def test_default_stream_includes_cache_usage(self):
+        """ストリーミングのデフォルト実装 - キャッシュのトークン数も最後に返す"""
+
+        class CachingClient(MockAPIClient):
+            def _generate_content(self, prompt: str, model_name: str) -> tuple:
+                return GenerationResult("生成されたテキスト", 100, 50, cache_read_tokens=2000)
+
+        items = list(CachingClient()._generate_content_stream("プロンプト", "test_model"))
+
+        assert items == [
+            "生成されたテキスト",
+            {"input_tokens": 100, "output_tokens": 50, "cache_read_tokens": 2000},
+        ]
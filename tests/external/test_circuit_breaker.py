@@ -0,0 +1,235 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient
+from app.external.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    get_circuit_breakers,
+    set_circuit_breakers,
+)
+from app.utils.exceptions import APIError, CircuitOpenError
+
+
+class _Clock:
+    """time.monotonicの代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = _Clock()
+    with patch("app.external.circuit_breaker.time.monotonic", clock):
+        yield clock
+
+
+def _breaker(**options):
+    return CircuitBreaker(
+        "claude/direct",
+        **{"window": 10, "min_calls": 4, "open_seconds": 30, "half_open_probes": 2, **options},
+    )
+
+
+def _call(breaker, error=None, latency=0.0, clock=None):
+    call = breaker.acquire()
+    if clock is not None:
+        clock.now += latency
+    call.finish(error)
+
+
+UNAVAILABLE = APIError("Service Unavailable", status_code=503)
+
+
+class TestCircuitBreaker:
+    """CircuitBreaker のテスト"""
+
+    def test_opens_on_failure_rate(self, clock):
+        """失敗率が閾値以上になると開き、呼び出さずに失敗させる"""
+        breaker = _breaker()
+        _call(breaker)
+        _call(breaker)
+        _call(breaker, UNAVAILABLE)
+        assert breaker.state == CLOSED
+
+        _call(breaker, UNAVAILABLE)
+
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.acquire()
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.retry_after == 30
+
+    def test_client_errors_not_counted(self, clock):
+        """入力の誤りなどプロバイダーの障害でない失敗は数えない"""
+        breaker = _breaker()
+        for _ in range(10):
+            _call(breaker, APIError("Bad Request", status_code=400))
+
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["calls"] == 0
+
+    def test_opens_on_slow_calls(self, clock):
+        """成功しても遅い呼び出しの割合が閾値以上なら開く"""
+        breaker = _breaker(slow_call_duration=10, slow_call_rate_threshold=0.75)
+        _call(breaker, latency=1, clock=clock)
+        for _ in range(3):
+            _call(breaker, latency=15, clock=clock)
+
+        assert breaker.state == OPEN
+        assert breaker.snapshot()["slow_call_rate"] == 0.75
+
+    def test_half_open_probes_close(self, clock):
+        """開いてからopen_seconds経過後は試行枠の件数だけ呼び出し、全て成功すれば閉じる"""
+        breaker = _breaker()
+        for _ in range(4):
+            _call(breaker, UNAVAILABLE)
+        clock.now += 30
+
+        assert breaker.state == HALF_OPEN
+        first = breaker.acquire()
+        second = breaker.acquire()
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+
+        first.finish()
+        second.finish()
+
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["calls"] == 0
+
+    def test_half_open_probe_failure_reopens(self, clock):
+        """試行呼び出しが1件でも失敗すれば再び開く"""
+        breaker = _breaker()
+        for _ in range(4):
+            _call(breaker, UNAVAILABLE)
+        clock.now += 30
+
+        _call(breaker, UNAVAILABLE)
+
+        assert breaker.state == OPEN
+        assert breaker.snapshot()["retry_after"] == 30
+
+    def test_unrelated_probe_failure_releases_slot(self, clock):
+        """試行呼び出しが中断・入力誤りで終わった場合は枠を戻して別の呼び出しで試行"""
+        breaker = _breaker(half_open_probes=1)
+        for _ in range(4):
+            _call(breaker, UNAVAILABLE)
+        clock.now += 30
+
+        _call(breaker, GeneratorExit())
+        _call(breaker)
+
+        assert breaker.state == CLOSED
+
+    def test_snapshot_counts_rejections(self, clock):
+        """開いている間に拒否した件数を公開"""
+        breaker = _breaker()
+        for _ in range(4):
+            _call(breaker, UNAVAILABLE)
+        for _ in range(3):
+            with pytest.raises(CircuitOpenError):
+                breaker.acquire()
+
+        snapshot = breaker.snapshot()
+
+        assert snapshot["state"] == OPEN
+        assert snapshot["failure_rate"] == 1.0
+        assert snapshot["rejected"] == 3
+        assert snapshot["opened_at"] is not None
+
+
+class TestCircuitBreakerRegistry:
+    """CircuitBreakerRegistry のテスト"""
+
+    def test_breaker_per_provider_and_route(self):
+        """プロバイダー・接続経路ごとに別のサーキットブレーカー"""
+        registry = CircuitBreakerRegistry()
+
+        assert registry.breaker("claude", "direct") is registry.breaker("claude", "direct")
+        assert registry.breaker("claude", "direct") is not registry.breaker("claude", "cloudflare")
+        assert list(registry.snapshot()["breakers"]) == ["claude/cloudflare", "claude/direct"]
+
+    def test_disabled(self):
+        """無効化されていればサーキットブレーカーを使わない"""
+        assert CircuitBreakerRegistry(enabled=False).breaker("claude", "direct") is None
+
+
+class _FailingClient(BaseAPIClient):
+    provider_route = ("claude", "direct")
+
+    def __init__(self):
+        super().__init__("key", "model")
+        self.calls = 0
+
+    def initialize(self) -> bool:
+        return True
+
+    def _generate_content(self, prompt: str, model_name: str) -> tuple:
+        self.calls += 1
+        raise APIError("Service Unavailable", status_code=503)
+
+
+class _AsyncFailingClient(AsyncBaseAPIClient):
+    provider_route = ("gemini", "direct")
+
+    def __init__(self):
+        super().__init__("key", "model")
+        self.calls = 0
+
+    async def initialize(self) -> bool:
+        return True
+
+    async def _generate_content(self, prompt: str, model_name: str) -> tuple:
+        self.calls += 1
+        raise APIError("Service Unavailable", status_code=503)
+
+
+class TestClientIntegration:
+    """APIクライアントからの利用のテスト"""
+
+    def test_sync_client_fails_fast(self):
+        """障害が続くとプロバイダーを呼び出さずに失敗する"""
+        set_circuit_breakers(CircuitBreakerRegistry(min_calls=3, window=3))
+        client = _FailingClient()
+
+        for _ in range(3):
+            with pytest.raises(APIError):
+                client.generate_summary("カルテ", prompt_template="テンプレート")
+        with pytest.raises(CircuitOpenError):
+            client.generate_summary("カルテ", prompt_template="テンプレート")
+
+        assert client.calls == 3
+        assert get_circuit_breakers().breaker("claude", "direct").state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_async_stream_fails_fast(self):
+        """非同期ストリーミングも同じサーキットブレーカーで失敗させる"""
+        set_circuit_breakers(CircuitBreakerRegistry(min_calls=2, window=2))
+        client = _AsyncFailingClient()
+
+        for _ in range(2):
+            with pytest.raises(APIError):
+                [c async for c in client.generate_summary_stream("カルテ", prompt_template="テンプレート")]
+        with pytest.raises(CircuitOpenError):
+            [c async for c in client.generate_summary_stream("カルテ", prompt_template="テンプレート")]
+
+        assert client.calls == 2
+
+    def test_endpoint(self, client, csrf_headers):
+        """運用状況 - /health/circuit-breakersで確認できる"""
+        get_circuit_breakers().breaker("gemini", "cloudflare")
+
+        response = client.get("/health/circuit-breakers", headers=csrf_headers)
+
+        assert response.status_code == 200
+        assert response.json()["breakers"]["gemini/cloudflare"]["state"] == CLOSED
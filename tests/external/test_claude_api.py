@@ -7,6 +7,7 @@ import pytest
 from anthropic.types import TextBlock
 
 from app.core.constants import MESSAGES
+from app.external.base_api import SummaryPrompt
 from app.external.claude_api import ClaudeAPIClient
 from app.utils.exceptions import APIError
 
@@ -377,6 +378,72 @@ class TestClaudeAPIClientGenerateContent:
         assert messages[0]["content"] == test_prompt
 
 
+class TestClaudeAPIClientGenerateContentStream:
+    """ClaudeAPIClient _generate_content_stream メソッドのテスト"""
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_ACCESS_KEY_ID": "test_key",
+            "AWS_SECRET_ACCESS_KEY": "test_secret",
+            "AWS_REGION": "us-east-1",
+            "ANTHROPIC_MODEL": "claude-3-5-sonnet-20241022",
+        },
+    )
+    def test_generate_content_stream_success(self):
+        """_generate_content_stream - テキストを逐次返し最後に使用量を返す"""
+        mock_client = MagicMock()
+        mock_stream = MagicMock()
+        mock_stream.text_stream = iter(["現在の処方: ", "メトホルミン"])
+        final_message = MagicMock()
+        final_message.usage.input_tokens = 1500
+        final_message.usage.output_tokens = 800
+        mock_stream.get_final_message.return_value = final_message
+        mock_client.messages.stream.return_value.__enter__.return_value = mock_stream
+
+        client = ClaudeAPIClient()
+        client.client = mock_client
+
+        items = list(client._generate_content_stream(
+            prompt="テストプロンプト", model_name="claude-3-5-sonnet-20241022"
+        ))
+
+        assert items == [
+            "現在の処方: ",
+            "メトホルミン",
+            {"input_tokens": 1500, "output_tokens": 800},
+        ]
+        mock_client.messages.stream.assert_called_once_with(
+            model="claude-3-5-sonnet-20241022",
+            max_tokens=6000,
+            messages=[{"role": "user", "content": "テストプロンプト"}],
+        )
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_ACCESS_KEY_ID": "test_key",
+            "AWS_SECRET_ACCESS_KEY": "test_secret",
+            "AWS_REGION": "us-east-1",
+            "ANTHROPIC_MODEL": "claude-3-5-sonnet-20241022",
+        },
+    )
+    def test_generate_content_stream_api_error(self):
+        """_generate_content_stream - API呼び出しエラー"""
+        mock_client = MagicMock()
+        mock_client.messages.stream.side_effect = Exception("Stream Error")
+
+        client = ClaudeAPIClient()
+        client.client = mock_client
+
+        with pytest.raises(APIError) as exc_info:
+            list(client._generate_content_stream(
+                prompt="テストプロンプト", model_name="claude-3-5-sonnet-20241022"
+            ))
+
+        assert "Stream Error" in str(exc_info.value)
+
+
 class TestClaudeAPIClientIntegration:
     """ClaudeAPIClient 統合テスト"""
 
@@ -521,3 +588,70 @@ class TestClaudeAPIClientEdgeCases:
             client.initialize()
 
         assert "Amazon Bedrock Claude API初期化エラー" in str(exc_info.value)
+
+
+class TestClaudeAPIClientPromptCaching:
+    """ClaudeAPIClient プロンプトキャッシュのテスト"""
+
+    @staticmethod
+    def _response(cache_read=None, cache_write=None):
+        mock_response = MagicMock()
+        mock_response.content = [TextBlock(type="text", text="生成されたサマリー")]
+        mock_response.usage.input_tokens = 300
+        mock_response.usage.output_tokens = 800
+        mock_response.usage.cache_read_input_tokens = cache_read
+        mock_response.usage.cache_creation_input_tokens = cache_write
+        return mock_response
+
+    @patch.dict(os.environ, {"ANTHROPIC_MODEL": "claude-3-5-sonnet-20241022"})
+    def test_template_prefix_marked_for_caching(self):
+        """プロンプトキャッシュ - テンプレート部分にcache_controlを付けて送信"""
+        mock_client = MagicMock()
+        mock_client.messages.create.return_value = self._response(cache_write=2500)
+
+        client = ClaudeAPIClient()
+        client.client = mock_client
+        result = client._generate_content(
+            SummaryPrompt("部署テンプレート", "【カルテ情報】\n患者情報"), "claude-3-5-sonnet-20241022"
+        )
+
+        content = mock_client.messages.create.call_args.kwargs["messages"][0]["content"]
+        assert content == [
+            {"type": "text", "text": "部署テンプレート", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "【カルテ情報】\n患者情報"},
+        ]
+        assert result == ("生成されたサマリー", 300, 800)
+        assert result.cache_read_tokens == 0
+        assert result.cache_write_tokens == 2500
+
+    @patch.dict(os.environ, {"ANTHROPIC_MODEL": "claude-3-5-sonnet-20241022"})
+    def test_stream_reports_cache_read(self):
+        """プロンプトキャッシュ - ストリーミングの最後にキャッシュ読み込みトークン数を返す"""
+        mock_client = MagicMock()
+        mock_stream = MagicMock()
+        mock_stream.text_stream = iter(["要約"])
+        mock_stream.get_final_message.return_value = self._response(cache_read=2500, cache_write=0)
+        mock_client.messages.stream.return_value.__enter__.return_value = mock_stream
+
+        client = ClaudeAPIClient()
+        client.client = mock_client
+        items = list(client._generate_content_stream(
+            SummaryPrompt("部署テンプレート", "【カルテ情報】"), "claude-3-5-sonnet-20241022"
+        ))
+
+        assert items[-1] == {"input_tokens": 300, "output_tokens": 800, "cache_read_tokens": 2500}
+
+    @patch("app.external.claude_api.get_settings")
+    @patch.dict(os.environ, {"ANTHROPIC_MODEL": "claude-3-5-sonnet-20241022"})
+    def test_disabled_sends_plain_prompt(self, mock_get_settings):
+        """プロンプトキャッシュ - 無効時は全文を1つのテキストとして送信"""
+        mock_get_settings.return_value.prompt_caching_enabled = False
+        mock_client = MagicMock()
+        mock_client.messages.create.return_value = self._response()
+
+        client = ClaudeAPIClient()
+        client.client = mock_client
+        client._generate_content(SummaryPrompt("部署テンプレート", "【カルテ情報】"), "claude")
+
+        content = mock_client.messages.create.call_args.kwargs["messages"][0]["content"]
+        assert content == "部署テンプレート\n【カルテ情報】"
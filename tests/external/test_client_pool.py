@@ -0,0 +1,124 @@
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.external.client_pool import ClientKey, ClientPool
+
+
+def make_key(provider: str = "claude", fingerprint: str = "fp1", mode: str = "sync") -> ClientKey:
+    return ClientKey(mode=mode, provider=provider, route="direct", fingerprint=fingerprint)
+
+
+class TestClientPoolGetOrCreate:
+    """ClientPool.get_or_create のテスト"""
+
+    def test_reuses_client_for_same_key(self):
+        """同じキーでは生成済みクライアントを返す"""
+        pool = ClientPool()
+        factory = MagicMock(side_effect=lambda: object())
+
+        client1 = pool.get_or_create(make_key(), factory)
+        client2 = pool.get_or_create(make_key(), factory)
+
+        assert client1 is client2
+        factory.assert_called_once()
+        assert pool.stats()["hits"] == 1
+        assert pool.stats()["misses"] == 1
+
+    def test_fingerprint_change_replaces_and_closes_old_client(self):
+        """フィンガープリントが変わると古いクライアントを閉じて置き換える"""
+        pool = ClientPool()
+        old_client = MagicMock()
+        new_client = MagicMock()
+
+        pool.get_or_create(make_key(fingerprint="fp1"), lambda: old_client)
+        result = pool.get_or_create(make_key(fingerprint="fp2"), lambda: new_client)
+
+        assert result is new_client
+        old_client.close.assert_called_once()
+        assert pool.stats()["size"] == 1
+
+    def test_different_provider_is_kept(self):
+        """別プロバイダーのクライアントは置き換えない"""
+        pool = ClientPool()
+        claude_client = MagicMock()
+
+        pool.get_or_create(make_key(provider="claude"), lambda: claude_client)
+        pool.get_or_create(make_key(provider="gemini"), MagicMock)
+
+        claude_client.close.assert_not_called()
+        assert pool.stats()["size"] == 2
+
+    def test_concurrent_access_creates_single_client(self):
+        """並行アクセスでもクライアントは1つだけ生成される"""
+        pool = ClientPool()
+        factory = MagicMock(side_effect=lambda: object())
+        results = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            results.append(pool.get_or_create(make_key(), factory))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        factory.assert_called_once()
+        assert all(r is results[0] for r in results)
+
+
+class TestClientPoolInvalidate:
+    """ClientPool.invalidate / aclose_all のテスト"""
+
+    def test_invalidate_by_provider(self):
+        """指定プロバイダーのみ破棄"""
+        pool = ClientPool()
+        claude_client = MagicMock()
+        gemini_client = MagicMock()
+        pool.get_or_create(make_key(provider="claude"), lambda: claude_client)
+        pool.get_or_create(make_key(provider="gemini"), lambda: gemini_client)
+
+        removed = pool.invalidate("claude")
+
+        assert removed == 1
+        claude_client.close.assert_called_once()
+        gemini_client.close.assert_not_called()
+        assert pool.stats()["clients"] == ["sync/gemini/direct"]
+
+    def test_invalidate_all(self):
+        """全クライアントを破棄"""
+        pool = ClientPool()
+        pool.get_or_create(make_key(provider="claude"), MagicMock)
+        pool.get_or_create(make_key(provider="gemini"), MagicMock)
+
+        assert pool.invalidate() == 2
+        assert pool.stats()["size"] == 0
+
+    def test_close_failure_is_ignored(self):
+        """クローズ時の例外は握りつぶす"""
+        pool = ClientPool()
+        client = MagicMock()
+        client.close.side_effect = RuntimeError("close error")
+        pool.get_or_create(make_key(), lambda: client)
+
+        assert pool.invalidate() == 1
+
+    @pytest.mark.asyncio
+    async def test_aclose_all_awaits_async_close(self):
+        """非同期クライアントのcloseをawaitする"""
+        pool = ClientPool()
+        sync_client = MagicMock()
+        async_client = MagicMock()
+        async_client.close = AsyncMock()
+        pool.get_or_create(make_key(mode="sync"), lambda: sync_client)
+        pool.get_or_create(make_key(mode="async"), lambda: async_client)
+
+        await pool.aclose_all()
+
+        sync_client.close.assert_called_once()
+        async_client.close.assert_awaited_once()
+        assert pool.stats()["size"] == 0
@@ -1,9 +1,11 @@
+import json
 from unittest.mock import MagicMock, patch
 
 import httpx
 import pytest
 
 from app.core.constants import MESSAGES
+from app.external.base_api import SummaryPrompt
 from app.external.cloudflare_claude_api import CloudflareClaudeAPIClient
 from app.utils.exceptions import APIError
 
@@ -18,6 +20,7 @@ def create_mock_settings(**kwargs):
     mock.cloudflare_account_id = kwargs.get("cloudflare_account_id", "test-account-id")
     mock.cloudflare_gateway_id = kwargs.get("cloudflare_gateway_id", "test-gateway-id")
     mock.cloudflare_aig_token = kwargs.get("cloudflare_aig_token", "test-token")
+    mock.prompt_caching_enabled = kwargs.get("prompt_caching_enabled", True)
     return mock
 
 
@@ -148,7 +151,7 @@ class TestCloudflareClaudeAPIClientInitialize:
 class TestCloudflareClaudeAPIClientGenerateContent:
     """CloudflareClaudeAPIClient _generate_content メソッドのテスト"""
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_success(self, mock_get_settings, mock_httpx_post):
         """_generate_content - 正常に成功"""
@@ -192,7 +195,7 @@ class TestCloudflareClaudeAPIClientGenerateContent:
         assert call_args[1]["headers"]["Content-Type"] == "application/json"
         assert "Authorization" in call_args[1]["headers"]
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_empty_response(self, mock_get_settings, mock_httpx_post):
         """_generate_content - レスポンスが空"""
@@ -219,7 +222,7 @@ class TestCloudflareClaudeAPIClientGenerateContent:
         assert result[1] == 100
         assert result[2] == 0
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_missing_usage(self, mock_get_settings, mock_httpx_post):
         """_generate_content - usage なし"""
@@ -240,7 +243,7 @@ class TestCloudflareClaudeAPIClientGenerateContent:
 
         assert result == ("生成されたサマリー", 0, 0)
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_http_error(self, mock_get_settings, mock_httpx_post):
         """_generate_content - HTTPエラー"""
@@ -262,7 +265,7 @@ class TestCloudflareClaudeAPIClientGenerateContent:
         assert "Cloudflare AI Gateway" in error_msg
         assert "HTTP 400" in error_msg
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_missing_settings(self, mock_get_settings, mock_httpx_post):
         """_generate_content - Cloudflare設定が不完全"""
@@ -276,7 +279,7 @@ class TestCloudflareClaudeAPIClientGenerateContent:
             client._generate_content("テストプロンプト", "anthropic.claude-3-5-sonnet-20241022-v2:0")
         assert "Cloudflare Gateway が初期化されていません" in str(exc_info.value)
 
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     @patch("app.external.cloudflare_claude_api.get_settings")
     def test_generate_content_network_error(self, mock_get_settings, mock_httpx_post):
         """_generate_content - ネットワークエラー"""
@@ -297,16 +300,16 @@ class TestCloudflareClaudeAPIClientIntegration:
     """CloudflareClaudeAPIClient 統合テスト"""
 
     @patch("app.external.base_api.get_selected_model")
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     @patch("app.external.cloudflare_claude_api.get_settings")
-    @patch("app.external.cloudflare_claude_api.httpx.post")
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
     def test_generate_summary_full_flow(
         self,
         mock_httpx_post,
         mock_get_settings,
         mock_db_session,
-        mock_get_prompt,
+        mock_resolve_prompt,
         mock_get_selected_model
     ):
         """generate_summary - 完全なフロー"""
@@ -317,7 +320,7 @@ class TestCloudflareClaudeAPIClientIntegration:
 
         mock_prompt = MagicMock()
         mock_prompt.content = "テストプロンプト"
-        mock_get_prompt.return_value = mock_prompt
+        mock_resolve_prompt.return_value = mock_prompt
         mock_get_selected_model.return_value = "anthropic.claude-3-5-sonnet-20241022-v2:0"
 
         mock_response = MagicMock()
@@ -347,3 +350,196 @@ class TestCloudflareClaudeAPIClientIntegration:
 
         assert result == ("生成された診療情報提供書", 3000, 1500)
         mock_httpx_post.assert_called_once()
+
+
+def encode_event_stream_message(headers: dict[str, str], payload: dict) -> bytes:
+    """AWSイベントストリーム形式のメッセージをエンコード"""
+    import binascii
+    import json
+    import struct
+
+    header_bytes = b""
+    for name, value in headers.items():
+        name_bytes = name.encode("utf-8")
+        value_bytes = value.encode("utf-8")
+        header_bytes += (
+            struct.pack("!B", len(name_bytes)) + name_bytes
+            + struct.pack("!BH", 7, len(value_bytes)) + value_bytes
+        )
+
+    payload_bytes = json.dumps(payload).encode("utf-8")
+    total_length = 12 + len(header_bytes) + len(payload_bytes) + 4
+    prelude = struct.pack("!II", total_length, len(header_bytes))
+    prelude += struct.pack("!I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + header_bytes + payload_bytes
+    return message + struct.pack("!I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+def _event(event_type: str, payload: dict) -> bytes:
+    return encode_event_stream_message(
+        {
+            ":event-type": event_type,
+            ":content-type": "application/json",
+            ":message-type": "event",
+        },
+        payload,
+    )
+
+
+# converse-stream の記録済みレスポンス
+RECORDED_CONVERSE_STREAM = b"".join([
+    _event("messageStart", {"role": "assistant"}),
+    _event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "現在の処方: "}}),
+    _event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "メトホルミン"}}),
+    _event("contentBlockStop", {"contentBlockIndex": 0}),
+    _event("messageStop", {"stopReason": "end_turn"}),
+    _event("metadata", {"usage": {"inputTokens": 1200, "outputTokens": 300, "totalTokens": 1500}, "metrics": {"latencyMs": 900}}),
+])
+
+
+def _mock_stream_factory(handler):
+    """MockTransportで応答するhttpx.stream代替を作成"""
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def _stream(method, url, **kwargs):
+        kwargs.pop("timeout", None)
+        return client.stream(method, url, **kwargs)
+
+    return _stream
+
+
+class TestCloudflareClaudeAPIClientGenerateContentStream:
+    """CloudflareClaudeAPIClient _generate_content_stream メソッドのテスト"""
+
+    @patch("app.external.cloudflare_claude_api.get_settings")
+    def test_generate_content_stream_success(self, mock_get_settings):
+        """_generate_content_stream - イベントストリームのdeltaを逐次返す"""
+        mock_get_settings.return_value = create_mock_settings()
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            # 分割されたチャンクでも復元できることを確認
+            chunks = [RECORDED_CONVERSE_STREAM[i:i + 37] for i in range(0, len(RECORDED_CONVERSE_STREAM), 37)]
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "application/vnd.amazon.eventstream"},
+                content=iter(chunks),
+            )
+
+        with patch(
+            "app.external.cloudflare_claude_api.gateway_http.stream",
+            side_effect=_mock_stream_factory(handler),
+        ):
+            client = CloudflareClaudeAPIClient()
+            items = list(client._generate_content_stream(
+                "テストプロンプト", "anthropic.claude-3-5-sonnet-20241022-v2:0"
+            ))
+
+        assert items == [
+            "現在の処方: ",
+            "メトホルミン",
+            {"input_tokens": 1200, "output_tokens": 300},
+        ]
+        assert str(requests[0].url).endswith("/converse-stream")
+        assert requests[0].headers["cf-aig-authorization"] == "Bearer test-token"
+        assert "Authorization" in requests[0].headers
+
+    @patch("app.external.cloudflare_claude_api.get_settings")
+    def test_generate_content_stream_exception_event(self, mock_get_settings):
+        """_generate_content_stream - ストリーム中の例外イベント"""
+        mock_get_settings.return_value = create_mock_settings()
+        body = _event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "途中"}})
+        body += encode_event_stream_message(
+            {
+                ":exception-type": "throttlingException",
+                ":content-type": "application/json",
+                ":message-type": "exception",
+            },
+            {"message": "Too many tokens"},
+        )
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=body)
+
+        with patch(
+            "app.external.cloudflare_claude_api.gateway_http.stream",
+            side_effect=_mock_stream_factory(handler),
+        ):
+            client = CloudflareClaudeAPIClient()
+            with pytest.raises(APIError) as exc_info:
+                list(client._generate_content_stream(
+                    "テストプロンプト", "anthropic.claude-3-5-sonnet-20241022-v2:0"
+                ))
+
+        assert "throttlingException" in str(exc_info.value)
+        assert exc_info.value.status_code == 429
+
+    @patch("app.external.cloudflare_claude_api.get_settings")
+    def test_generate_content_stream_http_error(self, mock_get_settings):
+        """_generate_content_stream - HTTPエラー"""
+        mock_get_settings.return_value = create_mock_settings()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(503, content=b"Service Unavailable")
+
+        with patch(
+            "app.external.cloudflare_claude_api.gateway_http.stream",
+            side_effect=_mock_stream_factory(handler),
+        ):
+            client = CloudflareClaudeAPIClient()
+            with pytest.raises(APIError) as exc_info:
+                list(client._generate_content_stream(
+                    "テストプロンプト", "anthropic.claude-3-5-sonnet-20241022-v2:0"
+                ))
+
+        assert "HTTP 503" in str(exc_info.value)
+
+
+class TestCloudflareClaudePromptCaching:
+    """CloudflareClaudeAPIClient プロンプトキャッシュのテスト"""
+
+    @patch("app.external.cloudflare_claude_api.gateway_http.post")
+    @patch("app.external.cloudflare_claude_api.get_settings")
+    def test_cache_point_after_template(self, mock_get_settings, mock_httpx_post):
+        """プロンプトキャッシュ - テンプレートの直後にcachePointを置き、キャッシュのトークン数を返す"""
+        mock_get_settings.return_value = create_mock_settings()
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "output": {"message": {"content": [{"text": "生成されたサマリー"}]}},
+            "usage": {
+                "inputTokens": 300,
+                "outputTokens": 800,
+                "cacheReadInputTokens": 2500,
+                "cacheWriteInputTokens": 0,
+            },
+        }
+        mock_httpx_post.return_value = mock_response
+
+        client = CloudflareClaudeAPIClient()
+        result = client._generate_content(
+            SummaryPrompt("部署テンプレート", "【カルテ情報】"), "anthropic.claude-3-5-sonnet-20241022-v2:0"
+        )
+
+        body = json.loads(mock_httpx_post.call_args[1]["content"])
+        assert body["messages"][0]["content"] == [
+            {"text": "部署テンプレート"},
+            {"cachePoint": {"type": "default"}},
+            {"text": "【カルテ情報】"},
+        ]
+        assert result == ("生成されたサマリー", 300, 800)
+        assert result.cache_read_tokens == 2500
+
+    @patch("app.external.cloudflare_claude_api.get_settings")
+    def test_disabled_sends_single_block(self, mock_get_settings):
+        """プロンプトキャッシュ - 無効時は全文を1つのブロックで送信"""
+        mock_get_settings.return_value = create_mock_settings(prompt_caching_enabled=False)
+
+        client = CloudflareClaudeAPIClient()
+        _, _, body_str = client._build_request(
+            SummaryPrompt("部署テンプレート", "【カルテ情報】"), "model", "converse"
+        )
+
+        assert json.loads(body_str)["messages"][0]["content"] == [
+            {"text": "部署テンプレート\n【カルテ情報】"}
+        ]
@@ -4,7 +4,7 @@ import httpx
 import pytest
 
 from app.core.constants import MESSAGES
-from app.external.cloudflare_gemini_api import CloudflareGeminiAPIClient
+from app.external.cloudflare_gemini_api import AsyncCloudflareGeminiAPIClient, CloudflareGeminiAPIClient
 from app.utils.exceptions import APIError
 
 
@@ -129,7 +129,7 @@ class TestCloudflareGeminiAPIClientInitialize:
 class TestCloudflareGeminiAPIClientGenerateContent:
     """CloudflareGeminiAPIClient _generate_content メソッドのテスト"""
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_success(self, mock_get_settings, mock_httpx_post):
         """_generate_content - 正常に成功"""
@@ -176,7 +176,7 @@ class TestCloudflareGeminiAPIClientGenerateContent:
         assert request_body["contents"][0]["parts"][0]["text"] == "テストプロンプト"
         assert request_body["generationConfig"]["thinkingConfig"]["thinkingLevel"] == "HIGH"
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_with_low_thinking_level(self, mock_get_settings, mock_httpx_post):
         """_generate_content - LOW thinking level"""
@@ -207,7 +207,7 @@ class TestCloudflareGeminiAPIClientGenerateContent:
         request_body = call_args[1]["json"]
         assert request_body["generationConfig"]["thinkingConfig"]["thinkingLevel"] == "LOW"
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_empty_response(self, mock_get_settings, mock_httpx_post):
         """_generate_content - レスポンスが空"""
@@ -230,7 +230,7 @@ class TestCloudflareGeminiAPIClientGenerateContent:
         assert result[1] == 100
         assert result[2] == 0
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_missing_usage_metadata(self, mock_get_settings, mock_httpx_post):
         """_generate_content - usageMetadata なし"""
@@ -251,7 +251,7 @@ class TestCloudflareGeminiAPIClientGenerateContent:
 
         assert result == ("生成されたサマリー", 0, 0)
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_http_error(self, mock_get_settings, mock_httpx_post):
         """_generate_content - HTTPエラー"""
@@ -272,8 +272,9 @@ class TestCloudflareGeminiAPIClientGenerateContent:
         error_msg = str(exc_info.value)
         assert "Cloudflare AI Gateway" in error_msg
         assert "HTTP 400" in error_msg
+        assert exc_info.value.status_code == 400
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_missing_settings(self, mock_get_settings, mock_httpx_post):
         """_generate_content - Cloudflare設定が不完全"""
@@ -287,7 +288,7 @@ class TestCloudflareGeminiAPIClientGenerateContent:
             client._generate_content("テストプロンプト", "gemini-2.0-flash")
         assert "Cloudflare Gateway が初期化されていません" in str(exc_info.value)
 
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     @patch("app.external.cloudflare_gemini_api.get_settings")
     def test_generate_content_network_error(self, mock_get_settings, mock_httpx_post):
         """_generate_content - ネットワークエラー"""
@@ -308,16 +309,16 @@ class TestCloudflareGeminiAPIClientIntegration:
     """CloudflareGeminiAPIClient 統合テスト"""
 
     @patch("app.external.base_api.get_selected_model")
-    @patch("app.external.base_api.get_prompt")
+    @patch("app.external.base_api.resolve_prompt")
     @patch("app.external.base_api.get_db_session")
     @patch("app.external.cloudflare_gemini_api.get_settings")
-    @patch("app.external.cloudflare_gemini_api.httpx.post")
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
     def test_generate_summary_full_flow(
         self,
         mock_httpx_post,
         mock_get_settings,
         mock_db_session,
-        mock_get_prompt,
+        mock_resolve_prompt,
         mock_get_selected_model
     ):
         """generate_summary - 完全なフロー"""
@@ -328,7 +329,7 @@ class TestCloudflareGeminiAPIClientIntegration:
 
         mock_prompt = MagicMock()
         mock_prompt.content = "テストプロンプト"
-        mock_get_prompt.return_value = mock_prompt
+        mock_resolve_prompt.return_value = mock_prompt
         mock_get_selected_model.return_value = "gemini-2.0-flash"
 
         mock_response = MagicMock()
@@ -358,3 +359,194 @@ class TestCloudflareGeminiAPIClientIntegration:
 
         assert result == ("生成された診療情報提供書", 3000, 1500)
         mock_httpx_post.assert_called_once()
+
+
+# streamGenerateContent?alt=sse の記録済みレスポンス
+RECORDED_SSE_STREAM = (
+    'data: {"candidates": [{"content": {"role": "model", "parts": [{"text": "考え中", "thought": true}]}}]}\r\n\r\n'
+    'data: {"candidates": [{"content": {"role": "model", "parts": [{"text": "現在の処方: "}]}}]}\r\n\r\n'
+    'data: {"candidates": [{"content": {"role": "model", "parts": [{"text": "メトホルミン"}]}}]}\r\n\r\n'
+    'data: {"candidates": [{"content": {"role": "model", "parts": [{"text": ""}]}, "finishReason": "STOP"}], '
+    '"usageMetadata": {"promptTokenCount": 2000, "candidatesTokenCount": 1000}}\r\n\r\n'
+)
+
+
+def _mock_stream_factory(handler):
+    """MockTransportで応答するhttpx.stream代替を作成"""
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def _stream(method, url, **kwargs):
+        kwargs.pop("timeout", None)
+        return client.stream(method, url, **kwargs)
+
+    return _stream
+
+
+class TestCloudflareGeminiAPIClientGenerateContentStream:
+    """CloudflareGeminiAPIClient _generate_content_stream メソッドのテスト"""
+
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    def test_generate_content_stream_success(self, mock_get_settings):
+        """_generate_content_stream - SSEチャンクを逐次返す"""
+        mock_get_settings.return_value = create_mock_settings()
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/event-stream"},
+                content=RECORDED_SSE_STREAM.encode("utf-8"),
+            )
+
+        with patch(
+            "app.external.cloudflare_gemini_api.gateway_http.stream",
+            side_effect=_mock_stream_factory(handler),
+        ):
+            client = CloudflareGeminiAPIClient()
+            items = list(client._generate_content_stream("テストプロンプト", "gemini-2.0-flash"))
+
+        assert items == [
+            "現在の処方: ",
+            "メトホルミン",
+            {"input_tokens": 2000, "output_tokens": 1000},
+        ]
+        assert ":streamGenerateContent" in str(requests[0].url)
+        assert requests[0].url.params["alt"] == "sse"
+        assert requests[0].headers["cf-aig-authorization"] == "Bearer test-token"
+
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    def test_generate_content_stream_http_error(self, mock_get_settings):
+        """_generate_content_stream - HTTPエラー"""
+        mock_get_settings.return_value = create_mock_settings()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(429, content=b"Too Many Requests")
+
+        with patch(
+            "app.external.cloudflare_gemini_api.gateway_http.stream",
+            side_effect=_mock_stream_factory(handler),
+        ):
+            client = CloudflareGeminiAPIClient()
+            with pytest.raises(APIError) as exc_info:
+                list(client._generate_content_stream("テストプロンプト", "gemini-2.0-flash"))
+
+        assert "HTTP 429" in str(exc_info.value)
+        assert "Too Many Requests" in str(exc_info.value)
+
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    def test_generate_content_stream_missing_settings(self, mock_get_settings):
+        """_generate_content_stream - Cloudflare設定が不完全"""
+        mock_get_settings.return_value = create_mock_settings(cloudflare_aig_token=None)
+
+        client = CloudflareGeminiAPIClient()
+
+        with pytest.raises(APIError) as exc_info:
+            list(client._generate_content_stream("テストプロンプト", "gemini-2.0-flash"))
+        assert "Cloudflare Gateway が初期化されていません" in str(exc_info.value)
+
+
+def _mock_async_client(handler):
+    """MockTransportで応答する共有httpx.AsyncClient代替を作成"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestAsyncCloudflareGeminiAPIClient:
+    """AsyncCloudflareGeminiAPIClient のテスト"""
+
+    @pytest.mark.asyncio
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    async def test_generate_content_success(self, mock_get_settings):
+        """_generate_content - 非同期でgenerateContentを呼び出す"""
+        mock_get_settings.return_value = create_mock_settings()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert ":generateContent" in str(request.url)
+            return httpx.Response(200, json={
+                "candidates": [{"content": {"parts": [{"text": "生成されたテキスト"}]}}],
+                "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 50},
+            })
+
+        with patch(
+            "app.external.gateway_http.get_async_client",
+            return_value=_mock_async_client(handler),
+        ):
+            client = AsyncCloudflareGeminiAPIClient()
+            result = await client._generate_content("テストプロンプト", "gemini-2.0-flash")
+
+        assert result == ("生成されたテキスト", 100, 50)
+
+    @pytest.mark.asyncio
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    async def test_generate_content_stream_success(self, mock_get_settings):
+        """_generate_content_stream - SSEチャンクを非同期に逐次返す"""
+        mock_get_settings.return_value = create_mock_settings()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/event-stream"},
+                content=RECORDED_SSE_STREAM.encode("utf-8"),
+            )
+
+        with patch(
+            "app.external.gateway_http.get_async_client",
+            return_value=_mock_async_client(handler),
+        ):
+            client = AsyncCloudflareGeminiAPIClient()
+            items = [
+                item async for item in client._generate_content_stream(
+                    "テストプロンプト", "gemini-2.0-flash"
+                )
+            ]
+
+        assert items == [
+            "現在の処方: ",
+            "メトホルミン",
+            {"input_tokens": 2000, "output_tokens": 1000},
+        ]
+
+    @pytest.mark.asyncio
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    async def test_generate_content_http_error(self, mock_get_settings):
+        """_generate_content - HTTPエラー"""
+        mock_get_settings.return_value = create_mock_settings()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(503, content=b"Service Unavailable")
+
+        with patch(
+            "app.external.gateway_http.get_async_client",
+            return_value=_mock_async_client(handler),
+        ):
+            client = AsyncCloudflareGeminiAPIClient()
+            with pytest.raises(APIError) as exc_info:
+                await client._generate_content("テストプロンプト", "gemini-2.0-flash")
+
+        assert "HTTP 503" in str(exc_info.value)
+
+
+class TestCloudflareGeminiImplicitCache:
+    """CloudflareGeminiAPIClient 暗黙キャッシュのトークン数のテスト"""
+
+    @patch("app.external.cloudflare_gemini_api.gateway_http.post")
+    @patch("app.external.cloudflare_gemini_api.get_settings")
+    def test_cached_tokens_separated_from_input(self, mock_get_settings, mock_httpx_post):
+        """暗黙キャッシュ - キャッシュから読み込んだトークン数を入力から分けて返す"""
+        mock_get_settings.return_value = create_mock_settings()
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "candidates": [{"content": {"parts": [{"text": "生成されたサマリー"}]}}],
+            "usageMetadata": {
+                "promptTokenCount": 2800,
+                "candidatesTokenCount": 500,
+                "cachedContentTokenCount": 2500,
+            },
+        }
+        mock_httpx_post.return_value = mock_response
+
+        client = CloudflareGeminiAPIClient()
+        result = client._generate_content("テストプロンプト", "gemini-2.5-pro")
+
+        assert result == ("生成されたサマリー", 300, 500)
+        assert result.cache_read_tokens == 2500
@@ -0,0 +1,129 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.core.config import Settings
+from app.external import gateway_http
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    """キープアライブ対応のローカルHTTPサーバー"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gateway_settings():
+    """共有クライアントをテスト用設定で作り直す"""
+    settings = Settings(cloudflare_http2=False, cloudflare_read_timeout=15.0)
+    with patch("app.external.gateway_http.get_settings", return_value=settings):
+        yield settings
+
+
+@pytest.fixture(autouse=True)
+async def close_shared_clients():
+    yield
+    await gateway_http.close_clients()
+
+
+def _delta(before: dict, after: dict, key: str) -> int:
+    return after[key] - before[key]
+
+
+class TestGatewayClientOptions:
+    """共有クライアント構築のテスト"""
+
+    def test_client_uses_settings(self, gateway_settings):
+        """タイムアウトとプール上限が設定から反映される"""
+        client = gateway_http.get_client()
+
+        assert client.timeout.read == 15.0
+        assert client.timeout.connect == gateway_settings.cloudflare_connect_timeout
+        assert client is gateway_http.get_client()
+
+    def test_settings_change_rebuilds_client(self, gateway_settings):
+        """設定が変わると共有クライアントを作り直す"""
+        client1 = gateway_http.get_client()
+        gateway_settings.cloudflare_read_timeout = 30.0
+        client2 = gateway_http.get_client()
+
+        assert client1 is not client2
+        assert client2.timeout.read == 30.0
+
+    def test_http2_falls_back_without_h2(self):
+        """h2が無い場合はHTTP/1.1で接続"""
+        settings = Settings(cloudflare_http2=True)
+        with patch("app.external.gateway_http.importlib.util.find_spec", return_value=None):
+            assert gateway_http._http2_enabled(settings) is False
+
+    def test_http2_disabled_by_setting(self):
+        """設定でHTTP/2を無効化"""
+        assert gateway_http._http2_enabled(Settings(cloudflare_http2=False)) is False
+
+
+class TestGatewayConnectionReuse:
+    """接続再利用カウンターのテスト"""
+
+    def test_sync_requests_reuse_connection(self, gateway_settings, local_server):
+        """同期リクエスト - 2回目以降は既存接続を再利用"""
+        before = gateway_http.get_connection_stats()
+
+        for _ in range(3):
+            response = gateway_http.post(f"{local_server}/v1", json={"n": 1})
+            assert response.json() == {"ok": True}
+
+        after = gateway_http.get_connection_stats()
+        assert _delta(before, after, "requests") == 3
+        assert _delta(before, after, "connections_opened") == 1
+        assert _delta(before, after, "reused_requests") == 2
+
+    @pytest.mark.asyncio
+    async def test_async_requests_reuse_connection(self, gateway_settings, local_server):
+        """非同期リクエスト - ストリーミングも同じ接続を再利用"""
+        before = gateway_http.get_connection_stats()
+
+        response = await gateway_http.apost(f"{local_server}/v1", json={"n": 1})
+        assert response.status_code == 200
+        async with gateway_http.astream("POST", f"{local_server}/v1", json={"n": 2}) as streamed:
+            assert await streamed.aread() == b'{"ok": true}'
+
+        after = gateway_http.get_connection_stats()
+        assert _delta(before, after, "requests") == 2
+        assert _delta(before, after, "connections_opened") == 1
+
+    def test_stream_counts_request(self, gateway_settings):
+        """ストリーミングリクエストもカウントされる"""
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"ok")))
+        before = gateway_http.get_connection_stats()
+
+        with patch("app.external.gateway_http.get_client", return_value=client):
+            with gateway_http.stream("POST", "https://gateway.example/v1") as response:
+                assert response.read() == b"ok"
+
+        after = gateway_http.get_connection_stats()
+        assert _delta(before, after, "requests") == 1
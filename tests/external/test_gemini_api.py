@@ -4,6 +4,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from app.core.constants import MESSAGES
+from app.external.base_api import SummaryPrompt
 from app.external.gemini_api import GeminiAPIClient
 from app.utils.exceptions import APIError
 
@@ -17,6 +18,8 @@ def create_mock_settings(**kwargs):
     mock.google_credentials_json = kwargs.get("google_credentials_json", None)
     mock.gemini_thinking_level = kwargs.get("gemini_thinking_level", "HIGH")
     mock.gemini_evaluation_model = kwargs.get("gemini_evaluation_model", "gemini-eval")
+    mock.prompt_caching_enabled = kwargs.get("prompt_caching_enabled", True)
+    mock.gemini_context_cache_ttl = kwargs.get("gemini_context_cache_ttl", 3600)
     return mock
 
 
@@ -600,3 +603,115 @@ class TestGeminiAPIClientEvaluationModel:
         )
 
         assert result == ("評価結果", 500, 200)
+
+
+class TestGeminiContextCache:
+    """GeminiAPIClient コンテキストキャッシュのテスト"""
+
+    @staticmethod
+    def _client(mock_get_settings, **settings):
+        mock_get_settings.return_value = create_mock_settings(**settings)
+        mock_client = MagicMock()
+        created = MagicMock()
+        created.name = "projects/p/locations/l/cachedContents/123"
+        created.usage_metadata.total_token_count = 2500
+        mock_client.caches.create.return_value = created
+
+        response = MagicMock()
+        response.text = "生成されたサマリー"
+        response.usage_metadata.prompt_token_count = 2800
+        response.usage_metadata.candidates_token_count = 500
+        response.usage_metadata.cached_content_token_count = 2500
+        mock_client.models.generate_content.return_value = response
+
+        client = GeminiAPIClient()
+        client.client = mock_client
+        return client, mock_client
+
+    @patch("app.external.gemini_api.get_settings")
+    def test_template_cached_once_and_reused(self, mock_get_settings):
+        """コンテキストキャッシュ - テンプレートごとに1回作成し、以降はカルテ部分のみ送信"""
+        client, mock_client = self._client(mock_get_settings)
+
+        first = client._generate_content(SummaryPrompt("部署テンプレート", "患者A"), "gemini-2.5-pro")
+        second = client._generate_content(SummaryPrompt("部署テンプレート", "患者B"), "gemini-2.5-pro")
+
+        mock_client.caches.create.assert_called_once()
+        call = mock_client.models.generate_content.call_args
+        assert call.kwargs["contents"] == "患者B"
+        assert call.kwargs["config"].cached_content == "projects/p/locations/l/cachedContents/123"
+        # 入力トークン数はキャッシュ分を除き、作成したリクエストのみ書き込みを記録
+        assert first == ("生成されたサマリー", 300, 500)
+        assert first.cache_read_tokens == 2500
+        assert first.cache_write_tokens == 2500
+        assert second.cache_write_tokens == 0
+
+    @patch("app.external.gemini_api.get_settings")
+    def test_template_change_creates_new_cache(self, mock_get_settings):
+        """コンテキストキャッシュ - テンプレートを編集すると別のキャッシュを作成"""
+        client, mock_client = self._client(mock_get_settings)
+
+        client._generate_content(SummaryPrompt("テンプレート v1", "患者A"), "gemini-2.5-pro")
+        client._generate_content(SummaryPrompt("テンプレート v2", "患者A"), "gemini-2.5-pro")
+
+        assert mock_client.caches.create.call_count == 2
+
+    @patch("app.external.gemini_api.logger")
+    @patch("app.external.gemini_api.get_settings")
+    def test_create_failure_falls_back_without_retry(self, mock_get_settings, mock_logger):
+        """コンテキストキャッシュ - 作成できない場合は全文を送り、期限まで再作成しない"""
+        client, mock_client = self._client(mock_get_settings)
+        mock_client.caches.create.side_effect = Exception("最小トークン数未満")
+
+        for _ in range(2):
+            client._generate_content(SummaryPrompt("短いテンプレート", "患者A"), "gemini-2.5-pro")
+
+        mock_client.caches.create.assert_called_once()
+        mock_logger.warning.assert_called_once()
+        call = mock_client.models.generate_content.call_args
+        assert call.kwargs["contents"] == "短いテンプレート\n患者A"
+        assert call.kwargs["config"].cached_content is None
+
+    @patch("app.external.gemini_api.get_settings")
+    def test_generation_failure_discards_cache(self, mock_get_settings):
+        """コンテキストキャッシュ - キャッシュを使った呼び出しが失敗した場合は次回作り直す"""
+        client, mock_client = self._client(mock_get_settings)
+        response = mock_client.models.generate_content.return_value
+        mock_client.models.generate_content.side_effect = [Exception("cached content not found"), response]
+
+        with pytest.raises(APIError):
+            client._generate_content(SummaryPrompt("部署テンプレート", "患者A"), "gemini-2.5-pro")
+        client._generate_content(SummaryPrompt("部署テンプレート", "患者A"), "gemini-2.5-pro")
+
+        assert mock_client.caches.create.call_count == 2
+
+    @patch("app.external.gemini_api.get_settings")
+    def test_disabled_by_zero_ttl(self, mock_get_settings):
+        """コンテキストキャッシュ - TTLが0の場合は作成しない"""
+        client, mock_client = self._client(mock_get_settings, gemini_context_cache_ttl=0)
+
+        client._generate_content(SummaryPrompt("部署テンプレート", "患者A"), "gemini-2.5-pro")
+
+        mock_client.caches.create.assert_not_called()
+
+    @patch("app.external.gemini_api.get_settings")
+    def test_stream_reports_cache_usage(self, mock_get_settings):
+        """コンテキストキャッシュ - ストリーミングの最後にキャッシュのトークン数を返す"""
+        client, mock_client = self._client(mock_get_settings)
+        chunk = MagicMock()
+        chunk.text = "要約"
+        chunk.usage_metadata.prompt_token_count = 2800
+        chunk.usage_metadata.candidates_token_count = 500
+        chunk.usage_metadata.cached_content_token_count = 2500
+        mock_client.models.generate_content_stream.return_value = iter([chunk])
+
+        items = list(client._generate_content_stream(
+            SummaryPrompt("部署テンプレート", "患者A"), "gemini-2.5-pro"
+        ))
+
+        assert items == [
+            "要約",
+            {"input_tokens": 300, "output_tokens": 500,
+             "cache_read_tokens": 2500, "cache_write_tokens": 2500},
+        ]
+        assert mock_client.models.generate_content_stream.call_args.kwargs["contents"] == "患者A"
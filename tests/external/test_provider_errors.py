@@ -0,0 +1,88 @@
+import httpx
+import pytest
+
+from app.external.provider_errors import is_retryable_error, provider_status_code
+from app.utils.exceptions import APIError
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class _GenaiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"code {code}")
+        self.code = code
+
+
+class _ClientError(Exception):
+    def __init__(self, status):
+        super().__init__("ThrottlingException")
+        self.response = {"ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def _wrapped(cause):
+    try:
+        try:
+            raise cause
+        except Exception as e:
+            raise APIError(f"ClaudeAPIClientでエラーが発生しました: {e}") from e
+    except APIError as wrapped:
+        return wrapped
+
+
+class TestProviderStatusCode:
+    """provider_status_code 関数のテスト"""
+
+    @pytest.mark.parametrize("error, expected", [
+        (APIError("gateway", status_code=429), 429),
+        (_StatusError(529), 529),
+        (_GenaiError(503), 503),
+        (_ClientError(429), 429),
+        (RuntimeError("unknown"), None),
+    ])
+    def test_status_sources(self, error, expected):
+        """SDKごとのステータスの持ち方から取得"""
+        assert provider_status_code(error) == expected
+
+    def test_walks_exception_chain(self):
+        """APIErrorで包まれた元の例外のステータスを取得"""
+        assert provider_status_code(_wrapped(_StatusError(503))) == 503
+
+    def test_httpx_response(self):
+        """httpx.HTTPStatusErrorのレスポンスから取得"""
+        request = httpx.Request("POST", "https://gateway.example/v1")
+        response = httpx.Response(502, request=request)
+        error = httpx.HTTPStatusError("bad gateway", request=request, response=response)
+
+        assert provider_status_code(error) == 502
+
+
+class TestIsRetryableError:
+    """is_retryable_error 関数のテスト"""
+
+    @pytest.mark.parametrize("status", [429, 500, 502, 503, 504, 529])
+    def test_retryable_status(self, status):
+        """レート制限・サーバーエラーは再試行対象"""
+        assert is_retryable_error(_wrapped(_StatusError(status))) is True
+
+    @pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+    def test_client_errors_not_retryable(self, status):
+        """リクエスト自体の誤りは再試行しない"""
+        assert is_retryable_error(APIError("error", status_code=status)) is False
+
+    def test_transport_errors(self):
+        """接続障害・タイムアウトは再試行対象"""
+        assert is_retryable_error(_wrapped(httpx.ConnectTimeout("timeout"))) is True
+        assert is_retryable_error(_wrapped(APIConnectionError("reset"))) is True
+        assert is_retryable_error(TimeoutError()) is True
+
+    def test_unknown_error_not_retryable(self):
+        """ステータスの分からない一般的な失敗は再試行しない"""
+        assert is_retryable_error(_wrapped(ValueError("parse error"))) is False
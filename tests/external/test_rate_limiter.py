@@ -0,0 +1,336 @@
+import random
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.external.async_base_api import AsyncBaseAPIClient
+from app.external.base_api import BaseAPIClient
+from app.external.provider_errors import is_throttled_error, retry_after_seconds
+from app.external.rate_limiter import (
+    BackoffPolicy,
+    ProviderRateLimiter,
+    RateLimiterRegistry,
+    TokenBucket,
+    get_rate_limiters,
+    set_rate_limiters,
+)
+from app.utils.exceptions import APIError, RateLimitedError
+
+
+class _Clock:
+    """time.monotonicの代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _throttled(retry_after: str | None = None, status: int = 429) -> APIError:
+    """ゲートウェイのHTTPエラーを包んだAPIError（Cloudflareクライアントと同じ形）"""
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    request = httpx.Request("POST", "https://gateway.example/v1")
+    response = httpx.Response(status, headers=headers, request=request)
+    try:
+        raise httpx.HTTPStatusError("Too Many Requests", request=request, response=response)
+    except httpx.HTTPStatusError:
+        try:
+            raise APIError("Cloudflare AI Gateway経由のAPI呼び出しエラー", status_code=status)
+        except APIError as e:
+            return e
+
+
+class TestTokenBucket:
+    """TokenBucket のテスト"""
+
+    def test_refills_over_time(self):
+        """1分あたりの上限を秒単位にならして補充"""
+        clock = _Clock()
+        bucket = TokenBucket(60, clock)
+        bucket.take(60)
+
+        assert bucket.wait_time(1) == pytest.approx(1.0)
+        clock.now += 0.5
+        assert bucket.wait_time(1) == pytest.approx(0.5)
+        clock.now += 0.5
+        assert bucket.wait_time(1) == 0.0
+
+    def test_never_exceeds_capacity(self):
+        """長く空いても上限を超えて貯まらない"""
+        clock = _Clock()
+        bucket = TokenBucket(60, clock)
+        clock.now += 3600
+
+        assert bucket.available == 60
+
+
+class TestProviderRateLimiter:
+    """ProviderRateLimiter のテスト"""
+
+    def test_reservations_wait_in_order(self):
+        """予約順に待ち時間が積み重なる（上限を超えた分はならして送信）"""
+        clock = _Clock()
+        limiter = ProviderRateLimiter("claude", tpm=600, max_wait=60, clock=clock)
+
+        waits = [limiter.reserve(tokens).wait for tokens in (600, 100, 100)]
+
+        assert waits == pytest.approx([0.0, 10.0, 20.0])
+
+    def test_requests_per_minute(self):
+        """RPMの上限でも待たせる"""
+        clock = _Clock()
+        limiter = ProviderRateLimiter("gemini", rpm=2, max_wait=60, clock=clock)
+
+        waits = [limiter.reserve(0).wait for _ in range(3)]
+
+        assert waits == pytest.approx([0.0, 0.0, 30.0])
+
+    def test_rejects_when_wait_too_long(self):
+        """待ち時間が上限を超える場合は予約せずにRateLimitedError"""
+        clock = _Clock()
+        limiter = ProviderRateLimiter("claude", tpm=60, max_wait=5, clock=clock)
+        limiter.reserve(60)
+
+        with pytest.raises(RateLimitedError) as exc_info:
+            limiter.reserve(10)
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after == pytest.approx(10.0)
+        assert limiter.snapshot()["rejected"] == 1
+        assert limiter.snapshot()["available_tokens"] == 0
+
+    def test_settle_with_actual_tokens(self):
+        """推定値との差分を実績で精算"""
+        clock = _Clock()
+        limiter = ProviderRateLimiter("claude", tpm=1000, clock=clock)
+
+        limiter.reserve(100).settle(400)
+
+        assert limiter.snapshot()["available_tokens"] == 600
+
+    def test_cancel_restores(self):
+        """呼び出さなかった予約は戻す"""
+        clock = _Clock()
+        limiter = ProviderRateLimiter("claude", rpm=10, tpm=1000, clock=clock)
+
+        limiter.reserve(300).cancel()
+
+        snapshot = limiter.snapshot()
+        assert snapshot["available_tokens"] == 1000
+        assert snapshot["available_requests"] == 10
+
+
+class TestBackoffPolicy:
+    """BackoffPolicy のテスト"""
+
+    def test_exponential_with_jitter(self):
+        """0から base * 2^attempt の範囲でばらつかせる"""
+        policy = BackoffPolicy(max_retries=5, base=1.0, cap=8.0, rng=random.Random(0))
+
+        for attempt in range(5):
+            assert 0 <= policy.delay(attempt) <= min(8.0, 2 ** attempt)
+
+    def test_honors_retry_after(self):
+        """Retry-Afterより早くは再試行しない"""
+        policy = BackoffPolicy(max_retries=2, base=1.0, cap=20.0, rng=random.Random(0))
+
+        assert policy.delay(0, retry_after=5.0) == 5.0
+
+    def test_gives_up(self):
+        """再試行回数を超える・Retry-Afterが上限より長い場合は再試行しない"""
+        policy = BackoffPolicy(max_retries=1, cap=20.0)
+
+        assert policy.delay(1) is None
+        assert policy.delay(0, retry_after=60.0) is None
+
+
+class TestRetryAfter:
+    """retry_after_seconds・is_throttled_error 関数のテスト"""
+
+    def test_seconds_header(self):
+        """秒数のRetry-Afterを包まれた例外からも取得"""
+        error = _throttled("7")
+
+        assert retry_after_seconds(error) == 7.0
+        assert is_throttled_error(error) is True
+
+    def test_milliseconds_header(self):
+        """retry-after-msを優先"""
+        request = httpx.Request("POST", "https://api.example")
+        response = httpx.Response(
+            429, headers={"retry-after-ms": "1500", "retry-after": "2"}, request=request
+        )
+        error = httpx.HTTPStatusError("rate limited", request=request, response=response)
+
+        assert retry_after_seconds(error) == 1.5
+
+    def test_http_date_header(self):
+        """日時形式のRetry-After（過去の日時は0秒）"""
+        assert retry_after_seconds(_throttled("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+
+    def test_missing(self):
+        """Retry-Afterがない・サーバーエラーはレート制限ではない"""
+        error = _throttled(status=503)
+
+        assert retry_after_seconds(error) is None
+        assert is_throttled_error(error) is False
+
+
+class _StubClient(BaseAPIClient):
+    """決められた順に失敗・成功するプロバイダーのスタブ"""
+
+    provider_route = ("claude", "direct")
+
+    def __init__(self, outcomes):
+        super().__init__("key", "model")
+        self._outcomes = list(outcomes)
+        self.calls = 0
+
+    def initialize(self) -> bool:
+        return True
+
+    def _generate_content(self, prompt: str, model_name: str) -> tuple:
+        self.calls += 1
+        outcome = self._outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class _AsyncStubClient(AsyncBaseAPIClient):
+    provider_route = ("gemini", "cloudflare")
+
+    def __init__(self, streams):
+        super().__init__("key", "model")
+        self._streams = list(streams)
+        self.calls = 0
+
+    async def initialize(self) -> bool:
+        return True
+
+    async def _generate_content(self, prompt: str, model_name: str) -> tuple:
+        raise NotImplementedError
+
+    async def _generate_content_stream(self, prompt: str, model_name: str):
+        self.calls += 1
+        for item in self._streams.pop(0):
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def _generate(client):
+    return client.generate_summary("カルテ", prompt_template="テンプレート")
+
+
+class TestProviderCall:
+    """APIクライアントからの利用のテスト"""
+
+    def test_retries_throttled_call_after_retry_after(self):
+        """429はRetry-Afterの秒数だけ待って再試行"""
+        set_rate_limiters(RateLimiterRegistry(
+            backoff=BackoffPolicy(max_retries=2, base=1.0, cap=20.0, rng=random.Random(0))
+        ))
+        client = _StubClient([_throttled("3"), ("要約", 100, 50)])
+
+        with patch("app.external.provider_call.time.sleep") as mock_sleep:
+            result = _generate(client)
+
+        assert result == ("要約", 100, 50)
+        assert client.calls == 2
+        mock_sleep.assert_called_once_with(3.0)
+
+    def test_gives_up_after_max_retries(self):
+        """再試行回数を超えたら送出"""
+        set_rate_limiters(RateLimiterRegistry(
+            backoff=BackoffPolicy(max_retries=1, rng=random.Random(0))
+        ))
+        client = _StubClient([_throttled(), _throttled()])
+
+        with patch("app.external.provider_call.time.sleep") as mock_sleep:
+            with pytest.raises(APIError):
+                _generate(client)
+
+        assert client.calls == 2
+        assert mock_sleep.call_count == 1
+
+    def test_server_error_not_retried(self):
+        """レート制限以外の失敗は再試行しない（予備の送信先への切り替えに任せる）"""
+        set_rate_limiters(RateLimiterRegistry(backoff=BackoffPolicy(max_retries=2)))
+        client = _StubClient([_throttled(status=503), ("要約", 100, 50)])
+
+        with patch("app.external.provider_call.time.sleep"):
+            with pytest.raises(APIError):
+                _generate(client)
+
+        assert client.calls == 1
+
+    def test_shapes_calls_under_rpm(self):
+        """RPMの上限を超える呼び出しは失敗させずに待たせて送る"""
+        clock = _Clock()
+        set_rate_limiters(RateLimiterRegistry(
+            limits={"claude": (2, 0)}, max_wait=60, clock=clock
+        ))
+        client = _StubClient([("要約", 100, 50)] * 3)
+
+        with patch("app.external.provider_call.time.sleep", side_effect=clock.sleep) as mock_sleep:
+            for _ in range(3):
+                _generate(client)
+
+        assert client.calls == 3
+        assert [c.args[0] for c in mock_sleep.call_args_list] == pytest.approx([30.0])
+        assert get_rate_limiters().snapshot()["providers"]["claude"]["waited"] == 1
+
+    def test_settles_actual_tokens(self):
+        """TPMは推定値で予約し、生成後に実際の入出力トークン数で精算"""
+        clock = _Clock()
+        set_rate_limiters(RateLimiterRegistry(limits={"claude": (0, 10000)}, clock=clock))
+        client = _StubClient([("要約", 3000, 1000)])
+
+        _generate(client)
+
+        assert get_rate_limiters().snapshot()["providers"]["claude"]["available_tokens"] == 6000
+
+    @pytest.mark.asyncio
+    async def test_async_stream_retries_before_first_chunk(self):
+        """ストリーミングは最初のチャンクの前に429を返された場合のみ再試行"""
+        set_rate_limiters(RateLimiterRegistry(
+            backoff=BackoffPolicy(max_retries=2, base=1.0, rng=random.Random(0))
+        ))
+        client = _AsyncStubClient([
+            [_throttled("2")],
+            ["要約", {"input_tokens": 100, "output_tokens": 50}],
+        ])
+
+        with patch("app.external.provider_call.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            chunks = [c async for c in client.generate_summary_stream("カルテ", prompt_template="テンプレート")]
+
+        assert chunks[0] == "要約"
+        assert client.calls == 2
+        mock_sleep.assert_awaited_once_with(2.0)
+
+    @pytest.mark.asyncio
+    async def test_async_stream_not_retried_after_output(self):
+        """出力を返した後の失敗は再試行しない"""
+        set_rate_limiters(RateLimiterRegistry(backoff=BackoffPolicy(max_retries=2)))
+        client = _AsyncStubClient([["途中", _throttled()], ["要約"]])
+
+        with patch("app.external.provider_call.asyncio.sleep", new_callable=AsyncMock):
+            with pytest.raises(APIError):
+                [c async for c in client.generate_summary_stream("カルテ", prompt_template="テンプレート")]
+
+        assert client.calls == 1
+
+    def test_endpoint(self, client, csrf_headers):
+        """運用状況 - /health/rate-limitsで確認できる"""
+        set_rate_limiters(RateLimiterRegistry(limits={"gemini": (100, 0)}))
+
+        response = client.get("/health/rate-limits", headers=csrf_headers)
+
+        assert response.status_code == 200
+        assert response.json()["providers"]["gemini"]["rpm"] == 100
@@ -0,0 +1,280 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services.admission import (
+    AdmissionController,
+    enter_admission,
+    queued_events,
+    set_admission_controller,
+    tenant_key,
+)
+from app.utils.exceptions import AdmissionRejectedError
+
+
+class _Clock:
+    """time.monotonicの代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(**options):
+    return AdmissionController(
+        **{"concurrency": {"claude": 2}, "max_queue": 2, "default_service_time": 10, **options}
+    )
+
+
+class TestAdmissionController:
+    """AdmissionController のテスト"""
+
+    def test_queues_beyond_concurrency(self):
+        """同時実行数を超えた分は待ち行列に並び、空いた順に実行枠を得る"""
+        controller = _controller()
+        first = controller.enter("claude")
+        second = controller.enter("claude")
+        third = controller.enter("claude")
+        fourth = controller.enter("claude")
+
+        assert first.admitted and second.admitted
+        assert not third.admitted
+        assert (third.position, fourth.position) == (1, 2)
+
+        first.release()
+
+        assert third.admitted
+        assert fourth.position == 1
+        assert controller.snapshot()["providers"]["claude"]["active"] == 2
+
+    def test_rejects_when_queue_full(self):
+        """待ち行列が満杯なら推定待ち時間付きで拒否"""
+        controller = _controller()
+        for _ in range(4):
+            controller.enter("claude")
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.enter("claude")
+
+        # 前に2件並んでいるため、実行枠2つが2巡する分を待つ
+        assert exc_info.value.retry_after == 20
+        assert controller.snapshot()["providers"]["claude"]["rejected"] == 1
+
+    def test_providers_are_independent(self):
+        """プロバイダーごとに別の実行枠"""
+        controller = _controller(concurrency={"claude": 1, "gemini": 1})
+        controller.enter("claude")
+
+        assert controller.enter("gemini").admitted
+        assert not controller.enter("claude").admitted
+
+    def test_estimated_wait_follows_service_time(self):
+        """推定待ち時間は直近の処理時間の移動平均から求める"""
+        clock = _Clock()
+        controller = _controller(concurrency={"claude": 1}, clock=clock)
+        running = controller.enter("claude")
+        waiting = controller.enter("claude")
+        assert waiting.estimated_wait == 10
+
+        clock.now += 60
+        running.release()
+
+        snapshot = controller.snapshot()["providers"]["claude"]
+        assert snapshot["service_time"] == pytest.approx(20.0)
+        assert snapshot["average_wait"] == pytest.approx(30.0)
+
+    def test_leaving_queue(self):
+        """待っている間に取り消した場合は待ち行列から抜ける"""
+        controller = _controller(concurrency={"claude": 1})
+        running = controller.enter("claude")
+        leaving = controller.enter("claude")
+        staying = controller.enter("claude")
+
+        leaving.release()
+        running.release()
+
+        assert staying.admitted
+        assert controller.snapshot()["providers"]["claude"]["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_admit_async_waits_for_release(self):
+        """実行枠が空くまで待つ"""
+        controller = _controller(concurrency={"claude": 1})
+        running = controller.enter("claude")
+        waiter = asyncio.ensure_future(controller.admit_async("claude"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        running.release()
+        ticket = await asyncio.wait_for(waiter, 1)
+
+        assert ticket.admitted
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """待機中に取り消された場合は待ち行列から抜ける"""
+        controller = _controller(concurrency={"claude": 1})
+        controller.enter("claude")
+        waiter = asyncio.ensure_future(controller.admit_async("claude"))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert controller.snapshot()["providers"]["claude"]["queued"] == 0
+
+
+class TestFairScheduling:
+    """利用者ごとの公平な割り当てのテスト"""
+
+    def _drain(self, controller, running, waiting):
+        """実行中の枠を1つずつ返し、実行枠を得た順に利用者を返す"""
+        order = []
+        while any(not t.admitted for t in waiting):
+            running.pop(0).release()
+            granted = [t for t in waiting if t.admitted and t not in running]
+            for ticket in granted:
+                order.append(ticket.tenant)
+                running.append(ticket)
+                waiting.remove(ticket)
+        return order
+
+    def test_interleaves_tenants(self):
+        """後から並んだ利用者の入力も、先に大量に並んだ利用者の入力と交互に実行する"""
+        controller = _controller(concurrency={"claude": 1}, max_queue=10)
+        running = [controller.enter("claude", "眼科")]
+        waiting = [controller.enter("claude", "内科") for _ in range(3)]
+        waiting += [controller.enter("claude", "外科") for _ in range(2)]
+
+        assert self._drain(controller, running, waiting) == ["内科", "外科", "内科", "外科", "内科"]
+
+    def test_small_inputs_first(self):
+        """長大な入力の後ろに短い入力を待たせない"""
+        controller = _controller(concurrency={"claude": 1}, max_queue=20)
+        running = [controller.enter("claude", "内科", cost=1000)]
+        waiting = [controller.enter("claude", "内科", cost=100_000)]
+        waiting += [controller.enter("claude", "外科", cost=2000) for _ in range(10)]
+
+        order = self._drain(controller, running, waiting)
+
+        assert order == ["外科"] * 10 + ["内科"]
+
+    def test_weights(self):
+        """重みの大きい利用者ほど多く実行枠を得る"""
+        controller = _controller(
+            concurrency={"claude": 1}, max_queue=10, tenant_weights={"救急科": 2}
+        )
+        running = [controller.enter("claude", "眼科")]
+        waiting = [controller.enter("claude", "内科") for _ in range(3)]
+        waiting += [controller.enter("claude", "救急科") for _ in range(4)]
+
+        order = self._drain(controller, running, waiting)
+
+        assert order[:6].count("救急科") == 4
+
+    def test_tenant_concurrency(self):
+        """同時実行数の上限に達した利用者の入力は、空いていても他の利用者に譲る"""
+        controller = _controller(concurrency={"claude": 3}, tenant_concurrency=2)
+        first = controller.enter("claude", "内科")
+        controller.enter("claude", "内科")
+        capped = controller.enter("claude", "内科")
+
+        assert not capped.admitted
+        assert controller.enter("claude", "外科").admitted
+
+        first.release()
+
+        assert capped.admitted
+
+    def test_tenant_snapshot(self):
+        """利用者ごとの待ち時間・処理時間を公開"""
+        clock = _Clock()
+        controller = _controller(concurrency={"claude": 1}, clock=clock)
+        running = controller.enter("claude", "内科")
+        waiting = controller.enter("claude", "外科")
+
+        clock.now += 40
+        running.release()
+        clock.now += 20
+        waiting.release()
+
+        tenants = controller.snapshot()["tenants"]
+        assert tenants["内科"]["average_service_time"] == 40
+        assert tenants["外科"]["average_wait"] == 40
+        assert tenants["外科"]["average_service_time"] == 20
+        assert tenants["外科"]["weight"] == 1.0
+
+
+class TestQueuedEvents:
+    """queued_events 関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_reports_position_until_admitted(self):
+        """実行枠を得るまで順番と推定待ち時間を送る"""
+        controller = _controller(concurrency={"claude": 1})
+        running = controller.enter("claude")
+        ticket = controller.enter("claude")
+        events = queued_events(ticket, heartbeat_interval=0.01)
+
+        first = await anext(events)
+        running.release()
+        remaining = [e async for e in events]
+
+        data = json.loads(first.split("data: ", 1)[1])
+        assert data["status"] == "queued"
+        assert data["position"] == 1
+        assert data["estimated_wait"] == 10
+        assert "1番目" in data["message"]
+        assert remaining == []
+
+    @pytest.mark.asyncio
+    async def test_admitted_immediately(self):
+        """すぐに実行できる場合は何も送らない"""
+        ticket = _controller().enter("claude")
+
+        assert [e async for e in queued_events(ticket)] == []
+
+
+class TestEnterAdmission:
+    """enter_admission 関数のテスト"""
+
+    def test_disabled(self):
+        """無効化されていれば常に実行できる"""
+        with patch("app.services.admission.get_settings") as mock_settings:
+            mock_settings.return_value.admission_enabled = False
+            ticket = enter_admission("claude")
+
+        assert ticket.admitted
+        ticket.release()
+
+    def test_uses_shared_controller(self):
+        """差し替えたアドミッション制御を使う"""
+        controller = _controller(concurrency={"claude": 1})
+        set_admission_controller(controller)
+
+        with enter_admission("claude"):
+            assert controller.snapshot()["providers"]["claude"]["active"] == 1
+        assert controller.snapshot()["providers"]["claude"]["active"] == 0
+
+    def test_tenant_key(self):
+        """診療科ごと、または診療科・医師ごとに割り当てる"""
+        assert tenant_key("内科", "山田") == "内科"
+        with patch("app.services.admission.get_settings") as mock_settings:
+            mock_settings.return_value.admission_tenant_key = "doctor"
+            assert tenant_key("内科", "山田") == "内科/山田"
+
+    def test_endpoint(self, client, csrf_headers):
+        """運用状況 - /health/admissionで確認できる"""
+        set_admission_controller(_controller())
+        enter_admission("claude").release()
+
+        response = client.get("/health/admission", headers=csrf_headers)
+
+        assert response.status_code == 200
+        assert response.json()["enabled"] is True
+        assert response.json()["providers"]["claude"]["admitted"] == 1
@@ -0,0 +1,253 @@
+import json
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_job import BatchJobItem
+from app.schemas.summary import SummaryRequest, SummaryResponse
+from app.services.batch_service import (
+    ITEM_FAILED,
+    JOB_COMPLETED,
+    JOB_RUNNING,
+    claim_next_item,
+    complete_item,
+    create_job,
+    fail_item,
+    get_job_status,
+    iter_job_results,
+    parse_batch_file,
+)
+from app.utils.exceptions import BatchInputError
+
+
+def _response(text: str = "主病名: 糖尿病") -> SummaryResponse:
+    return SummaryResponse(
+        success=True,
+        output_summary=text,
+        parsed_summary={"主病名": "糖尿病"},
+        input_tokens=1000,
+        output_tokens=500,
+        processing_time=2.5,
+        model_used="Claude",
+        model_switched=False,
+    )
+
+
+@pytest.fixture
+def session_factory(test_db):
+    """テスト用DBのセッションファクトリ（get_db_sessionと同じくコミットまで行う）"""
+    Session = sessionmaker(bind=test_db.get_bind())
+
+    @contextmanager
+    def factory():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return factory
+
+
+def _create(session_factory, count: int = 2) -> str:
+    requests = [SummaryRequest(medical_text=f"カルテ{i}", department="眼科") for i in range(count)]
+    with session_factory() as db:
+        return create_job(db, requests, "charts.jsonl", "127.0.0.1").id
+
+
+class TestParseBatchFile:
+    """parse_batch_file 関数のテスト"""
+
+    def test_jsonl(self):
+        """1行1件のJSONを読み込み、空行は読み飛ばす"""
+        content = (
+            '{"medical_text": "カルテ1", "department": "眼科"}\n'
+            "\n"
+            '{"medical_text": "カルテ2", "document_type": "返書"}\n'
+        ).encode()
+
+        requests = parse_batch_file(content, "charts.jsonl", max_items=10)
+
+        assert [r.medical_text for r in requests] == ["カルテ1", "カルテ2"]
+        assert requests[0].department == "眼科"
+        assert requests[1].document_type == "返書"
+
+    def test_csv(self):
+        """CSVは1行目を列名とし、空欄は既定値を使う（Excelが付けるBOMも読める）"""
+        content = (
+            "\ufeffmedical_text,department,model,model_explicitly_selected\n"
+            "カルテ1,眼科,,\n"
+            "カルテ2,,Gemini_Pro,true\n"
+        ).encode()
+
+        requests = parse_batch_file(content, "charts.CSV", max_items=10)
+
+        assert requests[0].department == "眼科"
+        assert requests[0].model == SummaryRequest.model_fields["model"].default
+        assert requests[1].department == "default"
+        assert requests[1].model_explicitly_selected is True
+
+    def test_reports_invalid_rows(self):
+        """不正な行があれば行番号付きで全体を受け付けない"""
+        content = '{"medical_text": "カルテ1"}\n{"department": "眼科"}\nnot json\n'.encode()
+
+        with pytest.raises(BatchInputError) as exc_info:
+            parse_batch_file(content, "charts.jsonl", max_items=10)
+
+        message = str(exc_info.value)
+        assert "2行目" in message and "medical_text" in message
+        assert "3行目" in message
+
+    def test_limits(self):
+        """空のファイル・上限を超える件数・UTF-8以外は受け付けない"""
+        with pytest.raises(BatchInputError):
+            parse_batch_file(b"\n", "charts.jsonl", max_items=10)
+        with pytest.raises(BatchInputError):
+            parse_batch_file(b'{"medical_text": "a"}\n' * 3, "charts.jsonl", max_items=2)
+        with pytest.raises(BatchInputError):
+            parse_batch_file("medical_text\nカルテ\n".encode("shift_jis"), "charts.csv", max_items=2)
+
+
+class TestJobLifecycle:
+    """ジョブの登録・取得・完了のテスト"""
+
+    def test_create_and_status(self, session_factory):
+        """登録直後は全件が処理待ち"""
+        job_id = _create(session_factory, count=3)
+
+        with session_factory() as db:
+            status = get_job_status(db, job_id)
+
+        assert status.status == "queued"
+        assert (status.total_items, status.pending, status.progress) == (3, 3, 0.0)
+
+    def test_claim_in_order(self, session_factory):
+        """行番号順に1件ずつ取得し、処理中の項目は他のワーカーに渡さない"""
+        job_id = _create(session_factory)
+
+        with session_factory() as db:
+            first = claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3)
+        with session_factory() as db:
+            second = claim_next_item(db, "worker-b", lease_seconds=60, max_attempts=3)
+        with session_factory() as db:
+            third = claim_next_item(db, "worker-c", lease_seconds=60, max_attempts=3)
+            status = get_job_status(db, job_id)
+
+        assert (first.line_no, second.line_no, third) == (1, 2, None)
+        assert first.request.medical_text == "カルテ0"
+        assert first.user_ip == "127.0.0.1"
+        assert status.status == JOB_RUNNING
+        assert status.running == 2
+
+    def test_complete_job(self, session_factory):
+        """全項目が完了するとジョブを完了にする"""
+        job_id = _create(session_factory)
+        for _ in range(2):
+            with session_factory() as db:
+                claimed = claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3)
+            with session_factory() as db:
+                job = complete_item(db, claimed, "worker-a", _response())
+
+        with session_factory() as db:
+            status = get_job_status(db, job_id)
+
+        assert job is not None
+        assert status.status == JOB_COMPLETED
+        assert (status.succeeded, status.progress) == (2, 1.0)
+        assert status.completed_at is not None
+
+    def test_two_finishers(self, session_factory):
+        """最後の項目を2つのワーカーが終えると、ジョブの行をロックしてから数えて一方が完了にする"""
+        job_id = _create(session_factory)
+        with session_factory() as db:
+            claimed_a = claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3)
+        with session_factory() as db:
+            claimed_b = claim_next_item(db, "worker-b", lease_seconds=60, max_attempts=3)
+
+        with session_factory() as db:
+            first = complete_item(db, claimed_a, "worker-a", _response())
+        with session_factory() as db, patch.object(db, "execute", wraps=db.execute) as execute:
+            last = complete_item(db, claimed_b, "worker-b", _response())
+            status = get_job_status(db, job_id)
+
+        # ロックは後続のCOUNTより先に取得する（SQLiteはFOR UPDATEを出力しないためPostgreSQL向けに確認）
+        lock = str(execute.call_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+        assert "FROM batch_jobs" in lock and "FOR UPDATE" in lock
+        assert first is None and last is not None
+        assert status.status == JOB_COMPLETED
+        assert status.completed_at is not None
+
+    def test_retry_later(self, session_factory):
+        """再試行する項目は待ち時間が明けるまで取得しない"""
+        _create(session_factory, count=1)
+        with session_factory() as db:
+            claimed = claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3)
+        with session_factory() as db:
+            fail_item(db, claimed, "worker-a", "503", datetime.now(UTC) + timedelta(seconds=60))
+
+        with session_factory() as db:
+            assert claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3) is None
+            db.execute(update(BatchJobItem).values(available_at=datetime.now(UTC)))
+        with session_factory() as db:
+            retried = claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=3)
+
+        assert retried.attempts == 2
+
+    def test_reclaims_expired_lease(self, session_factory):
+        """処理中に停止したワーカーの項目は期限切れ後に取得し直し、古いワーカーの結果は反映しない"""
+        job_id = _create(session_factory, count=1)
+        with session_factory() as db:
+            stale = claim_next_item(db, "worker-a", lease_seconds=0, max_attempts=3)
+        with session_factory() as db:
+            reclaimed = claim_next_item(db, "worker-b", lease_seconds=60, max_attempts=3)
+        with session_factory() as db:
+            complete_item(db, stale, "worker-a", _response("古い結果"))
+            status = get_job_status(db, job_id)
+
+        assert reclaimed.line_no == stale.line_no
+        assert status.running == 1 and status.succeeded == 0
+
+    def test_interrupted_too_often(self, session_factory):
+        """停止したワーカーの分で再試行回数を使い切った項目は失敗にする"""
+        job_id = _create(session_factory, count=1)
+        with session_factory() as db:
+            claim_next_item(db, "worker-a", lease_seconds=0, max_attempts=1)
+        with session_factory() as db:
+            assert claim_next_item(db, "worker-b", lease_seconds=60, max_attempts=1) is None
+            status = get_job_status(db, job_id)
+
+        assert status.failed == 1
+        assert status.status == JOB_COMPLETED
+
+
+class TestIterJobResults:
+    """iter_job_results 関数のテスト"""
+
+    def test_results_in_order(self, session_factory):
+        """完了した項目のみ行番号順に返し、afterで続きから取得できる"""
+        job_id = _create(session_factory, count=3)
+        claimed = []
+        for _ in range(3):
+            with session_factory() as db:
+                claimed.append(claim_next_item(db, "worker-a", lease_seconds=60, max_attempts=1))
+        with session_factory() as db:
+            complete_item(db, claimed[0], "worker-a", _response("文書1"))
+            fail_item(db, claimed[2], "worker-a", "入力テキストが長すぎます", None)
+
+        with patch("app.services.batch_service.get_db_session", session_factory):
+            lines = [json.loads(line) for line in iter_job_results(job_id, page_size=1)]
+            later = [json.loads(line) for line in iter_job_results(job_id, after=1)]
+
+        assert [(r["line_no"], r["status"]) for r in lines] == [(1, "succeeded"), (3, ITEM_FAILED)]
+        assert lines[0]["result"]["output_summary"] == "文書1"
+        assert lines[1]["error_message"] == "入力テキストが長すぎます"
+        assert [r["line_no"] for r in later] == [3]
@@ -0,0 +1,197 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_job import BatchJobItem
+from app.schemas.summary import SummaryRequest, SummaryResponse
+from app.services.batch_service import create_job, get_job_status
+from app.services.batch_worker import BatchWorker
+
+
+class _InputError(str):
+    """再試行しても成功しない失敗（入力エラー）"""
+
+
+class _FakeProvider:
+    """
+    execute_summary_generationの代わりに決められた順に成功・失敗する
+
+    文字列はプロバイダー呼び出しの失敗（再試行可能）、_InputErrorは入力エラーとして返す
+    """
+
+    def __init__(self, outcomes=None):
+        self._outcomes = list(outcomes or [])
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self._outcomes.pop(0) if self._outcomes else "ok"
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "ok":
+            return SummaryResponse(
+                success=True,
+                output_summary=f"{kwargs['medical_text']}の文書",
+                parsed_summary={},
+                input_tokens=100,
+                output_tokens=50,
+                processing_time=1.0,
+                model_used="Claude",
+                model_switched=False,
+            )
+        return SummaryResponse(
+            success=False,
+            output_summary="",
+            parsed_summary={},
+            input_tokens=0,
+            output_tokens=0,
+            processing_time=0.0,
+            model_used="Claude",
+            model_switched=False,
+            retryable=not isinstance(outcome, _InputError),
+            error_message=outcome,
+        )
+
+
+@pytest.fixture
+def session_factory(test_db):
+    """テスト用DBのセッションファクトリ（get_db_sessionと同じくコミットまで行う）"""
+    Session = sessionmaker(bind=test_db.get_bind())
+
+    @contextmanager
+    def factory():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return factory
+
+
+def _create(session_factory, count: int = 2) -> str:
+    requests = [
+        SummaryRequest(medical_text=f"カルテ{i}", department="眼科", doctor="橋本義弘")
+        for i in range(count)
+    ]
+    with session_factory() as db:
+        return create_job(db, requests, "charts.jsonl", "10.0.0.1").id
+
+
+def _status(session_factory, job_id):
+    with session_factory() as db:
+        return get_job_status(db, job_id)
+
+
+def _make_available(session_factory):
+    """再試行の待ち時間を経過させる"""
+    with session_factory() as db:
+        db.execute(update(BatchJobItem).values(available_at=BatchJobItem.updated_at))
+
+
+class TestBatchWorker:
+    """BatchWorker のテスト"""
+
+    def test_generates_with_request_fields(self, session_factory):
+        """行の内容とジョブ登録者のIPで文書生成を呼び出す"""
+        provider = _FakeProvider()
+        worker = BatchWorker(session_factory=session_factory, generate=provider)
+        job_id = _create(session_factory)
+
+        while worker.run_once():
+            pass
+
+        status = _status(session_factory, job_id)
+        assert status.status == "completed"
+        assert status.succeeded == 2
+        assert provider.calls[0]["medical_text"] == "カルテ0"
+        assert provider.calls[0]["department"] == "眼科"
+        assert provider.calls[0]["user_ip"] == "10.0.0.1"
+        assert worker.stats()["succeeded"] == 2
+
+    def test_retries_failures(self, session_factory):
+        """失敗した項目は待ち時間の後に再試行する"""
+        provider = _FakeProvider(["API エラーが発生しました", RuntimeError("接続エラー"), "ok"])
+        worker = BatchWorker(
+            session_factory=session_factory, generate=provider, max_attempts=3, retry_delay=60
+        )
+        job_id = _create(session_factory, count=1)
+
+        assert worker.run_once()
+        assert not worker.run_once()  # 待ち時間中は取得しない
+        _make_available(session_factory)
+        assert worker.run_once()
+        _make_available(session_factory)
+        assert worker.run_once()
+
+        status = _status(session_factory, job_id)
+        assert status.succeeded == 1
+        assert worker.stats()["retried"] == 2
+
+    def test_gives_up_after_max_attempts(self, session_factory):
+        """再試行回数を使い切った項目は失敗として記録し、他の項目は続ける"""
+        provider = _FakeProvider(["入力テキストが長すぎます"])
+        worker = BatchWorker(session_factory=session_factory, generate=provider, max_attempts=1)
+        job_id = _create(session_factory)
+
+        while worker.run_once():
+            pass
+
+        status = _status(session_factory, job_id)
+        assert (status.succeeded, status.failed) == (1, 1)
+        assert status.status == "completed"
+
+    def test_input_error_not_retried(self, session_factory):
+        """入力エラーは再試行回数が残っていても直ちに失敗として記録する"""
+        provider = _FakeProvider([_InputError("入力テキストが長すぎます")])
+        worker = BatchWorker(session_factory=session_factory, generate=provider, max_attempts=3)
+        job_id = _create(session_factory, count=1)
+
+        assert worker.run_once()
+
+        status = _status(session_factory, job_id)
+        assert (status.failed, status.pending) == (1, 0)
+        assert status.status == "completed"
+        assert len(provider.calls) == 1
+        assert worker.stats()["retried"] == 0
+
+    def test_resumes_after_restart(self, session_factory):
+        """停止したワーカーが処理中だった項目を、再起動後のワーカーが期限切れ後に処理する"""
+        job_id = _create(session_factory, count=1)
+        stopped = BatchWorker(
+            session_factory=session_factory, lease_seconds=0,
+            generate=_FakeProvider([KeyboardInterrupt()]),
+        )
+        with pytest.raises(KeyboardInterrupt):
+            stopped.run_once()
+
+        restarted = BatchWorker(session_factory=session_factory, generate=_FakeProvider())
+        assert restarted.run_once()
+
+        assert _status(session_factory, job_id).succeeded == 1
+
+    def test_threads(self, session_factory):
+        """開始したスレッドが処理待ちの項目を処理し、停止できる"""
+        provider = _FakeProvider()
+        worker = BatchWorker(
+            session_factory=session_factory, generate=provider, concurrency=1, poll_interval=0.01
+        )
+        job_id = _create(session_factory, count=3)
+
+        worker.start()
+        try:
+            for _ in range(500):
+                if _status(session_factory, job_id).status == "completed":
+                    break
+                worker._stop.wait(0.01)
+        finally:
+            worker.shutdown()
+
+        assert _status(session_factory, job_id).succeeded == 3
+        assert worker.stats()["running"] is False
@@ -0,0 +1,170 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+
+from app.services import cache_invalidation, prompt_service
+from app.services.cache_invalidation import (
+    InMemoryInvalidationBus,
+    PostgresInvalidationBus,
+    dispatch,
+    notify_change,
+)
+
+
+@pytest.fixture
+def recorded_handlers(monkeypatch):
+    """登録済みハンドラーを記録用のものに差し替える"""
+    received: dict[str, list] = {"prompt": [], "evaluation_prompt": []}
+    monkeypatch.setattr(
+        cache_invalidation,
+        "_handlers",
+        {kind: [calls.append] for kind, calls in received.items()},
+    )
+    return received
+
+
+class TestDispatch:
+    """dispatch 関数のテスト"""
+
+    def test_dispatch_routes_by_kind(self, recorded_handlers):
+        """通知の振り分け - 種類ごとのハンドラーに渡す"""
+        dispatch(json.dumps({"kind": "evaluation_prompt", "key": ["返書"]}))
+
+        assert recorded_handlers["evaluation_prompt"] == [["返書"]]
+        assert recorded_handlers["prompt"] == []
+
+    def test_dispatch_ignores_bad_payload(self, recorded_handlers):
+        """通知の振り分け - 不正なペイロードは無視"""
+        with patch("app.services.cache_invalidation.logger") as mock_logger:
+            dispatch("not json")
+            dispatch(json.dumps({"key": ["返書"]}))
+
+        assert recorded_handlers == {"prompt": [], "evaluation_prompt": []}
+        assert mock_logger.warning.call_count == 2
+
+
+class TestInMemoryInvalidationBus:
+    """InMemoryInvalidationBus のテスト"""
+
+    def test_delivered_after_commit(self, test_db, recorded_handlers):
+        """プロセス内バス - コミット後に配信"""
+        notify_change(test_db, cache_invalidation.PROMPT, ["眼科", "返書", "default"])
+        assert recorded_handlers["prompt"] == []
+
+        test_db.commit()
+
+        assert recorded_handlers["prompt"] == [["眼科", "返書", "default"]]
+
+    def test_discarded_on_rollback(self, test_db, recorded_handlers):
+        """プロセス内バス - ロールバック時は配信しない"""
+        test_db.execute(text("SELECT 1"))
+        notify_change(test_db, cache_invalidation.PROMPT)
+        test_db.rollback()
+        test_db.commit()
+
+        assert recorded_handlers["prompt"] == []
+
+    def test_prompt_write_notifies_key(self, test_db, sample_prompts, recorded_handlers):
+        """プロセス内バス - プロンプト保存で変更キーを通知"""
+        prompt_service.create_or_update_prompt(
+            test_db,
+            department="眼科",
+            document_type="他院への紹介",
+            doctor="橋本義弘",
+            content="更新後プロンプト",
+        )
+        test_db.commit()
+
+        assert recorded_handlers["prompt"] == [["眼科", "他院への紹介", "橋本義弘"]]
+
+    def test_other_worker_cache_evicted(self, test_db, sample_prompts):
+        """プロセス内バス - 通知を受けたら解決済みプロンプトを破棄"""
+        key = ("眼科", "他院への紹介", "橋本義弘")
+        prompt_service.resolve_prompt(test_db, *key)
+
+        dispatch(json.dumps({"kind": "prompt", "key": list(key)}))
+
+        with patch(
+            "app.services.prompt_service.get_prompt", wraps=prompt_service.get_prompt
+        ) as mock_get_prompt:
+            prompt_service.resolve_prompt(test_db, *key)
+        mock_get_prompt.assert_called_once()
+
+
+class TestPostgresInvalidationBus:
+    """PostgresInvalidationBus のテスト"""
+
+    def test_dsn_strips_driver(self):
+        """PostgreSQLバス - psycopg2用にドライバー指定を除去"""
+        bus = PostgresInvalidationBus("postgresql+psycopg2://user:pass@db:5432/medidocs")
+        assert bus._dsn == "postgresql://user:pass@db:5432/medidocs"
+
+    def test_publish_uses_pg_notify_in_transaction(self):
+        """PostgreSQLバス - 書き込みと同じセッションでpg_notifyを実行"""
+        mock_db = MagicMock()
+        bus = PostgresInvalidationBus("postgresql://user:pass@db/medidocs")
+
+        bus.publish(mock_db, '{"kind": "prompt", "key": null}')
+
+        statement = mock_db.execute.call_args.args[0]
+        assert "pg_notify" in str(statement)
+        mock_db.commit.assert_not_called()
+
+    def test_listen_dispatches_notifications(self):
+        """PostgreSQLバス - 受信した通知を振り分ける"""
+        bus = PostgresInvalidationBus("postgresql://user:pass@db/medidocs")
+        payload = json.dumps({"kind": "prompt", "key": None})
+
+        conn = MagicMock()
+        conn.notifies = []
+
+        def poll():
+            conn.notifies.append(MagicMock(payload=payload))
+            bus._stop.set()
+
+        conn.poll.side_effect = poll
+
+        with patch("app.services.cache_invalidation.psycopg2.connect", return_value=conn), \
+                patch("app.services.cache_invalidation.select.select", return_value=([conn], [], [])), \
+                patch("app.services.cache_invalidation.dispatch") as mock_dispatch, \
+                patch("app.services.cache_invalidation.dispatch_all") as mock_dispatch_all:
+            bus._listen(resync=False)
+
+        conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(
+            f"LISTEN {cache_invalidation.CHANNEL}"
+        )
+        mock_dispatch.assert_called_once_with(payload)
+        mock_dispatch_all.assert_not_called()
+        conn.close.assert_called_once()
+
+    def test_listen_resyncs_after_reconnect(self):
+        """PostgreSQLバス - 再接続時は全キャッシュを破棄"""
+        bus = PostgresInvalidationBus("postgresql://user:pass@db/medidocs")
+        bus._stop.set()
+
+        with patch("app.services.cache_invalidation.psycopg2.connect"), \
+                patch("app.services.cache_invalidation.dispatch_all") as mock_dispatch_all:
+            bus._listen(resync=True)
+
+        mock_dispatch_all.assert_called_once()
+
+
+class TestCreateBus:
+    """バス選択のテスト"""
+
+    @pytest.mark.parametrize(
+        ("backend", "database_url", "expected"),
+        [
+            ("auto", "postgresql://user:pass@db/medidocs", PostgresInvalidationBus),
+            ("auto", "sqlite:///./medidocs.db", InMemoryInvalidationBus),
+            ("memory", "postgresql://user:pass@db/medidocs", InMemoryInvalidationBus),
+        ],
+    )
+    def test_create_bus(self, backend, database_url, expected):
+        """バス選択 - 設定とデータベースURLから決定"""
+        with patch("app.services.cache_invalidation.get_settings") as mock_get_settings:
+            mock_get_settings.return_value.cache_invalidation_backend = backend
+            mock_get_settings.return_value.get_database_url.return_value = database_url
+            assert isinstance(cache_invalidation._create_bus(), expected)
@@ -6,6 +6,8 @@ from app.services.evaluation_prompt_service import (
     delete_evaluation_prompt,
     get_all_evaluation_prompts,
     get_evaluation_prompt,
+    invalidate_evaluation_prompt_cache,
+    resolve_evaluation_prompt,
 )
 
 
@@ -147,3 +149,54 @@ class TestDeleteEvaluationPrompt:
         assert success is False
         assert message == "返書の評価プロンプトが見つかりません"
         mock_db.delete.assert_not_called()
+
+
+class TestResolveEvaluationPrompt:
+    """resolve_evaluation_prompt 関数のテスト"""
+
+    def test_resolve_evaluation_prompt_cached(self):
+        """評価プロンプト解決 - 2回目はDBを参照しない"""
+        mock_db = MagicMock()
+        mock_prompt = MagicMock()
+        mock_prompt.content = "評価プロンプト内容"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_prompt
+
+        assert resolve_evaluation_prompt(mock_db, "他院への紹介") == "評価プロンプト内容"
+        assert resolve_evaluation_prompt(mock_db, "他院への紹介") == "評価プロンプト内容"
+
+        assert mock_db.query.call_count == 1
+
+    def test_resolve_evaluation_prompt_caches_missing(self):
+        """評価プロンプト解決 - 未設定の結果もキャッシュ"""
+        mock_db = MagicMock()
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+
+        assert resolve_evaluation_prompt(mock_db, "返書") is None
+        assert resolve_evaluation_prompt(mock_db, "返書") is None
+
+        assert mock_db.query.call_count == 1
+
+    def test_invalidate_evaluation_prompt_cache_by_document_type(self):
+        """評価プロンプト解決 - 指定した文書タイプのみ破棄"""
+        mock_db = MagicMock()
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        resolve_evaluation_prompt(mock_db, "返書")
+        resolve_evaluation_prompt(mock_db, "最終返書")
+
+        invalidate_evaluation_prompt_cache("返書")
+        resolve_evaluation_prompt(mock_db, "返書")
+        resolve_evaluation_prompt(mock_db, "最終返書")
+
+        assert mock_db.query.call_count == 3
+
+    def test_save_evaluation_prompt_invalidates_cache_after_commit(self, test_db):
+        """評価プロンプト解決 - 保存のコミット後にキャッシュを破棄"""
+        create_or_update_evaluation_prompt(test_db, "他院への紹介", "旧プロンプト")
+        test_db.commit()
+        assert resolve_evaluation_prompt(test_db, "他院への紹介") == "旧プロンプト"
+
+        create_or_update_evaluation_prompt(test_db, "他院への紹介", "新プロンプト")
+        assert resolve_evaluation_prompt(test_db, "他院への紹介") == "旧プロンプト"
+        test_db.commit()
+
+        assert resolve_evaluation_prompt(test_db, "他院への紹介") == "新プロンプト"
@@ -1,12 +1,14 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.core.constants import MESSAGES
 from app.services.evaluation_service import (
     build_evaluation_prompt,
     execute_evaluation,
+    execute_evaluation_async,
     execute_evaluation_stream,
 )
+from app.services.input_preparation import prepare_input
 
 
 class TestBuildEvaluationPrompt:
@@ -97,9 +99,40 @@ class TestExecuteEvaluation:
         assert result.processing_time >= 0
         assert result.error_message is None
 
-        mock_client.initialize.assert_called_once()
+        mock_client.ensure_initialized.assert_called_once()
         mock_client._generate_content.assert_called_once()
 
+    @patch("app.services.evaluation_service.GeminiAPIClient")
+    @patch("app.services.evaluation_service.get_db_session")
+    @patch("app.services.evaluation_service.settings")
+    def test_execute_evaluation_reuses_generation_scan(
+        self, mock_settings, mock_get_db_session, mock_client_class
+    ):
+        """評価実行 - 生成時に走査済みのカルテは再走査しない"""
+        mock_settings.gemini_evaluation_model = "gemini-2.0-flash-thinking-exp-01-21"
+        mock_settings.max_input_tokens = 100000
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        mock_db.query.return_value.filter.return_value.first.return_value.content = "評価プロンプト"
+        mock_client_class.return_value._generate_content.return_value = ("評価結果", 10, 5)
+
+        chart = "患者は咳と発熱を訴えている" * 10
+        prepare_input(chart)
+        with patch(
+            "app.services.input_preparation.scan_prompt_injection", return_value=[]
+        ) as mock_scan:
+            result = execute_evaluation(
+                document_type="他院への紹介",
+                input_text=chart,
+                current_prescription="",
+                additional_info="",
+                output_summary="出力内容",
+            )
+
+        assert result.success is True
+        # 走査したのは生成された出力のみ
+        mock_scan.assert_called_once_with("出力内容")
+
     @patch("app.services.evaluation_service.settings")
     def test_execute_evaluation_no_output(self, mock_settings):
         """評価実行 - 出力なしエラー"""
@@ -296,15 +329,87 @@ class TestExecuteEvaluation:
         assert "【生成された出力】" in call_args
 
 
+class TestExecuteEvaluationAsync:
+    """execute_evaluation_async 関数のテスト"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.evaluation_service.AsyncGeminiAPIClient")
+    @patch("app.services.evaluation_service.get_db_session")
+    @patch("app.services.evaluation_service.settings")
+    async def test_execute_evaluation_async_success(
+        self, mock_settings, mock_get_db_session, mock_client_class
+    ):
+        """非同期評価実行 - 正常系"""
+        mock_settings.gemini_evaluation_model = "gemini-2.0-flash-thinking-exp-01-21"
+        mock_settings.max_input_tokens = 100000
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        mock_prompt = MagicMock()
+        mock_prompt.content = "評価プロンプト"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_prompt
+
+        mock_client = MagicMock()
+        mock_client.ensure_initialized = AsyncMock()
+        mock_client._generate_content = AsyncMock(return_value=("評価結果: 良好です", 1000, 500))
+        mock_client_class.return_value = mock_client
+
+        result = await execute_evaluation_async(
+            document_type="他院への紹介",
+            input_text="患者情報",
+            current_prescription="処方内容",
+            additional_info="追加情報",
+            output_summary="出力内容"
+        )
+
+        assert result.success is True
+        assert result.evaluation_result == "評価結果: 良好です"
+        assert result.input_tokens == 1000
+        mock_client.ensure_initialized.assert_awaited_once()
+        prompt_arg = mock_client._generate_content.await_args.args[0]
+        assert "評価プロンプト" in prompt_arg
+        assert "出力内容" in prompt_arg
+
+    @pytest.mark.asyncio
+    @patch("app.services.evaluation_service._run_async_evaluation", new_callable=AsyncMock)
+    @patch("app.services.evaluation_service.get_db_session")
+    @patch("app.services.evaluation_service.settings")
+    async def test_execute_evaluation_async_general_exception(
+        self, mock_settings, mock_get_db_session, mock_run_async
+    ):
+        """非同期評価実行 - 予期しない例外"""
+        mock_settings.gemini_evaluation_model = "gemini-2.0-flash-thinking-exp-01-21"
+        mock_settings.max_input_tokens = 100000
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        mock_prompt = MagicMock()
+        mock_prompt.content = "評価プロンプト"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_prompt
+
+        mock_run_async.side_effect = RuntimeError("接続断")
+
+        result = await execute_evaluation_async(
+            document_type="他院への紹介",
+            input_text="患者情報",
+            current_prescription="",
+            additional_info="",
+            output_summary="出力内容"
+        )
+
+        assert result.success is False
+        assert result.error_message == MESSAGES["ERROR"]["EVALUATION_API_ERROR"].format(error="接続断")
+
+
 class TestExecuteEvaluationStream:
     """execute_evaluation_stream 関数のテスト"""
 
     @pytest.mark.asyncio
-    @patch("app.services.evaluation_service._run_sync_evaluation")
+    @patch("app.services.evaluation_service._run_async_evaluation", new_callable=AsyncMock)
     @patch("app.services.evaluation_service.get_db_session")
     @patch("app.services.evaluation_service.settings")
     async def test_execute_evaluation_stream_success(
-        self, mock_settings, mock_get_db_session, mock_run_sync
+        self, mock_settings, mock_get_db_session, mock_run_async
     ):
         """評価ストリーミング実行 - 正常系"""
         mock_settings.gemini_evaluation_model = "gemini-2.0-flash-thinking-exp-01-21"
@@ -320,7 +425,7 @@ class TestExecuteEvaluationStream:
         mock_db.query.return_value.filter.return_value.first.return_value = mock_prompt
 
         # モック評価結果
-        mock_run_sync.return_value = ("評価結果: 良好です", 1000, 500)
+        mock_run_async.return_value = ("評価結果: 良好です", 1000, 500)
 
         events = []
         async for event in execute_evaluation_stream(
@@ -410,11 +515,11 @@ class TestExecuteEvaluationStream:
         assert "評価プロンプトが設定されていません" in events[0]
 
     @pytest.mark.asyncio
-    @patch("app.services.evaluation_service._run_sync_evaluation")
+    @patch("app.services.evaluation_service._run_async_evaluation", new_callable=AsyncMock)
     @patch("app.services.evaluation_service.get_db_session")
     @patch("app.services.evaluation_service.settings")
     async def test_execute_evaluation_stream_api_error(
-        self, mock_settings, mock_get_db_session, mock_run_sync
+        self, mock_settings, mock_get_db_session, mock_run_async
     ):
         """評価ストリーミング実行 - API呼び出しエラー"""
         mock_settings.gemini_evaluation_model = "gemini-2.0-flash-thinking-exp-01-21"
@@ -430,7 +535,7 @@ class TestExecuteEvaluationStream:
         mock_db.query.return_value.filter.return_value.first.return_value = mock_prompt
 
         # モックでエラー
-        mock_run_sync.side_effect = Exception("API接続エラー")
+        mock_run_async.side_effect = Exception("API接続エラー")
 
         events = []
         async for event in execute_evaluation_stream(
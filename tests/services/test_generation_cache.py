@@ -0,0 +1,217 @@
+import os
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import generation_cache
+from app.services.generation_cache import (
+    CachedGeneration,
+    DatabaseGenerationCache,
+    FileGenerationCache,
+    MemoryGenerationCache,
+    generation_cache_key,
+    get_generation_cache,
+    lookup_generation,
+    set_generation_cache,
+    store_generation,
+)
+
+_RESULT = CachedGeneration(
+    output_summary="主病名: 糖尿病",
+    parsed_summary={"主病名": "糖尿病"},
+    input_tokens=1000,
+    output_tokens=500,
+)
+
+
+def _key(**overrides) -> str:
+    params = {
+        "prompt_template": "プロンプト",
+        "medical_text": "患者は60歳男性。",
+        "additional_info": "",
+        "referral_purpose": "",
+        "current_prescription": "",
+        "provider": "claude",
+        "model_name": "claude-sonnet",
+    }
+    params.update(overrides)
+    return generation_cache_key(**params)
+
+
+class TestGenerationCacheKey:
+    """generation_cache_key 関数のテスト"""
+
+    def test_same_inputs_same_key(self):
+        """キャッシュキー - 同じ入力は同じキー"""
+        assert _key() == _key()
+        assert len(_key()) == 64
+
+    @pytest.mark.parametrize("field,value", [
+        ("prompt_template", "別のプロンプト"),
+        ("medical_text", "患者は61歳男性。"),
+        ("additional_info", "HbA1c 7.5%"),
+        ("referral_purpose", "精査"),
+        ("current_prescription", "メトホルミン"),
+        ("provider", "gemini"),
+        ("model_name", "claude-opus"),
+    ])
+    def test_any_field_changes_key(self, field, value):
+        """キャッシュキー - いずれかの要素が変わればキーも変わる"""
+        assert _key(**{field: value}) != _key()
+
+    def test_generation_config_changes_key(self):
+        """キャッシュキー - Geminiの思考レベルが変わればキーも変わる"""
+        with patch("app.services.generation_cache.get_settings") as mock_settings:
+            mock_settings.return_value.gemini_thinking_level = "LOW"
+            low = _key(provider="gemini")
+            mock_settings.return_value.gemini_thinking_level = "HIGH"
+            high = _key(provider="gemini")
+        assert low != high
+
+
+class TestMemoryGenerationCache:
+    """MemoryGenerationCache のテスト"""
+
+    def test_put_and_get(self):
+        """メモリキャッシュ - 保存した結果を取得"""
+        cache = MemoryGenerationCache()
+        cache.put("k", _RESULT)
+        assert cache.get("k") == _RESULT
+        assert cache.get("missing") is None
+
+    def test_evicts_least_recently_used(self):
+        """メモリキャッシュ - 上限を超えると古いエントリから破棄"""
+        cache = MemoryGenerationCache(maxsize=2)
+        cache.put("a", _RESULT)
+        cache.put("b", _RESULT)
+        cache.put("c", _RESULT)
+        assert cache.get("a") is None
+        assert cache.get("c") == _RESULT
+
+
+class TestFileGenerationCache:
+    """FileGenerationCache のテスト"""
+
+    def test_put_and_get(self, tmp_path):
+        """ファイルキャッシュ - 別インスタンスからも取得できる"""
+        FileGenerationCache(tmp_path).put("k", _RESULT)
+        assert FileGenerationCache(tmp_path).get("k") == _RESULT
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_expired_entry_removed(self, tmp_path):
+        """ファイルキャッシュ - 期限切れのエントリは取得せず削除"""
+        cache = FileGenerationCache(tmp_path, ttl=60)
+        cache.put("k", _RESULT)
+        old = time.time() - 120
+        os.utime(tmp_path / "k.json", (old, old))
+
+        assert cache.get("k") is None
+        assert not (tmp_path / "k.json").exists()
+
+    def test_prunes_oldest_over_maxsize(self, tmp_path):
+        """ファイルキャッシュ - 上限を超えると更新の古いファイルから削除"""
+        cache = FileGenerationCache(tmp_path, maxsize=2)
+        for i, key in enumerate(["a", "b"]):
+            cache.put(key, _RESULT)
+            mtime = time.time() - 10 + i
+            os.utime(tmp_path / f"{key}.json", (mtime, mtime))
+        cache.put("c", _RESULT)
+
+        assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["b", "c"]
+
+
+class TestDatabaseGenerationCache:
+    """DatabaseGenerationCache のテスト"""
+
+    @pytest.fixture
+    def cache(self, test_db):
+        @contextmanager
+        def session_factory():
+            try:
+                yield test_db
+                test_db.commit()
+            except Exception:
+                test_db.rollback()
+                raise
+
+        return DatabaseGenerationCache(session_factory=session_factory, maxsize=2)
+
+    def test_put_and_get(self, cache):
+        """DBキャッシュ - 保存した結果を取得"""
+        cache.put("k", _RESULT)
+        assert cache.get("k") == _RESULT
+        assert cache.get("missing") is None
+
+    def test_put_overwrites_existing(self, cache):
+        """DBキャッシュ - 同じキーは上書き"""
+        cache.put("k", _RESULT)
+        updated = CachedGeneration("主病名: 高血圧", {"主病名": "高血圧"}, 10, 5)
+        cache.put("k", updated)
+        assert cache.get("k") == updated
+
+    def test_expired_entry_not_returned(self, test_db, cache):
+        """DBキャッシュ - 期限切れのエントリは返さない"""
+        cache._ttl = -cache._ttl
+        cache.put("k", _RESULT)
+        assert cache.get("k") is None
+
+    def test_prunes_over_maxsize(self, test_db, cache):
+        """DBキャッシュ - 上限を超えると作成の古いエントリから削除"""
+        for key in ["a", "b", "c"]:
+            cache.put(key, _RESULT)
+            time.sleep(0.01)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == _RESULT
+        assert cache.get("c") == _RESULT
+
+
+class TestGenerationCacheAccessors:
+    """lookup_generation / store_generation / get_generation_cache のテスト"""
+
+    def test_disabled_by_default(self):
+        """キャッシュ取得 - 既定設定では無効"""
+        set_generation_cache(None, configured=False)
+        assert get_generation_cache() is None
+        store_generation("k", _RESULT)
+        assert lookup_generation("k") is None
+
+    @pytest.mark.parametrize("backend,expected", [
+        ("memory", MemoryGenerationCache),
+        ("database", DatabaseGenerationCache),
+        ("file", FileGenerationCache),
+    ])
+    def test_backend_from_settings(self, monkeypatch, backend, expected):
+        """キャッシュ取得 - 設定のバックエンドを生成"""
+        monkeypatch.setattr(
+            generation_cache, "get_settings",
+            lambda: MagicMock(generation_cache_backend=backend, generation_cache_maxsize=8,
+                              generation_cache_ttl=60, generation_cache_dir="unused"),
+        )
+        set_generation_cache(None, configured=False)
+        assert isinstance(get_generation_cache(), expected)
+
+    @patch("app.services.generation_cache.logger")
+    def test_unknown_backend_disables_cache(self, mock_logger, monkeypatch):
+        """キャッシュ取得 - 不明なバックエンドは警告して無効"""
+        monkeypatch.setattr(
+            generation_cache, "get_settings",
+            lambda: MagicMock(generation_cache_backend="redis"),
+        )
+        set_generation_cache(None, configured=False)
+        assert get_generation_cache() is None
+        mock_logger.warning.assert_called_once()
+
+    @patch("app.services.generation_cache.logger")
+    def test_failures_are_swallowed(self, mock_logger):
+        """キャッシュ読み書き - 失敗しても例外を投げずキャッシュなしとして扱う"""
+        broken = MagicMock()
+        broken.get.side_effect = OSError("読み込み失敗")
+        broken.put.side_effect = OSError("書き込み失敗")
+        set_generation_cache(broken)
+
+        store_generation("k", _RESULT)
+        assert lookup_generation("k") is None
+        assert mock_logger.warning.call_count == 2
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from app.services.hedging import GenerationLane, hedged_stream
+from app.utils.exceptions import APIError
+
+PRIMARY = GenerationLane("Claude", "claude", "claude-sonnet")
+ALTERNATE_ROUTE = GenerationLane("Claude", "claude", "claude-sonnet", "direct")
+OTHER_MODEL = GenerationLane("Gemini_Pro", "gemini", "gemini-pro")
+
+
+def _lanes(behaviours):
+    """送信先ごとのストリーム（開始した送信先を記録）"""
+    started: list[GenerationLane] = []
+    closed: list[GenerationLane] = []
+
+    def start(lane):
+        started.append(lane)
+
+        async def stream():
+            try:
+                async for item in behaviours[lane]():
+                    yield item
+            finally:
+                closed.append(lane)
+
+        return stream()
+
+    return start, started, closed
+
+
+def _ok(text, delay=0.0):
+    async def stream():
+        if delay:
+            await asyncio.sleep(delay)
+        yield text
+        yield {"input_tokens": 10, "output_tokens": 5}
+    return stream
+
+
+def _fail(error, delay=0.0):
+    async def stream():
+        if delay:
+            await asyncio.sleep(delay)
+        raise error
+        yield
+    return stream
+
+
+class TestHedgedStream:
+    """hedged_stream のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_single_lane_passthrough(self):
+        """送信先が1つならそのまま中継し、served_modelを付けない"""
+        start, started, _ = _lanes({PRIMARY: _ok("要約")})
+
+        chunks = [c async for c in hedged_stream([PRIMARY], start, hedge_delay=0.01)]
+
+        assert chunks == ["要約", {"input_tokens": 10, "output_tokens": 5}]
+        assert started == [PRIMARY]
+
+    @pytest.mark.asyncio
+    async def test_hedges_slow_lane_and_cancels_loser(self):
+        """最初のチャンクが遅ければ予備にも送り、先に応答した方を採用して他を打ち切る"""
+        start, started, closed = _lanes({
+            PRIMARY: _ok("遅い要約", delay=1.0),
+            OTHER_MODEL: _ok("速い要約"),
+        })
+
+        chunks = [c async for c in hedged_stream([PRIMARY, OTHER_MODEL], start, hedge_delay=0.01)]
+
+        assert chunks[0] == "速い要約"
+        assert chunks[-1]["served_model"] == "Gemini_Pro"
+        assert started == [PRIMARY, OTHER_MODEL]
+        assert PRIMARY in closed
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_is_fast(self):
+        """待ち時間内に応答があれば予備には送らない"""
+        start, started, _ = _lanes({PRIMARY: _ok("要約"), OTHER_MODEL: _ok("予備")})
+
+        chunks = [c async for c in hedged_stream([PRIMARY, OTHER_MODEL], start, hedge_delay=1.0)]
+
+        assert chunks[0] == "要約"
+        assert "served_model" not in chunks[-1]
+        assert started == [PRIMARY]
+
+    @pytest.mark.asyncio
+    async def test_fails_over_on_rate_limit(self):
+        """429で失敗した場合は待たずに次の送信先へ切り替える"""
+        start, started, _ = _lanes({
+            PRIMARY: _fail(APIError("Too Many Requests", status_code=429)),
+            ALTERNATE_ROUTE: _ok("要約"),
+        })
+
+        chunks = [
+            c async for c in hedged_stream([PRIMARY, ALTERNATE_ROUTE], start, hedge_delay=None)
+        ]
+
+        assert chunks[0] == "要約"
+        # 同じモデルの別経路ではモデルは変わらないがserved_modelは付く
+        assert chunks[-1]["served_model"] == "Claude"
+        assert started == [PRIMARY, ALTERNATE_ROUTE]
+
+    @pytest.mark.asyncio
+    async def test_no_failover_on_client_error(self):
+        """400など再試行しても成功しない失敗は切り替えずに送出"""
+        start, started, _ = _lanes({
+            PRIMARY: _fail(APIError("Bad Request", status_code=400)),
+            OTHER_MODEL: _ok("要約"),
+        })
+
+        with pytest.raises(APIError, match="Bad Request"):
+            [c async for c in hedged_stream([PRIMARY, OTHER_MODEL], start, hedge_delay=None)]
+        assert started == [PRIMARY]
+
+    @pytest.mark.asyncio
+    async def test_failover_disabled(self):
+        """failover=Falseでは429でも切り替えない"""
+        start, started, _ = _lanes({
+            PRIMARY: _fail(APIError("Too Many Requests", status_code=429)),
+            OTHER_MODEL: _ok("要約"),
+        })
+
+        with pytest.raises(APIError):
+            [
+                c async for c in hedged_stream(
+                    [PRIMARY, OTHER_MODEL], start, hedge_delay=None, failover=False
+                )
+            ]
+        assert started == [PRIMARY]
+
+    @pytest.mark.asyncio
+    async def test_all_lanes_fail(self):
+        """全ての送信先が失敗した場合は最後の失敗を送出"""
+        start, started, _ = _lanes({
+            PRIMARY: _fail(APIError("primary", status_code=503)),
+            OTHER_MODEL: _fail(APIError("secondary", status_code=529)),
+        })
+
+        with pytest.raises(APIError, match="secondary"):
+            [c async for c in hedged_stream([PRIMARY, OTHER_MODEL], start, hedge_delay=None)]
+        assert started == [PRIMARY, OTHER_MODEL]
+
+    @pytest.mark.asyncio
+    async def test_hedged_lane_failure_keeps_primary(self):
+        """予備が失敗しても遅れて応答した主の送信先を採用"""
+        start, _, _ = _lanes({
+            PRIMARY: _ok("要約", delay=0.05),
+            OTHER_MODEL: _fail(APIError("overloaded", status_code=529)),
+        })
+
+        chunks = [c async for c in hedged_stream([PRIMARY, OTHER_MODEL], start, hedge_delay=0.01)]
+
+        assert chunks[0] == "要約"
+        assert "served_model" not in chunks[-1]
@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.models.usage import SummaryUsage
+from app.services.model_router import ModelRouter, get_model_router
+from app.services.token_estimator import TokenEstimate
+
+
+@pytest.fixture(autouse=True)
+def configured_models():
+    """両モデルとも設定済みとして扱う"""
+    with patch(
+        "app.services.model_selector.get_provider_and_model",
+        side_effect=lambda model: (model.lower(), f"{model}-model"),
+    ) as mock:
+        yield mock
+
+
+def _router(**kwargs):
+    kwargs.setdefault("latency_slo", 30.0)
+    kwargs.setdefault("min_samples", 5)
+    return ModelRouter(session_factory=None, **kwargs)
+
+
+def _record(router, model, latency, count, tokens=1000, success=True):
+    for _ in range(count):
+        router.record(model, latency, tokens, success)
+
+
+class TestModelRouterChoose:
+    """モデル選択のテスト"""
+
+    def test_no_samples_keeps_preferred(self):
+        """モデル選択 - 記録がない場合は指定どおり"""
+        decision = _router().choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Claude"
+        assert decision.reason == "preferred"
+        assert decision.switched is False
+
+    def test_latency_slo_exceeded(self):
+        """モデル選択 - p95がSLOを超えた場合はSLOを満たすモデルに切替"""
+        router = _router()
+        _record(router, "Claude", 90.0, 10)
+        _record(router, "Gemini_Pro", 20.0, 10)
+
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Gemini_Pro"
+        assert decision.reason == "latency_slo"
+        assert decision.switched is True
+        assert decision.health["Claude"].p95_latency == 90.0
+
+    def test_p95_ignores_few_slow_requests(self):
+        """モデル選択 - 一部だけ遅い場合はp95で判定して切り替えない"""
+        router = _router()
+        _record(router, "Claude", 10.0, 99)
+        _record(router, "Claude", 120.0, 1)
+
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Claude"
+
+    def test_error_rate_exceeded(self):
+        """モデル選択 - エラー率が上限を超えた場合は切替"""
+        router = _router(max_error_rate=0.2)
+        _record(router, "Claude", 10.0, 6)
+        _record(router, "Claude", 5.0, 4, success=False)
+
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Gemini_Pro"
+        assert decision.reason == "error_rate"
+        assert decision.health["Claude"].error_rate == pytest.approx(0.4)
+
+    def test_no_healthy_alternative(self):
+        """モデル選択 - 他のモデルもSLOを満たさない場合は指定どおり"""
+        router = _router()
+        _record(router, "Claude", 90.0, 10)
+        _record(router, "Gemini_Pro", 90.0, 10)
+
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Claude"
+        assert decision.reason == "no_healthy_alternative"
+
+    def test_uses_size_bucket(self):
+        """モデル選択 - 同じ大きさのプロンプトの記録で判定"""
+        router = _router()
+        _record(router, "Claude", 10.0, 10, tokens=2000)
+        _record(router, "Claude", 90.0, 10, tokens=60000)
+
+        assert router.choose("Claude", TokenEstimate(3000)).model == "Claude"
+        assert router.choose("Claude", TokenEstimate(70000)).model == "Gemini_Pro"
+
+    def test_alternative_not_configured(self, configured_models):
+        """モデル選択 - 切替先が設定されていない場合は指定どおり"""
+        def only_claude(model):
+            if model != "Claude":
+                raise ValueError("未設定")
+            return "claude", "claude-model"
+
+        configured_models.side_effect = only_claude
+        router = _router()
+        _record(router, "Claude", 90.0, 10)
+
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Claude"
+        assert decision.reason == "no_healthy_alternative"
+
+    def test_alternative_over_budget(self):
+        """モデル選択 - 切替先のプロンプト予算を超える場合は切り替えない"""
+        router = _router()
+        _record(router, "Gemini_Pro", 90.0, 10, tokens=200000)
+
+        with patch("app.services.model_selector.prompt_token_budget", return_value=100000):
+            decision = router.choose("Gemini_Pro", TokenEstimate(150000))
+
+        assert decision.model == "Gemini_Pro"
+        assert "Claude" not in decision.health
+
+    def test_old_samples_expire(self):
+        """モデル選択 - 集計期間を過ぎた記録は使わず指定どおりに戻る"""
+        router = _router(window_seconds=900)
+        with patch("app.services.model_router.time.monotonic", return_value=1000.0):
+            _record(router, "Claude", 90.0, 10)
+            assert router.choose("Claude", TokenEstimate(1000)).model == "Gemini_Pro"
+
+        with patch("app.services.model_router.time.monotonic", return_value=2000.0):
+            decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.model == "Claude"
+        assert decision.health["Claude"].samples == 0
+
+
+class TestModelRouterSeed:
+    """使用統計からの初期化のテスト"""
+
+    def test_seed_from_usage(self, test_db):
+        """初期化 - キャッシュ応答以外の処理時間で統計を作る"""
+        jst = ZoneInfo("Asia/Tokyo")
+        for _ in range(10):
+            test_db.add(SummaryUsage(
+                date=datetime.now(jst), model="Claude", input_tokens=1000,
+                output_tokens=100, processing_time=80.0, estimated_input_tokens=1200,
+            ))
+            test_db.add(SummaryUsage(
+                date=datetime.now(jst), model="Claude", input_tokens=0,
+                output_tokens=0, processing_time=0.1, cache_hit=True,
+            ))
+        test_db.commit()
+
+        @contextmanager
+        def session_factory():
+            yield test_db
+
+        router = ModelRouter(session_factory=session_factory, latency_slo=30.0, min_samples=5)
+        decision = router.choose("Claude", TokenEstimate(1000))
+
+        assert decision.health["Claude"].samples == 10
+        assert decision.health["Claude"].p95_latency == 80.0
+        assert decision.model == "Gemini_Pro"
+
+    def test_seed_failure_starts_empty(self):
+        """初期化 - DBを参照できない場合は記録なしで開始"""
+        def failing_factory():
+            raise RuntimeError("db down")
+
+        router = ModelRouter(session_factory=failing_factory)
+
+        assert router.choose("Claude", TokenEstimate(1000)).model == "Claude"
+
+
+class TestModelRouterSnapshot:
+    """判定の公開のテスト"""
+
+    def test_snapshot_lists_recent_decisions(self):
+        """公開 - 統計と直近の判定（新しい順）"""
+        router = _router()
+        router.choose("Claude", TokenEstimate(1000))
+        _record(router, "Claude", 90.0, 10)
+        router.choose("Claude", TokenEstimate(2000))
+
+        snapshot = router.snapshot()
+
+        assert snapshot["latency_slo"] == 30.0
+        assert snapshot["models"]["Claude"]["p95_latency"] == 90.0
+        assert [d["estimated_tokens"] for d in snapshot["decisions"]] == [2000, 1000]
+        assert snapshot["decisions"][0]["switched"] is True
+
+    def test_routing_endpoint(self, client, csrf_headers):
+        """運用状況 - /health/routingで確認できる"""
+        _record(get_model_router(), "Claude", 12.0, 3)
+
+        response = client.get("/health/routing", headers=csrf_headers)
+
+        assert response.status_code == 200
+        assert response.json()["models"]["Claude"]["samples"] == 3
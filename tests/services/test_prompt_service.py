@@ -151,3 +151,167 @@ def test_get_prompt_hierarchical_fallback_none(test_db):
         doctor="存在しない医師",
     )
     assert prompt is None
+
+
+def test_resolve_prompt_cached(test_db, sample_prompts):
+    """解決済みプロンプト - 2回目はDBを参照しない"""
+    from unittest.mock import patch
+
+    with patch(
+        "app.services.prompt_service.get_prompt", wraps=prompt_service.get_prompt
+    ) as mock_get_prompt:
+        first = prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+        second = prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+
+    assert first == second
+    assert first.content == "眼科用プロンプト"
+    assert mock_get_prompt.call_count == 1
+
+
+def test_resolve_prompt_caches_missing(test_db):
+    """解決済みプロンプト - 該当なしの結果もキャッシュ"""
+    from unittest.mock import patch
+
+    with patch(
+        "app.services.prompt_service.get_prompt", wraps=prompt_service.get_prompt
+    ) as mock_get_prompt:
+        for _ in range(2):
+            resolved = prompt_service.resolve_prompt(test_db, "内科", "他院への紹介", "田中医師")
+            assert resolved == prompt_service.ResolvedPrompt(content=None, selected_model=None)
+
+    assert mock_get_prompt.call_count == 1
+
+
+def test_resolve_prompt_invalidated_on_update(test_db, sample_prompts):
+    """解決済みプロンプト - 更新後は新しい内容を返す"""
+    before = prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+    assert before.content == "眼科用プロンプト"
+
+    prompt_service.create_or_update_prompt(
+        test_db,
+        department="眼科",
+        document_type="他院への紹介",
+        doctor="橋本義弘",
+        content="更新後プロンプト",
+        selected_model="Gemini_Pro",
+    )
+    test_db.commit()
+
+    after = prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+    assert after.content == "更新後プロンプト"
+    assert after.selected_model == "Gemini_Pro"
+
+
+def test_resolve_prompt_reloaded_before_commit_is_evicted(test_db, sample_prompts):
+    """解決済みプロンプト - 書き込みとコミットの間に他の読み込みが保存した古い内容はコミット後に破棄"""
+    key = ("眼科", "他院への紹介", "橋本義弘")
+    prompt_service.create_or_update_prompt(
+        test_db, department=key[0], document_type=key[1], doctor=key[2], content="更新後プロンプト"
+    )
+    # コミット前に別のリクエストが古い行を読み込んでキャッシュした状態
+    prompt_service._store_resolved(
+        {key: prompt_service.ResolvedPrompt("眼科用プロンプト", None)},
+        prompt_service._prompt_cache_generation,
+    )
+
+    test_db.commit()
+
+    assert prompt_service.resolve_prompt(test_db, *key).content == "更新後プロンプト"
+
+
+def test_resolve_prompt_invalidated_on_delete(test_db, sample_prompts):
+    """解決済みプロンプト - 削除後は上位階層にフォールバック"""
+    prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+
+    prompt_service.delete_prompt(test_db, sample_prompts[1].id)
+    test_db.commit()
+
+    resolved = prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+    assert resolved.content == sample_prompts[0].content
+
+
+def test_resolve_prompt_not_cached_when_invalidated_during_lookup(test_db, sample_prompts):
+    """解決済みプロンプト - 読み込み中に無効化された結果は保存しない"""
+    from unittest.mock import patch
+
+    original = prompt_service.get_prompt
+
+    def lookup_then_invalidate(*args, **kwargs):
+        result = original(*args, **kwargs)
+        prompt_service.invalidate_prompt_cache()
+        return result
+
+    with patch("app.services.prompt_service.get_prompt", side_effect=lookup_then_invalidate):
+        prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+
+    with patch(
+        "app.services.prompt_service.get_prompt", wraps=prompt_service.get_prompt
+    ) as mock_get_prompt:
+        prompt_service.resolve_prompt(test_db, "眼科", "他院への紹介", "橋本義弘")
+
+    assert mock_get_prompt.call_count == 1
+
+
+def test_get_prompt_falls_back_to_department_level(test_db, sample_prompts):
+    """特定プロンプト取得 - 医師別がなければ上位階層を返す"""
+    prompt = prompt_service.get_prompt(
+        test_db,
+        department="眼科",
+        document_type="他院への紹介",
+        doctor="別の医師",
+    )
+    assert prompt is not None
+    assert prompt.department == "default"
+
+
+def test_get_prompt_single_query(test_db, sample_prompts):
+    """特定プロンプト取得 - 階層をたどっても1クエリ"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        prompt_service.get_prompt(test_db, "内科", "他院への紹介", "田中医師")
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1
+
+
+def test_get_prompts_bulk(test_db, sample_prompts):
+    """一括取得 - キーごとに最も具体的なプロンプトを選択"""
+    keys = [
+        ("眼科", "他院への紹介", "橋本義弘"),
+        ("眼科", "他院への紹介", "default"),
+        ("眼科", "返書", "橋本義弘"),
+    ]
+    prompts = prompt_service.get_prompts_bulk(test_db, keys)
+
+    assert list(prompts) == keys
+    assert prompts[keys[0]].content == "眼科用プロンプト"
+    assert prompts[keys[1]].content == "デフォルトプロンプト"
+    assert prompts[keys[2]] is None
+
+
+def test_resolve_prompts_bulk_fetches_only_missing(test_db, sample_prompts):
+    """一括解決 - キャッシュ済みのキーは再取得しない"""
+    from unittest.mock import patch
+
+    cached_key = ("眼科", "他院への紹介", "橋本義弘")
+    missing_key = ("default", "他院への紹介", "default")
+    prompt_service.resolve_prompt(test_db, *cached_key)
+
+    with patch(
+        "app.services.prompt_service.get_prompts_bulk", wraps=prompt_service.get_prompts_bulk
+    ) as mock_bulk:
+        resolved = prompt_service.resolve_prompts_bulk(test_db, [cached_key, missing_key])
+
+    assert resolved[cached_key].content == "眼科用プロンプト"
+    assert resolved[missing_key].content == "デフォルトプロンプト"
+    mock_bulk.assert_called_once()
+    assert mock_bulk.call_args.args[1] == [missing_key]
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def _gated_stream(gate: asyncio.Event, calls: list[int], chunks=("主病名: ", "糖尿病")):
+    """gateが開くまで最初のチャンク以降を止めるプロバイダーストリーム"""
+    async def start():
+        calls.append(1)
+        yield chunks[0]
+        await gate.wait()
+        for chunk in chunks[1:]:
+            yield chunk
+        yield {"input_tokens": 100, "output_tokens": 50}
+
+    return start
+
+
+async def _drain(subscription) -> list:
+    items = [item async for item in subscription]
+    await subscription.aclose()
+    return items
+
+
+class TestSingleFlight:
+    """SingleFlight のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_subscribers_share_one_call(self):
+        """同時リクエスト集約 - 同じキーは1回の呼び出しを共有し全チャンクを受け取る"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        calls: list[int] = []
+        start = _gated_stream(gate, calls)
+
+        first = group.subscribe("k", start)
+        second = group.subscribe("k", start)
+        tasks = [asyncio.ensure_future(_drain(first)), asyncio.ensure_future(_drain(second))]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == [1]
+        assert first.leader is True
+        assert second.leader is False
+        expected = ["主病名: ", "糖尿病", {"input_tokens": 100, "output_tokens": 50}]
+        assert results == [expected, expected]
+        assert group.stats() == {"in_flight": 0, "coalesced": 1}
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber_replays_earlier_chunks(self):
+        """同時リクエスト集約 - 途中から参加しても先頭のチャンクから受け取る"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        calls: list[int] = []
+        start = _gated_stream(gate, calls)
+
+        first = group.subscribe("k", start)
+        assert await anext(first) == "主病名: "
+        late = group.subscribe("k", start)
+        gate.set()
+
+        rest, late_items = await asyncio.gather(_drain(first), _drain(late))
+        assert calls == [1]
+        assert rest == ["糖尿病", {"input_tokens": 100, "output_tokens": 50}]
+        assert late_items[0] == "主病名: "
+
+    @pytest.mark.asyncio
+    async def test_different_keys_are_independent(self):
+        """同時リクエスト集約 - キーが異なれば別々に呼び出す"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        gate.set()
+        calls: list[int] = []
+        start = _gated_stream(gate, calls)
+
+        await asyncio.gather(_drain(group.subscribe("a", start)), _drain(group.subscribe("b", start)))
+        assert calls == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_finished_call_not_reused(self):
+        """同時リクエスト集約 - 完了後の同じキーは新しく呼び出す"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        gate.set()
+        calls: list[int] = []
+        start = _gated_stream(gate, calls)
+
+        await _drain(group.subscribe("k", start))
+        subscription = group.subscribe("k", start)
+        await _drain(subscription)
+        assert calls == [1, 1]
+        assert subscription.leader is True
+
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_all_subscribers(self):
+        """同時リクエスト集約 - 呼び出しの失敗は全ての参加者に伝わる"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+
+        async def failing():
+            await gate.wait()
+            raise RuntimeError("API接続エラー")
+            yield  # pragma: no cover
+
+        subscriptions = [group.subscribe("k", failing), group.subscribe("k", failing)]
+        tasks = [asyncio.ensure_future(_drain(s)) for s in subscriptions]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert group.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_leader_leaving_does_not_stop_others(self):
+        """同時リクエスト集約 - 最初のリクエストが切断しても他の参加者には生成を続ける"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        calls: list[int] = []
+        start = _gated_stream(gate, calls)
+
+        leader = group.subscribe("k", start)
+        follower = group.subscribe("k", start)
+        await anext(leader)
+        await leader.aclose()
+        gate.set()
+
+        items = await _drain(follower)
+        assert items[-1] == {"input_tokens": 100, "output_tokens": 50}
+
+    @pytest.mark.asyncio
+    async def test_last_subscriber_leaving_cancels_call(self):
+        """同時リクエスト集約 - 全員が抜けるとプロバイダー呼び出しを打ち切る"""
+        group = SingleFlight()
+        gate = asyncio.Event()
+        closed = asyncio.Event()
+
+        async def start():
+            try:
+                yield "主病名: "
+                await gate.wait()
+                yield "糖尿病"
+            finally:
+                closed.set()
+
+        subscription = group.subscribe("k", start)
+        await anext(subscription)
+        await subscription.aclose()
+
+        await asyncio.wait_for(closed.wait(), timeout=1)
+        assert group.stats()["in_flight"] == 0
@@ -1,8 +1,14 @@
+import asyncio
 import json
 
 import pytest
 
-from app.services.sse_helpers import sse_event, stream_with_heartbeat
+from app.services.sse_helpers import (
+    await_with_heartbeat,
+    sse_event,
+    stream_chunks_with_heartbeat,
+    stream_with_heartbeat,
+)
 
 
 class TestSseEvent:
@@ -95,3 +101,134 @@ class TestStreamWithHeartbeat:
         error_items = [i for i in items if isinstance(i, str) and "event: error" in i]
         assert len(error_items) >= 1
         assert "テストエラー" in error_items[0]
+
+
+class TestStreamChunksWithHeartbeat:
+    """stream_chunks_with_heartbeat 関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_stream_chunks_forwards_deltas(self):
+        """チャンク転送 - 各チャンクがdeltaイベントとして届く"""
+        async def stream_task(prefix: str):
+            yield f"{prefix}1"
+            yield f"{prefix}2"
+            yield {"input_tokens": 100, "output_tokens": 50}
+
+        items = []
+        async for item in stream_chunks_with_heartbeat(
+            chunk_stream=stream_task("チャンク"),
+            start_message="開始",
+            running_status="processing",
+            running_message="処理中",
+            elapsed_message_template="処理中... {elapsed}秒",
+        ):
+            items.append(item)
+
+        deltas = [i for i in items if isinstance(i, str) and i.startswith("event: delta")]
+        assert len(deltas) == 2
+        assert json.loads(deltas[0].split("data: ")[1])["text"] == "チャンク1"
+        assert json.loads(deltas[1].split("data: ")[1])["text"] == "チャンク2"
+        assert items[-1] == ("チャンク1チャンク2", 100, 50)
+
+    @pytest.mark.asyncio
+    async def test_stream_chunks_heartbeat_during_silence(self):
+        """チャンク転送 - 無応答の間のみハートビート"""
+        async def stream_task():
+            await asyncio.sleep(0.3)
+            yield "遅延チャンク"
+            yield {"input_tokens": 1, "output_tokens": 1}
+
+        items = []
+        async for item in stream_chunks_with_heartbeat(
+            chunk_stream=stream_task(),
+            start_message="開始",
+            running_status="processing",
+            running_message="処理中",
+            elapsed_message_template="処理中... {elapsed}秒",
+            heartbeat_interval=0.1,
+        ):
+            items.append(item)
+
+        first_delta = next(
+            idx for idx, i in enumerate(items)
+            if isinstance(i, str) and i.startswith("event: delta")
+        )
+        heartbeats = [i for i in items[2:first_delta] if "処理中..." in i]
+        assert len(heartbeats) >= 1
+        assert items[-1] == ("遅延チャンク", 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_stream_chunks_error(self):
+        """チャンク転送 - 途中でエラー"""
+        async def stream_task():
+            yield "途中まで"
+            raise ValueError("ストリームエラー")
+
+        items = []
+        async for item in stream_chunks_with_heartbeat(
+            chunk_stream=stream_task(),
+            start_message="開始",
+            running_status="processing",
+            running_message="処理中",
+            elapsed_message_template="処理中... {elapsed}秒",
+        ):
+            items.append(item)
+
+        assert any(isinstance(i, str) and i.startswith("event: delta") for i in items)
+        assert "event: error" in items[-1]
+        assert "ストリームエラー" in items[-1]
+
+    @pytest.mark.asyncio
+    async def test_stream_chunks_closes_stream_on_disconnect(self):
+        """チャンク転送 - 途中で購読を止めるとストリームが閉じられる"""
+        closed = []
+
+        async def stream_task():
+            try:
+                yield "チャンク"
+                await asyncio.sleep(10)
+                yield "届かない"
+            finally:
+                closed.append(True)
+
+        stream = stream_chunks_with_heartbeat(
+            chunk_stream=stream_task(),
+            start_message="開始",
+            running_status="processing",
+            running_message="処理中",
+            elapsed_message_template="処理中... {elapsed}秒",
+            heartbeat_interval=0.05,
+        )
+        async for item in stream:
+            if item.startswith("event: delta"):
+                break
+        await stream.aclose()
+
+        assert closed == [True]
+
+
+class TestAwaitWithHeartbeat:
+    """await_with_heartbeat 関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_await_with_heartbeat_success(self):
+        """コルーチン実行 - 待機中のハートビートと結果"""
+        async def slow_task(text: str):
+            await asyncio.sleep(0.3)
+            return (text, 10, 5)
+
+        items = []
+        async for item in await_with_heartbeat(
+            async_func=slow_task,
+            async_func_args=("結果",),
+            start_message="開始",
+            running_status="processing",
+            running_message="処理中",
+            elapsed_message_template="処理中... {elapsed}秒",
+            heartbeat_interval=0.1,
+        ):
+            items.append(item)
+
+        heartbeats = [i for i in items if isinstance(i, str) and "処理中..." in i]
+        assert len(heartbeats) >= 1
+        assert items[-1] == ("結果", 10, 5)
@@ -89,3 +89,24 @@ def test_get_usage_records_ordering(test_db, sample_usage_records):
     records = statistics_service.get_usage_records(test_db)
     if len(records) >= 2:
         assert records[0].date >= records[1].date
+
+
+def test_get_usage_summary_counts_cache_hits(test_db, sample_usage_records):
+    """使用統計サマリー取得 - キャッシュ応答の件数"""
+    sample_usage_records[0].cache_hit = True
+    test_db.commit()
+
+    summary = statistics_service.get_usage_summary(test_db)
+    assert summary["total_count"] == 2
+    assert summary["cache_hit_count"] == 1
+
+
+def test_get_usage_summary_totals_prompt_cache_tokens(test_db, sample_usage_records):
+    """使用統計サマリー取得 - プロンプトキャッシュの読み込み・書き込みトークン数の合計"""
+    sample_usage_records[0].cache_read_tokens = 2500
+    sample_usage_records[1].cache_write_tokens = 1200
+    test_db.commit()
+
+    summary = statistics_service.get_usage_summary(test_db)
+    assert summary["total_cache_read_tokens"] == 2500
+    assert summary["total_cache_write_tokens"] == 1200
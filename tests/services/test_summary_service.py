@@ -1,11 +1,24 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from app.core.constants import MESSAGES
+from app.external.base_api import GenerationResult
 from app.services.model_selector import determine_model, get_provider_and_model
-from app.services.summary_service import execute_summary_generation, validate_input
+from app.services.generation_cache import MemoryGenerationCache, set_generation_cache
+from app.services.model_router import ModelRouter, get_model_router, set_model_router
+from app.services.prompt_service import ResolvedPrompt
+from app.services.token_estimator import TokenEstimate
+from app.services.summary_service import (
+    execute_summary_generation,
+    execute_summary_generation_async,
+    execute_summary_generation_stream,
+    validate_input,
+)
 from app.services.usage_service import save_usage
+from app.utils.exceptions import APIError
 
 
 class TestValidateInput:
@@ -63,10 +76,12 @@ class TestDetermineModel:
     def test_determine_model_below_threshold(self, mock_settings):
         """モデル決定 - 閾値以下"""
         mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
 
         model, switched = determine_model(
             requested_model="Claude",
-            input_length=10000,
+            estimate=TokenEstimate(10000),
             department="default",
             document_type="他院への紹介",
             doctor="default",
@@ -80,11 +95,13 @@ class TestDetermineModel:
     def test_determine_model_above_threshold_with_gemini(self, mock_settings):
         """モデル決定 - 閾値超過、Gemini利用可能"""
         mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
         mock_settings.gemini_model = "gemini-1.5-pro-002"
 
         model, switched = determine_model(
             requested_model="Claude",
-            input_length=50000,
+            estimate=TokenEstimate(50000),
             department="default",
             document_type="他院への紹介",
             doctor="default",
@@ -98,12 +115,14 @@ class TestDetermineModel:
     def test_determine_model_above_threshold_no_gemini(self, mock_settings):
         """モデル決定 - 閾値超過、Gemini利用不可"""
         mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
         mock_settings.gemini_model = None
 
         with pytest.raises(ValueError) as exc_info:
             determine_model(
                 requested_model="Claude",
-                input_length=50000,
+                estimate=TokenEstimate(50000),
                 department="default",
                 document_type="他院への紹介",
                 doctor="default",
@@ -117,10 +136,12 @@ class TestDetermineModel:
     def test_determine_model_gemini_requested(self, mock_settings):
         """モデル決定 - Geminiが明示的に選択された"""
         mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
 
         model, switched = determine_model(
             requested_model="Gemini_Pro",
-            input_length=10000,
+            estimate=TokenEstimate(10000),
             department="default",
             document_type="他院への紹介",
             doctor="default",
@@ -138,6 +159,8 @@ class TestDetermineModel:
         from unittest.mock import MagicMock
 
         mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
 
         # モックDBセッション
         mock_db = MagicMock()
@@ -148,7 +171,7 @@ class TestDetermineModel:
         mock_prompt.selected_model = "Gemini_Pro"
         mock_get_prompt.return_value = mock_prompt
 
-        model, switched = determine_model(requested_model="Claude", input_length=10000, department="眼科",
+        model, switched = determine_model(requested_model="Claude", estimate=TokenEstimate(10000), department="眼科",
                                           document_type="他院への紹介", doctor="橋本義弘")
 
         # プロンプトで設定されたモデルが使用される
@@ -156,6 +179,89 @@ class TestDetermineModel:
         assert switched is False
 
 
+    @patch("app.core.database.get_db_session")
+    @patch("app.services.model_selector.settings")
+    def test_determine_model_uses_resolved_prompt(self, mock_settings, mock_db_session):
+        """モデル決定 - 解決済みプロンプトがあればDBを参照しない"""
+        mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
+
+        model, switched = determine_model(
+            requested_model="Claude",
+            estimate=TokenEstimate(10000),
+            department="眼科",
+            document_type="他院への紹介",
+            doctor="橋本義弘",
+            resolved_prompt=ResolvedPrompt(content="眼科用", selected_model="Gemini_Pro"),
+        )
+
+        assert model == "Gemini_Pro"
+        assert switched is False
+        mock_db_session.assert_not_called()
+
+
+    @patch("app.services.model_selector.settings")
+    def test_determine_model_uses_calibrated_estimate(self, mock_settings):
+        """モデル決定 - Claudeの補正係数で予算を超える場合は切替"""
+        mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 1048576
+        mock_settings.gemini_model = "gemini-1.5-pro-002"
+
+        model, switched = determine_model(
+            requested_model="Claude",
+            estimate=TokenEstimate(30000, {"Claude": 1.5, "Gemini_Pro": 0.8}),
+            department="default",
+            document_type="他院への紹介",
+            doctor="default",
+            model_explicitly_selected=True,
+        )
+
+        assert model == "Gemini_Pro"
+        assert switched is True
+
+    @patch("app.services.model_selector.settings")
+    def test_determine_model_claude_context_window(self, mock_settings):
+        """モデル決定 - 閾値よりコンテキスト長が小さい場合はコンテキスト長で判定"""
+        mock_settings.max_token_threshold = 400000
+        mock_settings.claude_context_window = 100000
+        mock_settings.gemini_context_window = 1048576
+        mock_settings.gemini_model = "gemini-1.5-pro-002"
+
+        model, switched = determine_model(
+            requested_model="Claude",
+            estimate=TokenEstimate(95000),
+            department="default",
+            document_type="他院への紹介",
+            doctor="default",
+            model_explicitly_selected=True,
+        )
+
+        assert model == "Gemini_Pro"
+        assert switched is True
+
+    @patch("app.services.model_selector.settings")
+    def test_determine_model_exceeds_gemini_context(self, mock_settings):
+        """モデル決定 - Geminiのコンテキスト長も超える場合はエラー"""
+        mock_settings.max_token_threshold = 40000
+        mock_settings.claude_context_window = 200000
+        mock_settings.gemini_context_window = 100000
+        mock_settings.gemini_model = "gemini-1.5-pro-002"
+
+        with pytest.raises(ValueError) as exc_info:
+            determine_model(
+                requested_model="Claude",
+                estimate=TokenEstimate(150000),
+                department="default",
+                document_type="他院への紹介",
+                doctor="default",
+                model_explicitly_selected=True,
+            )
+
+        assert str(exc_info.value) == MESSAGES["VALIDATION"]["INPUT_EXCEEDS_CONTEXT"]
+
+
 class TestGetProviderAndModel:
     """get_provider_and_model 関数のテスト"""
 
@@ -202,12 +308,9 @@ class TestGetProviderAndModel:
 class TestSaveUsage:
     """save_usage 関数のテスト"""
 
-    @patch("app.services.usage_service.get_db_session")
-    def test_save_usage_success(self, mock_get_db_session):
-        """使用統計保存 - 正常系"""
-        mock_db = MagicMock()
-        mock_get_db_session.return_value.__enter__.return_value = mock_db
-
+    @patch("app.services.usage_service.get_usage_writer")
+    def test_save_usage_success(self, mock_get_usage_writer):
+        """使用統計保存 - 書き込みキューに追加"""
         save_usage(
             department="眼科",
             doctor="橋本義弘",
@@ -218,42 +321,39 @@ class TestSaveUsage:
             processing_time=2.5,
         )
 
-        # DBへの追加が呼ばれたことを確認
-        mock_db.add.assert_called_once()
-
-        # 追加されたUsageオブジェクトを検証
-        added_usage = mock_db.add.call_args[0][0]
-        assert added_usage.department == "眼科"
-        assert added_usage.doctor == "橋本義弘"
-        assert added_usage.document_type == "他院への紹介"
-        assert added_usage.model == "Claude"
-        assert added_usage.input_tokens == 1000
-        assert added_usage.output_tokens == 500
-        assert added_usage.app_type == "referral_letter"
-        assert added_usage.processing_time == 2.5
-
-    @patch("app.services.usage_service.get_db_session")
-    @patch("logging.error")
-    def test_save_usage_failure_silent(self, mock_logging_error, mock_get_db_session):
-        """使用統計保存 - 失敗時にエラーを無視"""
-        mock_db = MagicMock()
-        mock_db.add.side_effect = Exception("DB接続エラー")
-        mock_get_db_session.return_value.__enter__.return_value = mock_db
-
-        # エラーが発生しても例外は投げられない
-        save_usage(
-            department="default",
-            doctor="default",
-            document_type="返書",
-            model="Gemini_Pro",
-            input_tokens=2000,
-            output_tokens=800,
-            processing_time=3.0,
-        )
+        mock_get_usage_writer.return_value.submit.assert_called_once()
+
+        # 追加されたレコードを検証
+        record = mock_get_usage_writer.return_value.submit.call_args[0][0]
+        assert record["department"] == "眼科"
+        assert record["doctor"] == "橋本義弘"
+        assert record["document_type"] == "他院への紹介"
+        assert record["model"] == "Claude"
+        assert record["input_tokens"] == 1000
+        assert record["output_tokens"] == 500
+        assert record["app_type"] == "referral_letter"
+        assert record["processing_time"] == 2.5
+        assert record["date"].tzinfo is not None
+
+    @patch("app.services.usage_writer.logger")
+    def test_save_usage_failure_silent(self, mock_logger, usage_writer):
+        """使用統計保存 - 書き込み失敗時もエラーを投げない"""
+        with patch.object(usage_writer, "_insert", side_effect=Exception("DB接続エラー")):
+            # エラーが発生しても例外は投げられない
+            save_usage(
+                department="default",
+                doctor="default",
+                document_type="返書",
+                model="Gemini_Pro",
+                input_tokens=2000,
+                output_tokens=800,
+                processing_time=3.0,
+            )
+            usage_writer.shutdown()
 
-        # 警告メッセージが出力されることを確認
-        mock_logging_error.assert_called_once()
-        assert "使用統計の保存に失敗しました" in str(mock_logging_error.call_args)
+        assert usage_writer.stats()["spilled"] == 1
+        mock_logger.error.assert_called_once()
+        assert "使用統計の保存に失敗しました" in str(mock_logger.error.call_args)
 
 
 class TestExecuteSummaryGeneration:
@@ -303,6 +403,42 @@ class TestExecuteSummaryGeneration:
         # 使用統計が保存されたことを確認
         mock_save_usage.assert_called_once()
 
+    @patch("app.services.summary_service.resolve_prompt")
+    @patch("app.services.summary_service.get_db_session")
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider")
+    @patch("app.services.summary_service.settings")
+    def test_execute_summary_generation_resolves_prompt_once(
+        self, mock_settings, mock_generate_summary_with_provider, mock_save_usage,
+        mock_get_provider_and_model, mock_get_db_session, mock_resolve_prompt
+    ):
+        """文書生成実行 - プロンプトを一度だけ解決してモデル決定と生成で共有"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_resolve_prompt.return_value = ResolvedPrompt(
+            content="眼科用プロンプト", selected_model="Gemini_Pro"
+        )
+        mock_get_provider_and_model.return_value = ("gemini", "gemini-2.5-pro")
+        mock_generate_summary_with_provider.return_value = ("主病名: 白内障", 100, 50)
+
+        result = execute_summary_generation(
+            medical_text="患者は70歳女性。両眼白内障にて経過観察中。",
+            additional_info="",
+            referral_purpose="",
+            current_prescription="",
+            department="眼科",
+            doctor="橋本義弘",
+            document_type="他院への紹介",
+            model="Claude",
+        )
+
+        assert result.success is True
+        assert result.model_used == "Gemini_Pro"
+        mock_resolve_prompt.assert_called_once()
+        assert mock_generate_summary_with_provider.call_args.kwargs["prompt_template"] == "眼科用プロンプト"
+
     @patch("app.services.summary_service.settings")
     def test_execute_summary_generation_validation_error(self, mock_settings):
         """文書生成実行 - 検証エラー"""
@@ -323,6 +459,7 @@ class TestExecuteSummaryGeneration:
 
         assert result.success is False
         assert result.error_message == "カルテ情報を入力してください"
+        assert result.retryable is False
         assert result.input_tokens == 0
         assert result.output_tokens == 0
         assert result.processing_time == 0
@@ -552,3 +689,792 @@ class TestExecuteSummaryGeneration:
         # フォーマット処理が呼ばれたことを確認
         mock_format.assert_called_once_with("# 主病名: 糖尿病")
         mock_parse.assert_called_once_with("主病名: 糖尿病")
+
+
+class TestExecuteSummaryGenerationAsync:
+    """execute_summary_generation_async 関数のテスト"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_execute_summary_generation_async_success(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """非同期文書生成実行 - 正常系"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+
+        mock_determine_model.return_value = ("Claude", False)
+        mock_get_provider_and_model.return_value = ("claude", "claude-3-5-sonnet-20241022")
+        mock_generate_async.return_value = ("主病名: 糖尿病", 1000, 500)
+
+        result = await execute_summary_generation_async(
+            medical_text="患者は60歳男性。2型糖尿病にて加療中。",
+            additional_info="",
+            referral_purpose="",
+            current_prescription="",
+            department="default",
+            doctor="default",
+            document_type="他院への紹介",
+            model="Claude",
+            model_explicitly_selected=True,
+        )
+
+        assert result.success is True
+        assert result.input_tokens == 1000
+        assert result.model_used == "Claude"
+        assert mock_generate_async.await_args.kwargs["provider"] == "claude"
+        mock_save_usage.assert_called_once()
+        # 補正係数の計算用にモデル選択時の推定トークン数を記録
+        assert mock_save_usage.call_args.kwargs["estimated_input_tokens"] > 0
+        estimate = mock_determine_model.call_args.args[1]
+        assert mock_save_usage.call_args.kwargs["estimated_input_tokens"] == estimate.raw_tokens
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_execute_summary_generation_async_api_error(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """非同期文書生成実行 - API呼び出しエラー"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+
+        mock_determine_model.return_value = ("Claude", False)
+        mock_get_provider_and_model.return_value = ("claude", "claude-3-5-sonnet-20241022")
+        mock_generate_async.side_effect = Exception("API接続エラー")
+
+        result = await execute_summary_generation_async(
+            medical_text="テストデータ" * 10,
+            additional_info="",
+            referral_purpose="",
+            current_prescription="",
+            department="default",
+            doctor="default",
+            document_type="他院への紹介",
+            model="Claude",
+            model_explicitly_selected=True,
+        )
+
+        assert result.success is False
+        assert result.error_message == "API接続エラー"
+        mock_save_usage.assert_not_called()
+
+
+class TestExecuteSummaryGenerationStream:
+    """execute_summary_generation_stream 関数のテスト"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_execute_summary_generation_stream_deltas(
+        self, mock_settings, mock_stream_with_provider, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """ストリーミング文書生成 - チャンクごとのdeltaと完了イベント"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+
+        mock_determine_model.return_value = ("Claude", False)
+        mock_get_provider_and_model.return_value = ("claude", "claude-3-5-sonnet-20241022")
+
+        async def fake_stream(**kwargs):
+            yield "現在の処方: "
+            yield "メトホルミン"
+            yield {"input_tokens": 1000, "output_tokens": 500}
+
+        mock_stream_with_provider.side_effect = fake_stream
+
+        events = []
+        async for event in execute_summary_generation_stream(
+            medical_text="患者は60歳男性。2型糖尿病にて加療中。",
+            additional_info="",
+            referral_purpose="",
+            current_prescription="",
+            department="default",
+            doctor="default",
+            document_type="他院への紹介",
+            model="Claude",
+            model_explicitly_selected=True,
+        ):
+            events.append(event)
+
+        deltas = [e for e in events if e.startswith("event: delta")]
+        assert len(deltas) == 2
+        assert events[-1].startswith("event: complete")
+        complete = json.loads(events[-1].split("data: ")[1])
+        assert complete["success"] is True
+        assert complete["output_summary"] == "現在の処方:メトホルミン"
+        assert complete["input_tokens"] == 1000
+        mock_save_usage.assert_called_once()
+
+
+_CACHE_TEST_KWARGS = dict(
+    medical_text="患者は60歳男性。2型糖尿病にて加療中。",
+    additional_info="",
+    referral_purpose="",
+    current_prescription="",
+    department="default",
+    doctor="default",
+    document_type="他院への紹介",
+    model="Claude",
+    model_explicitly_selected=True,
+)
+
+
+class TestGenerationCacheReplay:
+    """生成結果キャッシュを使った文書生成のテスト"""
+
+    @pytest.fixture(autouse=True)
+    def memory_cache(self):
+        cache = MemoryGenerationCache()
+        set_generation_cache(cache)
+        return cache
+
+    @pytest.fixture(autouse=True)
+    def resolved_prompt(self):
+        with patch(
+            "app.services.summary_service._lookup_prompt",
+            return_value=ResolvedPrompt(content="デフォルトプロンプト", selected_model=None),
+        ):
+            yield
+
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider")
+    @patch("app.services.summary_service.settings")
+    def test_second_request_served_from_cache(
+        self, mock_settings, mock_generate, mock_save_usage, mock_get_provider_and_model
+    ):
+        """生成結果キャッシュ - 同じ入力の2回目はLLMを呼ばずにキャッシュから返す"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        mock_generate.return_value = ("主病名: 糖尿病", 1000, 500)
+
+        first = execute_summary_generation(**_CACHE_TEST_KWARGS)
+        second = execute_summary_generation(**_CACHE_TEST_KWARGS)
+
+        assert first.cache_hit is False
+        assert second.cache_hit is True
+        assert second.output_summary == first.output_summary
+        assert second.parsed_summary == first.parsed_summary
+        assert second.input_tokens == 1000
+        mock_generate.assert_called_once()
+        # キャッシュ応答はトークンを消費していないため0として記録
+        assert mock_save_usage.call_count == 2
+        replay_usage = mock_save_usage.call_args_list[1].kwargs
+        assert replay_usage["cache_hit"] is True
+        assert replay_usage["input_tokens"] == 0
+        assert replay_usage["output_tokens"] == 0
+
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider")
+    @patch("app.services.summary_service.settings")
+    def test_bypass_cache_regenerates(
+        self, mock_settings, mock_generate, mock_save_usage, mock_get_provider_and_model
+    ):
+        """生成結果キャッシュ - bypass_cache指定時は再生成してキャッシュを更新"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        mock_generate.side_effect = [("主病名: 糖尿病", 1000, 500), ("主病名: 高血圧", 900, 400)]
+
+        execute_summary_generation(**_CACHE_TEST_KWARGS)
+        regenerated = execute_summary_generation(**_CACHE_TEST_KWARGS, bypass_cache=True)
+        replayed = execute_summary_generation(**_CACHE_TEST_KWARGS)
+
+        assert regenerated.cache_hit is False
+        assert mock_generate.call_count == 2
+        assert replayed.cache_hit is True
+        assert replayed.output_summary == regenerated.output_summary
+
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider")
+    @patch("app.services.summary_service.settings")
+    def test_different_prompt_misses_cache(
+        self, mock_settings, mock_generate, mock_save_usage, mock_get_provider_and_model
+    ):
+        """生成結果キャッシュ - 入力が異なればキャッシュを使わない"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        mock_generate.return_value = ("主病名: 糖尿病", 1000, 500)
+
+        execute_summary_generation(**_CACHE_TEST_KWARGS)
+        result = execute_summary_generation(**{**_CACHE_TEST_KWARGS, "additional_info": "HbA1c 7.5%"})
+
+        assert result.cache_hit is False
+        assert mock_generate.call_count == 2
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_stream_replays_cached_result(
+        self, mock_settings, mock_stream_with_provider, mock_save_usage, mock_get_provider_and_model
+    ):
+        """生成結果キャッシュ - ストリーミングはキャッシュ命中時に完了イベントのみ返す"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+
+        async def fake_stream(**kwargs):
+            yield "主病名: 糖尿病"
+            yield {"input_tokens": 1000, "output_tokens": 500}
+
+        mock_stream_with_provider.side_effect = fake_stream
+
+        runs = []
+        for _ in range(2):
+            runs.append([e async for e in execute_summary_generation_stream(**_CACHE_TEST_KWARGS)])
+
+        assert mock_stream_with_provider.call_count == 1
+        assert len(runs[1]) == 1
+        assert runs[1][0].startswith("event: complete")
+        complete = json.loads(runs[1][0].split("data: ")[1])
+        assert complete["cache_hit"] is True
+        assert complete["output_summary"] == "主病名:糖尿病"
+
+
+class TestGenerationCoalescing:
+    """同じ内容の同時リクエストを1回の生成にまとめるテスト"""
+
+    @pytest.fixture(autouse=True)
+    def resolved_prompt(self):
+        with patch(
+            "app.services.summary_service._lookup_prompt",
+            return_value=ResolvedPrompt(content="デフォルトプロンプト", selected_model=None),
+        ):
+            yield
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_concurrent_requests_share_one_call(
+        self, mock_settings, mock_generate_async, mock_save_usage, mock_get_provider_and_model
+    ):
+        """同時リクエスト集約 - 同じ内容の非同期生成は1回だけプロバイダーを呼ぶ"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_settings.generation_coalescing = True
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        gate = asyncio.Event()
+
+        async def slow_generate(**kwargs):
+            await gate.wait()
+            return ("主病名: 糖尿病", 1000, 500)
+
+        mock_generate_async.side_effect = slow_generate
+
+        tasks = [
+            asyncio.ensure_future(execute_summary_generation_async(**_CACHE_TEST_KWARGS))
+            for _ in range(3)
+        ]
+        while mock_generate_async.call_count == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        gate.set()
+        results = await asyncio.gather(*tasks)
+
+        assert mock_generate_async.call_count == 1
+        assert all(r.success and r.output_summary == "主病名:糖尿病" for r in results)
+        assert sorted(r.coalesced for r in results) == [False, True, True]
+        # プロバイダーのトークン消費は呼び出した1件のみに記録
+        recorded = sorted(c.kwargs["input_tokens"] for c in mock_save_usage.call_args_list)
+        assert recorded == [0, 0, 1000]
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_fallback_request_joins_stream(
+        self, mock_settings, mock_stream_with_provider, mock_generate_async, mock_save_usage,
+        mock_get_provider_and_model
+    ):
+        """同時リクエスト集約 - ストリーミング中の同じ内容の非ストリーミング生成はストリームに参加"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_settings.generation_coalescing = True
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        gate = asyncio.Event()
+
+        async def fake_stream(**kwargs):
+            yield "主病名: "
+            await gate.wait()
+            yield "糖尿病"
+            yield {"input_tokens": 1000, "output_tokens": 500}
+
+        mock_stream_with_provider.side_effect = fake_stream
+
+        async def collect_stream():
+            return [e async for e in execute_summary_generation_stream(**_CACHE_TEST_KWARGS)]
+
+        stream_task = asyncio.ensure_future(collect_stream())
+        while mock_stream_with_provider.call_count == 0:
+            await asyncio.sleep(0.01)
+        fallback_task = asyncio.ensure_future(execute_summary_generation_async(**_CACHE_TEST_KWARGS))
+        await asyncio.sleep(0.05)
+        gate.set()
+        events, fallback = await asyncio.gather(stream_task, fallback_task)
+
+        mock_generate_async.assert_not_called()
+        assert fallback.coalesced is True
+        assert fallback.output_summary == "主病名:糖尿病"
+        complete = json.loads(events[-1].split("data: ")[1])
+        assert complete["coalesced"] is False
+        assert complete["output_summary"] == fallback.output_summary
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_disabled_calls_provider_per_request(
+        self, mock_settings, mock_generate_async, mock_save_usage, mock_get_provider_and_model
+    ):
+        """同時リクエスト集約 - 無効時はリクエストごとに呼び出す"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.max_token_threshold = 100000
+        mock_settings.generation_coalescing = False
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        mock_generate_async.return_value = ("主病名: 糖尿病", 1000, 500)
+
+        results = await asyncio.gather(
+            execute_summary_generation_async(**_CACHE_TEST_KWARGS),
+            execute_summary_generation_async(**_CACHE_TEST_KWARGS),
+        )
+
+        assert mock_generate_async.call_count == 2
+        assert not any(r.coalesced for r in results)
+
+
+class TestPromptCacheUsage:
+    """プロバイダーのプロンプトキャッシュのトークン数記録のテスト"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_async_records_cache_tokens(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """プロンプトキャッシュ - 非同期生成でキャッシュの読み込み・書き込みトークン数を記録"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_determine_model.return_value = ("Claude", False)
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+        mock_generate_async.return_value = GenerationResult(
+            "主病名: 糖尿病", 300, 500, cache_read_tokens=2500, cache_write_tokens=0
+        )
+
+        result = await execute_summary_generation_async(**_CACHE_TEST_KWARGS)
+
+        assert result.success is True
+        usage = mock_save_usage.call_args.kwargs
+        assert usage["input_tokens"] == 300
+        assert usage["cache_read_tokens"] == 2500
+        assert usage["cache_write_tokens"] == 0
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model")
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_stream_records_cache_tokens(
+        self, mock_settings, mock_stream_with_provider, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """プロンプトキャッシュ - ストリーミング最後のトークン数からキャッシュ分を記録"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_determine_model.return_value = ("Claude", False)
+        mock_get_provider_and_model.return_value = ("claude", "claude-sonnet")
+
+        async def fake_stream(**kwargs):
+            yield "主病名: 糖尿病"
+            yield {"input_tokens": 300, "output_tokens": 500, "cache_write_tokens": 2500}
+
+        mock_stream_with_provider.side_effect = fake_stream
+
+        async for _ in execute_summary_generation_stream(**_CACHE_TEST_KWARGS):
+            pass
+
+        usage = mock_save_usage.call_args.kwargs
+        assert usage["cache_read_tokens"] == 0
+        assert usage["cache_write_tokens"] == 2500
+
+
+def _provider_for(model):
+    return ("gemini", "gemini-pro") if model == "Gemini_Pro" else ("claude", "claude-sonnet")
+
+
+class TestAdaptiveRouting:
+    """応答時間・エラー率によるモデル選択のテスト"""
+
+    @pytest.fixture(autouse=True)
+    def resolved_prompt(self):
+        with patch(
+            "app.services.summary_service._lookup_prompt",
+            return_value=ResolvedPrompt(content="デフォルトプロンプト", selected_model=None),
+        ) as mock_lookup_prompt:
+            yield mock_lookup_prompt
+
+    @pytest.mark.asyncio
+    @patch("app.services.model_selector.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_routes_away_from_slow_model(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_router_provider
+    ):
+        """適応的モデル選択 - モデル未指定でClaudeのp95がSLO超過ならGeminiで生成"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.adaptive_routing = True
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.return_value = ("主病名: 糖尿病", 1000, 500)
+        router = get_model_router()
+        for _ in range(20):
+            router.record("Claude", 300.0, 100, True)
+
+        result = await execute_summary_generation_async(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is True
+        assert result.model_used == "Gemini_Pro"
+        assert result.model_switched is True
+        assert mock_generate_async.await_args.kwargs["provider"] == "gemini"
+        assert router.snapshot()["decisions"][0]["reason"] == "latency_slo"
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_explicit_model_is_kept(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """適応的モデル選択 - ユーザーが選んだモデルは切り替えない"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.adaptive_routing = True
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.return_value = ("主病名: 糖尿病", 1000, 500)
+        for _ in range(20):
+            get_model_router().record("Claude", 300.0, 100, True)
+
+        result = await execute_summary_generation_async(**_CACHE_TEST_KWARGS)
+
+        assert result.model_used == "Claude"
+        assert result.model_switched is False
+
+    @pytest.mark.asyncio
+    @patch("app.services.model_selector.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_prompt_selected_model_is_kept(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_router_provider, resolved_prompt
+    ):
+        """適応的モデル選択 - プロンプト設定で指定されたモデルは切り替えない"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.adaptive_routing = True
+        resolved_prompt.return_value = ResolvedPrompt(content="眼科用", selected_model="Claude")
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.return_value = ("主病名: 糖尿病", 1000, 500)
+        for _ in range(20):
+            get_model_router().record("Claude", 300.0, 100, True)
+
+        result = await execute_summary_generation_async(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is True
+        assert result.model_used == "Claude"
+        assert result.model_switched is False
+        assert mock_generate_async.await_args.kwargs["provider"] == "claude"
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_records_provider_outcomes(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """適応的モデル選択 - プロバイダー呼び出しの成否を統計に記録"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_settings.generation_coalescing = False
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.side_effect = [("主病名: 糖尿病", 1000, 500), RuntimeError("overloaded")]
+        router = ModelRouter(session_factory=None, min_samples=1)
+        set_model_router(router)
+
+        await execute_summary_generation_async(**_CACHE_TEST_KWARGS)
+        failed = await execute_summary_generation_async(**_CACHE_TEST_KWARGS)
+
+        assert failed.success is False
+        health = router.health("Claude")
+        assert health.samples == 2
+        assert health.error_rate == 0.5
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_stream_failure_recorded(
+        self, mock_settings, mock_stream_with_provider, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model
+    ):
+        """適応的モデル選択 - ストリーミングの途中で失敗した呼び出しもエラーとして記録"""
+        mock_settings.min_input_tokens = 10
+        mock_settings.max_input_tokens = 100000
+        mock_determine_model.return_value = ("Claude", False)
+
+        async def failing_stream(**kwargs):
+            yield "主病名: "
+            raise RuntimeError("503 Service Unavailable")
+
+        mock_stream_with_provider.side_effect = failing_stream
+        router = ModelRouter(session_factory=None, min_samples=1)
+        set_model_router(router)
+
+        events = [e async for e in execute_summary_generation_stream(**_CACHE_TEST_KWARGS)]
+
+        assert events[-1].startswith("event: error")
+        assert router.health("Claude").error_rate == 1.0
+
+
+def _failover_settings(mock_settings):
+    mock_settings.min_input_tokens = 10
+    mock_settings.max_input_tokens = 100000
+    mock_settings.adaptive_routing = False
+    mock_settings.generation_coalescing = False
+    mock_settings.hedging_enabled = False
+    mock_settings.failover_enabled = True
+    mock_settings.hedge_targets = ["model"]
+
+
+class TestFailover:
+    """レート制限・サーバーエラー時の予備モデルへの切り替えのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def resolved_prompt(self):
+        with patch(
+            "app.services.summary_service._lookup_prompt",
+            return_value=ResolvedPrompt(content="デフォルトプロンプト", selected_model=None),
+        ) as mock_lookup_prompt:
+            yield mock_lookup_prompt
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_fails_over_to_other_model(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits
+    ):
+        """429で失敗した場合は別のモデルで生成し、実際に生成したモデルを記録"""
+        _failover_settings(mock_settings)
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.side_effect = [
+            APIError("Too Many Requests", status_code=429),
+            ("主病名: 糖尿病", 1000, 500),
+        ]
+
+        result = await execute_summary_generation_async(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is True
+        assert result.model_used == "Gemini_Pro"
+        assert result.model_switched is True
+        assert mock_generate_async.await_args_list[1].kwargs["provider"] == "gemini"
+        assert mock_save_usage.call_args.kwargs["model"] == "Gemini_Pro"
+        health = get_model_router().health("Claude")
+        assert health.samples == 1
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_explicit_model_not_switched(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits
+    ):
+        """ユーザーが選んだモデルは別のモデルに切り替えない"""
+        _failover_settings(mock_settings)
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.side_effect = APIError("Too Many Requests", status_code=429)
+
+        result = await execute_summary_generation_async(**_CACHE_TEST_KWARGS)
+
+        assert result.success is False
+        assert result.retryable is True
+        assert mock_generate_async.await_count == 1
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async", new_callable=AsyncMock)
+    @patch("app.services.summary_service.settings")
+    async def test_prompt_selected_model_not_switched(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits, resolved_prompt
+    ):
+        """プロンプト設定でモデルが指定されている場合は別のモデルに切り替えない"""
+        _failover_settings(mock_settings)
+        resolved_prompt.return_value = ResolvedPrompt(content="眼科用", selected_model="Claude")
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate_async.side_effect = APIError("Too Many Requests", status_code=429)
+
+        result = await execute_summary_generation_async(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is False
+        assert mock_generate_async.await_count == 1
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_non_stream_not_hedged(
+        self, mock_settings, mock_generate_async, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits
+    ):
+        """非ストリーミングでは生成に時間がかかっても予備に送らない"""
+        _failover_settings(mock_settings)
+        mock_settings.hedging_enabled = True
+        mock_settings.hedge_default_delay = 0.01
+        mock_determine_model.return_value = ("Claude", False)
+
+        async def generate(**kwargs):
+            await asyncio.sleep(0.05)
+            return ("主病名: 糖尿病", 1000, 500)
+
+        mock_generate_async.side_effect = generate
+
+        result = await execute_summary_generation_async(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is True
+        assert result.model_used == "Claude"
+        assert mock_generate_async.call_count == 1
+
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_with_provider")
+    @patch("app.services.summary_service.settings")
+    def test_sync_failover(
+        self, mock_settings, mock_generate, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits
+    ):
+        """同期処理でも5xxで失敗した場合は別のモデルで生成"""
+        _failover_settings(mock_settings)
+        mock_determine_model.return_value = ("Claude", False)
+        mock_generate.side_effect = [
+            APIError("Service Unavailable", status_code=503),
+            ("主病名: 糖尿病", 1000, 500),
+        ]
+
+        result = execute_summary_generation(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )
+
+        assert result.success is True
+        assert result.model_used == "Gemini_Pro"
+        assert mock_save_usage.call_args.kwargs["model"] == "Gemini_Pro"
+
+    @pytest.mark.asyncio
+    @patch("app.services.summary_service.model_fits", return_value=True)
+    @patch("app.services.summary_service.get_provider_and_model", side_effect=_provider_for)
+    @patch("app.services.summary_service.determine_model")
+    @patch("app.services.summary_service.save_usage")
+    @patch("app.services.summary_service.generate_summary_stream_with_provider_async")
+    @patch("app.services.summary_service.settings")
+    async def test_stream_hedged_to_other_model(
+        self, mock_settings, mock_stream_with_provider, mock_save_usage,
+        mock_determine_model, mock_get_provider_and_model, mock_model_fits
+    ):
+        """ストリーミングで最初のチャンクが遅ければ予備にも送り、先に応答したモデルを使う"""
+        _failover_settings(mock_settings)
+        mock_settings.hedging_enabled = True
+        mock_settings.hedge_default_delay = 0.01
+        mock_determine_model.return_value = ("Claude", False)
+
+        async def stream(**kwargs):
+            if kwargs["provider"] == "claude":
+                await asyncio.sleep(1)
+            yield "主病名: 糖尿病"
+            yield {"input_tokens": 1000, "output_tokens": 500}
+
+        mock_stream_with_provider.side_effect = stream
+
+        events = [e async for e in execute_summary_generation_stream(
+            **{**_CACHE_TEST_KWARGS, "model_explicitly_selected": False}
+        )]
+
+        complete = json.loads(events[-1].split("data: ")[1])
+        assert complete["model_used"] == "Gemini_Pro"
+        assert complete["model_switched"] is True
+        assert mock_save_usage.call_args.kwargs["model"] == "Gemini_Pro"
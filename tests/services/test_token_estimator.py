@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.models.usage import SummaryUsage
+from app.services.token_estimator import (
+    TokenCalibration,
+    TokenEstimate,
+    estimate_prompt_tokens,
+    estimate_text_tokens,
+    estimate_tokens,
+    set_token_calibration,
+)
+
+JST = ZoneInfo("Asia/Tokyo")
+
+
+def _session_factory(db):
+    @contextmanager
+    def factory():
+        yield db
+    return factory
+
+
+def _add_usage(db, model, count, input_tokens, estimated, date=None, **kwargs):
+    for _ in range(count):
+        db.add(SummaryUsage(
+            date=date or datetime.now(JST),
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=100,
+            estimated_input_tokens=estimated,
+            **kwargs,
+        ))
+    db.commit()
+
+
+class TestEstimateTextTokens:
+    """補正前の推定トークン数のテスト"""
+
+    def test_empty(self):
+        """推定 - 空文字は0"""
+        assert estimate_text_tokens("") == 0
+
+    def test_japanese_counts_per_char(self):
+        """推定 - 日本語は1文字1トークン"""
+        assert estimate_text_tokens("糖尿病で加療中") == 7
+
+    def test_ascii_counts_per_four_chars(self):
+        """推定 - 英数字は約4文字1トークン"""
+        assert estimate_text_tokens("HbA1c 7.2%") == 3
+
+    def test_mixed_text(self):
+        """推定 - 日本語と英数字の混在"""
+        assert estimate_text_tokens("HbA1c 7.2%で改善") == 3 + 3
+
+    def test_prompt_includes_template_and_sections(self):
+        """推定 - テンプレート・紹介目的・処方を含むプロンプト全体を数える"""
+        body_only = estimate_prompt_tokens("", "カルテ")
+        with_all = estimate_prompt_tokens("テンプレート", "カルテ", "", "精査依頼", "メトホルミン")
+
+        assert with_all > body_only + len("テンプレート") + len("精査依頼") + len("メトホルミン")
+
+
+class TestTokenEstimate:
+    """補正係数の適用のテスト"""
+
+    def test_uncalibrated_model(self):
+        """補正 - 係数がないモデルは補正しない"""
+        assert TokenEstimate(1000).for_model("Claude") == 1000
+
+    def test_calibrated_model(self):
+        """補正 - モデルごとの係数を掛ける"""
+        estimate = TokenEstimate(1000, {"Claude": 1.25, "Gemini_Pro": 0.8})
+
+        assert estimate.for_model("Claude") == 1250
+        assert estimate.for_model("Gemini_Pro") == 800
+
+
+class TestTokenCalibration:
+    """使用統計からの補正係数の計算のテスト"""
+
+    def test_factor_from_usage(self, test_db):
+        """補正係数 - 実際の入力トークン数（キャッシュ分を含む）と推定値の比"""
+        _add_usage(test_db, "Claude", 20, 1000, 1000, cache_read_tokens=500)
+        _add_usage(test_db, "Gemini_Pro", 20, 800, 1000)
+
+        calibration = TokenCalibration(session_factory=_session_factory(test_db))
+
+        assert calibration.factors() == {"Claude": pytest.approx(1.5), "Gemini_Pro": pytest.approx(0.8)}
+
+    def test_requires_min_samples(self, test_db):
+        """補正係数 - 件数が足りないモデルは補正しない"""
+        _add_usage(test_db, "Claude", 5, 2000, 1000)
+
+        calibration = TokenCalibration(session_factory=_session_factory(test_db))
+
+        assert calibration.factors() == {}
+
+    def test_excludes_cache_hits_and_unestimated(self, test_db):
+        """補正係数 - キャッシュ応答と推定値のない行は使わない"""
+        _add_usage(test_db, "Claude", 20, 1200, 1000)
+        _add_usage(test_db, "Claude", 20, 0, 1000, cache_hit=True)
+        _add_usage(test_db, "Claude", 20, 5000, None)
+
+        calibration = TokenCalibration(session_factory=_session_factory(test_db))
+
+        assert calibration.factors() == {"Claude": pytest.approx(1.2)}
+
+    def test_excludes_old_usage(self, test_db):
+        """補正係数 - 集計期間より前の使用統計は使わない"""
+        _add_usage(test_db, "Claude", 20, 3000, 1000, date=datetime.now(JST) - timedelta(days=60))
+
+        calibration = TokenCalibration(session_factory=_session_factory(test_db), days=30)
+
+        assert calibration.factors() == {}
+
+    def test_factor_is_clamped(self, test_db):
+        """補正係数 - 極端な比率は上限で制限"""
+        _add_usage(test_db, "Claude", 20, 100000, 1000)
+
+        calibration = TokenCalibration(session_factory=_session_factory(test_db))
+
+        assert calibration.factors() == {"Claude": 4.0}
+
+    def test_cached_until_ttl(self, test_db):
+        """補正係数 - 有効期間内は再計算しない"""
+        calibration = TokenCalibration(session_factory=_session_factory(test_db), ttl=600)
+        assert calibration.factors() == {}
+
+        _add_usage(test_db, "Claude", 20, 1500, 1000)
+
+        assert calibration.factors() == {}
+        calibration.refresh()
+        assert calibration.factors() == {"Claude": pytest.approx(1.5)}
+
+    def test_load_failure_keeps_previous(self, test_db):
+        """補正係数 - 再計算に失敗した場合は前回の係数を使い続ける"""
+        _add_usage(test_db, "Claude", 20, 1500, 1000)
+        calibration = TokenCalibration(session_factory=_session_factory(test_db))
+        calibration.refresh()
+
+        with patch.object(calibration, "_load", side_effect=RuntimeError("db down")):
+            calibration.refresh()
+
+        assert calibration.factors() == {"Claude": pytest.approx(1.5)}
+
+    def test_disabled(self):
+        """補正係数 - ttl=0ではDBを参照せず補正しない"""
+        def failing_factory():
+            raise AssertionError("DBを参照しない")
+
+        assert TokenCalibration(session_factory=failing_factory, ttl=0).factors() == {}
+
+    def test_estimate_tokens_uses_shared_calibration(self, test_db):
+        """推定 - プロセス共有の補正係数を付けて返す"""
+        _add_usage(test_db, "Gemini_Pro", 20, 900, 1000)
+        set_token_calibration(TokenCalibration(session_factory=_session_factory(test_db)))
+
+        estimate = estimate_tokens("テンプレート", "カルテ")
+
+        assert estimate.raw_tokens == estimate_prompt_tokens("テンプレート", "カルテ")
+        assert estimate.factors == {"Gemini_Pro": pytest.approx(0.9)}
@@ -0,0 +1,236 @@
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.usage import SummaryUsage
+from app.services.usage_writer import UsageWriter
+
+JST = ZoneInfo("Asia/Tokyo")
+
+
+def _record(department: str = "眼科", input_tokens: int = 1000) -> dict:
+    return {
+        "date": datetime(2026, 1, 5, 10, 0, tzinfo=JST),
+        "department": department,
+        "doctor": "橋本義弘",
+        "document_type": "他院への紹介",
+        "model": "Claude",
+        "input_tokens": input_tokens,
+        "output_tokens": 500,
+        "app_type": "referral_letter",
+        "processing_time": 2.5,
+    }
+
+
+@pytest.fixture
+def session_factory(test_db):
+    """テスト用DBに書き込むセッションファクトリ"""
+    Session = sessionmaker(bind=test_db.get_bind())
+
+    @contextmanager
+    def factory():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return factory
+
+
+@pytest.fixture
+def insert_statements(test_db):
+    """発行されたINSERT文を記録"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+class TestUsageWriter:
+    """UsageWriter のテスト"""
+
+    def test_flush_on_shutdown_as_multi_row_insert(
+        self, test_db, session_factory, insert_statements, tmp_path
+    ):
+        """書き込み - 終了時に残りをまとめて1文で書き込む"""
+        writer = UsageWriter(
+            session_factory=session_factory,
+            flush_interval=60,
+            spill_path=tmp_path / "spill.jsonl",
+        )
+        for i in range(3):
+            writer.submit(_record(input_tokens=i))
+        writer.shutdown()
+
+        rows = test_db.query(SummaryUsage).order_by(SummaryUsage.input_tokens).all()
+        assert [r.input_tokens for r in rows] == [0, 1, 2]
+        assert rows[0].document_type == "他院への紹介"
+        assert rows[0].model == "Claude"
+        assert len(insert_statements) == 1
+        assert writer.stats()["written"] == 3
+
+    def test_flush_on_batch_size(self, test_db, session_factory, insert_statements, tmp_path):
+        """書き込み - 件数に達したら待たずに書き込む"""
+        writer = UsageWriter(
+            session_factory=session_factory,
+            batch_size=2,
+            flush_interval=60,
+            spill_path=tmp_path / "spill.jsonl",
+        )
+        for i in range(5):
+            writer.submit(_record(input_tokens=i))
+        writer.shutdown()
+
+        assert test_db.query(SummaryUsage).count() == 5
+        # 2件 + 2件 + 終了時の1件
+        assert len(insert_statements) == 3
+
+    def test_spill_when_database_unavailable(self, session_factory, tmp_path):
+        """退避 - DBに書き込めない場合はファイルに退避"""
+        spill_path = tmp_path / "spill.jsonl"
+        writer = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+
+        with patch.object(writer, "_insert", side_effect=Exception("DB接続エラー")):
+            writer.submit(_record())
+            writer.shutdown()
+
+        lines = spill_path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["date"] == "2026-01-05T10:00:00+09:00"
+        assert writer.stats()["spill_pending"] is True
+
+    def test_spill_replayed_on_start(self, test_db, session_factory, tmp_path):
+        """退避 - 起動時に退避ファイルを再投入して削除"""
+        spill_path = tmp_path / "spill.jsonl"
+        failing = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+        with patch.object(failing, "_insert", side_effect=Exception("DB接続エラー")):
+            failing.submit(_record(department="default"))
+            failing.shutdown()
+
+        writer = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+        writer.start()
+        writer.shutdown()
+
+        rows = test_db.query(SummaryUsage).all()
+        assert [r.department for r in rows] == ["default"]
+        assert rows[0].date is not None
+        assert not spill_path.exists()
+        assert writer.stats()["spill_pending"] is False
+
+    def test_replay_failure_keeps_spill(self, session_factory, tmp_path):
+        """退避 - 再投入に失敗した場合は退避ファイルを残す"""
+        spill_path = tmp_path / "spill.jsonl"
+        spill_path.write_text(
+            json.dumps({**_record(), "date": "2026-01-05T10:00:00+09:00"}) + "\n",
+            encoding="utf-8",
+        )
+        writer = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+
+        with patch.object(writer, "_insert", side_effect=Exception("DB接続エラー")):
+            writer._replay_spill()
+
+        assert len(spill_path.read_text(encoding="utf-8").splitlines()) == 1
+
+    def test_replay_partial_failure_does_not_duplicate(
+        self, test_db, session_factory, tmp_path
+    ):
+        """退避 - 途中のINSERTが失敗しても書き込み済みの分を二重に再投入しない"""
+        spill_path = tmp_path / "spill.jsonl"
+        spill_path.write_text(
+            "".join(
+                json.dumps({**_record(input_tokens=i), "date": "2026-01-05T10:00:00+09:00"}) + "\n"
+                for i in range(3)
+            ),
+            encoding="utf-8",
+        )
+        writer = UsageWriter(session_factory=session_factory, batch_size=2, spill_path=spill_path)
+        inserts = []
+
+        def fail_second_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT"):
+                inserts.append(statement)
+                if len(inserts) == 2:
+                    raise RuntimeError("DB接続エラー")
+
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", fail_second_insert)
+        try:
+            writer._replay_spill()
+        finally:
+            event.remove(engine, "before_cursor_execute", fail_second_insert)
+
+        assert test_db.query(SummaryUsage).count() == 0
+        assert len(spill_path.read_text(encoding="utf-8").splitlines()) == 3
+
+        writer._replay_spill()
+
+        assert test_db.query(SummaryUsage).count() == 3
+
+    def test_replay_shared_spill_once(self, test_db, session_factory, tmp_path):
+        """退避 - 同じ退避ファイルを共有する別のプロセスが再投入中なら二重に書き込まない"""
+        spill_path = tmp_path / "spill.jsonl"
+        spill_path.write_text(
+            json.dumps({**_record(), "date": "2026-01-05T10:00:00+09:00"}) + "\n",
+            encoding="utf-8",
+        )
+        replaying = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+        other = UsageWriter(session_factory=session_factory, spill_path=spill_path)
+        insert = replaying._insert
+
+        def insert_while_other_replays(rows):
+            other._replay_spill()
+            insert(rows)
+
+        with patch.object(replaying, "_insert", side_effect=insert_while_other_replays):
+            replaying._replay_spill()
+
+        assert test_db.query(SummaryUsage).count() == 1
+        assert replaying.stats()["spill_pending"] is False
+
+    def test_queue_full_spills_without_blocking(self, session_factory, tmp_path):
+        """背圧 - キュー満杯時は呼び出し元を待たせずファイルに退避"""
+        spill_path = tmp_path / "spill.jsonl"
+        writer = UsageWriter(
+            session_factory=session_factory, max_queue_size=1, spill_path=spill_path
+        )
+
+        with patch.object(writer, "start"):
+            writer.submit(_record())
+            writer.submit(_record())
+
+        assert writer.stats()["spilled"] == 1
+        assert writer.stats()["queued"] == 1
+
+    def test_queue_full_drop_policy(self, session_factory, tmp_path):
+        """背圧 - dropポリシーでは破棄して件数を記録"""
+        spill_path = tmp_path / "spill.jsonl"
+        writer = UsageWriter(
+            session_factory=session_factory,
+            max_queue_size=1,
+            overflow="drop",
+            spill_path=spill_path,
+        )
+
+        with patch.object(writer, "start"):
+            writer.submit(_record())
+            writer.submit(_record())
+
+        assert writer.stats()["dropped"] == 1
+        assert not spill_path.exists()
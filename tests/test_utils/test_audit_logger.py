@@ -0,0 +1,177 @@
+import json
+import logging
+import logging.handlers
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings
+from app.models.audit_log import AuditLog
+from app.utils.audit_logger import (
+    AuditPipeline,
+    AuditJsonFormatter,
+    DatabaseAuditHandler,
+    build_audit_sinks,
+    log_audit_event,
+    serialize_audit_event,
+    start_audit_logging,
+    stop_audit_logging,
+)
+
+
+class _ListHandler(logging.Handler):
+    """受け取ったレコードを保持するテスト用シンク"""
+
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+        self.flushes = 0
+        self.setFormatter(AuditJsonFormatter())
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def flush(self):
+        self.flushes += 1
+
+
+@pytest.fixture
+def session_factory(test_db):
+    Session = sessionmaker(bind=test_db.get_bind())
+
+    @contextmanager
+    def factory():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    return factory
+
+
+class TestLogAuditEvent:
+    """log_audit_event 関数のテスト"""
+
+    def test_without_pipeline_logs_json(self, caplog):
+        """監査ログ - パイプライン未起動時は同期的にJSONを出力"""
+        with caplog.at_level(logging.INFO, logger="audit"):
+            log_audit_event("文書生成開始", user_ip="127.0.0.1", document_type="返書")
+
+        data = json.loads(caplog.records[0].getMessage())
+        assert data["event_type"] == "文書生成開始"
+        assert data["user_ip"] == "127.0.0.1"
+        assert data["document_type"] == "返書"
+        assert data["success"] is True
+
+    def test_pipeline_writes_all_events_on_stop(self):
+        """監査ログ - 停止時にキューの残りを全て書き出す"""
+        sink = _ListHandler()
+        start_audit_logging([sink])
+        for i in range(20):
+            log_audit_event("文書生成完了", input_tokens=i)
+        stop_audit_logging()
+
+        events = [json.loads(sink.format(r)) for r in sink.records]
+        assert [e["input_tokens"] for e in events] == list(range(20))
+
+    def test_pipeline_does_not_propagate(self):
+        """監査ログ - パイプライン起動中はルートロガーに伝播しない"""
+        audit = logging.getLogger("audit")
+        start_audit_logging([_ListHandler()])
+        assert audit.propagate is False
+        stop_audit_logging()
+        assert audit.propagate is True
+
+    def test_pipeline_flushes_when_idle(self):
+        """監査ログ - イベントがなければ一定間隔でシンクを書き出す"""
+        sink = _ListHandler()
+        pipeline = AuditPipeline([sink], flush_interval=0.01)
+        pipeline.start()
+        time.sleep(0.1)
+        pipeline.stop()
+
+        assert sink.flushes >= 2
+
+
+class TestSerializeAuditEvent:
+    """serialize_audit_event 関数のテスト"""
+
+    def test_compact_and_non_ascii(self):
+        """シリアライズ - 空白なし・日本語はそのまま"""
+        assert serialize_audit_event({"event_type": "評価完了", "success": True}) == (
+            '{"event_type":"評価完了","success":true}'
+        )
+
+
+class TestDatabaseAuditHandler:
+    """DatabaseAuditHandler のテスト"""
+
+    def _record(self, event_type: str) -> logging.LogRecord:
+        record = logging.LogRecord("audit", logging.INFO, __file__, 0, event_type, None, None)
+        record.audit = {
+            "timestamp": "2026-01-05T01:00:00+00:00",
+            "event_type": event_type,
+            "success": True,
+            "document_type": "返書",
+        }
+        return record
+
+    def test_buffers_until_batch_size(self, test_db, session_factory):
+        """DBシンク - 件数に達するまでまとめて書き込む"""
+        handler = DatabaseAuditHandler(session_factory=session_factory, batch_size=2)
+
+        handler.handle(self._record("評価開始"))
+        assert test_db.query(AuditLog).count() == 0
+
+        handler.handle(self._record("評価完了"))
+        rows = test_db.query(AuditLog).order_by(AuditLog.id).all()
+        assert [r.event_type for r in rows] == ["評価開始", "評価完了"]
+        assert rows[0].document_type == "返書"
+        assert json.loads(rows[0].payload)["event_type"] == "評価開始"
+
+    def test_flush_writes_remaining(self, test_db, session_factory):
+        """DBシンク - flushで残りを書き込む"""
+        handler = DatabaseAuditHandler(session_factory=session_factory, batch_size=50)
+        handler.handle(self._record("評価開始"))
+        handler.flush()
+
+        assert test_db.query(AuditLog).count() == 1
+
+    def test_write_failure_does_not_raise(self):
+        """DBシンク - 書き込み失敗時も例外を投げない"""
+
+        @contextmanager
+        def failing_factory():
+            raise RuntimeError("DB接続エラー")
+            yield
+
+        handler = DatabaseAuditHandler(session_factory=failing_factory, batch_size=1)
+        handler.handle(self._record("評価開始"))
+
+
+class TestBuildAuditSinks:
+    """build_audit_sinks 関数のテスト"""
+
+    def test_file_sink_writes_jsonl(self, tmp_path):
+        """出力先 - ローテーションするJSONLファイル"""
+        path = tmp_path / "logs" / "audit.jsonl"
+        settings = Settings(audit_log_sinks=["file"], audit_log_file=str(path))
+        sinks = build_audit_sinks(settings)
+        assert isinstance(sinks[0], logging.handlers.RotatingFileHandler)
+
+        start_audit_logging(sinks)
+        log_audit_event("プロンプト作成", prompt_id=1)
+        stop_audit_logging()
+
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert json.loads(lines[0])["prompt_id"] == 1
+
+    def test_unknown_sink_ignored(self):
+        """出力先 - 不明な出力先は無視"""
+        settings = Settings(audit_log_sinks=["stdout", "unknown"])
+        sinks = build_audit_sinks(settings)
+        assert len(sinks) == 1
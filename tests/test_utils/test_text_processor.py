@@ -1,4 +1,14 @@
-from app.utils.text_processor import format_output_summary, parse_output_summary
+import random
+import re
+
+from app.core.constants import DEFAULT_SECTION_NAMES, SECTION_DETECTION_PATTERNS
+from app.utils.text_processor import (
+    SectionStreamParser,
+    format_output_summary,
+    get_section_parser,
+    parse_output_summary,
+    section_aliases,
+)
 
 
 class TestFormatOutputSummary:
@@ -288,3 +298,107 @@ class TestParseOutputSummary:
 
         # パターンマッチで空白を吸収
         assert result["備考"] == "特記事項なし"
+
+
+def _reference_parse(summary_text: str) -> dict[str, str]:
+    """パターンを1つずつ照合する従来の実装（同等性確認用）"""
+    sections = {section: "" for section in DEFAULT_SECTION_NAMES}
+    current_section = None
+    all_section_names = list(sections.keys()) + list(section_aliases.keys())
+
+    for line in summary_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        detected = None
+        for section in all_section_names:
+            for pattern in SECTION_DETECTION_PATTERNS:
+                match = re.match(pattern.format(section=re.escape(section)), line)
+                if match:
+                    content = match.group(1).strip() if match.groups() else ""
+                    detected = (section_aliases.get(section, section), content)
+                    break
+            if detected:
+                break
+
+        if detected:
+            current_section, content = detected
+            if content:
+                sections[current_section] = content
+        elif current_section:
+            if sections[current_section]:
+                sections[current_section] += "\n" + line
+            else:
+                sections[current_section] = line
+
+    return sections
+
+
+_LINE_FRAGMENTS = [
+    "現在の処方", "備考", "その他", "補足", "メモ", "治療経過",
+    "【", "】", "[", "]", "■", "●", ":", "：", " ", "　",
+    "アムロジピン5mg", "経過良好", "備考欄参照", "\t",
+]
+
+
+def _random_summary(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(0, 12)):
+        lines.append("".join(rng.choice(_LINE_FRAGMENTS) for _ in range(rng.randint(0, 5))))
+    return "\n".join(lines)
+
+
+class TestSectionParser:
+    """コンパイル済みセクションパーサーのテスト"""
+
+    def test_matches_reference_implementation(self):
+        """従来の逐次照合と同じ結果になる"""
+        rng = random.Random(20260105)
+        for _ in range(2000):
+            text = _random_summary(rng)
+            assert parse_output_summary(text) == _reference_parse(text), text
+
+    def test_parser_cached_per_section_set(self):
+        """同じセクション構成ではコンパイル済みパーサーを再利用"""
+        assert get_section_parser() is get_section_parser()
+        assert get_section_parser(["治療経過", "備考"]) is not get_section_parser()
+
+    def test_custom_section_names(self):
+        """診療科ごとのセクション構成で解析"""
+        parser = get_section_parser(["治療経過", "現在の処方", "備考"])
+        result = parser.parse("治療経過: 手術施行\n現在の処方: なし\nメモ: 特記なし")
+        assert result == {"治療経過": "手術施行", "現在の処方": "なし", "備考": "特記なし"}
+
+    def test_classify_heading(self):
+        """見出し行の判定"""
+        parser = get_section_parser()
+        assert parser.classify("【現在の処方】アムロジピン") == ("現在の処方", "アムロジピン")
+        assert parser.classify("補足") == ("備考", "")
+        assert parser.classify("経過良好") is None
+
+
+class TestSectionStreamParser:
+    """SectionStreamParser のテスト"""
+
+    def test_chunked_equals_whole(self):
+        """任意の位置で分割したチャンクでも一括解析と同じ結果"""
+        rng = random.Random(42)
+        for _ in range(500):
+            text = _random_summary(rng)
+            parser = SectionStreamParser()
+            pos = 0
+            while pos < len(text):
+                size = rng.randint(1, 8)
+                parser.feed(text[pos:pos + size])
+                pos += size
+            assert parser.close() == parse_output_summary(text), text
+
+    def test_partial_line_pending_until_newline(self):
+        """改行までは未完の行として保留"""
+        parser = SectionStreamParser()
+        assert parser.feed("現在の処方: アムロ")["現在の処方"] == ""
+        assert parser.feed("ジピン\n備")["現在の処方"] == "アムロジピン"
+        # チャンクをまたいだ見出しも1行として判定
+        assert parser.feed("考: 特記なし")["備考"] == ""
+        assert parser.close() == {"現在の処方": "アムロジピン", "備考": "特記なし"}